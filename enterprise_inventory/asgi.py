@@ -3,6 +3,9 @@ ASGI config for enterprise_inventory project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Les vues JSON asynchrones (recherche, statistiques) et le déploiement ASGI
+sont décrits dans le README (section Déploiement).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +17,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "enterprise_inventory.settings")
 
 application = get_asgi_application()
+
+# Tâches périodiques du processus serveur uniquement (après le chargement des applications)
+from inventory.maintenance_preventive import demarrer_automatiquement
+
+demarrer_automatiquement()
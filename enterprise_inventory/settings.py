@@ -42,11 +42,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "inventory.profilage.ProfilageRequetesMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "users.middleware.CapacitesMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -139,4 +141,80 @@ LOGOUT_REDIRECT_URL = '/users/login/'
 #trust origin
 CSRF_TRUSTED_ORIGINS = [
     "https://noble-simply-sturgeon.ngrok-free.app",
-    "http://localhost:8000"]
\ No newline at end of file
+    "http://localhost:8000"]
+
+# Durée de validité maximale (secondes) des statistiques pré-calculées du tableau de bord
+TABLEAU_BORD_STATS_DUREE_MAX = 300
+
+# Produits en stock bas listés sur le tableau de bord technicien (lien "voir tout" au-delà)
+TABLEAU_BORD_PRODUITS_CRITIQUES = 20
+
+# Recherche plein texte : 'auto' (FTS5 sous SQLite, tsvector sous PostgreSQL), 'fts5', 'postgres' ou 'icontains'
+RECHERCHE_BACKEND = 'auto'
+
+# Exports CSV/XLSX : nombre de lignes lues par lot (values_list().iterator(chunk_size=...))
+EXPORT_TAILLE_LOT = 2000
+
+# Cache disque des PDF (MEDIA_ROOT/pdf) ; incrémenter PDF_CACHE_VERSION après une modification des gabarits
+PDF_CACHE_VERSION = 1
+# Pré-rendu des PDF à l'enregistrement des documents, dans un pool de threads local
+PDF_PRE_RENDU = False
+PDF_PRE_RENDU_TRAVAILLEURS = 2
+
+# Processus de rendu des PDF par lot (inventory/lot_pdf.py) ; 1 = rendu dans le processus courant
+PDF_LOT_TRAVAILLEURS = 4
+# Nombre maximal de documents par lot (au-delà, l'utilisateur doit restreindre les filtres)
+PDF_LOT_MAX_DOCUMENTS = 200
+
+# Clôtures de stock (inventory/cloture_stock.py) : durée de conservation des clôtures journalières
+CLOTURE_STOCK_RETENTION_JOURS = 90
+
+# Cache des rôles et capacités (users/permissions.py) : durée de validité d'une entrée en secondes
+PERMISSIONS_CACHE_DUREE = 300
+
+# Profilage des requêtes SQL par vue (inventory/profilage.py) : en-têtes X-Requetes-SQL / Server-Timing
+# et historique des dernières mesures servi par /profilage/
+PROFILAGE_REQUETES = DEBUG
+PROFILAGE_HISTORIQUE = 200
+
+# Pagination par curseur des listes (inventory/pagination.py) ; ?page= garde la pagination classique.
+# Le total affiché est compté jusqu'à PAGINATION_TOTAL_LIMITE lignes ("plus de N résultats" au-delà)
+PAGINATION_CURSEUR = True
+PAGINATION_TOTAL_LIMITE = 1000
+
+# Durée (secondes) de cache des badges des pages de liste (inventory/stats_listes.py),
+# périmés à chaque écriture sur le modèle concerné
+STATS_LISTES_DUREE = 30
+
+# Durée (secondes) de cache des pages publiques du catalogue (inventory/cache_catalogue.py),
+# périmées à chaque écriture sur un produit ou une catégorie et aux ruptures de stock.
+# Le cache par défaut est en mémoire, propre à chaque processus ; pour le partager entre
+# plusieurs processus sans serveur dédié :
+# CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+#                       'LOCATION': BASE_DIR / 'cache'}}
+CACHE_CATALOGUE_DUREE = 300
+
+# Planification des maintenances préventives (inventory/maintenance_preventive.py) :
+# interventions créées MAINTENANCE_HORIZON_JOURS jours à l'avance, à MAINTENANCE_HEURE heures,
+# pour une durée prévue de MAINTENANCE_DUREE_PREVUE minutes. Lancée par la commande
+# schedule_maintenance, ou toutes les MAINTENANCE_PLANIFICATION_INTERVALLE secondes dans le
+# processus serveur (wsgi.py, asgi.py) si MAINTENANCE_PLANIFICATION_AUTO est activé
+MAINTENANCE_HORIZON_JOURS = 30
+MAINTENANCE_HEURE = 9
+MAINTENANCE_DUREE_PREVUE = 60
+MAINTENANCE_PLANIFICATION_AUTO = False
+MAINTENANCE_PLANIFICATION_INTERVALLE = 3600
+
+# Planning des techniciens (inventory/planning_techniciens.py) : minutes de travail par jour
+# ouvré (0 = lundi) à partir de PLANNING_HEURE_DEBUT heures ; résultat en cache jusqu'à la
+# prochaine écriture d'une intervention, au plus PLANNING_CACHE_DUREE secondes
+PLANNING_CAPACITE_MINUTES = 480
+PLANNING_HEURE_DEBUT = 8
+PLANNING_JOURS_OUVRES = (0, 1, 2, 3, 4)
+PLANNING_CACHE_DUREE = 3600
+
+# Réapprovisionnement (inventory/reapprovisionnement.py) : historique des sorties en semaines,
+# taux de service visé pour le stock de sécurité, jours de demande couverts par une commande
+REAPPRO_HISTORIQUE_SEMAINES = 104
+REAPPRO_NIVEAU_SERVICE = 0.95
+REAPPRO_COUVERTURE_JOURS = 30
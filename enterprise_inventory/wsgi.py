@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "enterprise_inventory.settings")
 
 application = get_wsgi_application()
+
+# Tâches périodiques du processus serveur uniquement (après le chargement des applications)
+from inventory.maintenance_preventive import demarrer_automatiquement
+
+demarrer_automatiquement()
@@ -4,7 +4,9 @@ from .models import (
     Client, Commande, LigneCommande, Vente, LigneVente,
     Devis, LigneDevis, Prospect, NoteObservation, 
     AppareilVendu, InterventionSAV, TransfertStock,
-    ProspectionTelephonique
+    ProspectionTelephonique, StatistiqueTableauBord, ClotureStock, InstantaneStock,
+    CompteurVentesProduit, CumulClient, SuggestionReappro, CommandeFournisseur, LigneCommandeFournisseur,
+    ReservationStock
 )
 
 
@@ -17,7 +19,7 @@ class CategorieAdmin(admin.ModelAdmin):
 
 @admin.register(Fournisseur)
 class FournisseurAdmin(admin.ModelAdmin):
-    list_display = ['nom', 'email', 'telephone', 'ville', 'actif', 'date_creation']
+    list_display = ['nom', 'email', 'telephone', 'ville', 'delai_livraison_jours', 'actif', 'date_creation']
     search_fields = ['nom', 'email', 'ville']
     list_filter = ['ville', 'actif', 'date_creation']
     list_editable = ['actif']
@@ -33,13 +35,13 @@ class MouvementStockInline(admin.TabularInline):
 class ProduitAdmin(admin.ModelAdmin):
     list_display = [
         'nom', 'reference', 'categorie', 'fournisseur', 
-        'quantite_stock', 'prix_vente', 'is_stock_bas', 'actif'
+        'quantite_stock', 'quantite_reservee', 'prix_vente', 'is_stock_bas', 'actif'
     ]
     list_filter = ['categorie', 'fournisseur', 'actif', 'date_creation']
     search_fields = ['nom', 'reference', 'code_barre']
     list_editable = ['quantite_stock', 'prix_vente', 'actif']
     inlines = [MouvementStockInline]
-    readonly_fields = ['date_creation', 'date_modification']
+    readonly_fields = ['quantite_reservee', 'quantite_disponible', 'date_creation', 'date_modification']
     
     def is_stock_bas(self, obj):
         return obj.is_stock_bas()
@@ -54,7 +56,7 @@ class ProduitAdmin(admin.ModelAdmin):
             'fields': ('categorie', 'fournisseur')
         }),
         ('Prix et Stock', {
-            'fields': ('prix_achat', 'prix_vente', 'quantite_stock', 'seuil_alerte')
+            'fields': ('prix_achat', 'prix_vente', 'quantite_stock', 'quantite_reservee', 'quantite_disponible', 'seuil_alerte')
         }),
         ('Statut', {
             'fields': ('actif',)
@@ -134,6 +136,11 @@ class CommandeAdmin(admin.ModelAdmin):
         }),
     )
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Lignes enregistrées par les inlines : total et réservations de stock recalculés
+        form.instance.calculer_total()
+
 
 class LigneVenteInline(admin.TabularInline):
     model = LigneVente
@@ -351,6 +358,89 @@ class ProspectionTelephoniqueAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(StatistiqueTableauBord)
+class StatistiqueTableauBordAdmin(admin.ModelAdmin):
+    list_display = ['cle', 'perime', 'date_calcul']
+    list_filter = ['perime']
+    search_fields = ['cle']
+    readonly_fields = ['cle', 'donnees', 'date_calcul']
+
+
+class InstantaneStockInline(admin.TabularInline):
+    model = InstantaneStock
+    extra = 0
+    can_delete = False
+    readonly_fields = ['produit', 'quantite', 'prix_achat', 'valeur']
+
+
+@admin.register(ClotureStock)
+class ClotureStockAdmin(admin.ModelAdmin):
+    list_display = ['date', 'periodicite', 'quantite_totale', 'valeur_totale', 'date_calcul']
+    list_filter = ['periodicite']
+    date_hierarchy = 'date'
+    readonly_fields = ['quantite_totale', 'valeur_totale', 'date_calcul']
+    inlines = [InstantaneStockInline]
+
+
+@admin.register(CompteurVentesProduit)
+class CompteurVentesProduitAdmin(admin.ModelAdmin):
+    list_display = ['produit', 'quantite_7j', 'quantite_30j', 'quantite_90j', 'ca_30j', 'date_compactage']
+    search_fields = ['produit__nom', 'produit__reference']
+    ordering = ['-quantite_30j']
+    readonly_fields = [
+        'produit', 'quantite_7j', 'quantite_30j', 'quantite_90j',
+        'ca_7j', 'ca_30j', 'ca_90j', 'date_compactage'
+    ]
+
+
+
+@admin.register(CumulClient)
+class CumulClientAdmin(admin.ModelAdmin):
+    list_display = ['client', 'chiffre_affaires', 'nombre_ventes', 'nombre_commandes', 'date_dernier_achat', 'montant_devis_ouverts']
+    search_fields = ['client__nom', 'client__prenom', 'client__email']
+    ordering = ['-chiffre_affaires']
+    readonly_fields = [
+        'client', 'chiffre_affaires', 'total_ventes', 'nombre_ventes', 'total_commandes', 'nombre_commandes',
+        'date_dernier_achat', 'montant_devis_ouverts', 'nombre_devis_ouverts', 'date_calcul'
+    ]
+
+
+@admin.register(SuggestionReappro)
+class SuggestionReapproAdmin(admin.ModelAdmin):
+    list_display = [
+        'produit', 'fournisseur', 'demande_hebdo', 'point_commande', 'stock_previsionnel',
+        'quantite_suggeree', 'date_calcul'
+    ]
+    list_filter = ['fournisseur']
+    search_fields = ['produit__nom', 'produit__reference']
+    ordering = ['-quantite_suggeree']
+    readonly_fields = [
+        'produit', 'fournisseur', 'demande_hebdo', 'ecart_type_hebdo', 'semaines', 'point_commande',
+        'stock_cible', 'stock_previsionnel', 'quantite_suggeree', 'date_calcul'
+    ]
+
+
+class LigneCommandeFournisseurInline(admin.TabularInline):
+    model = LigneCommandeFournisseur
+    extra = 1
+    autocomplete_fields = ['produit']
+
+
+@admin.register(CommandeFournisseur)
+class CommandeFournisseurAdmin(admin.ModelAdmin):
+    list_display = ['numero_commande', 'fournisseur', 'statut', 'total', 'date_commande', 'utilisateur']
+    list_filter = ['statut', 'date_commande', 'fournisseur']
+    search_fields = ['numero_commande', 'fournisseur__nom']
+    inlines = [LigneCommandeFournisseurInline]
+    readonly_fields = ['date_commande', 'total']
+
+
+@admin.register(ReservationStock)
+class ReservationStockAdmin(admin.ModelAdmin):
+    list_display = ['commande', 'produit', 'quantite']
+    search_fields = ['commande__numero_commande', 'produit__nom', 'produit__reference']
+    readonly_fields = ['commande', 'produit', 'quantite']
+
 # Configuration générale de l'admin
 admin.site.site_header = "Enterprise Inventory - Administration"
 admin.site.site_title = "Enterprise Inventory"
@@ -359,3 +449,4 @@ admin.site.index_title = "Gestion d'Inventaire d'Entreprise"
 # Amélioration des autocomplete
 Produit.search_fields = ['nom', 'reference']
 Client.search_fields = ['nom', 'prenom', 'email']
+
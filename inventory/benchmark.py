@@ -0,0 +1,282 @@
+"""
+Mesure reproductible des vues principales
+
+Chaque scénario appelle une vue avec le client de test de Django, connecté
+avec le compte du rôle concerné (comptes créés par generate_dataset, voir
+inventory/donnees_synthetiques.py). Pour chaque scénario sont relevés le temps
+du premier appel (caches froids), puis la moyenne, la médiane, le p95 et le
+minimum des appels suivants, ainsi que le nombre de requêtes SQL et les N+1
+(inventory/profilage.py).
+
+Les résultats sont un dictionnaire sérialisable en JSON ; comparer() confronte
+deux séries de résultats scénario par scénario.
+
+concurrence() compare le débit d'un scénario servi par l'application WSGI
+(pool de threads, comme gunicorn --threads) et par l'application ASGI (une
+boucle d'événements, requêtes simultanées), appelées directement dans le
+processus, sans serveur HTTP.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.db.models import Max
+from django.test import Client as ClientTest
+from django.urls import reverse
+from django.utils import timezone
+
+from .donnees_synthetiques import UTILISATEURS, MOT_DE_PASSE
+from .models import Produit, Client, Commande, Vente, Devis, MouvementStock, LigneVente
+from .profilage import mesurer
+
+
+@dataclass
+class Scenario:
+    nom: str
+    role: str
+    vue: str
+    params: dict = field(default_factory=dict)
+    # Arguments de l'URL, calculés sur la base mesurée (ex. dernier document)
+    arguments: object = None
+    # Données POST, calculées sur la base mesurée ; un scénario POST écrit en base
+    donnees: object = None
+
+    @property
+    def ecriture(self):
+        return self.donnees is not None
+
+
+def dernier(model):
+    return lambda: [model.objects.aggregate(pk=Max('pk'))['pk']]
+
+
+def vente_simple():
+    produit = Produit.objects.filter(actif=True, quantite_stock__gt=0).order_by('pk').first()
+    return {
+        'mode_paiement': 'ESPECES',
+        'remise': '0',
+        'ligne_0_produit': str(produit.pk),
+        'ligne_0_quantite': '1',
+        'ligne_0_prix_unitaire': str(produit.prix_vente),
+    }
+
+
+SCENARIOS = [
+    *[Scenario(f'dashboard_{role.lower()}', role, 'inventory:dashboard') for role in UTILISATEURS],
+    Scenario('produits_list', 'MANAGER', 'inventory:produits_list'),
+    Scenario('produits_list_recherche', 'MANAGER', 'inventory:produits_list', {'q': 'Produit 123'}),
+    Scenario('produits_list_page_profonde', 'MANAGER', 'inventory:produits_list', {'page': '200'}),
+    Scenario('stock_list_stock_bas', 'TECHNICIEN', 'inventory:stock_list', {'stock_bas': '1'}),
+    Scenario('clients_list', 'COMMERCIAL_SHOWROOM', 'inventory:clients_list'),
+    Scenario('commandes_list_statut', 'COMMERCIAL_SHOWROOM', 'inventory:commandes_list', {'statut': 'EN_ATTENTE'}),
+    Scenario('ventes_list', 'COMMERCIAL_SHOWROOM', 'inventory:ventes_list'),
+    Scenario('devis_list', 'COMMERCIAL_TERRAIN', 'inventory:devis_list'),
+    Scenario('intervention_list', 'TECHNICIEN', 'inventory:intervention_list'),
+    Scenario('api_produit_search', 'COMMERCIAL_SHOWROOM', 'inventory:api_produit_search', {'q': 'Produit 42'}),
+    Scenario('api_client_search', 'COMMERCIAL_SHOWROOM', 'inventory:api_client_search', {'q': 'Client42'}),
+    Scenario('prospection_stats_api', 'COMMERCIAL_TERRAIN', 'inventory:prospection_stats_api'),
+    Scenario('vente_pdf', 'COMMERCIAL_SHOWROOM', 'inventory:vente_generate_pdf', arguments=dernier(Vente)),
+    Scenario('commande_bon_livraison', 'COMMERCIAL_SHOWROOM', 'inventory:commande_print_livraison', arguments=dernier(Commande)),
+    Scenario('devis_pdf', 'MANAGER', 'inventory:devis_pdf', arguments=dernier(Devis)),
+    Scenario('vente_create_formulaire', 'COMMERCIAL_SHOWROOM', 'inventory:vente_create'),
+    Scenario('vente_create', 'COMMERCIAL_SHOWROOM', 'inventory:vente_create', donnees=vente_simple),
+]
+
+
+def volumes():
+    """Taille de la base mesurée, jointe aux résultats pour les comparer à bon escient"""
+    return {
+        model._meta.model_name: model.objects.count()
+        for model in (Produit, Client, MouvementStock, Vente, LigneVente, Commande, Devis)
+    }
+
+
+def clients_par_role():
+    clients = {}
+    for role, username in UTILISATEURS.items():
+        if not User.objects.filter(username=username).exists():
+            raise LookupError(f"Compte {username} introuvable : générez d'abord les données (generate_dataset)")
+        client = ClientTest(SERVER_NAME='localhost')
+        client.login(username=username, password=MOT_DE_PASSE)
+        clients[role] = client
+    return clients
+
+
+def percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(round(p / 100 * (len(valeurs) - 1))))]
+
+
+def executer(scenario, client, iterations):
+    url = reverse(scenario.vue, args=scenario.arguments() if scenario.arguments else None)
+    durees, requetes, doublons, statut = [], 0, 0, None
+    for _ in range(iterations + 1):
+        with mesurer() as mesure:
+            if scenario.ecriture:
+                response = client.post(url, scenario.donnees())
+            else:
+                response = client.get(url, scenario.params)
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        durees.append(mesure.duree_totale)
+        requetes, doublons, statut = mesure.requetes, len(mesure.doublons()), response.status_code
+
+    premier, suivants = durees[0], durees[1:] or durees
+    return {
+        'url': url,
+        'role': scenario.role,
+        'statut': statut,
+        'premier_ms': round(premier, 2),
+        'moyenne_ms': round(sum(suivants) / len(suivants), 2),
+        'mediane_ms': round(percentile(suivants, 50), 2),
+        'p95_ms': round(percentile(suivants, 95), 2),
+        'min_ms': round(min(suivants), 2),
+        'requetes': requetes,
+        'n_plus_un': doublons,
+    }
+
+
+def lancer(iterations=5, noms=None, ecriture=True, journal=None):
+    journal = journal or (lambda nom, resultat: None)
+    clients = clients_par_role()
+    resultats = {}
+    for scenario in SCENARIOS:
+        if (noms and scenario.nom not in noms) or (scenario.ecriture and not ecriture):
+            continue
+        resultats[scenario.nom] = resultat = executer(scenario, clients[scenario.role], iterations)
+        journal(scenario.nom, resultat)
+    return {
+        'date': timezone.now().isoformat(),
+        'iterations': iterations,
+        'volumes': volumes(),
+        'resultats': resultats,
+    }
+
+
+def comparer(precedents, actuels):
+    """Écart de temps moyen et de requêtes par scénario commun : {nom: (ecart_pct, ecart_requetes)}"""
+    ecarts = {}
+    for nom, actuel in actuels['resultats'].items():
+        precedent = precedents['resultats'].get(nom)
+        if precedent is None:
+            continue
+        base = precedent['moyenne_ms'] or 1
+        ecarts[nom] = (
+            round((actuel['moyenne_ms'] - precedent['moyenne_ms']) / base * 100, 1),
+            actuel['requetes'] - precedent['requetes'],
+        )
+    return ecarts
+
+
+# ================== WSGI / ASGI ==================
+
+def _environ(chemin, requete, cookie):
+    from io import BytesIO
+    return {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': chemin, 'QUERY_STRING': requete,
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie,
+        'wsgi.input': BytesIO(), 'wsgi.errors': BytesIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+
+
+def appel_wsgi(application, chemin, requete, cookie):
+    statuts = []
+    corps = application(_environ(chemin, requete, cookie), lambda statut, entetes, exc_info=None: statuts.append(statut))
+    try:
+        b''.join(corps)
+    finally:
+        getattr(corps, 'close', lambda: None)()
+    return int(statuts[0].split()[0])
+
+
+async def appel_asgi(application, chemin, requete, cookie):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': chemin, 'raw_path': chemin.encode(), 'root_path': '',
+        'query_string': requete.encode(), 'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+    }
+    corps_envoye, statut = False, []
+
+    async def recevoir():
+        nonlocal corps_envoye
+        if not corps_envoye:
+            corps_envoye = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Pas de déconnexion du client : attente jusqu'à l'annulation par Django
+        await asyncio.Future()
+
+    async def envoyer(message):
+        if message['type'] == 'http.response.start':
+            statut.append(message['status'])
+
+    await application(scope, recevoir, envoyer)
+    return statut[0]
+
+
+def _resume(durees, statuts, total):
+    return {
+        'requetes': len(durees),
+        'erreurs': sum(statut >= 400 for statut in statuts),
+        'duree_s': round(total, 3),
+        'requetes_par_s': round(len(durees) / total, 1) if total else None,
+        'mediane_ms': round(percentile(durees, 50), 2),
+        'p95_ms': round(percentile(durees, 95), 2),
+    }
+
+
+def concurrence(nom='api_produit_search', requetes=200, simultanees=20, threads=4):
+    """Débit et latences du scénario `nom` sous WSGI (`threads` threads) et sous ASGI (`simultanees` requêtes en vol)"""
+    scenario = next((scenario for scenario in SCENARIOS if scenario.nom == nom and not scenario.ecriture), None)
+    if scenario is None:
+        raise LookupError(f'Scénario en lecture inconnu : {nom}')
+    chemin = reverse(scenario.vue, args=scenario.arguments() if scenario.arguments else None)
+    requete = urlencode(scenario.params)
+    cookies = clients_par_role()[scenario.role].cookies
+    cookie = '; '.join(f'{morsel.key}={morsel.coded_value}' for morsel in cookies.values())
+
+    def chrono_wsgi(application):
+        debut = time.perf_counter()
+        statut = appel_wsgi(application, chemin, requete, cookie)
+        return (time.perf_counter() - debut) * 1000, statut
+
+    wsgi = get_wsgi_application()
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        mesures = list(pool.map(lambda _: chrono_wsgi(wsgi), range(requetes)))
+    resultat_wsgi = _resume([d for d, _ in mesures], [s for _, s in mesures], time.perf_counter() - debut)
+
+    asgi = get_asgi_application()
+
+    async def charge():
+        limite = asyncio.Semaphore(simultanees)
+
+        async def chrono_asgi():
+            async with limite:
+                debut = time.perf_counter()
+                statut = await appel_asgi(asgi, chemin, requete, cookie)
+                return (time.perf_counter() - debut) * 1000, statut
+
+        debut = time.perf_counter()
+        mesures = await asyncio.gather(*(chrono_asgi() for _ in range(requetes)))
+        return mesures, time.perf_counter() - debut
+
+    mesures, total = asyncio.run(charge())
+    resultat_asgi = _resume([d for d, _ in mesures], [s for _, s in mesures], total)
+
+    return {
+        'scenario': nom,
+        'url': f'{chemin}?{requete}' if requete else chemin,
+        'threads_wsgi': threads,
+        'simultanees_asgi': simultanees,
+        'wsgi': resultat_wsgi,
+        'asgi': resultat_asgi,
+    }
@@ -0,0 +1,175 @@
+"""
+Cache des pages publiques du catalogue (boutique e-commerce, accueil client)
+
+Deux niveaux, dans le cache Django (mémoire locale, fichiers, ...) :
+- page entière : une réponse anonyme (GET, sans message en attente) est gardée
+  CACHE_CATALOGUE_DUREE secondes, sous une clé formée de la vue, de ses
+  arguments et des paramètres qui changent son contenu (catégorie, recherche,
+  tri, page) ; les utilisateurs connectés, dont l'en-tête de page diffère,
+  passent par la vue
+- fragments : la liste des catégories et les produits populaires de
+  l'accueil, partagés par toutes les requêtes, connectées ou non
+
+Aucune clé n'est recherchée ni supprimée à l'invalidation. Chaque clé contient
+les versions des données dont dépend la page :
+    'categories'          : enregistrement ou suppression d'une Categorie
+    'produits'            : tout changement visible dans les listes de produits
+    'categorie:<pk>'      : produits d'une catégorie (fiche produit et produits similaires)
+Incrémenter une version (inventory/signals.py, stock.appliquer_mouvements,
+reservations.synchroniser), une fois la transaction validée, rend les
+anciennes clés inaccessibles ; elles expirent d'elles-mêmes. Un produit qui
+change de catégorie périme les pages de l'ancienne et de la nouvelle.
+
+Sont invalidants : l'enregistrement ou la suppression d'un produit ou d'une
+catégorie, et un mouvement de stock ou une réservation qui fait passer le
+disponible d'un produit à zéro ou l'en fait sortir. Les autres variations de stock (quantité affichée) et les
+ventes (ordre des produits populaires) sont reprises à l'expiration.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+from .models import Produit, Categorie
+
+
+PREFIXE = 'catalogue'
+
+
+def duree():
+    return getattr(settings, 'CACHE_CATALOGUE_DUREE', 300)
+
+
+def _cle_version(nom):
+    return f'{PREFIXE}:version:{nom}'
+
+
+def _initiale():
+    # Horodatage plutôt que 1 : une version évincée du cache ne retombe pas sur
+    # une valeur déjà utilisée par des pages encore en cache
+    return int(time.time() * 1000)
+
+
+def versions(*noms):
+    """Versions courantes des données `noms`, lues en un seul accès au cache"""
+    cles = {_cle_version(nom): nom for nom in noms}
+    trouvees = cache.get_many(cles)
+    manquantes = {cle: _initiale() for cle in cles if cle not in trouvees}
+    if manquantes:
+        cache.set_many(manquantes, None)
+        trouvees.update(manquantes)
+    return [trouvees[cle] for cle in cles]
+
+
+def _incrementer(nom):
+    try:
+        cache.incr(_cle_version(nom))
+    except ValueError:
+        cache.set(_cle_version(nom), _initiale(), None)
+
+
+def _invalider(categories, liste_categories):
+    _incrementer('produits')
+    for categorie_id in categories:
+        _incrementer(f'categorie:{categorie_id}')
+    if liste_categories:
+        _incrementer('categories')
+
+
+def invalider_catalogue(categories=(), liste_categories=False):
+    """
+    Périme les listes de produits, les pages des catégories `categories`
+    (identifiants) et, avec liste_categories, la liste des catégories
+
+    Dans une transaction, les versions ne changent qu'à sa validation : une
+    requête anonyme servie entre-temps remettrait sinon l'ancienne page en
+    cache sous la nouvelle version.
+    """
+    categories = set(categories)
+    transaction.on_commit(lambda: _invalider(categories, liste_categories))
+
+
+def _cle(*parties):
+    return f'{PREFIXE}:' + ':'.join(str(partie) for partie in parties)
+
+
+# ================== FRAGMENTS ==================
+
+def fragment(nom, calcul, *dependances):
+    """Résultat de `calcul()` mis en cache sous `nom` tant que `dependances` ne changent pas"""
+    cle = _cle('fragment', nom, *versions(*dependances))
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = calcul()
+        cache.set(cle, resultat, duree())
+    return resultat
+
+
+def categories():
+    """Toutes les catégories (filtres et menus du catalogue)"""
+    return fragment('categories', lambda: list(Categorie.objects.all()), 'categories')
+
+
+# ================== PAGES ==================
+
+def _en_cache(request):
+    """Une page n'est servie ou enregistrée que pour un visiteur anonyme sans message à afficher"""
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def listes(**kwargs):
+    """Dépendances des pages listant des produits"""
+    return ('produits', 'categories')
+
+
+def fiche_produit(pk):
+    """Dépendances de la fiche d'un produit : sa catégorie (le produit et ses produits similaires)"""
+    categorie_id = fragment(
+        f'produit:{pk}:categorie',
+        lambda: Produit.objects.filter(pk=pk).values_list('categorie_id', flat=True).first() or 0,
+        'produits'
+    )
+    return ('categories', f'categorie:{categorie_id}')
+
+
+def page_catalogue(parametres=(), dependances=listes):
+    """
+    Décorateur de vue publique : page entière en cache pour les visiteurs
+    anonymes. `parametres` sont les paramètres GET qui changent la page,
+    `dependances(**kwargs)` les versions dont elle dépend.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if not _en_cache(request):
+                return view_func(request, *args, **kwargs)
+
+            valeurs = '&'.join(f'{nom}={request.GET.get(nom, "")}' for nom in parametres)
+            cle = _cle(
+                'page', view_func.__name__,
+                *[f'{nom}={valeur}' for nom, valeur in sorted(kwargs.items())],
+                *versions(*dependances(**kwargs)),
+                hashlib.sha1(valeurs.encode()).hexdigest(),
+            )
+            page = cache.get(cle)
+            if page is not None:
+                contenu, content_type = page
+                return HttpResponse(contenu, content_type=content_type)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(cle, (response.content, response['Content-Type']), duree())
+            return response
+        return _wrapped_view
+    return decorator
+
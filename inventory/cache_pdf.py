@@ -0,0 +1,210 @@
+"""
+Cache disque des PDF de documents (commandes, ventes, devis)
+
+Chaque rendu est enregistré sous MEDIA_ROOT/pdf/<modèle>/<pk>/<type>-<empreinte>.pdf.
+L'empreinte est un hachage du document, de son client et de ses lignes : toute
+modification produit une nouvelle clé, l'ancien fichier n'est donc jamais servi.
+Les signaux (inventory/signals.py) suppriment en plus les fichiers d'un document
+modifié ou supprimé.
+
+Les fonctions de rendu (document -> octets PDF) sont déclarées avec le
+décorateur @document_pdf('type', Modele) dans les modules de vues et dans
+inventory/moteur_pdf.py.
+
+Si PDF_PRE_RENDU est activé, l'enregistrement d'un document déclenche son
+rendu dans un pool de threads local (PDF_PRE_RENDU_TRAVAILLEURS), sans broker
+externe, pour que le premier clic sur « Imprimer » soit servi depuis le disque.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Prefetch
+
+from .models import Commande, LigneCommande, Vente, LigneVente, Devis, LigneDevis
+
+
+# Type de document -> (modèle, fonction de rendu)
+RENDUS = {}
+
+# Modules déclarant des rendus, importés avant un pré-rendu hors requête
+MODULES_RENDUS = ['inventory.views_pdf_commandes', 'inventory.extended_views', 'inventory.moteur_pdf']
+
+# Modèle de document -> (modèle de ligne, champ vers le document)
+LIGNES_DOCUMENT = {
+    Commande: (LigneCommande, 'commande'),
+    Vente: (LigneVente, 'vente'),
+    Devis: (LigneDevis, 'devis'),
+}
+
+_pool = None
+
+
+def document_pdf(type_document, model):
+    """Déclare la fonction de rendu d'un type de document"""
+    def decorator(fonction):
+        RENDUS[type_document] = (model, fonction)
+        return fonction
+    return decorator
+
+
+def lignes_document(document):
+    """Lignes du document avec leurs produits, sans requête si déjà préchargées (rendu par lot)"""
+    model_ligne, champ = LIGNES_DOCUMENT[type(document)]
+    accesseur = model_ligne._meta.get_field(champ).remote_field.get_accessor_name()
+    if accesseur in getattr(document, '_prefetched_objects_cache', {}):
+        return getattr(document, accesseur).all()
+    return getattr(document, accesseur).select_related('produit')
+
+
+def prefetch_lignes(model):
+    """Prefetch des lignes et de leurs produits, en une requête pour tous les documents"""
+    model_ligne, champ = LIGNES_DOCUMENT[model]
+    accesseur = model_ligne._meta.get_field(champ).remote_field.get_accessor_name()
+    return Prefetch(accesseur, queryset=model_ligne.objects.select_related('produit'))
+
+
+def repertoire_cache():
+    return getattr(settings, 'PDF_CACHE_ROOT', os.path.join(settings.MEDIA_ROOT, 'pdf'))
+
+
+def repertoire_document(model, pk):
+    return os.path.join(repertoire_cache(), model._meta.label_lower, str(pk))
+
+
+# ================== EMPREINTE ==================
+
+def empreinte(document):
+    """Hachage du contenu imprimé : document, client et lignes (avec les produits)"""
+    return empreintes(type(document), [document.pk])[document.pk]
+
+
+def empreintes(model, pks):
+    """{pk: empreinte} de documents d'un même modèle, en trois requêtes quel que soit leur nombre"""
+    documents = {ligne[model._meta.pk.attname]: ligne for ligne in model.objects.filter(pk__in=pks).values()}
+
+    clients = {}
+    ids_clients = {ligne.get('client_id') for ligne in documents.values()} - {None}
+    if ids_clients:
+        model_client = model._meta.get_field('client').related_model
+        clients = {ligne['id']: ligne for ligne in model_client.objects.filter(pk__in=ids_clients).values()}
+
+    lignes = {}
+    if model in LIGNES_DOCUMENT:
+        model_ligne, champ = LIGNES_DOCUMENT[model]
+        colonnes = [f.attname for f in model_ligne._meta.concrete_fields]
+        position = colonnes.index(model_ligne._meta.get_field(champ).attname)
+        for ligne in model_ligne.objects.filter(**{f'{champ}__in': pks}).order_by('pk').values_list(
+            *colonnes, 'produit__nom', 'produit__reference', 'produit__description'
+        ):
+            lignes.setdefault(ligne[position], []).append(ligne)
+
+    resultat = {}
+    for pk in pks:
+        document = documents.get(pk, {})
+        hachage = hashlib.sha256()
+        hachage.update(repr(getattr(settings, 'PDF_CACHE_VERSION', 1)).encode())
+        hachage.update(repr([document] if document else []).encode())
+        client_id = document.get('client_id')
+        if client_id:
+            hachage.update(repr([clients[client_id]] if client_id in clients else []).encode())
+        if model in LIGNES_DOCUMENT:
+            hachage.update(repr(lignes.get(pk, [])).encode())
+        resultat[pk] = hachage.hexdigest()[:20]
+    return resultat
+
+
+# ================== LECTURE / ÉCRITURE ==================
+
+def chemin_pdf(document, type_document, cle=None):
+    """Fichier du rendu ; `cle` évite de recalculer une empreinte déjà obtenue par empreintes()"""
+    return os.path.join(
+        repertoire_document(type(document), document.pk),
+        f'{type_document}-{cle or empreinte(document)}.pdf'
+    )
+
+
+def lire_pdf(chemin):
+    """Octets du PDF en cache, None s'il n'a pas encore été rendu"""
+    try:
+        with open(chemin, 'rb') as fichier:
+            return fichier.read()
+    except FileNotFoundError:
+        return None
+
+
+def enregistrer_pdf(chemin, pdf):
+    # Écriture atomique : un rendu concurrent ne lit jamais un fichier partiel
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    descripteur, temporaire = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix='.tmp')
+    with os.fdopen(descripteur, 'wb') as fichier:
+        fichier.write(pdf)
+    os.replace(temporaire, chemin)
+
+
+def pdf_en_cache(document, type_document):
+    """Retourne les octets du PDF, rendus une seule fois par version du document"""
+    chemin = chemin_pdf(document, type_document)
+    pdf = lire_pdf(chemin)
+    if pdf is None:
+        _, rendu = RENDUS[type_document]
+        pdf = rendu(document)
+        enregistrer_pdf(chemin, pdf)
+    return pdf
+
+
+def invalider_pdf(model, pk):
+    """Supprime tous les PDF en cache d'un document"""
+    shutil.rmtree(repertoire_document(model, pk), ignore_errors=True)
+
+
+# ================== PRÉ-RENDU ==================
+
+def pre_rendu_actif():
+    return getattr(settings, 'PDF_PRE_RENDU', False)
+
+
+def charger_rendus():
+    for module in MODULES_RENDUS:
+        import_module(module)
+
+
+def pre_rendre(model, pk):
+    """Rend tous les types de documents déclarés pour ce document"""
+    charger_rendus()
+    document = model.objects.filter(pk=pk).first()
+    if document is None:
+        return
+    for type_document, (model_rendu, _) in list(RENDUS.items()):
+        if model_rendu is model:
+            pdf_en_cache(document, type_document)
+
+
+def _tache_pre_rendu(model, pk):
+    try:
+        pre_rendre(model, pk)
+    finally:
+        # Le thread du pool a ouvert ses propres connexions
+        connections.close_all()
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PDF_PRE_RENDU_TRAVAILLEURS', 2),
+            thread_name_prefix='pdf'
+        )
+    return _pool
+
+
+def planifier_pre_rendu(model, pk):
+    """Soumet le pré-rendu au pool une fois la transaction validée"""
+    if pre_rendu_actif():
+        transaction.on_commit(lambda: pool().submit(_tache_pre_rendu, model, pk))
@@ -0,0 +1,114 @@
+"""
+Clôtures de stock et valorisation à une date
+
+Une clôture (ClotureStock) fige la quantité et la valeur de chaque produit à
+la fin d'une journée ou d'un mois (InstantaneStock). Elle est écrite par la
+commande `python manage.py close_stock`, typiquement chaque nuit.
+
+Le stock à une date X se lit alors sans rejouer tout l'historique :
+    clôture la plus récente à X ou avant + mouvements intervenus depuis
+agrégés en une requête par produit. Sans clôture antérieure, on part du stock
+actuel et on retranche les mouvements postérieurs à X.
+
+Le sens des mouvements est celui du registre (inventory/stock.py).
+"""
+
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, F, Sum
+from django.utils import timezone
+
+from .models import Produit, MouvementStock, ClotureStock, InstantaneStock
+from .stock import TYPES_ENTRANTS
+
+
+def fin_de_journee(jour):
+    """Premier instant du lendemain dans le fuseau courant (borne exclue)"""
+    return timezone.make_aware(datetime.datetime.combine(jour + datetime.timedelta(days=1), datetime.time.min))
+
+
+def variations(debut=None, fin=None):
+    """Variation nette du stock de chaque produit pour les mouvements de [debut, fin["""
+    mouvements = MouvementStock.objects.order_by()
+    if debut is not None:
+        mouvements = mouvements.filter(date_mouvement__gte=debut)
+    if fin is not None:
+        mouvements = mouvements.filter(date_mouvement__lt=fin)
+    return dict(mouvements.values('produit').annotate(
+        variation=Sum(Case(When(type_mouvement__in=TYPES_ENTRANTS, then=F('quantite')), default=-F('quantite')))
+    ).values_list('produit', 'variation'))
+
+
+def stock_au(jour, depuis_cloture=True):
+    """
+    Stock de chaque produit à la fin de `jour` : {produit_id: (quantite, prix_achat)}.
+
+    Les produits à stock nul sont omis. Avec depuis_cloture=False, le calcul
+    part toujours du stock actuel (utilisé pour écrire les clôtures).
+    """
+    fin = fin_de_journee(jour)
+    cloture = ClotureStock.objects.filter(date__lte=jour).order_by('-date').first() if depuis_cloture else None
+
+    if cloture is not None:
+        stock = {
+            produit_id: (quantite, prix_achat)
+            for produit_id, quantite, prix_achat in cloture.instantanes.values_list('produit_id', 'quantite', 'prix_achat')
+        }
+        delta = variations(fin_de_journee(cloture.date), fin)
+    else:
+        stock = {
+            produit_id: (quantite, prix_achat)
+            for produit_id, quantite, prix_achat in Produit.objects.values_list('pk', 'quantite_stock', 'prix_achat')
+        }
+        delta = {produit_id: -variation for produit_id, variation in variations(fin).items()}
+
+    # Prix d'achat actuel des produits absents du point de départ
+    prix = dict(Produit.objects.filter(pk__in=set(delta) - set(stock)).values_list('pk', 'prix_achat'))
+    for produit_id, variation in delta.items():
+        quantite, prix_achat = stock.get(produit_id, (0, prix.get(produit_id)))
+        stock[produit_id] = (quantite + variation, prix_achat)
+
+    return {produit_id: valeurs for produit_id, valeurs in stock.items() if valeurs[0]}
+
+
+def valorisation_au(jour):
+    """Nombre de produits en stock, quantité et valeur totales à la fin de `jour`"""
+    stock = stock_au(jour)
+    return {
+        'date': jour,
+        'produits': len(stock),
+        'quantite_totale': sum(quantite for quantite, _ in stock.values()),
+        'valeur_totale': sum(quantite * prix_achat for quantite, prix_achat in stock.values() if prix_achat is not None),
+    }
+
+
+def cloturer_stock(jour, periodicite='JOUR'):
+    """Écrit (ou remplace) la clôture de `jour` et retourne la ClotureStock"""
+    with transaction.atomic():
+        stock = stock_au(jour, depuis_cloture=False)
+        cloture, _ = ClotureStock.objects.update_or_create(date=jour, defaults={'periodicite': periodicite})
+        cloture.instantanes.all().delete()
+        InstantaneStock.objects.bulk_create([
+            InstantaneStock(
+                cloture=cloture,
+                produit_id=produit_id,
+                quantite=quantite,
+                prix_achat=prix_achat,
+                valeur=quantite * prix_achat,
+            )
+            for produit_id, (quantite, prix_achat) in stock.items()
+        ], batch_size=500)
+        cloture.quantite_totale = sum(quantite for quantite, _ in stock.values())
+        cloture.valeur_totale = sum(quantite * prix_achat for quantite, prix_achat in stock.values())
+        cloture.save(update_fields=['quantite_totale', 'valeur_totale', 'date_calcul'])
+    return cloture
+
+
+def purger_clotures_journalieres(aujourd_hui=None):
+    """Supprime les clôtures journalières plus anciennes que CLOTURE_STOCK_RETENTION_JOURS (les mensuelles restent)"""
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    limite = aujourd_hui - datetime.timedelta(days=getattr(settings, 'CLOTURE_STOCK_RETENTION_JOURS', 90))
+    _, supprimees = ClotureStock.objects.filter(periodicite='JOUR', date__lt=limite).delete()
+    return supprimees.get(ClotureStock._meta.label, 0)
@@ -0,0 +1,166 @@
+"""
+Compteurs de ventes par produit (popularité)
+
+Les ventes sont cumulées par produit et par jour (VenteProduitJour) et en
+fenêtres glissantes de 7, 30 et 90 jours (CompteurVentesProduit, quantités et
+chiffre d'affaires des lignes). Les classements « produits populaires » du
+dashboard et de la boutique lisent ces compteurs indexés au lieu de joindre
+Produit, LigneVente et Vente sur la période.
+
+- enregistrer_ventes() incrémente les compteurs au fil des ventes, en quatre
+  requêtes par vente quel que soit le nombre de lignes (UPDATE ... SET
+  quantite = quantite + CASE produit_id ... comme le registre de stock) ;
+  appelée par vente_create après l'insertion des lignes, et par les signaux
+  de LigneVente (création unitaire, suppression)
+- compacter() recalcule les fenêtres à partir des cumuls journaliers (un jour
+  sort de la fenêtre de 7 jours...) et supprime les jours de plus de 90 jours ;
+  lancé chaque nuit par `python manage.py compact_sales_counters`
+- reconstruire() recalcule les cumuls journaliers depuis les lignes de vente
+  (reprise de l'historique, lignes modifiées après coup)
+"""
+
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, When, F, Q, Sum, Value, IntegerField
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Produit, LigneVente, VenteProduitJour, CompteurVentesProduit, MONTANT
+
+
+FENETRES = (7, 30, 90)
+
+
+def jour_de(date_vente):
+    return timezone.localdate(date_vente) if date_vente else timezone.localdate()
+
+
+def _increment(valeurs, champ):
+    """CASE produit_id WHEN ... THEN <valeur> : une seule requête UPDATE pour tous les produits"""
+    return Case(
+        *[When(produit_id=produit_id, then=Value(valeur)) for produit_id, valeur in valeurs.items()],
+        default=Value(0), output_field=champ
+    )
+
+
+def _cumuls(lignes, signe):
+    cumuls = defaultdict(lambda: [0, Decimal('0')])
+    for ligne in lignes:
+        produit_id = getattr(ligne, 'produit_id', None) or ligne.produit.pk
+        cumuls[produit_id][0] += signe * ligne.quantite
+        cumuls[produit_id][1] += signe * ligne.quantite * ligne.prix_unitaire
+    return cumuls
+
+
+def enregistrer_ventes(lignes, date_vente=None, signe=1):
+    """
+    Ajoute aux compteurs les lignes d'une vente (produit, quantite, prix_unitaire),
+    ou les retranche avec signe=-1
+    """
+    cumuls = _cumuls(lignes, signe)
+    if not cumuls:
+        return
+    jour = jour_de(date_vente)
+    age = (timezone.localdate() - jour).days
+    quantites = {produit_id: quantite for produit_id, (quantite, _) in cumuls.items()}
+    montants = {produit_id: montant for produit_id, (_, montant) in cumuls.items()}
+
+    with transaction.atomic():
+        VenteProduitJour.objects.bulk_create(
+            [VenteProduitJour(produit_id=produit_id, jour=jour) for produit_id in cumuls],
+            ignore_conflicts=True
+        )
+        VenteProduitJour.objects.filter(produit_id__in=cumuls, jour=jour).update(
+            quantite=F('quantite') + _increment(quantites, IntegerField()),
+            chiffre_affaires=F('chiffre_affaires') + _increment(montants, MONTANT),
+        )
+
+        fenetres = [n for n in FENETRES if 0 <= age < n]
+        if not fenetres:
+            return
+        CompteurVentesProduit.objects.bulk_create(
+            [CompteurVentesProduit(produit_id=produit_id) for produit_id in cumuls],
+            ignore_conflicts=True
+        )
+        increments = {}
+        for n in fenetres:
+            increments[f'quantite_{n}j'] = F(f'quantite_{n}j') + _increment(quantites, IntegerField())
+            increments[f'ca_{n}j'] = F(f'ca_{n}j') + _increment(montants, MONTANT)
+        CompteurVentesProduit.objects.filter(produit_id__in=cumuls).update(**increments)
+
+
+# ================== COMPACTAGE ==================
+
+def compacter(aujourd_hui=None):
+    """
+    Recalcule les fenêtres glissantes à partir des cumuls journaliers et supprime
+    les cumuls sortis de la plus grande fenêtre. Retourne le nombre de produits vendus.
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    debut = {n: aujourd_hui - datetime.timedelta(days=n - 1) for n in FENETRES}
+    maintenant = timezone.now()
+    zero = Value(Decimal('0'), output_field=MONTANT)
+
+    with transaction.atomic():
+        VenteProduitJour.objects.filter(jour__lt=debut[max(FENETRES)]).delete()
+        agregats = {}
+        for n in FENETRES:
+            fenetre = Q(jour__gte=debut[n], jour__lte=aujourd_hui)
+            agregats[f'quantite_{n}j'] = Coalesce(Sum('quantite', filter=fenetre), 0)
+            agregats[f'ca_{n}j'] = Coalesce(Sum('chiffre_affaires', filter=fenetre), zero, output_field=MONTANT)
+        lignes = VenteProduitJour.objects.order_by().values('produit').annotate(**agregats)
+
+        compteurs = [
+            CompteurVentesProduit(produit_id=ligne.pop('produit'), date_compactage=maintenant, **ligne)
+            for ligne in lignes
+        ]
+        champs = [*agregats, 'date_compactage']
+        CompteurVentesProduit.objects.bulk_create(
+            compteurs, batch_size=500,
+            update_conflicts=True, unique_fields=['produit'], update_fields=champs
+        )
+        # Produits sans vente sur 90 jours : compteurs non réécrits ci-dessus
+        CompteurVentesProduit.objects.filter(
+            Q(date_compactage__isnull=True) | Q(date_compactage__lt=maintenant)
+        ).update(date_compactage=maintenant, **{champ: 0 for champ in agregats})
+    return len(compteurs)
+
+
+def reconstruire(aujourd_hui=None):
+    """Recalcule les cumuls journaliers des 90 derniers jours depuis les lignes de vente, puis compacte"""
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    debut = timezone.make_aware(datetime.datetime.combine(
+        aujourd_hui - datetime.timedelta(days=max(FENETRES) - 1), datetime.time.min
+    ))
+    par_jour = LigneVente.objects.filter(vente__date_vente__gte=debut).annotate(
+        jour=TruncDate('vente__date_vente')
+    ).order_by().values('produit', 'jour').annotate(
+        total_quantite=Sum('quantite'),
+        total_ca=Sum(F('quantite') * F('prix_unitaire'), output_field=MONTANT),
+    )
+    with transaction.atomic():
+        VenteProduitJour.objects.all().delete()
+        VenteProduitJour.objects.bulk_create([
+            VenteProduitJour(produit_id=ligne['produit'], jour=ligne['jour'],
+                             quantite=ligne['total_quantite'], chiffre_affaires=ligne['total_ca'])
+            for ligne in par_jour
+        ], batch_size=1000)
+        return compacter(aujourd_hui)
+
+
+# ================== CLASSEMENTS ==================
+
+def par_popularite(produits, fenetre=30):
+    """Trie `produits` par quantité vendue sur `fenetre` jours (produits jamais vendus en dernier)"""
+    return produits.order_by(F(f'compteur_ventes__quantite_{fenetre}j').desc(nulls_last=True), '-id')
+
+
+def produits_populaires(fenetre=30, limite=5):
+    """Produits les plus vendus sur `fenetre` jours, avec total_vendu"""
+    champ = f'compteur_ventes__quantite_{fenetre}j'
+    return Produit.objects.filter(**{f'{champ}__gt': 0}).annotate(
+        total_vendu=F(champ)
+    ).order_by('-total_vendu', '-id')[:limite]
@@ -0,0 +1,133 @@
+"""
+Cumuls par client (chiffre d'affaires, commandes, devis en cours)
+
+La fiche client, la liste des clients (tri et filtre par chiffre d'affaires)
+et le classement des meilleurs clients lisent une ligne CumulClient par
+client au lieu d'agréger ventes, commandes et devis à chaque affichage.
+
+- actualiser() recalcule les cumuls des clients indiqués, en une requête de
+  lecture (sous-requêtes corrélées sur les index client des documents) et une
+  requête d'écriture (INSERT ... ON CONFLICT DO UPDATE) ; appelée par les
+  signaux de Vente, Commande et Devis, et par calculer_total() qui met à
+  jour le total d'un document sans signal, pour le client du document et,
+  s'il a changé, celui lu en base (DocumentClient)
+- reconstruire() recalcule tous les clients par lots ;
+  `python manage.py rebuild_client_rollups`
+
+Le chiffre d'affaires additionne les ventes et les commandes non annulées ;
+un devis est en cours tant qu'il est brouillon ou envoyé.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Count, DateTimeField, DecimalField, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce
+
+from .models import Client, Commande, Vente, Devis, CumulClient
+
+
+CUMUL = DecimalField(max_digits=14, decimal_places=2)
+STATUTS_DEVIS_OUVERTS = ('BROUILLON', 'ENVOYE')
+TAILLE_LOT = 500
+
+CHAMPS = [
+    'chiffre_affaires', 'total_ventes', 'nombre_ventes', 'total_commandes', 'nombre_commandes',
+    'date_dernier_achat', 'montant_devis_ouverts', 'nombre_devis_ouverts',
+]
+
+
+def _sous_requete(model, agregat, output_field, *conditions):
+    documents = model.objects.filter(*conditions, client=OuterRef('pk')).order_by().values('client')
+    return Subquery(documents.annotate(valeur=agregat).values('valeur'), output_field=output_field)
+
+
+def _somme(model, *conditions):
+    return Coalesce(
+        _sous_requete(model, Sum('total'), CUMUL, *conditions),
+        Value(Decimal('0')), output_field=CUMUL
+    )
+
+
+def _nombre(model, *conditions):
+    return Coalesce(_sous_requete(model, Count('id'), IntegerField(), *conditions), 0)
+
+
+def _agregats():
+    commande_active = ~Q(statut='ANNULEE')
+    devis_ouvert = Q(statut__in=STATUTS_DEVIS_OUVERTS)
+    return {
+        'total_ventes': _somme(Vente),
+        'nombre_ventes': _nombre(Vente),
+        'total_commandes': _somme(Commande),
+        'nombre_commandes': _nombre(Commande),
+        'commandes_actives': _somme(Commande, commande_active),
+        'derniere_vente': _sous_requete(Vente, Max('date_vente'), DateTimeField()),
+        'derniere_commande': _sous_requete(Commande, Max('date_commande'), DateTimeField(), commande_active),
+        'montant_devis_ouverts': _somme(Devis, devis_ouvert),
+        'nombre_devis_ouverts': _nombre(Devis, devis_ouvert),
+    }
+
+
+def _cumul(ligne):
+    dates = [date for date in (ligne.pop('derniere_vente'), ligne.pop('derniere_commande')) if date]
+    commandes_actives = ligne.pop('commandes_actives')
+    return CumulClient(
+        client_id=ligne.pop('pk'),
+        chiffre_affaires=ligne['total_ventes'] + commandes_actives,
+        date_dernier_achat=max(dates) if dates else None,
+        **ligne
+    )
+
+
+def actualiser(*client_ids):
+    """Recalcule les cumuls des clients `client_ids` (les None sont ignorés)"""
+    client_ids = {client_id for client_id in client_ids if client_id is not None}
+    if not client_ids:
+        return 0
+    agregats = _agregats()
+    lignes = Client.objects.filter(pk__in=client_ids).order_by().annotate(**agregats).values('pk', *agregats)
+    cumuls = [_cumul(ligne) for ligne in lignes]
+    CumulClient.objects.bulk_create(
+        cumuls, update_conflicts=True, unique_fields=['client'], update_fields=[*CHAMPS, 'date_calcul']
+    )
+    return len(cumuls)
+
+
+def reconstruire():
+    """Recalcule les cumuls de tous les clients ; retourne le nombre de clients"""
+    client_ids = list(Client.objects.order_by('pk').values_list('pk', flat=True))
+    with transaction.atomic():
+        for debut in range(0, len(client_ids), TAILLE_LOT):
+            actualiser(*client_ids[debut:debut + TAILLE_LOT])
+    return len(client_ids)
+
+
+def cumul(client):
+    """Cumuls du client (à zéro s'il n'en a pas encore)"""
+    return getattr(client, 'cumul', None) or CumulClient(client=client)
+
+
+# ================== CLASSEMENTS ==================
+
+TRIS = {
+    'ca': [F('cumul__chiffre_affaires').desc(nulls_last=True), '-id'],
+    'dernier_achat': [F('cumul__date_dernier_achat').desc(nulls_last=True), '-id'],
+    'devis': [F('cumul__montant_devis_ouverts').desc(nulls_last=True), '-id'],
+}
+
+
+def trier(clients, tri):
+    """Trie les clients par cumul (`tri` : clé de TRIS), sinon les laisse dans leur ordre"""
+    if tri in TRIS:
+        return clients.order_by(*TRIS[tri])
+    return clients
+
+
+def meilleurs_clients(limite=20):
+    """Clients au plus fort chiffre d'affaires (parcours de l'index cumul_client_ca_idx)"""
+    return CumulClient.objects.filter(chiffre_affaires__gt=0).select_related('client').order_by(
+        '-chiffre_affaires', '-client_id'
+    )[:limite]
@@ -0,0 +1,391 @@
+"""
+Jeux de données synthétiques volumineux (mesures de performance)
+
+generer() remplit la base avec bulk_create, par lots, à partir d'une graine :
+deux générations avec la même graine et la même échelle produisent les mêmes
+données (références, quantités, prix, dates relatives à la date de fin).
+
+Les enregistrements bulk_create ne passent pas par save() ni par les signaux :
+- les numéros de documents sont réservés par bloc dans les compteurs de
+  inventory/numerotation.py
+- les totaux sont calculés à la génération
+- les dates (date_creation, date_vente, ...) sont fixées par le générateur
+  (auto_now_add est suspendu le temps de la génération, voir dates_libres)
+- l'index de recherche est reconstruit, les réservations des commandes
+  confirmées recalculées (les commandes expédiées ou livrées sont générées
+  comme déjà sorties du stock) et les statistiques marquées périmées à la fin
+
+Les mouvements de stock sont rejoués produit par produit : quantite_avant /
+quantite_apres sont cohérents et le stock final des produits est celui du
+dernier mouvement.
+"""
+
+import random
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Categorie, Fournisseur, Produit, Client, MouvementStock,
+    Commande, LigneCommande, Vente, LigneVente, Devis, LigneDevis,
+    Prospect, AppareilVendu, InterventionSAV, StatistiqueTableauBord
+)
+from .numerotation import numeros
+from .recherche import backend, reconstruire_index
+from .compteurs_ventes import reconstruire as reconstruire_compteurs
+from .cache_catalogue import invalider_catalogue
+from .cumuls_clients import reconstruire as reconstruire_cumuls
+from .reservations import STATUTS_EXPEDIES, reconstruire as reconstruire_reservations
+
+
+@dataclass(frozen=True)
+class Echelle:
+    produits: int
+    clients: int
+    mouvements: int
+    ventes: int
+    commandes: int
+    devis: int
+    prospects: int
+    appareils: int
+    jours: int = 365
+
+
+ECHELLES = {
+    'petite': Echelle(produits=200, clients=100, mouvements=2000, ventes=500, commandes=200, devis=100, prospects=100, appareils=50),
+    'moyenne': Echelle(produits=10000, clients=2000, mouvements=100000, ventes=20000, commandes=5000, devis=5000, prospects=2000, appareils=1000),
+    'grande': Echelle(produits=100000, clients=20000, mouvements=1000000, ventes=200000, commandes=50000, devis=50000, prospects=20000, appareils=10000),
+}
+
+TAILLE_LOT = 5000
+MOT_DE_PASSE = 'bench123'
+
+# Un utilisateur par rôle : le benchmark se connecte avec ces comptes
+UTILISATEURS = {
+    'MANAGER': 'bench_manager',
+    'COMMERCIAL_SHOWROOM': 'bench_showroom',
+    'COMMERCIAL_TERRAIN': 'bench_terrain',
+    'TECHNICIEN': 'bench_technicien',
+}
+
+MODES_PAIEMENT = [code for code, _ in Vente.MODE_PAIEMENT_CHOICES]
+STATUTS_COMMANDE = [code for code, _ in Commande.STATUT_CHOICES]
+STATUTS_DEVIS = [code for code, _ in Devis.STATUT_CHOICES]
+STATUTS_PROSPECT = [code for code, _ in Prospect.STATUT_CHOICES]
+TYPES_INTERVENTION = [code for code, _ in InterventionSAV.TYPE_CHOICES]
+
+
+def echelle(nom, **surcharges):
+    """Échelle prédéfinie, avec éventuellement certains volumes remplacés"""
+    return replace(ECHELLES[nom], **{cle: valeur for cle, valeur in surcharges.items() if valeur is not None})
+
+
+@contextmanager
+def dates_libres(*models):
+    """Suspend auto_now_add pour que bulk_create conserve les dates fournies"""
+    champs = [f for model in models for f in model._meta.concrete_fields if getattr(f, 'auto_now_add', False)]
+    for champ in champs:
+        champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ in champs:
+            champ.auto_now_add = True
+
+
+def par_lots(iterable, taille=TAILLE_LOT):
+    lot = []
+    for element in iterable:
+        lot.append(element)
+        if len(lot) == taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+class Generateur:
+    def __init__(self, echelle, graine=42, journal=None):
+        self.echelle = echelle
+        self.graine = graine
+        self.alea = random.Random(graine)
+        self.journal = journal or (lambda message: None)
+        self.fin = timezone.now().replace(microsecond=0)
+        self.debut = self.fin - timedelta(days=echelle.jours)
+        self.prefixe = f'SYN{graine}'
+
+    def date(self):
+        return self.debut + timedelta(seconds=self.alea.randrange(self.echelle.jours * 86400))
+
+    def creer(self, model, objets):
+        """bulk_create par lots ; retourne les objets créés (avec leur pk)"""
+        crees = []
+        for lot in par_lots(objets):
+            crees.extend(model.objects.bulk_create(lot))
+        self.journal(f'{model._meta.verbose_name_plural} : {len(crees)}')
+        return crees
+
+    # ================== RÉFÉRENTIELS ==================
+
+    def utilisateurs(self):
+        utilisateurs = {}
+        for role, username in UTILISATEURS.items():
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                user = User.objects.create_user(username=username, password=MOT_DE_PASSE, email=f'{username}@exemple.fr')
+            user.profile.role = role
+            user.profile.save()
+            utilisateurs[role] = user
+        return utilisateurs
+
+    def referentiels(self):
+        categories = self.creer(Categorie, [
+            Categorie(nom=f'{self.prefixe} Catégorie {i}', date_creation=self.debut) for i in range(20)
+        ])
+        fournisseurs = self.creer(Fournisseur, [
+            Fournisseur(
+                nom=f'{self.prefixe} Fournisseur {i}', email=f'{self.prefixe.lower()}.fournisseur{i}@exemple.fr',
+                telephone=f'01{i:08d}', adresse=f'{i} Rue du Commerce', ville='Paris', code_postal='75001',
+                date_creation=self.debut,
+            )
+            for i in range(50)
+        ])
+        return categories, fournisseurs
+
+    def produits(self, categories, fournisseurs):
+        alea = self.alea
+        produits = []
+        for i in range(self.echelle.produits):
+            prix_achat = Decimal(alea.randrange(500, 500000)) / 100
+            produits.append(Produit(
+                nom=f'{self.prefixe} Produit {i}',
+                reference=f'{self.prefixe}-{i:07d}',
+                description=f'Appareil de démonstration {i % 97}',
+                categorie=alea.choice(categories),
+                fournisseur=alea.choice(fournisseurs),
+                prix_achat=prix_achat,
+                prix_vente=(prix_achat * Decimal('1.35')).quantize(Decimal('0.01')),
+                quantite_stock=0,
+                seuil_alerte=alea.randrange(0, 20),
+                actif=alea.random() > 0.05,
+                date_creation=self.date(),
+            ))
+        return self.creer(Produit, produits)
+
+    def clients(self):
+        return self.creer(Client, [
+            Client(
+                nom=f'Client{i}', prenom=self.prefixe, entreprise=f'Clinique {i % 500}',
+                email=f'{self.prefixe.lower()}.client{i}@exemple.fr', telephone=f'06{i:08d}',
+                adresse=f'{i} Avenue de la Santé', ville='Lyon', code_postal='69001',
+                date_creation=self.date(),
+            )
+            for i in range(self.echelle.clients)
+        ])
+
+    # ================== MOUVEMENTS ==================
+
+    def mouvements(self, produits, utilisateur):
+        """Mouvements datés dans l'ordre chronologique, rejoués produit par produit"""
+        alea = self.alea
+        n = self.echelle.mouvements
+        pas = timedelta(seconds=self.echelle.jours * 86400 / max(n, 1))
+        stocks = {}
+
+        def construire():
+            for i in range(n):
+                produit = alea.choice(produits)
+                avant = stocks.get(produit.pk, 0)
+                quantite = alea.randrange(1, 20)
+                if avant < quantite or alea.random() < 0.4:
+                    type_mouvement, apres = 'ENTREE', avant + quantite
+                else:
+                    type_mouvement, apres = 'SORTIE', avant - quantite
+                stocks[produit.pk] = apres
+                yield MouvementStock(
+                    produit=produit, type_mouvement=type_mouvement, quantite=quantite,
+                    quantite_avant=avant, quantite_apres=apres, motif='Génération synthétique',
+                    utilisateur=utilisateur, date_mouvement=self.debut + pas * i,
+                )
+
+        total = 0
+        for lot in par_lots(construire()):
+            MouvementStock.objects.bulk_create(lot)
+            total += len(lot)
+        self.journal(f'mouvements de stock : {total}')
+
+        for produit in produits:
+            produit.quantite_stock = stocks.get(produit.pk, 0)
+        Produit.objects.bulk_update(produits, ['quantite_stock'], batch_size=TAILLE_LOT)
+
+    # ================== DOCUMENTS ==================
+
+    def lignes(self, produits, modele_ligne, champ, documents, avec_remise=False):
+        """Crée 1 à 5 lignes par document et renseigne le total des documents"""
+        alea = self.alea
+        lignes = []
+        for document in documents:
+            total = Decimal('0')
+            for produit in alea.sample(produits, alea.randrange(1, 6)):
+                quantite = alea.randrange(1, 4)
+                ligne = modele_ligne(**{champ: document}, produit=produit, quantite=quantite, prix_unitaire=produit.prix_vente)
+                montant = quantite * produit.prix_vente
+                if avec_remise:
+                    ligne.remise = Decimal(alea.choice([0, 0, 5, 10]))
+                    montant = montant * (1 - ligne.remise / 100)
+                total += montant
+                lignes.append(ligne)
+            document.total = total.quantize(Decimal('0.01'))
+        modele_ligne.objects.bulk_create(lignes, batch_size=TAILLE_LOT)
+        type(documents[0]).objects.bulk_update(documents, ['total'], batch_size=TAILLE_LOT)
+
+    def ventes(self, produits, clients, vendeurs):
+        alea = self.alea
+        ventes = []
+        numeros_vente = numeros(Vente, 'numero_vente', 'VTE', '-', 5, self.echelle.ventes)
+        for lot in par_lots(range(self.echelle.ventes)):
+            documents = Vente.objects.bulk_create([
+                Vente(
+                    numero_vente=next(numeros_vente),
+                    client=alea.choice(clients) if alea.random() < 0.8 else None,
+                    mode_paiement=alea.choice(MODES_PAIEMENT),
+                    utilisateur=alea.choice(vendeurs),
+                    date_vente=self.date(),
+                )
+                for _ in lot
+            ])
+            self.lignes(produits, LigneVente, 'vente', documents)
+            ventes.extend(documents)
+        self.journal(f'ventes : {len(ventes)}')
+        return ventes
+
+    def commandes(self, produits, clients, vendeurs):
+        alea = self.alea
+        total = 0
+        numeros_commande = numeros(Commande, 'numero_commande', 'CMD', '-', 5, self.echelle.commandes)
+        for lot in par_lots(range(self.echelle.commandes)):
+            documents = [
+                Commande(
+                    numero_commande=next(numeros_commande),
+                    client=alea.choice(clients),
+                    statut=alea.choice(STATUTS_COMMANDE),
+                    adresse_livraison='1 Rue de la Livraison',
+                    utilisateur=alea.choice(vendeurs),
+                    date_commande=self.date(),
+                )
+                for _ in lot
+            ]
+            for document in documents:
+                # Historique : le stock des commandes expédiées est déjà sorti (voir inventory/reservations.py)
+                document.stock_expedie = document.statut in STATUTS_EXPEDIES
+            documents = Commande.objects.bulk_create(documents)
+            self.lignes(produits, LigneCommande, 'commande', documents)
+            total += len(documents)
+        self.journal(f'commandes : {total}')
+
+    def devis(self, produits, clients, commercial):
+        alea = self.alea
+        total = 0
+        numeros_devis = numeros(Devis, 'numero_devis', 'DEV', '', 4, self.echelle.devis)
+        for lot in par_lots(range(self.echelle.devis)):
+            documents = []
+            for _ in lot:
+                date_creation = self.date()
+                documents.append(Devis(
+                    numero_devis=next(numeros_devis),
+                    client=alea.choice(clients),
+                    statut=alea.choice(STATUTS_DEVIS),
+                    commercial=commercial,
+                    date_creation=date_creation,
+                    date_validite=(date_creation + timedelta(days=30)).date(),
+                ))
+            documents = Devis.objects.bulk_create(documents)
+            self.lignes(produits, LigneDevis, 'devis', documents, avec_remise=True)
+            total += len(documents)
+        self.journal(f'devis : {total}')
+
+    def prospects(self, commercial):
+        alea = self.alea
+        self.creer(Prospect, [
+            Prospect(
+                nom=f'Prospect{i}', prenom=self.prefixe, entreprise=f'Cabinet {i % 300}',
+                email=f'{self.prefixe.lower()}.prospect{i}@exemple.fr', telephone=f'07{i:08d}',
+                statut=alea.choice(STATUTS_PROSPECT), commercial=commercial, date_creation=self.date(),
+            )
+            for i in range(self.echelle.prospects)
+        ])
+
+    def appareils_et_interventions(self, ventes, produits, technicien):
+        """Un appareil par vente tirée au sort, avec une intervention planifiée chacun"""
+        alea = self.alea
+        ventes_client = [vente for vente in ventes if vente.client_id]
+        appareils = []
+        for i, vente in enumerate(alea.sample(ventes_client, min(self.echelle.appareils, len(ventes_client)))):
+            installation = vente.date_vente.date()
+            appareils.append(AppareilVendu(
+                numero_serie=f'{self.prefixe}-SN-{i:07d}',
+                produit=alea.choice(produits),
+                client_id=vente.client_id,
+                vente=vente,
+                date_installation=installation,
+                lieu_installation='Salle 1',
+                prochaine_maintenance_preventive=installation + timedelta(days=365),
+                technicien_responsable=technicien,
+            ))
+        appareils = self.creer(AppareilVendu, appareils)
+
+        numeros_intervention = numeros(InterventionSAV, 'numero_intervention', 'INT', '', 4, len(appareils))
+        self.creer(InterventionSAV, [
+            InterventionSAV(
+                numero_intervention=next(numeros_intervention),
+                type_intervention=alea.choice(TYPES_INTERVENTION),
+                appareil=appareil,
+                client_id=appareil.client_id,
+                technicien=technicien,
+                date_prevue=self.fin + timedelta(days=alea.randrange(-60, 60)),
+                duree_prevue=alea.choice([30, 60, 120]),
+                description='Intervention générée',
+            )
+            for appareil in appareils
+        ])
+
+    # ================== GÉNÉRATION ==================
+
+    def generer(self):
+        if Produit.objects.filter(reference__startswith=f'{self.prefixe}-').exists():
+            raise ValueError(f'Des données ont déjà été générées avec la graine {self.graine}')
+
+        utilisateurs = self.utilisateurs()
+        vendeurs = [utilisateurs['MANAGER'], utilisateurs['COMMERCIAL_SHOWROOM']]
+        modeles_dates = (
+            Categorie, Fournisseur, Produit, Client, MouvementStock, Commande, Vente, Devis, Prospect
+        )
+        with dates_libres(*modeles_dates), transaction.atomic():
+            categories, fournisseurs = self.referentiels()
+            produits = self.produits(categories, fournisseurs)
+            clients = self.clients()
+            self.mouvements(produits, utilisateurs['TECHNICIEN'])
+            ventes = self.ventes(produits, clients, vendeurs)
+            self.commandes(produits, clients, vendeurs)
+            self.devis(produits, clients, utilisateurs['COMMERCIAL_TERRAIN'])
+            self.prospects(utilisateurs['COMMERCIAL_TERRAIN'])
+            self.appareils_et_interventions(ventes, produits, utilisateurs['TECHNICIEN'])
+
+        # bulk_create n'envoie pas les signaux d'indexation et d'invalidation
+        if backend() == 'fts5':
+            reconstruire_index()
+        reconstruire_compteurs()
+        reconstruire_cumuls()
+        reconstruire_reservations()
+        invalider_catalogue(liste_categories=True)
+        StatistiqueTableauBord.objects.update(perime=True)
+        return utilisateurs
+
+
+def generer(echelle, graine=42, journal=None):
+    return Generateur(echelle, graine, journal).generer()
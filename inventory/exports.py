@@ -0,0 +1,308 @@
+"""
+Exports CSV / XLSX en flux, à mémoire bornée
+
+Chaque export est décrit par une DefinitionExport : le queryset de base, le
+filtre de la page de liste correspondante (inventory/filtres.py) et les
+colonnes. Les lignes sont lues avec values_list(...).iterator(chunk_size=...),
+sans instancier de modèles, puis :
+- CSV  : envoyées au fil de l'eau par un StreamingHttpResponse (séparateur ';'
+         et BOM pour Excel, comme l'ancien export des prospections)
+- XLSX : écrites par openpyxl en mode write_only dans un fichier temporaire,
+         renvoyé par blocs avec FileResponse (nécessite openpyxl)
+"""
+
+import csv
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from django.conf import settings
+from django.db.models import F, ExpressionWrapper
+from django.http import StreamingHttpResponse, FileResponse
+from django.utils import timezone
+
+from .models import (
+    Produit, MouvementStock, Client, Commande, Vente, LigneVente, Devis,
+    ProspectionTelephonique, MONTANT
+)
+from .filtres import (
+    filtrer_produits, filtrer_mouvements, filtrer_clients, filtrer_commandes,
+    filtrer_ventes, filtrer_devis, filtrer_prospections
+)
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # openpyxl est optionnel : seul l'export CSV est alors disponible
+    Workbook = None
+
+
+def taille_lot():
+    """Nombre de lignes lues par aller-retour avec la base (réglage EXPORT_TAILLE_LOT)"""
+    return getattr(settings, 'EXPORT_TAILLE_LOT', 2000)
+
+
+def xlsx_disponible():
+    return Workbook is not None
+
+
+# ================== FORMATS DE CELLULES ==================
+
+def texte(valeur):
+    return '' if valeur is None else valeur
+
+
+def choix(choices):
+    """Affiche le libellé d'un champ à choix (équivalent de get_FOO_display)"""
+    libelles = dict(choices)
+    return lambda valeur: libelles.get(valeur, valeur or '')
+
+
+def date(valeur):
+    return valeur.strftime('%d/%m/%Y') if valeur else ''
+
+
+def date_heure(valeur):
+    return timezone.localtime(valeur).strftime('%d/%m/%Y %H:%M') if valeur else ''
+
+
+def nom_complet(prenom, nom):
+    return f"{prenom or ''} {nom or ''}".strip()
+
+
+@dataclass
+class Colonne:
+    entete: str
+    champs: tuple
+    format: Callable = texte
+
+
+@dataclass
+class DefinitionExport:
+    nom_fichier: str
+    permission: str
+    queryset: Callable
+    filtre: Callable
+    colonnes: list = field(default_factory=list)
+
+    def champs(self):
+        """Champs values_list de toutes les colonnes, sans doublon"""
+        resultat = []
+        for colonne in self.colonnes:
+            for champ in colonne.champs:
+                if champ not in resultat:
+                    resultat.append(champ)
+        return resultat
+
+
+EXPORTS = {
+    'produits': DefinitionExport(
+        nom_fichier='produits',
+        permission='can_manage_products',
+        queryset=lambda: Produit.objects.order_by('nom'),
+        filtre=filtrer_produits,
+        colonnes=[
+            Colonne('Référence', ('reference',)),
+            Colonne('Nom', ('nom',)),
+            Colonne('Code-barres', ('code_barre',)),
+            Colonne('Catégorie', ('categorie__nom',)),
+            Colonne('Fournisseur', ('fournisseur__nom',)),
+            Colonne("Prix d'achat", ('prix_achat',)),
+            Colonne('Prix de vente', ('prix_vente',)),
+            Colonne('Stock', ('quantite_stock',)),
+            Colonne("Seuil d'alerte", ('seuil_alerte',)),
+            Colonne('Actif', ('actif',), lambda actif: 'Oui' if actif else 'Non'),
+        ],
+    ),
+    'mouvements': DefinitionExport(
+        nom_fichier='mouvements_stock',
+        permission='can_manage_stock',
+        queryset=lambda: MouvementStock.objects.all(),
+        filtre=filtrer_mouvements,
+        colonnes=[
+            Colonne('Date', ('date_mouvement',), date_heure),
+            Colonne('Référence produit', ('produit__reference',)),
+            Colonne('Produit', ('produit__nom',)),
+            Colonne('Type', ('type_mouvement',), choix(MouvementStock.TYPE_MOUVEMENT_CHOICES)),
+            Colonne('Quantité', ('quantite',)),
+            Colonne('Stock avant', ('quantite_avant',)),
+            Colonne('Stock après', ('quantite_apres',)),
+            Colonne('Motif', ('motif',)),
+            Colonne('Numéro de lot', ('numero_lot',)),
+            Colonne('Utilisateur', ('utilisateur__username',)),
+        ],
+    ),
+    'clients': DefinitionExport(
+        nom_fichier='clients',
+        permission='can_manage_clients',
+        queryset=lambda: Client.objects.order_by('nom', 'prenom'),
+        filtre=filtrer_clients,
+        colonnes=[
+            Colonne('Nom', ('nom',)),
+            Colonne('Prénom', ('prenom',)),
+            Colonne('Entreprise', ('entreprise',)),
+            Colonne('Email', ('email',)),
+            Colonne('Téléphone', ('telephone',)),
+            Colonne('Adresse', ('adresse',)),
+            Colonne('Code postal', ('code_postal',)),
+            Colonne('Ville', ('ville',)),
+            Colonne('Pays', ('pays',)),
+            Colonne('Date de création', ('date_creation',), date_heure),
+        ],
+    ),
+    'commandes': DefinitionExport(
+        nom_fichier='commandes',
+        permission='can_manage_orders',
+        queryset=lambda: Commande.objects.all(),
+        filtre=filtrer_commandes,
+        colonnes=[
+            Colonne('Numéro', ('numero_commande',)),
+            Colonne('Date', ('date_commande',), date_heure),
+            Colonne('Client', ('client__prenom', 'client__nom'), nom_complet),
+            Colonne('Statut', ('statut',), choix(Commande.STATUT_CHOICES)),
+            Colonne('Livraison prévue', ('date_livraison_prevue',), date),
+            Colonne('Total', ('total',)),
+            Colonne('Utilisateur', ('utilisateur__username',)),
+        ],
+    ),
+    'ventes': DefinitionExport(
+        nom_fichier='ventes',
+        permission='can_manage_sales',
+        queryset=lambda: Vente.objects.all(),
+        filtre=filtrer_ventes,
+        colonnes=[
+            Colonne('Numéro', ('numero_vente',)),
+            Colonne('Date', ('date_vente',), date_heure),
+            Colonne('Client', ('client__prenom', 'client__nom'), nom_complet),
+            Colonne('Mode de paiement', ('mode_paiement',), choix(Vente.MODE_PAIEMENT_CHOICES)),
+            Colonne('Remise (%)', ('remise',)),
+            Colonne('Total', ('total',)),
+            Colonne('Vendeur', ('utilisateur__username',)),
+        ],
+    ),
+    # Une ligne par article vendu, avec les filtres de la liste des ventes
+    'lignes_vente': DefinitionExport(
+        nom_fichier='lignes_vente',
+        permission='can_manage_sales',
+        queryset=lambda: Vente.objects.all(),
+        filtre=lambda request, ventes: LigneVente.objects.filter(
+            vente__in=filtrer_ventes(request, ventes).order_by().values('pk')
+        ).annotate(
+            sous_total=ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=MONTANT)
+        ).order_by('-vente__date_vente', 'pk'),
+        colonnes=[
+            Colonne('Vente', ('vente__numero_vente',)),
+            Colonne('Date', ('vente__date_vente',), date_heure),
+            Colonne('Client', ('vente__client__prenom', 'vente__client__nom'), nom_complet),
+            Colonne('Référence produit', ('produit__reference',)),
+            Colonne('Produit', ('produit__nom',)),
+            Colonne('Quantité', ('quantite',)),
+            Colonne('Prix unitaire', ('prix_unitaire',)),
+            Colonne('Sous-total', ('sous_total',)),
+        ],
+    ),
+    'devis': DefinitionExport(
+        nom_fichier='devis',
+        permission='can_manage_quotes',
+        queryset=lambda: Devis.objects.order_by('-date_creation'),
+        filtre=filtrer_devis,
+        colonnes=[
+            Colonne('Numéro', ('numero_devis',)),
+            Colonne('Date', ('date_creation',), date_heure),
+            Colonne('Client', ('client__prenom', 'client__nom'), nom_complet),
+            Colonne('Entreprise', ('client__entreprise',)),
+            Colonne('Statut', ('statut',), choix(Devis.STATUT_CHOICES)),
+            Colonne('Validité', ('date_validite',), date),
+            Colonne('Total', ('total',)),
+            Colonne('Commercial', ('commercial__first_name', 'commercial__last_name'), nom_complet),
+        ],
+    ),
+    'prospections': DefinitionExport(
+        nom_fichier='prospections',
+        permission='can_manage_prospects',
+        queryset=lambda: ProspectionTelephonique.objects.order_by('-date_creation'),
+        filtre=filtrer_prospections,
+        colonnes=[
+            Colonne('Nom Complet', ('nom_complet',)),
+            Colonne('Numéro Téléphone', ('numero_telephone',)),
+            Colonne('Email', ('email',)),
+            Colonne('Type Appel', ('type_appel',), choix(ProspectionTelephonique.TYPE_APPEL_CHOICES)),
+            Colonne('Statut', ('statut',), choix(ProspectionTelephonique.STATUT_CHOICES)),
+            Colonne('Date RDV', ('date_rdv',), date),
+            Colonne('Source Prospect', ('source_prospect',), choix(ProspectionTelephonique.SOURCE_PROSPECT_CHOICES)),
+            Colonne('Description', ('description',)),
+            Colonne('Commercial', ('commercial__first_name', 'commercial__last_name'), nom_complet),
+            Colonne('Date Création', ('date_creation',), date_heure),
+            Colonne('Date Modification', ('date_modification',), date_heure),
+        ],
+    ),
+}
+
+
+# ================== PRODUCTION DES LIGNES ==================
+
+def lignes_export(definition, request):
+    """Génère l'en-tête puis les lignes formatées, lues par lots depuis la base"""
+    champs = definition.champs()
+    positions = [[champs.index(champ) for champ in colonne.champs] for colonne in definition.colonnes]
+
+    yield [colonne.entete for colonne in definition.colonnes]
+
+    queryset = definition.filtre(request, definition.queryset())
+    for valeurs in queryset.values_list(*champs).iterator(chunk_size=taille_lot()):
+        yield [
+            colonne.format(*[valeurs[i] for i in indices])
+            for colonne, indices in zip(definition.colonnes, positions)
+        ]
+
+
+class Echo:
+    """Pseudo-fichier : write() renvoie la ligne au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def _flux_csv(lignes):
+    writer = csv.writer(Echo(), delimiter=';')
+    yield '\ufeff'  # BOM pour Excel
+    for ligne in lignes:
+        yield writer.writerow(ligne)
+
+
+def nom_fichier(definition, extension):
+    return f'{definition.nom_fichier}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+
+def reponse_csv(definition, request):
+    response = StreamingHttpResponse(
+        _flux_csv(lignes_export(definition, request)),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier(definition, "csv")}"'
+    return response
+
+
+def reponse_xlsx(definition, request):
+    # Classeur write_only : les lignes sont écrites sur disque au fur et à mesure
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet(title=definition.nom_fichier[:31])
+    for ligne in lignes_export(definition, request):
+        feuille.append(ligne)
+
+    fichier = tempfile.TemporaryFile()
+    classeur.save(fichier)
+    fichier.seek(0)
+    return FileResponse(
+        fichier,
+        as_attachment=True,
+        filename=nom_fichier(definition, 'xlsx'),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def peut_exporter(user, definition):
+    if user.is_superuser:
+        return True
+    profile = getattr(user, 'profile', None)
+    return profile is not None and getattr(profile, definition.permission)()
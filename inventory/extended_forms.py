@@ -125,6 +125,8 @@ class InterventionSAVForm(forms.ModelForm):
         from users.models import Profile
         techniciens = Profile.objects.filter(role='TECHNICIEN').values_list('user', flat=True)
         self.fields['technicien'].queryset = self.fields['technicien'].queryset.filter(id__in=techniciens)
+        # Le libellé d'un appareil affiche son produit et son client
+        self.fields['appareil'].queryset = self.fields['appareil'].queryset.select_related('produit', 'client')
 
 
 class TransfertStockForm(forms.ModelForm):
@@ -9,8 +9,15 @@ from django.utils import timezone
 from django.db import transaction
 from datetime import date, timedelta
 from users.decorators import role_required
+from users.permissions import droits
 from .models import *
 from .extended_forms import *
+from .lignes import analyser_lignes, creer_lignes
+from .filtres import filtrer_devis
+from .cache_pdf import document_pdf, pdf_en_cache, lignes_document
+from .pagination import paginer
+from .stats_listes import statistiques
+from .planning_techniciens import planning
 from io import BytesIO
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfgen import canvas
@@ -25,40 +32,23 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 @role_required(['COMMERCIAL_TERRAIN', 'MANAGER'])
 def devis_list(request):
     """Liste des devis pour commercial terrain"""
-    devis_list = Devis.objects.all()
-    
-    # Filtrage par statut
     statut = request.GET.get('statut')
-    if statut:
-        devis_list = devis_list.filter(statut=statut)
-    
-    # Filtrage par commercial (si pas manager)
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN':
-        devis_list = devis_list.filter(commercial=request.user)
-    
-    # Recherche
     search = request.GET.get('search')
-    if search:
-        devis_list = devis_list.filter(
-            Q(numero_devis__icontains=search) |
-            Q(client__nom__icontains=search) |
-            Q(client__prenom__icontains=search) |
-            Q(client__entreprise__icontains=search)
-        )
+    devis_list = filtrer_devis(request, Devis.objects.select_related('client', 'commercial'))
     
     # Pagination
-    paginator = Paginator(devis_list, 20)
-    page_number = request.GET.get('page')
-    devis = paginator.get_page(page_number)
-    
-    # Statistiques pour le dashboard
-    stats = {
-        'total_devis': devis_list.count(),
-        'devis_brouillon': devis_list.filter(statut='BROUILLON').count(),
-        'devis_envoyes': devis_list.filter(statut='ENVOYE').count(),
-        'devis_acceptes': devis_list.filter(statut='ACCEPTE').count(),
-        'total_montant': devis_list.aggregate(total=Sum('total'))['total'] or 0,
-    }
+    devis = paginer(request, devis_list, 20, total=True)
+    
+    # Statistiques pour le dashboard, en une requête (voir inventory/stats_listes.py)
+    stats = statistiques(
+        devis_list, request.user,
+        total_devis=Count('id'),
+        devis_brouillon=Count('id', filter=Q(statut='BROUILLON')),
+        devis_envoyes=Count('id', filter=Q(statut='ENVOYE')),
+        devis_acceptes=Count('id', filter=Q(statut='ACCEPTE')),
+        total_montant=Sum('total'),
+    )
+    stats['total_montant'] = stats['total_montant'] or 0
     
     context = {
         'devis': devis,
@@ -77,7 +67,7 @@ def devis_detail(request, pk):
     devis = get_object_or_404(Devis, pk=pk)
     
     # Vérifier les permissions
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN' and devis.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and devis.commercial != request.user:
         messages.error(request, "Vous n'avez pas accès à ce devis.")
         return redirect('inventory:devis_list')
     
@@ -104,91 +94,9 @@ def devis_create(request):
                     devis.commercial = request.user
                     devis.save()
                     
-                    # ✅ PARSING MANUEL (comme commande_create_advanced)
-                    lines_created = 0
-                    lines_data = {}
-                    has_error = False
-                    
-                    # Parser toutes les clés POST pour trouver TOUTES les lignes de produit
-                    for key in request.POST:
-                        if key.startswith('ligne_') and '_' in key:
-                            parts = key.split('_', 2)  # ligne_0_produit → ['ligne', '0', 'produit']
-                            if len(parts) == 3:
-                                line_idx = parts[1]
-                                field_name = parts[2]
-                                
-                                if line_idx not in lines_data:
-                                    lines_data[line_idx] = {}
-                                lines_data[line_idx][field_name] = request.POST[key]
-                    
-                    print(f"=== DEBUG DEVIS_CREATE ===")
-                    print(f"POST data: {request.POST}")
-                    print(f"Lignes trouvées: {sorted(lines_data.keys())}")
-                    
-                    # Traiter chaque ligne trouvée (triée par index)
-                    for line_idx in sorted(lines_data.keys(), key=lambda x: int(x) if x.isdigit() else 0):
-                        data = lines_data[line_idx]
-                        produit_id = data.get('produit')
-                        quantite = data.get('quantite')
-                        prix_unitaire = data.get('prix_unitaire')
-                        remise = data.get('remise', '0')  # Remise optionnelle
-                        
-                        print(f"Traitement ligne {line_idx}: produit={produit_id}, qte={quantite}, prix={prix_unitaire}, remise={remise}")
-                        
-                        # Ignorer les lignes vides (pas de produit sélectionné)
-                        if not produit_id:
-                            print(f"Ligne {line_idx} ignorée (pas de produit)")
-                            continue
-                        
-                        # Vérifier que tous les champs requis sont présents
-                        if not quantite or not prix_unitaire:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Quantité et prix requis')
-                            has_error = True
-                            continue
-                        
-                        try:
-                            produit = Produit.objects.get(id=produit_id)
-                            quantite = int(quantite)
-                            prix_unitaire = float(prix_unitaire)
-                            remise = float(remise) if remise else 0
-                            
-                            # Validations
-                            if quantite <= 0:
-                                messages.error(request, f'{produit.nom}: La quantité doit être positive')
-                                has_error = True
-                                continue
-                            
-                            if prix_unitaire < 0:
-                                messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
-                                has_error = True
-                                continue
-                            
-                            if remise < 0 or remise > 100:
-                                messages.error(request, f'{produit.nom}: La remise doit être entre 0 et 100%')
-                                has_error = True
-                                continue
-                            
-                            # Créer la ligne de devis
-                            ligne = LigneDevis.objects.create(
-                                devis=devis,
-                                produit=produit,
-                                quantite=quantite,
-                                prix_unitaire=prix_unitaire,
-                                remise=remise
-                            )
-                            lines_created += 1
-                            print(f"✓ Ligne {line_idx} créée: {ligne}")
-                            
-                        except Produit.DoesNotExist:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Produit introuvable')
-                            has_error = True
-                            continue
-                        except (ValueError, TypeError) as e:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Erreur de conversion - {str(e)}')
-                            has_error = True
-                            continue
-                    
-                    print(f"✓ Total de lignes créées: {lines_created}")
+                    # Traitement des lignes de produit (voir inventory/lignes.py)
+                    lignes, has_error = analyser_lignes(request, avec_remise=True)
+                    lines_created = 0 if has_error else len(creer_lignes(LigneDevis, 'devis', devis, lignes))
                     
                     # Si erreur détectée, annuler la transaction
                     if has_error:
@@ -205,9 +113,8 @@ def devis_create(request):
                     messages.success(request, f"Devis {devis.numero_devis} créé avec succès ({lines_created} ligne(s)).")
                     return redirect('inventory:devis_detail', pk=devis.pk)
                     
-            except ValueError as e:
+            except ValueError:
                 # Erreur de validation, le formulaire sera réaffiché avec les erreurs
-                print(f"Erreur de validation: {e}")
                 messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
         else:
             messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
@@ -229,7 +136,7 @@ def devis_edit(request, pk):
     devis = get_object_or_404(Devis, pk=pk)
     
     # Vérifier les permissions
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN' and devis.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and devis.commercial != request.user:
         messages.error(request, "Vous n'avez pas accès à ce devis.")
         return redirect('inventory:devis_list')
     
@@ -244,91 +151,9 @@ def devis_edit(request, pk):
                     # Supprimer les anciennes lignes
                     devis.lignedevis_set.all().delete()
                     
-                    # ✅ PARSING MANUEL (comme devis_create)
-                    lines_created = 0
-                    lines_data = {}
-                    has_error = False
-                    
-                    # Parser toutes les clés POST pour trouver TOUTES les lignes de produit
-                    for key in request.POST:
-                        if key.startswith('ligne_') and '_' in key:
-                            parts = key.split('_', 2)
-                            if len(parts) == 3:
-                                line_idx = parts[1]
-                                field_name = parts[2]
-                                
-                                if line_idx not in lines_data:
-                                    lines_data[line_idx] = {}
-                                lines_data[line_idx][field_name] = request.POST[key]
-                    
-                    print(f"=== DEBUG DEVIS_EDIT ===")
-                    print(f"POST data: {request.POST}")
-                    print(f"Lignes trouvées: {sorted(lines_data.keys())}")
-                    
-                    # Traiter chaque ligne trouvée (triée par index)
-                    for line_idx in sorted(lines_data.keys(), key=lambda x: int(x) if x.isdigit() else 0):
-                        data = lines_data[line_idx]
-                        produit_id = data.get('produit')
-                        quantite = data.get('quantite')
-                        prix_unitaire = data.get('prix_unitaire')
-                        remise = data.get('remise', '0')
-                        
-                        print(f"Traitement ligne {line_idx}: produit={produit_id}, qte={quantite}, prix={prix_unitaire}, remise={remise}")
-                        
-                        # Ignorer les lignes vides
-                        if not produit_id:
-                            print(f"Ligne {line_idx} ignorée (pas de produit)")
-                            continue
-                        
-                        # Vérifier que tous les champs requis sont présents
-                        if not quantite or not prix_unitaire:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Quantité et prix requis')
-                            has_error = True
-                            continue
-                        
-                        try:
-                            produit = Produit.objects.get(id=produit_id)
-                            quantite = int(quantite)
-                            prix_unitaire = float(prix_unitaire)
-                            remise = float(remise) if remise else 0
-                            
-                            # Validations
-                            if quantite <= 0:
-                                messages.error(request, f'{produit.nom}: La quantité doit être positive')
-                                has_error = True
-                                continue
-                            
-                            if prix_unitaire < 0:
-                                messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
-                                has_error = True
-                                continue
-                            
-                            if remise < 0 or remise > 100:
-                                messages.error(request, f'{produit.nom}: La remise doit être entre 0 et 100%')
-                                has_error = True
-                                continue
-                            
-                            # Créer la ligne de devis
-                            ligne = LigneDevis.objects.create(
-                                devis=devis,
-                                produit=produit,
-                                quantite=quantite,
-                                prix_unitaire=prix_unitaire,
-                                remise=remise
-                            )
-                            lines_created += 1
-                            print(f"✓ Ligne {line_idx} créée: {ligne}")
-                            
-                        except Produit.DoesNotExist:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Produit introuvable')
-                            has_error = True
-                            continue
-                        except (ValueError, TypeError) as e:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Erreur de conversion - {str(e)}')
-                            has_error = True
-                            continue
-                    
-                    print(f"✓ Total de lignes créées: {lines_created}")
+                    # Traitement des lignes de produit (voir inventory/lignes.py)
+                    lignes, has_error = analyser_lignes(request, avec_remise=True)
+                    lines_created = 0 if has_error else len(creer_lignes(LigneDevis, 'devis', devis, lignes))
                     
                     # Si erreur détectée, annuler la transaction
                     if has_error:
@@ -345,9 +170,8 @@ def devis_edit(request, pk):
                     messages.success(request, f"Devis {devis.numero_devis} modifié avec succès ({lines_created} ligne(s)).")
                     return redirect('inventory:devis_detail', pk=devis.pk)
                     
-            except ValueError as e:
+            except ValueError:
                 # Erreur de validation, le formulaire sera réaffiché avec les erreurs
-                print(f"Erreur de validation: {e}")
                 messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
         else:
             messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
@@ -364,28 +188,17 @@ def devis_edit(request, pk):
     return render(request, 'inventory/devis_form.html', context)
 
 
-@login_required
-@role_required(['COMMERCIAL_TERRAIN', 'MANAGER'])
-def devis_pdf(request, pk):
+@document_pdf('devis', Devis)
+def rendre_devis(devis):
     """Générer un PDF professionnel pour un devis"""
     from django.template.loader import render_to_string
     from weasyprint import HTML
-    from django.http import HttpResponse
     from decimal import Decimal
-    from datetime import datetime
     from django.conf import settings
     import os
     
-    # Récupérer le devis
-    devis = get_object_or_404(Devis, pk=pk)
-    
-    # Vérifier les permissions
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN' and devis.commercial != request.user:
-        messages.error(request, "Vous n'avez pas accès à ce devis.")
-        return redirect('inventory:devis_list')
-    
-    # Récupérer les lignes du devis
-    lignes_devis = devis.lignedevis_set.all()
+    # Récupérer les lignes du devis (déjà préchargées lors d'un rendu par lot)
+    lignes_devis = lignes_document(devis)
     
     # Calculer TVA et Total TTC
     tva = devis.total * Decimal('0.18')  # TVA 18%
@@ -400,7 +213,6 @@ def devis_pdf(request, pk):
         'lignes_devis': lignes_devis,
         'tva': tva,
         'total_ttc': total_ttc,
-        'now': datetime.now(),
         'logo_path': logo_path,
         'STATIC_ROOT': os.path.join(settings.BASE_DIR, 'static'),
     }
@@ -409,11 +221,24 @@ def devis_pdf(request, pk):
     html_string = render_to_string('inventory/devis_pdf.html', context)
     
     # Générer le PDF avec WeasyPrint
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf_file = html.write_pdf()
+    html = HTML(string=html_string, base_url=str(settings.BASE_DIR))
+    return html.write_pdf()
+
+
+@login_required
+@role_required(['COMMERCIAL_TERRAIN', 'MANAGER'])
+def devis_pdf(request, pk):
+    """Générer un PDF professionnel pour un devis"""
+    # Récupérer le devis
+    devis = get_object_or_404(Devis, pk=pk)
+    
+    # Vérifier les permissions
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and devis.commercial != request.user:
+        messages.error(request, "Vous n'avez pas accès à ce devis.")
+        return redirect('inventory:devis_list')
     
-    # Créer la réponse HTTP
-    response = HttpResponse(pdf_file, content_type='application/pdf')
+    # PDF servi depuis le cache disque tant que le devis n'a pas changé
+    response = HttpResponse(pdf_en_cache(devis, 'devis'), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="Devis_{devis.numero_devis}.pdf"'
     
     return response
@@ -425,10 +250,10 @@ def devis_pdf(request, pk):
 @role_required(['COMMERCIAL_TERRAIN', 'MANAGER'])
 def prospect_list(request):
     """Liste des prospects"""
-    prospects_list = Prospect.objects.all()
+    prospects_list = Prospect.objects.select_related('commercial')
     
     # Filtrage par commercial (si pas manager)
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN':
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN':
         prospects_list = prospects_list.filter(commercial=request.user)
     
     # Filtrage par statut
@@ -499,7 +324,7 @@ def prospect_detail(request, pk):
     prospect = get_object_or_404(Prospect, pk=pk)
     
     # Vérifier les permissions
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN' and prospect.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and prospect.commercial != request.user:
         messages.error(request, "Vous n'avez pas accès à ce prospect.")
         return redirect('inventory:prospect_list')
     
@@ -519,7 +344,7 @@ def prospect_edit(request, pk):
     prospect = get_object_or_404(Prospect, pk=pk)
     
     # Vérifier les permissions
-    if request.user.profile.role == 'COMMERCIAL_TERRAIN' and prospect.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and prospect.commercial != request.user:
         messages.error(request, "Vous n'avez pas accès à ce prospect.")
         return redirect('inventory:prospect_list')
     
@@ -589,7 +414,7 @@ def appareil_list(request):
     appareils_list = AppareilVendu.objects.select_related('produit', 'client', 'technicien_responsable')
     
     # Filtrage par technicien (si pas manager)
-    if request.user.profile.role == 'TECHNICIEN':
+    if droits(request.user).role == 'TECHNICIEN':
         appareils_list = appareils_list.filter(technicien_responsable=request.user)
     
     # Filtres
@@ -650,10 +475,10 @@ def appareil_detail(request, pk):
 @role_required(['TECHNICIEN', 'MANAGER'])
 def intervention_list(request):
     """Liste des interventions SAV"""
-    interventions_list = InterventionSAV.objects.select_related('appareil', 'client', 'technicien')
+    interventions_list = InterventionSAV.objects.select_related('appareil__produit', 'appareil__client', 'client', 'technicien')
     
     # Filtrage par technicien (si pas manager)
-    if request.user.profile.role == 'TECHNICIEN':
+    if droits(request.user).role == 'TECHNICIEN':
         interventions_list = interventions_list.filter(technicien=request.user)
     
     # Filtres
@@ -666,9 +491,7 @@ def intervention_list(request):
         interventions_list = interventions_list.filter(type_intervention=type_intervention)
     
     # Pagination
-    paginator = Paginator(interventions_list, 20)
-    page_number = request.GET.get('page')
-    interventions = paginator.get_page(page_number)
+    interventions = paginer(request, interventions_list, 20, total=True)
     
     context = {
         'interventions': interventions,
@@ -680,6 +503,32 @@ def intervention_list(request):
     return render(request, 'inventory/intervention_list.html', context)
 
 
+@login_required
+@role_required(['TECHNICIEN', 'MANAGER'])
+def planning_interventions_api(request):
+    """
+    API JSON du planning des techniciens : interventions ouvertes réparties par
+    technicien et par jour (?debut=AAAA-MM-JJ&fin=AAAA-MM-JJ, 7 jours par défaut)
+    """
+    try:
+        debut = date.fromisoformat(request.GET['debut']) if request.GET.get('debut') else timezone.localdate()
+        fin = date.fromisoformat(request.GET['fin']) if request.GET.get('fin') else debut + timedelta(days=6)
+    except ValueError:
+        return JsonResponse({'erreur': 'Dates attendues au format AAAA-MM-JJ'}, status=400)
+    if fin < debut or (fin - debut).days > 62:
+        return JsonResponse({'erreur': 'Période invalide (62 jours au plus)'}, status=400)
+    
+    donnees = planning(debut, fin)
+    # Un technicien ne voit que son propre planning
+    if droits(request.user).role == 'TECHNICIEN':
+        donnees = {
+            **donnees,
+            'techniciens': [t for t in donnees['techniciens'] if t['id'] == request.user.pk],
+            'non_planifiees': [],
+        }
+    return JsonResponse(donnees)
+
+
 @login_required
 @role_required(['TECHNICIEN', 'MANAGER'])
 def intervention_create(request):
@@ -689,7 +538,7 @@ def intervention_create(request):
         if form.is_valid():
             intervention = form.save(commit=False)
             # Le technicien par défaut est l'utilisateur connecté si c'est un technicien
-            if request.user.profile.role == 'TECHNICIEN':
+            if droits(request.user).role == 'TECHNICIEN':
                 intervention.technicien = request.user
             intervention.save()
             
@@ -775,7 +624,7 @@ def transfert_list(request):
     transferts_list = TransfertStock.objects.select_related('produit', 'demandeur')
     
     # Filtrage par utilisateur
-    if request.user.profile.role in ['TECHNICIEN', 'COMMERCIAL_SHOWROOM']:
+    if droits(request.user).a_role(['TECHNICIEN', 'COMMERCIAL_SHOWROOM']):
         transferts_list = transferts_list.filter(
             Q(demandeur=request.user) | 
             Q(expediteur=request.user) | 
@@ -788,9 +637,7 @@ def transfert_list(request):
         transferts_list = transferts_list.filter(statut=statut)
     
     # Pagination
-    paginator = Paginator(transferts_list, 20)
-    page_number = request.GET.get('page')
-    transferts = paginator.get_page(page_number)
+    transferts = paginer(request, transferts_list, 20, total=True)
     
     context = {
         'transferts': transferts,
@@ -0,0 +1,186 @@
+"""
+Filtres des pages de liste, partagés avec les exports (inventory/exports.py)
+
+Chaque fonction applique au queryset les paramètres GET de la liste
+correspondante, pour qu'un export contienne exactement ce que l'utilisateur voit.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q, F
+
+from users.permissions import droits
+
+from .models import ProspectionTelephonique
+from .recherche import rechercher
+from .cumuls_clients import trier as trier_clients
+
+
+def filtrer_produits(request, produits):
+    query = request.GET.get('q', '')
+    categorie_id = request.GET.get('categorie', '')
+    fournisseur_id = request.GET.get('fournisseur', '')
+    stock_bas = request.GET.get('stock_bas', '')
+
+    if query:
+        # Recherche plein texte, résultats triés par pertinence
+        produits = rechercher(produits, query).order_by('rang_recherche')
+
+    if categorie_id:
+        produits = produits.filter(categorie_id=categorie_id)
+
+    if fournisseur_id:
+        produits = produits.filter(fournisseur_id=fournisseur_id)
+
+    if stock_bas:
+        produits = produits.filter(quantite_stock__lte=F('seuil_alerte'))
+
+    return produits
+
+
+def filtrer_mouvements(request, mouvements):
+    produit_id = request.GET.get('produit', '')
+    type_mouvement = request.GET.get('type_mouvement', '')
+    date_debut = request.GET.get('date_debut', '')
+    date_fin = request.GET.get('date_fin', '')
+
+    if produit_id:
+        mouvements = mouvements.filter(produit_id=produit_id)
+
+    if type_mouvement:
+        mouvements = mouvements.filter(type_mouvement=type_mouvement)
+
+    if date_debut:
+        mouvements = mouvements.filter(date_mouvement__date__gte=date_debut)
+
+    if date_fin:
+        mouvements = mouvements.filter(date_mouvement__date__lte=date_fin)
+
+    return mouvements.order_by('-date_mouvement')
+
+
+def filtrer_clients(request, clients):
+    query = request.GET.get('q', '')
+    ville = request.GET.get('ville', '')
+
+    if query:
+        # Recherche plein texte, résultats triés par pertinence
+        clients = rechercher(clients, query).order_by('rang_recherche')
+
+    if ville:
+        clients = clients.filter(ville__icontains=ville)
+
+    # Chiffre d'affaires minimum et tri par cumuls (inventory/cumuls_clients.py)
+    try:
+        ca_min = Decimal(request.GET.get('ca_min', '') or '0')
+    except InvalidOperation:
+        ca_min = Decimal('0')
+    if ca_min > 0:
+        clients = clients.filter(cumul__chiffre_affaires__gte=ca_min)
+
+    return trier_clients(clients, request.GET.get('tri', ''))
+
+
+def filtrer_commandes(request, commandes):
+    statut = request.GET.get('statut', '')
+    query = request.GET.get('q', '')
+
+    if statut:
+        commandes = commandes.filter(statut=statut)
+
+    if query:
+        commandes = commandes.filter(
+            Q(numero_commande__icontains=query) |
+            Q(client__nom__icontains=query) |
+            Q(client__prenom__icontains=query)
+        )
+
+    return commandes.order_by('-date_commande')
+
+
+def filtrer_ventes(request, ventes):
+    mode_paiement = request.GET.get('mode_paiement', '')
+    query = request.GET.get('q', '')
+    date_debut = request.GET.get('date_debut', '')
+    date_fin = request.GET.get('date_fin', '')
+
+    if mode_paiement:
+        ventes = ventes.filter(mode_paiement=mode_paiement)
+
+    if query:
+        ventes = ventes.filter(
+            Q(numero_vente__icontains=query) |
+            Q(client__nom__icontains=query) |
+            Q(client__prenom__icontains=query)
+        )
+
+    if date_debut:
+        ventes = ventes.filter(date_vente__gte=date_debut)
+
+    if date_fin:
+        ventes = ventes.filter(date_vente__lte=date_fin)
+
+    return ventes.order_by('-date_vente')
+
+
+def filtrer_devis(request, devis_list):
+    # Filtrage par statut
+    statut = request.GET.get('statut')
+    if statut:
+        devis_list = devis_list.filter(statut=statut)
+
+    # Filtrage par commercial (si pas manager)
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN':
+        devis_list = devis_list.filter(commercial=request.user)
+
+    # Recherche
+    search = request.GET.get('search')
+    if search:
+        devis_list = devis_list.filter(
+            Q(numero_devis__icontains=search) |
+            Q(client__nom__icontains=search) |
+            Q(client__prenom__icontains=search) |
+            Q(client__entreprise__icontains=search)
+        )
+
+    return devis_list
+
+
+def prospections_visibles(user, prospections=None):
+    # Filtres commerciaux uniquement voient leurs prospects
+    if prospections is None:
+        prospections = ProspectionTelephonique.objects.all()
+    if droits(user).role == 'COMMERCIAL_TERRAIN':
+        prospections = prospections.filter(commercial=user)
+    return prospections
+
+
+def filtrer_prospections(request, prospections):
+    prospections = prospections_visibles(request.user, prospections)
+
+    # Recherche
+    search_query = request.GET.get('search', '')
+    if search_query:
+        prospections = prospections.filter(
+            Q(nom_complet__icontains=search_query) |
+            Q(numero_telephone__icontains=search_query) |
+            Q(email__icontains=search_query) |
+            Q(description__icontains=search_query)
+        )
+
+    # Filtre par statut
+    statut_filter = request.GET.get('statut', '')
+    if statut_filter:
+        prospections = prospections.filter(statut=statut_filter)
+
+    # Filtre par type d'appel
+    type_appel_filter = request.GET.get('type_appel', '')
+    if type_appel_filter:
+        prospections = prospections.filter(type_appel=type_appel_filter)
+
+    # Filtre par source (appel entrant uniquement)
+    source_filter = request.GET.get('source', '')
+    if source_filter:
+        prospections = prospections.filter(source_prospect=source_filter)
+
+    return prospections
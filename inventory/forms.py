@@ -59,7 +59,7 @@ class FournisseurForm(forms.ModelForm):
         model = Fournisseur
         fields = [
             'nom', 'email', 'telephone', 'adresse', 'ville', 
-            'code_postal', 'pays', 'actif'
+            'code_postal', 'pays', 'delai_livraison_jours', 'actif'
         ]
         widgets = {
             'nom': forms.TextInput(attrs={'class': 'form-control'}),
@@ -69,6 +69,7 @@ class FournisseurForm(forms.ModelForm):
             'ville': forms.TextInput(attrs={'class': 'form-control'}),
             'code_postal': forms.TextInput(attrs={'class': 'form-control'}),
             'pays': forms.TextInput(attrs={'class': 'form-control'}),
+            'delai_livraison_jours': forms.NumberInput(attrs={'class': 'form-control', 'min': 0}),
             'actif': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
 
@@ -130,9 +131,9 @@ class CommandeForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if not self.instance.pk:
-            # Générer automatiquement un numéro de commande
-            from datetime import datetime
-            self.fields['numero_commande'].initial = f"CMD-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            # Le numéro est attribué à l'enregistrement (voir inventory/numerotation.py)
+            self.fields['numero_commande'].required = False
+            self.fields['numero_commande'].widget.attrs['placeholder'] = "Attribué automatiquement"
         
         self.fields['date_livraison_prevue'].help_text = "Date prévue pour la livraison"
         self.fields['adresse_livraison'].help_text = "L'adresse du client sera automatiquement renseignée"
@@ -218,9 +219,9 @@ class VenteForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if not self.instance.pk:
-            # Générer automatiquement un numéro de vente
-            from datetime import datetime
-            self.fields['numero_vente'].initial = f"VTE-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            # Le numéro est attribué à l'enregistrement (voir inventory/numerotation.py)
+            self.fields['numero_vente'].required = False
+            self.fields['numero_vente'].widget.attrs['placeholder'] = "Attribué automatiquement"
         
         # Permettre les ventes sans client (vente comptoir)
         self.fields['client'].required = False
@@ -0,0 +1,155 @@
+"""
+Saisie groupée des lignes de documents (commandes, devis, ventes)
+
+Les formulaires envoient les lignes sous la forme ligne_<N>_produit,
+ligne_<N>_quantite, ligne_<N>_prix_unitaire (et ligne_<N>_remise pour les devis).
+Ce module remplace les boucles recopiées dans chaque vue :
+- tous les produits référencés sont chargés en une seule requête (in_bulk)
+- les lignes sont insérées avec bulk_create
+
+Les sorties de stock correspondantes passent par le registre (inventory/stock.py).
+"""
+
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.contrib import messages
+
+from .models import Produit
+
+
+@dataclass
+class LigneSaisie:
+    index: str
+    produit: Produit
+    quantite: int
+    prix_unitaire: Decimal
+    remise: Decimal = Decimal('0')
+
+
+def extraire_lignes(post):
+    """Regroupe les clés ligne_<N>_<champ> par index, triées par index"""
+    lines_data = {}
+    for key in post:
+        if key.startswith('ligne_'):
+            parts = key.split('_', 2)  # ligne_0_produit → ['ligne', '0', 'produit']
+            if len(parts) == 3:
+                lines_data.setdefault(parts[1], {})[parts[2]] = post[key]
+    return sorted(lines_data.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+
+
+def _numero(line_idx):
+    return int(line_idx) + 1 if line_idx.isdigit() else line_idx
+
+
+def analyser_lignes(request, avec_remise=False, avertissement_stock=None,
+                    stock_bloquant=False, verrouiller=False):
+    """
+    Valide les lignes postées et retourne (lignes, has_error).
+
+    Les messages d'erreur sont ajoutés ligne par ligne à `request`.
+    - avec_remise : lit et valide ligne_<N>_remise (0 à 100 %)
+    - avertissement_stock : callable(produit, quantite) -> message, affiché en
+      avertissement si la quantité dépasse le stock
+    - stock_bloquant : une quantité supérieure au stock restant est une erreur
+    - verrouiller : charge les produits avec select_for_update
+    """
+    lignes_postees = [(idx, data) for idx, data in extraire_lignes(request.POST) if data.get('produit')]
+    has_error = False
+
+    identifiants = set()
+    for line_idx, data in lignes_postees:
+        try:
+            identifiants.add(int(data['produit']))
+        except (ValueError, TypeError):
+            pass
+
+    queryset = Produit.objects.select_for_update() if verrouiller else Produit.objects.all()
+    produits = queryset.in_bulk(identifiants)
+    # Stock non réservé par les commandes confirmées (voir inventory/reservations.py)
+    stock_restant = {pk: produit.quantite_disponible for pk, produit in produits.items()}
+
+    lignes = []
+    for line_idx, data in lignes_postees:
+        quantite = data.get('quantite')
+        prix_unitaire = data.get('prix_unitaire')
+        remise = data.get('remise', '0') if avec_remise else '0'
+
+        # Vérifier que tous les champs requis sont présents
+        if not quantite or not prix_unitaire:
+            messages.error(request, f'Ligne {_numero(line_idx)}: Quantité et prix requis')
+            has_error = True
+            continue
+
+        try:
+            produit = produits.get(int(data['produit']))
+            if produit is None:
+                messages.error(request, f'Ligne {_numero(line_idx)}: Produit introuvable')
+                has_error = True
+                continue
+
+            quantite = int(quantite)
+            prix_unitaire = float(prix_unitaire)
+            remise = float(remise) if remise else 0
+        except (ValueError, TypeError) as e:
+            messages.error(request, f'Ligne {_numero(line_idx)}: Erreur de conversion - {str(e)}')
+            has_error = True
+            continue
+
+        # Validations
+        if quantite <= 0:
+            messages.error(request, f'{produit.nom}: La quantité doit être positive')
+            has_error = True
+            continue
+
+        if prix_unitaire < 0:
+            messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
+            has_error = True
+            continue
+
+        if remise < 0 or remise > 100:
+            messages.error(request, f'{produit.nom}: La remise doit être entre 0 et 100%')
+            has_error = True
+            continue
+
+        # Vérifier le stock disponible (les lignes d'un même produit se cumulent)
+        if quantite > stock_restant[produit.pk]:
+            if stock_bloquant:
+                messages.error(
+                    request,
+                    f'Stock insuffisant pour {produit.nom}. '
+                    f'Stock disponible: {stock_restant[produit.pk]}, Demandé: {quantite}'
+                )
+                has_error = True
+                continue
+            if avertissement_stock:
+                messages.warning(request, avertissement_stock(produit, quantite))
+        stock_restant[produit.pk] -= quantite
+
+        lignes.append(LigneSaisie(
+            index=line_idx,
+            produit=produit,
+            quantite=quantite,
+            prix_unitaire=Decimal(str(prix_unitaire)),
+            remise=Decimal(str(remise)),
+        ))
+
+    return lignes, has_error
+
+
+def creer_lignes(model, document_field, document, lignes):
+    """Insère les lignes du document en une seule requête"""
+    avec_remise = any(f.name == 'remise' for f in model._meta.get_fields())
+    objets = []
+    for ligne in lignes:
+        valeurs = {
+            document_field: document,
+            'produit': ligne.produit,
+            'quantite': ligne.quantite,
+            'prix_unitaire': ligne.prix_unitaire,
+        }
+        if avec_remise:
+            valeurs['remise'] = ligne.remise
+        objets.append(model(**valeurs))
+    return model.objects.bulk_create(objets)
+
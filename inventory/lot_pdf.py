@@ -0,0 +1,285 @@
+"""
+Génération de PDF par lot (bons de livraison, proformas, factures, devis)
+
+Les documents correspondant aux filtres (période, statut, client) sont chargés
+en une requête par modèle, avec leurs lignes et produits préchargés
+(prefetch_lignes), puis rendus en parallèle dans un pool de processus
+(PDF_LOT_TRAVAILLEURS) par les fonctions déclarées avec @document_pdf :
+les gabarits WeasyPrint bon_livraison_pdf.html, facture_proforma_pdf.html et
+devis_pdf.html, et le moteur ReportLab pour les factures de vente.
+
+Chaque document est d'abord lu dans le cache disque (inventory/cache_pdf.py) ;
+seuls les absents sont rendus, puis enregistrés pour les impressions et les
+lots suivants. Les processus du pool ne reçoivent que le type et les clés
+primaires des documents à rendre et les relisent par paquets : aucune instance
+de modèle chargée pendant la requête n'est sérialisée vers eux.
+
+Un lot est limité à PDF_LOT_MAX_DOCUMENTS documents (LotTropVolumineux au-delà).
+
+Sorties :
+- ZIP : produit au fil de l'eau, un fichier par document, dans l'ordre du lot
+- PDF fusionné : un seul fichier (nécessite pypdf)
+"""
+
+import multiprocessing
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from io import BytesIO
+from itertools import chain
+from typing import Callable
+
+import django
+from django.conf import settings
+from django.db import connection, connections
+from django.utils import timezone
+
+from users.permissions import droits
+
+from .models import Commande, Vente, Devis
+from .cache_pdf import RENDUS, charger_rendus, chemin_pdf, empreintes, enregistrer_pdf, lire_pdf, prefetch_lignes
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # pypdf est optionnel : seul le ZIP est alors disponible
+    PdfWriter = None
+
+
+# Documents relus et rendus par tâche du pool
+TAILLE_PAQUET = 4
+
+
+class LotTropVolumineux(Exception):
+    """Les filtres retiennent plus de documents que PDF_LOT_MAX_DOCUMENTS"""
+
+    def __init__(self, limite):
+        self.limite = limite
+        super().__init__(f'Lot limité à {limite} documents')
+
+
+def sans_restriction(documents, user):
+    return documents
+
+
+def devis_du_commercial(documents, user):
+    # Comme la liste des devis : un commercial terrain ne voit que ses devis
+    if user is not None and droits(user).role == 'COMMERCIAL_TERRAIN':
+        return documents.filter(commercial=user)
+    return documents
+
+
+@dataclass
+class TypeLot:
+    type_document: str  # clé de cache_pdf.RENDUS
+    model: type
+    permission: str
+    prefixe: str
+    champ_numero: str
+    champ_date: str
+    relations: tuple
+    restriction: Callable = sans_restriction
+
+    def nom_fichier(self, document):
+        return f'{self.prefixe}_{getattr(document, self.champ_numero)}.pdf'
+
+
+TYPES_LOT = {
+    'bon_livraison': TypeLot(
+        'bon_livraison', Commande, 'can_manage_orders', 'Bon_Livraison',
+        'numero_commande', 'date_commande', ('client', 'utilisateur')
+    ),
+    'proforma_commande': TypeLot(
+        'proforma_commande', Commande, 'can_manage_orders', 'Facture_Proforma',
+        'numero_commande', 'date_commande', ('client', 'utilisateur')
+    ),
+    'facture_vente': TypeLot(
+        'facture_vente', Vente, 'can_manage_sales', 'facture_vente',
+        'numero_vente', 'date_vente', ('client', 'utilisateur')
+    ),
+    'devis': TypeLot(
+        'devis', Devis, 'can_manage_quotes', 'Devis',
+        'numero_devis', 'date_creation', ('client', 'commercial'), devis_du_commercial
+    ),
+}
+
+
+def fusion_disponible():
+    return PdfWriter is not None
+
+
+def peut_generer(user, type_lot):
+    if user.is_superuser:
+        return True
+    # Capacités en cache (users/permissions.py) : pas de requête sur le profil à chaque type
+    return type_lot.permission in droits(user).capacites
+
+
+# ================== CHARGEMENT ==================
+
+def limite_lot():
+    return getattr(settings, 'PDF_LOT_MAX_DOCUMENTS', 200)
+
+
+def charger_documents(types, date_debut=None, date_fin=None, statut=None, client=None, user=None):
+    """
+    Retourne la liste ordonnée des (type_lot, document) à rendre.
+
+    Sans période, le lot couvre la journée en cours. Le statut ne s'applique
+    qu'aux modèles qui en ont un (les ventes n'en ont pas). Lève LotTropVolumineux
+    au-delà de limite_lot() documents, sans charger plus que la limite par modèle.
+    """
+    limite = limite_lot()
+    if not date_debut and not date_fin:
+        date_debut = date_fin = timezone.localdate()
+
+    documents_par_model = {}
+    taches = []
+    for type_lot in types:
+        model = type_lot.model
+        if model not in documents_par_model:
+            documents = model.objects.select_related(*type_lot.relations).prefetch_related(prefetch_lignes(model))
+            if date_debut:
+                documents = documents.filter(**{f'{type_lot.champ_date}__date__gte': date_debut})
+            if date_fin:
+                documents = documents.filter(**{f'{type_lot.champ_date}__date__lte': date_fin})
+            if statut and any(f.name == 'statut' for f in model._meta.fields):
+                documents = documents.filter(statut=statut)
+            if client:
+                documents = documents.filter(client_id=client)
+            documents = type_lot.restriction(documents, user)
+            # Une requête pour les documents, une pour leurs lignes et produits
+            documents_par_model[model] = list(documents.order_by(type_lot.champ_date, 'pk')[:limite + 1])
+        taches.extend((type_lot, document) for document in documents_par_model[model])
+        if len(taches) > limite:
+            raise LotTropVolumineux(limite)
+    return taches
+
+
+# ================== RENDU PARALLÈLE ==================
+
+_pool = None
+
+
+def _rendre_documents(type_document, pks):
+    """Rendu dans un processus du pool : les documents sont relus avec leurs lignes, en un paquet"""
+    try:
+        charger_rendus()
+        type_lot = TYPES_LOT[type_document]
+        model = type_lot.model
+        documents = model.objects.select_related(*type_lot.relations).prefetch_related(
+            prefetch_lignes(model)
+        ).in_bulk(pks)
+        _, rendu = RENDUS[type_document]
+        return [rendu(documents[pk]) for pk in pks]
+    finally:
+        # Le processus est réutilisé : pas de connexion laissée ouverte entre deux lots
+        connections.close_all()
+
+
+def travailleurs():
+    return getattr(settings, 'PDF_LOT_TRAVAILLEURS', 4)
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        # spawn : les processus ne partagent ni connexions ni état hérités du serveur
+        _pool = ProcessPoolExecutor(
+            max_workers=travailleurs(),
+            mp_context=multiprocessing.get_context('spawn'),
+            # Django est initialisé avant la première tâche
+            initializer=django.setup,
+        )
+    return _pool
+
+
+def _rendre_manquants(taches):
+    """Octets PDF des documents absents du cache, dans l'ordre des tâches"""
+    # Dans une transaction, les processus du pool ne verraient pas les écritures non validées
+    if travailleurs() <= 1 or len(taches) <= 1 or connection.in_atomic_block:
+        # Rendu local : les documents chargés (lignes préchargées) servent tels quels
+        charger_rendus()
+        return (RENDUS[type_lot.type_document][1](document) for type_lot, document in taches)
+
+    # Paquets consécutifs d'un même type : (type, [pk, ...])
+    paquets = []
+    for type_lot, document in taches:
+        if paquets and paquets[-1][0] == type_lot.type_document and len(paquets[-1][1]) < TAILLE_PAQUET:
+            paquets[-1][1].append(document.pk)
+        else:
+            paquets.append((type_lot.type_document, [document.pk]))
+    types_document, pks = zip(*paquets)
+    return chain.from_iterable(pool().map(_rendre_documents, types_document, pks))
+
+
+def rendre_lot(taches):
+    """Génère les octets PDF des documents, dans l'ordre des tâches, depuis le cache disque si possible"""
+    # Empreintes calculées par modèle, en trois requêtes, plutôt que document par document
+    pks_par_model = {}
+    for type_lot, document in taches:
+        pks_par_model.setdefault(type_lot.model, set()).add(document.pk)
+    cles = {model: empreintes(model, pks) for model, pks in pks_par_model.items()}
+    chemins = [
+        chemin_pdf(document, type_lot.type_document, cles[type_lot.model][document.pk])
+        for type_lot, document in taches
+    ]
+    pdfs = [lire_pdf(chemin) for chemin in chemins]
+    rendus = _rendre_manquants([tache for tache, pdf in zip(taches, pdfs) if pdf is None])
+    for chemin, pdf in zip(chemins, pdfs):
+        if pdf is None:
+            pdf = next(rendus)
+            enregistrer_pdf(chemin, pdf)
+        yield pdf
+
+
+# ================== SORTIES ==================
+
+class FluxZip:
+    """Pseudo-fichier non positionnable : conserve les octets écrits par ZipFile jusqu'à leur envoi"""
+
+    def __init__(self):
+        self.morceaux = []
+        self.position = 0
+
+    def write(self, donnees):
+        self.morceaux.append(bytes(donnees))
+        self.position += len(donnees)
+        return len(donnees)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def vider(self):
+        donnees = b''.join(self.morceaux)
+        self.morceaux = []
+        return donnees
+
+
+def flux_zip(taches):
+    """Archive ZIP produite au fil des rendus, sans la construire en mémoire"""
+    flux = FluxZip()
+    with zipfile.ZipFile(flux, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for (type_lot, document), pdf in zip(taches, rendre_lot(taches)):
+            archive.writestr(f'{type_lot.type_document}/{type_lot.nom_fichier(document)}', pdf)
+            yield flux.vider()
+    yield flux.vider()
+
+
+def pdf_fusionne(taches):
+    """PDF unique (fichier temporaire positionné au début) regroupant tous les documents"""
+    fusion = PdfWriter()
+    for pdf in rendre_lot(taches):
+        fusion.append(PdfReader(BytesIO(pdf)))
+    fichier = tempfile.TemporaryFile()
+    fusion.write(fichier)
+    fichier.seek(0)
+    return fichier
+
+
+def nom_lot(extension):
+    return f'lot_documents_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
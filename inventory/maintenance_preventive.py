@@ -0,0 +1,275 @@
+"""
+Planification des maintenances préventives des appareils vendus
+
+planifier() crée à l'avance les interventions PREVENTIVE des appareils dont
+la prochaine maintenance tombe dans les MAINTENANCE_HORIZON_JOURS jours :
+- les appareils sont parcourus dans l'ordre de l'index appareil_maintenance_idx
+  (prochaine_maintenance_preventive, id), par lots de TAILLE_LOT lus par
+  curseur (keyset) : la mémoire reste bornée quel que soit le parc
+- un appareil en retard est planifié à partir d'aujourd'hui ; chaque échéance
+  de l'horizon donne une intervention, puis prochaine_maintenance_preventive
+  avance de intervalle_maintenance_jours
+- chaque intervention est confiée au technicien le moins chargé (interventions
+  planifiées ou en cours sur l'horizon), sauf si le technicien responsable de
+  l'appareil n'a pas plus de ECART_CHARGE interventions de plus que lui
+- les interventions d'un lot sont insérées avec bulk_create, leurs numéros
+  réservés en une écriture, et les dates des appareils avancées en une requête
+
+Les appareils hors service et ceux qui ont déjà une maintenance préventive
+ouverte (planifiée, en cours, reportée) sont ignorés. Chaque lot est une
+transaction qui commence par verrouiller la ligne CLE_VERROU de
+CompteurDocument : deux planifications simultanées (commande et tâche
+périodique d'un autre processus) traitent les lots l'une après l'autre et
+relisent les dates déjà avancées.
+
+Lancement : `python manage.py schedule_maintenance` (tâche cron), ou dans le
+processus serveur (wsgi.py, asgi.py) avec MAINTENANCE_PLANIFICATION_AUTO (voir
+Planificateur).
+"""
+
+import datetime
+import heapq
+import logging
+import threading
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import AppareilVendu, InterventionSAV
+from .numerotation import numeros, reserver
+from .pagination import condition_apres
+from .planning_techniciens import invalider_planning
+from .statistiques import invalider_statistiques
+
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 500
+ECART_CHARGE = 3
+CLE_VERROU = 'PLANIFICATION_MAINTENANCE'
+STATUTS_OUVERTS = ('PLANIFIEE', 'EN_COURS', 'REPORTEE')
+ORDRE = [('prochaine_maintenance_preventive', False), ('id', False)]
+
+
+def horizon():
+    return getattr(settings, 'MAINTENANCE_HORIZON_JOURS', 30)
+
+
+def heure_intervention():
+    return getattr(settings, 'MAINTENANCE_HEURE', 9)
+
+
+def duree_prevue():
+    return getattr(settings, 'MAINTENANCE_DUREE_PREVUE', 60)
+
+
+@dataclass
+class Resultat:
+    appareils: int = 0
+    interventions: int = 0
+    par_technicien: dict = field(default_factory=dict)
+
+
+# ================== CHARGE DES TECHNICIENS ==================
+
+class Charges:
+    """Nombre d'interventions ouvertes par technicien ; attribue au moins chargé"""
+
+    def __init__(self, charges):
+        self.charges = dict(charges)
+        self._tas = [(charge, technicien_id) for technicien_id, charge in self.charges.items()]
+        heapq.heapify(self._tas)
+
+    def __bool__(self):
+        return bool(self.charges)
+
+    def _minimum(self):
+        # Entrées périmées (charge modifiée depuis leur ajout) écartées au passage
+        while self._tas[0][0] != self.charges[self._tas[0][1]]:
+            heapq.heappop(self._tas)
+        return self._tas[0]
+
+    def attribuer(self, responsable_id=None):
+        charge_minimale, technicien_id = self._minimum()
+        if responsable_id in self.charges and self.charges[responsable_id] <= charge_minimale + ECART_CHARGE:
+            technicien_id = responsable_id
+        self.charges[technicien_id] += 1
+        heapq.heappush(self._tas, (self.charges[technicien_id], technicien_id))
+        return technicien_id
+
+
+def charges_techniciens(debut, fin):
+    """Charges des techniciens actifs : interventions ouvertes prévues entre debut et fin"""
+    techniciens = User.objects.filter(is_active=True, profile__role='TECHNICIEN').annotate(
+        charge=Count('interventions_technicien', filter=Q(
+            interventions_technicien__statut__in=STATUTS_OUVERTS,
+            interventions_technicien__date_prevue__gte=debut,
+            interventions_technicien__date_prevue__lt=fin,
+        ))
+    ).order_by('pk')
+    return Charges(techniciens.values_list('pk', 'charge'))
+
+
+# ================== PLANIFICATION ==================
+
+def debut_journee(jour, heure=0):
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time(heure)))
+
+
+def appareils_a_planifier(limite):
+    """Appareils dont la maintenance est due au plus tard à `limite`, sans maintenance préventive ouverte"""
+    ouvertes = InterventionSAV.objects.filter(
+        appareil=OuterRef('pk'), type_intervention='PREVENTIVE', statut__in=STATUTS_OUVERTS
+    )
+    return AppareilVendu.objects.filter(
+        prochaine_maintenance_preventive__lte=limite
+    ).exclude(statut='HORS_SERVICE').exclude(Exists(ouvertes)).order_by(
+        'prochaine_maintenance_preventive', 'id'
+    )
+
+
+def echeances(prochaine, intervalle, aujourd_hui, limite):
+    """Dates des maintenances à planifier d'ici `limite`, et la prochaine date restant à planifier"""
+    intervalle = datetime.timedelta(days=max(1, intervalle))
+    dates = []
+    jour = max(prochaine, aujourd_hui)
+    while jour <= limite:
+        dates.append(jour)
+        jour += intervalle
+    return dates, jour
+
+
+def _planifier_lot(appareils, apres, aujourd_hui, limite, charges, resultat):
+    """Planifie un lot ; retourne les valeurs de tri du dernier appareil lu, ou None en fin de parcours"""
+    with transaction.atomic():
+        # Verrou de planification (ligne de compteur) tenu jusqu'à la fin du lot
+        reserver(CLE_VERROU, 0)
+        lot = appareils.filter(condition_apres(ORDRE, apres)) if apres else appareils
+        lot = list(lot.values_list(
+            'pk', 'prochaine_maintenance_preventive', 'intervalle_maintenance_jours',
+            'client_id', 'technicien_responsable_id'
+        )[:TAILLE_LOT])
+        if not lot:
+            return None
+
+        planifiees, avancees = [], []
+        for pk, prochaine, intervalle, client_id, responsable_id in lot:
+            dates, suivante = echeances(prochaine, intervalle, aujourd_hui, limite)
+            for jour in dates:
+                technicien_id = charges.attribuer(responsable_id)
+                resultat.par_technicien[technicien_id] = resultat.par_technicien.get(technicien_id, 0) + 1
+                planifiees.append(InterventionSAV(
+                    type_intervention='PREVENTIVE',
+                    appareil_id=pk,
+                    client_id=client_id,
+                    technicien_id=technicien_id,
+                    date_prevue=debut_journee(jour, heure_intervention()),
+                    duree_prevue=duree_prevue(),
+                    description='Maintenance préventive planifiée automatiquement',
+                ))
+            avancees.append(AppareilVendu(pk=pk, prochaine_maintenance_preventive=suivante))
+
+        numeros_intervention = numeros(InterventionSAV, 'numero_intervention', 'INT', '', 4, len(planifiees))
+        for intervention in planifiees:
+            intervention.numero_intervention = next(numeros_intervention)
+        InterventionSAV.objects.bulk_create(planifiees)
+        AppareilVendu.objects.bulk_update(avancees, ['prochaine_maintenance_preventive'])
+
+    resultat.appareils += len(lot)
+    resultat.interventions += len(planifiees)
+    dernier = lot[-1]
+    return [dernier[1], dernier[0]]
+
+
+def planifier(aujourd_hui=None, jours=None):
+    """
+    Crée les interventions préventives des `jours` prochains jours (par défaut
+    MAINTENANCE_HORIZON_JOURS) et avance les dates de maintenance des appareils
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    limite = aujourd_hui + datetime.timedelta(days=horizon() if jours is None else jours)
+    resultat = Resultat()
+
+    charges = charges_techniciens(debut_journee(aujourd_hui), debut_journee(limite + datetime.timedelta(days=1)))
+    if not charges:
+        logger.warning('Aucun technicien actif : maintenances préventives non planifiées')
+        return resultat
+
+    appareils = appareils_a_planifier(limite)
+    apres = None
+    while True:
+        apres = _planifier_lot(appareils, apres, aujourd_hui, limite, charges, resultat)
+        if apres is None:
+            break
+
+    if resultat.par_technicien:
+        # bulk_create n'envoie pas post_save : invalider comme les signaux des interventions
+        invalider_statistiques(*resultat.par_technicien)
+        invalider_planning()
+    return resultat
+
+
+# ================== TÂCHE PÉRIODIQUE ==================
+
+class Planificateur(threading.Thread):
+    """
+    Planification périodique dans le processus de l'application (thread
+    démon), toutes les MAINTENANCE_PLANIFICATION_INTERVALLE secondes
+    """
+
+    def __init__(self, intervalle=None):
+        super().__init__(name='planification-maintenance', daemon=True)
+        self.intervalle = intervalle or getattr(settings, 'MAINTENANCE_PLANIFICATION_INTERVALLE', 3600)
+        self.arret = threading.Event()
+
+    def executer(self):
+        close_old_connections()
+        try:
+            resultat = planifier()
+            logger.info(
+                'Maintenances préventives : %s intervention(s) pour %s appareil(s)',
+                resultat.interventions, resultat.appareils
+            )
+        except Exception:
+            logger.exception('Échec de la planification des maintenances préventives')
+        finally:
+            close_old_connections()
+
+    def run(self):
+        while not self.arret.is_set():
+            self.executer()
+            self.arret.wait(self.intervalle)
+
+    def arreter(self):
+        self.arret.set()
+
+
+_planificateur = None
+_verrou = threading.Lock()
+
+
+def demarrer(intervalle=None):
+    """Démarre la tâche périodique du processus (une seule par processus)"""
+    global _planificateur
+    with _verrou:
+        if _planificateur is None or not _planificateur.is_alive():
+            _planificateur = Planificateur(intervalle)
+            _planificateur.start()
+    return _planificateur
+
+
+def demarrer_automatiquement():
+    """
+    Démarre la tâche périodique si MAINTENANCE_PLANIFICATION_AUTO est activé.
+
+    Appelé par les points d'entrée serveur (wsgi.py, asgi.py) et non par
+    AppConfig.ready : migrate, shell, les tests et le processus parent de
+    l'autoreloader de runserver ne lancent aucun thread qui interroge la base.
+    """
+    if getattr(settings, 'MAINTENANCE_PLANIFICATION_AUTO', False):
+        return demarrer()
+    return None
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.lot_pdf import TYPES_LOT, charger_documents, flux_zip, pdf_fusionne, fusion_disponible, nom_lot
+
+
+class Command(BaseCommand):
+    help = 'Génère en un seul fichier (ZIP ou PDF fusionné) les documents PDF filtrés par période, statut et client'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type', choices=sorted(TYPES_LOT), action='append', dest='types',
+            help='Type de document à générer (par défaut : bons de livraison et factures de vente)'
+        )
+        parser.add_argument('--date-debut', help='Date de début AAAA-MM-JJ (par défaut : aujourd\'hui)')
+        parser.add_argument('--date-fin', help='Date de fin AAAA-MM-JJ (par défaut : aujourd\'hui)')
+        parser.add_argument('--statut', help='Statut des commandes / devis (ignoré pour les ventes)')
+        parser.add_argument('--client', type=int, help='Identifiant du client')
+        parser.add_argument('--format', choices=['zip', 'pdf'], default='zip', help='Archive ZIP ou PDF fusionné')
+        parser.add_argument('--sortie', help='Fichier à écrire (par défaut : lot_documents_<horodatage>.<format>)')
+
+    def handle(self, *args, **options):
+        if options['format'] == 'pdf' and not fusion_disponible():
+            raise CommandError('La fusion en un seul PDF nécessite le module pypdf (utilisez --format zip)')
+
+        types = [TYPES_LOT[nom] for nom in options['types'] or ['bon_livraison', 'facture_vente']]
+        taches = charger_documents(
+            types,
+            date_debut=options['date_debut'],
+            date_fin=options['date_fin'],
+            statut=options['statut'],
+            client=options['client'],
+        )
+        sortie = options['sortie'] or nom_lot(options['format'])
+
+        with open(sortie, 'wb') as fichier:
+            if options['format'] == 'pdf':
+                with pdf_fusionne(taches) as fusion:
+                    fichier.write(fusion.read())
+            else:
+                for morceau in flux_zip(taches):
+                    fichier.write(morceau)
+
+        self.stdout.write(self.style.SUCCESS(f'{len(taches)} document(s) écrit(s) dans {sortie}'))
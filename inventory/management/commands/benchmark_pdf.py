@@ -0,0 +1,66 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Commande, Vente
+from inventory.moteur_pdf import DISPOSITIONS, contexte, rendre
+
+
+class Command(BaseCommand):
+    help = 'Mesure le temps de rendu et la mémoire de chaque disposition PDF du moteur ReportLab'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=20,
+            help='Nombre de rendus par disposition (par défaut : 20)'
+        )
+        parser.add_argument('--commande', type=int, help='Identifiant de la commande à rendre (par défaut : la plus récente)')
+        parser.add_argument('--vente', type=int, help='Identifiant de la vente à rendre (par défaut : la plus récente)')
+        parser.add_argument(
+            '--disposition', choices=sorted(DISPOSITIONS), action='append',
+            help='Disposition à mesurer (par défaut : toutes)'
+        )
+
+    def document(self, model, pk):
+        if pk is not None:
+            document = model.objects.filter(pk=pk).first()
+            if document is None:
+                raise CommandError(f'{model._meta.verbose_name} {pk} introuvable')
+            return document
+        return model.objects.order_by('-pk').first()
+
+    def handle(self, *args, **options):
+        iterations = max(options['iterations'], 1)
+        documents = {
+            Commande: self.document(Commande, options['commande']),
+            Vente: self.document(Vente, options['vente']),
+        }
+
+        for nom in options['disposition'] or sorted(DISPOSITIONS):
+            _, modeles = DISPOSITIONS[nom]
+            for model in modeles:
+                document = documents[model]
+                if document is None:
+                    self.stdout.write(f'{nom} ({model.__name__}) : aucun document, ignoré')
+                    continue
+
+                # Le contexte (document et lignes) est chargé une fois : seul le rendu est mesuré
+                ctx = contexte(document)
+
+                tracemalloc.start()
+                pdf = rendre(nom, ctx)
+                _, pic = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                durees = []
+                for _ in range(iterations):
+                    debut = time.perf_counter()
+                    rendre(nom, ctx)
+                    durees.append((time.perf_counter() - debut) * 1000)
+
+                self.stdout.write(self.style.SUCCESS(
+                    f'{nom} ({model.__name__} {document.pk}) : '
+                    f'moyenne {sum(durees) / len(durees):.1f} ms, min {min(durees):.1f} ms, '
+                    f'pic mémoire {pic / 1024:.0f} Kio, taille {len(pdf) / 1024:.1f} Kio'
+                ))
@@ -0,0 +1,84 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.benchmark import SCENARIOS, comparer, concurrence, lancer
+
+
+class Command(BaseCommand):
+    help = 'Mesure les vues principales (dashboard par rôle, listes, recherches, PDF, vente_create) et écrit les résultats en JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5, help='Appels mesurés par scénario, après le premier (par défaut : 5)')
+        parser.add_argument(
+            '--scenario', choices=[scenario.nom for scenario in SCENARIOS], action='append',
+            help='Scénario à mesurer (par défaut : tous)'
+        )
+        parser.add_argument('--lecture-seule', action='store_true', help="Ignore les scénarios qui écrivent en base (vente_create)")
+        parser.add_argument('--sortie', help='Fichier JSON où écrire les résultats')
+        parser.add_argument('--comparer', help='Résultats JSON d\'une exécution précédente à comparer')
+        parser.add_argument(
+            '--concurrence', choices=[scenario.nom for scenario in SCENARIOS if not scenario.ecriture],
+            help='Compare le débit du scénario sous WSGI et sous ASGI au lieu de mesurer les scénarios'
+        )
+        parser.add_argument('--requetes', type=int, default=200, help='Requêtes envoyées par serveur avec --concurrence (par défaut : 200)')
+        parser.add_argument('--simultanees', type=int, default=20, help='Requêtes simultanées sous ASGI (par défaut : 20)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads WSGI (par défaut : 4)')
+
+    def handle(self, *args, **options):
+        if options['concurrence']:
+            return self.comparer_serveurs(options)
+
+        def journal(nom, resultat):
+            self.stdout.write(
+                f'{nom} : moyenne {resultat["moyenne_ms"]:.1f} ms, p95 {resultat["p95_ms"]:.1f} ms, '
+                f'premier {resultat["premier_ms"]:.1f} ms, {resultat["requetes"]} requêtes'
+                + (f', {resultat["n_plus_un"]} N+1' if resultat['n_plus_un'] else '')
+                + (f' (HTTP {resultat["statut"]})' if resultat['statut'] >= 400 else '')
+            )
+
+        try:
+            resultats = lancer(
+                iterations=max(options['iterations'], 1),
+                noms=options['scenario'],
+                ecriture=not options['lecture_seule'],
+                journal=journal,
+            )
+        except LookupError as e:
+            raise CommandError(str(e))
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                json.dump(resultats, fichier, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Résultats écrits dans {options["sortie"]}')
+
+        if options['comparer']:
+            with open(options['comparer'], encoding='utf-8') as fichier:
+                precedents = json.load(fichier)
+            for nom, (ecart, requetes) in comparer(precedents, resultats).items():
+                self.stdout.write(f'{nom} : {ecart:+.1f} % de temps moyen, {requetes:+d} requêtes')
+
+        self.stdout.write(self.style.SUCCESS(f'{len(resultats["resultats"])} scénario(s) mesuré(s)'))
+
+    def comparer_serveurs(self, options):
+        try:
+            resultats = concurrence(
+                options['concurrence'], requetes=max(options['requetes'], 1),
+                simultanees=max(options['simultanees'], 1), threads=max(options['threads'], 1),
+            )
+        except LookupError as e:
+            raise CommandError(str(e))
+
+        for serveur in ('wsgi', 'asgi'):
+            resultat = resultats[serveur]
+            self.stdout.write(
+                f'{serveur.upper()} : {resultat["requetes_par_s"]} requêtes/s, médiane {resultat["mediane_ms"]:.1f} ms, '
+                f'p95 {resultat["p95_ms"]:.1f} ms' + (f', {resultat["erreurs"]} erreur(s)' if resultat['erreurs'] else '')
+            )
+
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                json.dump(resultats, fichier, indent=2, ensure_ascii=False)
+            self.stdout.write(f'Résultats écrits dans {options["sortie"]}')
+
+        self.stdout.write(self.style.SUCCESS(f'{resultats["url"]} mesuré sous WSGI et ASGI'))
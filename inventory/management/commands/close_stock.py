@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.cloture_stock import cloturer_stock, purger_clotures_journalieres
+
+
+class Command(BaseCommand):
+    help = 'Enregistre la clôture de stock (quantité et valeur par produit) à la fin d\'une journée ou d\'un mois'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Date de clôture AAAA-MM-JJ (par défaut : hier, ou fin du mois dernier avec --mensuel)')
+        parser.add_argument('--mensuel', action='store_true', help='Clôture mensuelle (conservée sans limite de durée)')
+        parser.add_argument(
+            '--sans-purge', action='store_true',
+            help='Ne pas supprimer les clôtures journalières au-delà de CLOTURE_STOCK_RETENTION_JOURS'
+        )
+
+    def handle(self, *args, **options):
+        aujourd_hui = timezone.localdate()
+        if options['date']:
+            try:
+                jour = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Date invalide, format attendu : AAAA-MM-JJ')
+        elif options['mensuel']:
+            jour = aujourd_hui.replace(day=1) - datetime.timedelta(days=1)
+        else:
+            jour = aujourd_hui - datetime.timedelta(days=1)
+
+        cloture = cloturer_stock(jour, 'MOIS' if options['mensuel'] else 'JOUR')
+        self.stdout.write(self.style.SUCCESS(
+            f'{cloture} : {cloture.instantanes.count()} produit(s), '
+            f'{cloture.quantite_totale} unité(s), valeur {cloture.valeur_totale} F CFA'
+        ))
+
+        if not options['sans_purge']:
+            supprimees = purger_clotures_journalieres(aujourd_hui)
+            if supprimees:
+                self.stdout.write(f'{supprimees} clôture(s) journalière(s) ancienne(s) supprimée(s)')
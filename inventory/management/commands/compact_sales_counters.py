@@ -0,0 +1,27 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.compteurs_ventes import compacter, reconstruire
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs de ventes par produit (fenêtres de 7, 30 et 90 jours) et purge les cumuls journaliers expirés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reconstruire', action='store_true',
+            help='Recalcule aussi les cumuls journaliers depuis les lignes de vente'
+        )
+        parser.add_argument('--date', help='Jour de référence AAAA-MM-JJ (par défaut : aujourd\'hui)')
+
+    def handle(self, *args, **options):
+        jour = None
+        if options['date']:
+            try:
+                jour = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Date invalide : {options['date']} (format attendu AAAA-MM-JJ)")
+
+        nombre = reconstruire(jour) if options['reconstruire'] else compacter(jour)
+        self.stdout.write(self.style.SUCCESS(f'Compteurs de ventes recalculés pour {nombre} produit(s)'))
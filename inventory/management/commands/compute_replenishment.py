@@ -0,0 +1,46 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.reapprovisionnement import calculer, creer_brouillons
+
+
+class Command(BaseCommand):
+    help = 'Calcule les points de commande et les quantités à commander à partir des sorties de stock'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Jour de référence AAAA-MM-JJ (par défaut : aujourd\'hui)')
+        parser.add_argument(
+            '--seuils', action='store_true',
+            help='Remplace le seuil d\'alerte des produits ayant assez d\'historique par le point de commande'
+        )
+        parser.add_argument(
+            '--brouillons', action='store_true',
+            help='Crée une commande fournisseur brouillon par fournisseur ayant des produits à commander'
+        )
+        parser.add_argument('--utilisateur', help='Nom de l\'utilisateur auteur des brouillons')
+
+    def handle(self, *args, **options):
+        jour = None
+        if options['date']:
+            try:
+                jour = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Date invalide : {options['date']} (format attendu AAAA-MM-JJ)")
+        utilisateur = None
+        if options['utilisateur']:
+            utilisateur = User.objects.filter(username=options['utilisateur']).first()
+            if utilisateur is None:
+                raise CommandError(f"Utilisateur inconnu : {options['utilisateur']}")
+
+        self.stdout.write('Calcul des suggestions de réapprovisionnement...')
+        resultat = calculer(jour, seuils=options['seuils'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultat.produits} produit(s) analysé(s), {resultat.a_commander} à commander'
+            + (f', {resultat.seuils} seuil(s) d\'alerte mis à jour' if options['seuils'] else '')
+        ))
+
+        if options['brouillons']:
+            commandes = creer_brouillons(utilisateur)
+            self.stdout.write(self.style.SUCCESS(f'{len(commandes)} commande(s) fournisseur brouillon créée(s)'))
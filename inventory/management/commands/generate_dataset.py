@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.donnees_synthetiques import ECHELLES, MOT_DE_PASSE, UTILISATEURS, echelle, generer
+
+
+class Command(BaseCommand):
+    help = 'Génère un jeu de données synthétique volumineux et reproductible (bulk_create, graine fixe)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--echelle', choices=sorted(ECHELLES), default='petite',
+            help='Volumes prédéfinis (grande : 100 000 produits, 1 000 000 mouvements, 200 000 ventes)'
+        )
+        parser.add_argument('--graine', type=int, default=42, help='Graine du générateur (par défaut : 42)')
+        parser.add_argument('--jours', type=int, help="Période couverte par les dates, en jours (par défaut : 365)")
+        for volume in ('produits', 'clients', 'mouvements', 'ventes', 'commandes', 'devis', 'prospects', 'appareils'):
+            parser.add_argument(f'--{volume}', type=int, help=f'Nombre de {volume} (remplace la valeur de l\'échelle)')
+
+    def handle(self, *args, **options):
+        volumes = echelle(options['echelle'], **{
+            cle: options[cle]
+            for cle in ('produits', 'clients', 'mouvements', 'ventes', 'commandes', 'devis', 'prospects', 'appareils', 'jours')
+        })
+        self.stdout.write(f'Génération ({options["echelle"]}, graine {options["graine"]}) : {volumes}')
+
+        debut = time.perf_counter()
+        try:
+            generer(volumes, options['graine'], journal=self.stdout.write)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Données générées en {time.perf_counter() - debut:.1f} s. '
+            f'Comptes : {", ".join(UTILISATEURS.values())} (mot de passe {MOT_DE_PASSE})'
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from inventory.cumuls_clients import reconstruire
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les cumuls de tous les clients (chiffre d\'affaires, commandes, devis en cours)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recalcul des cumuls clients...')
+        nombre = reconstruire()
+        self.stdout.write(self.style.SUCCESS(f'Cumuls recalculés pour {nombre} client(s)'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from inventory.statistiques import reconstruire_statistiques
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les statistiques pré-calculées du tableau de bord (globales et par utilisateur)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recalcul des statistiques du tableau de bord...')
+        nombre = reconstruire_statistiques()
+        self.stdout.write(self.style.SUCCESS(f'Statistiques recalculées pour {nombre} utilisateur(s)'))
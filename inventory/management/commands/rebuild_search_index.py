@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from inventory.recherche import backend, reconstruire_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des produits et des clients"
+
+    def handle(self, *args, **options):
+        mode = backend()
+        if mode != 'fts5':
+            self.stdout.write(f"Backend de recherche '{mode}' : aucun index à reconstruire")
+            return
+        nombre = reconstruire_index()
+        self.stdout.write(self.style.SUCCESS(f'{nombre} objet(s) indexé(s)'))
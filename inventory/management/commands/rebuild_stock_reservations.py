@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from inventory.reservations import reconstruire
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les réservations et les quantités réservées des produits à partir des lignes des commandes confirmées'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recalcul des quantités réservées...')
+        nombre = reconstruire()
+        self.stdout.write(self.style.SUCCESS(f'Quantités réservées corrigées pour {nombre} produit(s)'))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q, F
+
+from inventory.models import Commande, Vente, Devis
+
+
+DOCUMENTS = {
+    'commande': Commande,
+    'vente': Vente,
+    'devis': Devis,
+}
+
+
+class Command(BaseCommand):
+    help = 'Recalcule en SQL les totaux des commandes, ventes et devis à partir de leurs lignes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--document', choices=sorted(DOCUMENTS), action='append',
+            help='Type de document à traiter (par défaut : tous)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Affiche le nombre de totaux incorrects sans les corriger'
+        )
+
+    def handle(self, *args, **options):
+        for nom in options['document'] or sorted(DOCUMENTS):
+            model = DOCUMENTS[nom]
+            incorrects = model.objects.annotate(
+                total_calcule=model.expression_total()
+            ).filter(~Q(total=F('total_calcule')))
+
+            with transaction.atomic():
+                nombre = incorrects.count()
+                if nombre and not options['dry_run']:
+                    # Une seule requête UPDATE ... SET total = (SELECT SUM(...)) par type de document
+                    model.objects.filter(pk__in=incorrects.values('pk')).update(total=model.expression_total())
+
+            if options['dry_run']:
+                self.stdout.write(f'{model._meta.verbose_name_plural} : {nombre} total(aux) incorrect(s)')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model._meta.verbose_name_plural} : {nombre} total(aux) corrigé(s)'
+                ))
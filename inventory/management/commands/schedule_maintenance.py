@@ -0,0 +1,44 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.maintenance_preventive import planifier, Planificateur
+
+
+class Command(BaseCommand):
+    help = 'Crée à l\'avance les interventions de maintenance préventive des appareils et les répartit entre les techniciens'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, help='Horizon de planification en jours (par défaut : MAINTENANCE_HORIZON_JOURS)')
+        parser.add_argument('--date', help='Jour de référence AAAA-MM-JJ (par défaut : aujourd\'hui)')
+        parser.add_argument(
+            '--boucle', action='store_true',
+            help='Reste actif et replanifie toutes les MAINTENANCE_PLANIFICATION_INTERVALLE secondes'
+        )
+        parser.add_argument('--intervalle', type=int, help='Intervalle de la boucle en secondes')
+
+    def handle(self, *args, **options):
+        if options['boucle']:
+            self.stdout.write('Planification périodique des maintenances préventives (Ctrl+C pour arrêter)...')
+            planificateur = Planificateur(options['intervalle'])
+            try:
+                planificateur.run()
+            except KeyboardInterrupt:
+                planificateur.arreter()
+            return
+
+        jour = None
+        if options['date']:
+            try:
+                jour = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError(f"Date invalide : {options['date']} (format attendu AAAA-MM-JJ)")
+
+        resultat = planifier(jour, options['jours'])
+        if not resultat.interventions:
+            self.stdout.write(self.style.WARNING('Aucune intervention planifiée'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultat.interventions} intervention(s) planifiée(s) pour {resultat.appareils} appareil(s), '
+            f'réparties entre {len(resultat.par_technicien)} technicien(s)'
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:44
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_prospectiontelephonique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueTableauBord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=100, unique=True)),
+                ('donnees', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('perime', models.BooleanField(default=False)),
+                ('date_calcul', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Statistique du tableau de bord',
+                'verbose_name_plural': 'Statistiques du tableau de bord',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_statistiquetableaubord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=50, unique=True)),
+                ('valeur', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Compteur de documents',
+                'verbose_name_plural': 'Compteurs de documents',
+            },
+        ),
+        migrations.AlterField(
+            model_name='commande',
+            name='numero_commande',
+            field=models.CharField(blank=True, max_length=50, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='vente',
+            name='numero_vente',
+            field=models.CharField(blank=True, max_length=50, unique=True),
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_compteurdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appareilvendu',
+            index=models.Index(fields=['prochaine_maintenance_preventive'], name='appareil_maintenance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appareilvendu',
+            index=models.Index(fields=['technicien_responsable', 'prochaine_maintenance_preventive'], name='appareil_tech_maint_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['-date_commande'], name='commande_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['statut', '-date_commande'], name='commande_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['client', '-date_commande'], name='commande_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commande',
+            index=models.Index(fields=['utilisateur', '-date_commande'], name='commande_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devis',
+            index=models.Index(fields=['-date_creation'], name='devis_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devis',
+            index=models.Index(fields=['commercial', 'statut', '-date_creation'], name='devis_com_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interventionsav',
+            index=models.Index(fields=['date_prevue'], name='intervention_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interventionsav',
+            index=models.Index(fields=['statut', 'date_prevue'], name='intervention_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interventionsav',
+            index=models.Index(fields=['technicien', 'statut', 'date_prevue'], name='intervention_tech_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementstock',
+            index=models.Index(fields=['-date_mouvement'], name='mouvement_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementstock',
+            index=models.Index(fields=['produit', '-date_mouvement'], name='mouvement_produit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouvementstock',
+            index=models.Index(fields=['utilisateur', '-date_mouvement'], name='mouvement_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('actif', True), ('quantite_stock__gt', 0)), fields=['-date_creation'], name='produit_catalogue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('actif', True), ('quantite_stock__lte', models.F('seuil_alerte'))), fields=['quantite_stock'], name='produit_stock_bas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospect',
+            index=models.Index(fields=['commercial', 'statut', '-date_derniere_interaction'], name='prospect_com_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospectiontelephonique',
+            index=models.Index(fields=['-date_creation'], name='prospection_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospectiontelephonique',
+            index=models.Index(fields=['statut', '-date_creation'], name='prospection_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prospectiontelephonique',
+            index=models.Index(fields=['commercial', 'statut', '-date_creation'], name='prospection_com_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfertstock',
+            index=models.Index(fields=['-date_creation'], name='transfert_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transfertstock',
+            index=models.Index(fields=['statut', '-date_creation'], name='transfert_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vente',
+            index=models.Index(fields=['-date_vente'], name='vente_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vente',
+            index=models.Index(fields=['client', '-date_vente'], name='vente_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vente',
+            index=models.Index(fields=['utilisateur', '-date_vente'], name='vente_user_date_idx'),
+        ),
+    ]
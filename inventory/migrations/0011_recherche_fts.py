@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+# Tables virtuelles FTS5 : sans accents (remove_diacritics), index de préfixes 2 et 3 caractères
+TABLES_FTS = {
+    'inventory_produit_fts': ('inventory_produit', ['nom', 'reference', 'code_barre', 'description']),
+    'inventory_client_fts': ('inventory_client', ['nom', 'prenom', 'email', 'telephone', 'entreprise']),
+}
+
+
+def creer_tables_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table_fts, (table, champs) in TABLES_FTS.items():
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {table_fts} USING fts5("
+                    f"{', '.join(champs)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+            except Exception:
+                # SQLite compilé sans FTS5 : la recherche reste en mode icontains
+                return
+            source = ', '.join(f"COALESCE({champ}, '')" for champ in champs)
+            cursor.execute(
+                f"INSERT INTO {table_fts} (rowid, {', '.join(champs)}) SELECT id, {source} FROM {table}"
+            )
+
+
+def supprimer_tables_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table_fts in TABLES_FTS:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_index_listes'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_tables_fts, supprimer_tables_fts),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_recherche_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClotureStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('periodicite', models.CharField(choices=[('JOUR', 'Journalière'), ('MOIS', 'Mensuelle')], default='JOUR', max_length=10)),
+                ('quantite_totale', models.IntegerField(default=0)),
+                ('valeur_totale', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('date_calcul', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Clôture de stock',
+                'verbose_name_plural': 'Clôtures de stock',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InstantaneStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField()),
+                ('prix_achat', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valeur', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('cloture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instantanes', to='inventory.cloturestock')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instantanes_stock', to='inventory.produit')),
+            ],
+            options={
+                'verbose_name': 'Instantané de stock',
+                'verbose_name_plural': 'Instantanés de stock',
+                'constraints': [models.UniqueConstraint(fields=('cloture', 'produit'), name='instantane_cloture_produit_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_cloture_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurVentesProduit',
+            fields=[
+                ('produit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compteur_ventes', serialize=False, to='inventory.produit')),
+                ('quantite_7j', models.IntegerField(default=0)),
+                ('quantite_30j', models.IntegerField(default=0)),
+                ('quantite_90j', models.IntegerField(default=0)),
+                ('ca_7j', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ca_30j', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ca_90j', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('date_compactage', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur de ventes',
+                'verbose_name_plural': 'Compteurs de ventes',
+                'indexes': [models.Index(fields=['-quantite_7j'], name='compteur_ventes_7j_idx'), models.Index(fields=['-quantite_30j'], name='compteur_ventes_30j_idx'), models.Index(fields=['-quantite_90j'], name='compteur_ventes_90j_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VenteProduitJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('quantite', models.IntegerField(default=0)),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_par_jour', to='inventory.produit')),
+            ],
+            options={
+                'verbose_name': "Ventes d'un produit par jour",
+                'verbose_name_plural': 'Ventes des produits par jour',
+                'indexes': [models.Index(fields=['jour'], name='vente_produit_jour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('produit', 'jour'), name='vente_produit_jour_uniq')],
+            },
+        ),
+    ]
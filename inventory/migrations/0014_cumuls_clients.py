@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_compteurs_ventes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulClient',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cumul', serialize=False, to='inventory.client')),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_ventes', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('nombre_ventes', models.IntegerField(default=0)),
+                ('total_commandes', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('nombre_commandes', models.IntegerField(default=0)),
+                ('date_dernier_achat', models.DateTimeField(blank=True, null=True)),
+                ('montant_devis_ouverts', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('nombre_devis_ouverts', models.IntegerField(default=0)),
+                ('date_calcul', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Cumul client',
+                'verbose_name_plural': 'Cumuls clients',
+                'indexes': [models.Index(fields=['-chiffre_affaires'], name='cumul_client_ca_idx'), models.Index(fields=['-date_dernier_achat'], name='cumul_client_achat_idx')],
+            },
+        ),
+    ]
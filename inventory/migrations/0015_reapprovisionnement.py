@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:28
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_cumuls_clients'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fournisseur',
+            name='delai_livraison_jours',
+            field=models.PositiveIntegerField(default=14, verbose_name='Délai de livraison (jours)'),
+        ),
+        migrations.CreateModel(
+            name='CommandeFournisseur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_commande', models.CharField(blank=True, max_length=50, unique=True)),
+                ('statut', models.CharField(choices=[('BROUILLON', 'Brouillon'), ('ENVOYEE', 'Envoyée'), ('RECUE', 'Reçue'), ('ANNULEE', 'Annulée')], default='BROUILLON', max_length=20)),
+                ('date_commande', models.DateTimeField(auto_now_add=True)),
+                ('notes', models.TextField(blank=True)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('fournisseur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commandes', to='inventory.fournisseur')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Commande fournisseur',
+                'verbose_name_plural': 'Commandes fournisseurs',
+                'ordering': ['-date_commande'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LigneCommandeFournisseur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+                ('prix_unitaire', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('commande', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='inventory.commandefournisseur')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes_commande_fournisseur', to='inventory.produit')),
+            ],
+            options={
+                'verbose_name': 'Ligne de commande fournisseur',
+                'verbose_name_plural': 'Lignes de commande fournisseur',
+            },
+        ),
+        migrations.CreateModel(
+            name='SuggestionReappro',
+            fields=[
+                ('produit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reappro', serialize=False, to='inventory.produit')),
+                ('demande_hebdo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ecart_type_hebdo', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('semaines', models.IntegerField(default=0)),
+                ('point_commande', models.IntegerField(default=0)),
+                ('stock_cible', models.IntegerField(default=0)),
+                ('stock_previsionnel', models.IntegerField(default=0)),
+                ('quantite_suggeree', models.IntegerField(default=0)),
+                ('date_calcul', models.DateTimeField()),
+                ('fournisseur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suggestions_reappro', to='inventory.fournisseur')),
+            ],
+            options={
+                'verbose_name': 'Suggestion de réapprovisionnement',
+                'verbose_name_plural': 'Suggestions de réapprovisionnement',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='commandefournisseur',
+            index=models.Index(fields=['fournisseur', 'statut'], name='commande_fourn_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suggestionreappro',
+            index=models.Index(condition=models.Q(('quantite_suggeree__gt', 0)), fields=['fournisseur'], name='reappro_a_commander_idx'),
+        ),
+    ]
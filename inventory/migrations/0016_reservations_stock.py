@@ -0,0 +1,88 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:57
+
+import django.core.validators
+import django.db.models.deletion
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def reserver_commandes_confirmees(apps, schema_editor):
+    """Réservations des commandes déjà confirmées ; les commandes expédiées ou livrées ont déjà quitté le stock"""
+    Commande = apps.get_model('inventory', 'Commande')
+    LigneCommande = apps.get_model('inventory', 'LigneCommande')
+    Produit = apps.get_model('inventory', 'Produit')
+    ReservationStock = apps.get_model('inventory', 'ReservationStock')
+
+    Commande.objects.filter(statut__in=('EXPEDIEE', 'LIVREE')).update(stock_expedie=True)
+
+    lignes = LigneCommande.objects.filter(commande__statut='CONFIRMEE').values(
+        'commande_id', 'produit_id'
+    ).annotate(quantite=Sum('quantite')).order_by()
+    ReservationStock.objects.bulk_create([
+        ReservationStock(commande_id=ligne['commande_id'], produit_id=ligne['produit_id'], quantite=ligne['quantite'])
+        for ligne in lignes
+    ], batch_size=500)
+
+    reservees = ReservationStock.objects.values('produit_id').annotate(total=Sum('quantite')).order_by()
+    for ligne in reservees:
+        Produit.objects.filter(pk=ligne['produit_id']).update(quantite_reservee=ligne['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_reapprovisionnement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField(validators=[django.core.validators.MinValueValidator(1)])),
+            ],
+            options={
+                'verbose_name': 'Réservation de stock',
+                'verbose_name_plural': 'Réservations de stock',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='produit',
+            name='produit_catalogue_idx',
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='stock_expedie',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='quantite_reservee',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='reservationstock',
+            name='commande',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory.commande'),
+        ),
+        migrations.AddField(
+            model_name='reservationstock',
+            name='produit',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory.produit'),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='quantite_disponible',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('quantite_stock'), '-', models.F('quantite_reservee')), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(condition=models.Q(('actif', True), ('quantite_disponible__gt', 0)), fields=['-date_creation'], name='produit_catalogue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservationstock',
+            constraint=models.UniqueConstraint(fields=('commande', 'produit'), name='reservation_commande_produit_uniq'),
+        ),
+        migrations.RunPython(reserver_commandes_confirmees, migrations.RunPython.noop),
+    ]
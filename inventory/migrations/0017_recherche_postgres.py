@@ -0,0 +1,82 @@
+from django.db import migrations, transaction
+
+
+# Colonnes calculées par PostgreSQL (GENERATED ... STORED) : tenues à jour à chaque
+# écriture, bulk_create compris, sans signal ni table annexe
+# table -> (champs de poids A, champs de poids B)
+TABLES_RECHERCHE = {
+    'inventory_produit': (['nom', 'reference'], ['code_barre', 'description']),
+    'inventory_client': (['nom', 'prenom', 'entreprise'], ['email', 'telephone']),
+}
+
+
+def _concatener(champs):
+    # concat_ws n'est pas IMMUTABLE : refusé dans une colonne calculée
+    return " || ' ' || ".join(f"COALESCE({champ}, '')" for champ in champs)
+
+
+def creer_index_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        # Point de sauvegarde : sans droit sur les extensions, la migration passe et
+        # la recherche reste en mode icontains
+        with transaction.atomic(using=schema_editor.connection.alias):
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception:
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        # Configuration 'french' qui retire les accents avant la racinisation
+        cursor.execute("CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = pg_catalog.french)")
+        cursor.execute(
+            "ALTER TEXT SEARCH CONFIGURATION french_unaccent "
+            "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem"
+        )
+        # unaccent() n'est que STABLE : enveloppe IMMUTABLE pour la colonne calculée du repli trigrammes
+        cursor.execute(
+            "CREATE OR REPLACE FUNCTION inventory_unaccent(text) RETURNS text "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+            "AS $$ SELECT unaccent('unaccent'::regdictionary, $1) $$"
+        )
+        for table, (champs_a, champs_b) in TABLES_RECHERCHE.items():
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN recherche_vecteur tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('french_unaccent', {_concatener(champs_a)}), 'A') || "
+                f"setweight(to_tsvector('french_unaccent', {_concatener(champs_b)}), 'B')"
+                f") STORED"
+            )
+            cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN recherche_texte text GENERATED ALWAYS AS ("
+                f"lower(inventory_unaccent({_concatener(champs_a + champs_b)}))"
+                f") STORED"
+            )
+            cursor.execute(f"CREATE INDEX {table}_recherche_gin ON {table} USING gin (recherche_vecteur)")
+            cursor.execute(
+                f"CREATE INDEX {table}_recherche_trgm ON {table} USING gin (recherche_texte gin_trgm_ops)"
+            )
+
+
+def supprimer_index_postgres(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES_RECHERCHE:
+            # Les index disparaissent avec leurs colonnes
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS recherche_texte")
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS recherche_vecteur")
+        cursor.execute("DROP FUNCTION IF EXISTS inventory_unaccent(text)")
+        cursor.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS french_unaccent")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_reservations_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index_postgres, supprimer_index_postgres),
+    ]
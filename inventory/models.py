@@ -1,10 +1,29 @@
 from django.db import models
+from django.db.models import Sum, F, Value, OuterRef, Subquery, ExpressionWrapper, DecimalField
+from django.db.models.functions import Coalesce, Round
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 from decimal import Decimal
 from datetime import date
 
 
+MONTANT = DecimalField(max_digits=10, decimal_places=2)
+
+
+def somme_lignes(model_ligne, champ_document, montant):
+    """
+    Sous-requête SQL sommant `montant` sur les lignes du document courant
+    (OuterRef('pk')), 0 si le document n'a aucune ligne.
+    """
+    lignes = model_ligne.objects.filter(**{champ_document: OuterRef('pk')}).order_by().values(champ_document)
+    return Coalesce(
+        Subquery(lignes.annotate(somme=Sum(ExpressionWrapper(montant, output_field=MONTANT))).values('somme')),
+        Value(Decimal('0')),
+        output_field=MONTANT
+    )
+
+
 class Categorie(models.Model):
     nom = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
@@ -26,6 +45,8 @@ class Fournisseur(models.Model):
     ville = models.CharField(max_length=50)
     code_postal = models.CharField(max_length=10)
     pays = models.CharField(max_length=50, default="France")
+    # Délai entre la commande et la réception, pour les points de commande (inventory/reapprovisionnement.py)
+    delai_livraison_jours = models.PositiveIntegerField(default=14, verbose_name="Délai de livraison (jours)")
     date_creation = models.DateTimeField(auto_now_add=True)
     actif = models.BooleanField(default=True)
 
@@ -47,6 +68,14 @@ class Produit(models.Model):
     prix_achat = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     prix_vente = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(Decimal('0.01'))])
     quantite_stock = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Quantité retenue par les commandes confirmées, et stock encore disponible à la vente
+    # (colonne calculée par la base, voir inventory/reservations.py)
+    quantite_reservee = models.IntegerField(default=0, editable=False)
+    quantite_disponible = models.GeneratedField(
+        expression=models.F('quantite_stock') - models.F('quantite_reservee'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
     seuil_alerte = models.IntegerField(default=10, validators=[MinValueValidator(0)])
     image = models.ImageField(upload_to='produits/', blank=True, null=True)
     actif = models.BooleanField(default=True)
@@ -56,10 +85,35 @@ class Produit(models.Model):
     class Meta:
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
+        indexes = [
+            # Index partiels : le filtre actif=True est rendu comme une colonne booléenne nue,
+            # qu'un index composite (actif, quantite_disponible) ne peut pas exploiter
+            models.Index(
+                fields=['-date_creation'],
+                condition=models.Q(actif=True, quantite_disponible__gt=0),
+                name='produit_catalogue_idx'
+            ),
+            # Produits en alerte (dashboard, stock_list, filtre stock bas)
+            models.Index(
+                fields=['quantite_stock'],
+                condition=models.Q(actif=True, quantite_stock__lte=models.F('seuil_alerte')),
+                name='produit_stock_bas_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nom} - {self.reference}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._categorie_id_charge = instance.__dict__.get('categorie_id')
+        return instance
+
+    def categories_catalogue(self):
+        """Catégories dont les pages du catalogue dépendent du produit : l'actuelle et celle lue en base"""
+        return {getattr(self, '_categorie_id_charge', None), self.categorie_id} - {None}
+
     def is_stock_bas(self):
         return self.quantite_stock <= self.seuil_alerte
 
@@ -70,6 +124,16 @@ class Produit(models.Model):
     def valeur_stock(self):
         return self.quantite_stock * self.prix_achat
 
+    def save(self, *args, **kwargs):
+        # quantite_reservee n'est écrite que par inventory/reservations.py : une fiche
+        # lue avant une confirmation de commande ne la remet pas à son ancienne valeur
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and not f.generated and f.name != 'quantite_reservee'
+            ]
+        super().save(*args, **kwargs)
+
 
 class MouvementStock(models.Model):
     TYPE_MOUVEMENT_CHOICES = [
@@ -93,6 +157,11 @@ class MouvementStock(models.Model):
         verbose_name = "Mouvement de Stock"
         verbose_name_plural = "Mouvements de Stock"
         ordering = ['-date_mouvement']
+        indexes = [
+            models.Index(fields=['-date_mouvement'], name='mouvement_date_idx'),
+            models.Index(fields=['produit', '-date_mouvement'], name='mouvement_produit_date_idx'),
+            models.Index(fields=['utilisateur', '-date_mouvement'], name='mouvement_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.produit.nom} - {self.type_mouvement} - {self.quantite}"
@@ -124,7 +193,24 @@ class Client(models.Model):
         return f"{self.prenom} {self.nom}"
 
 
-class Commande(models.Model):
+class DocumentClient:
+    """
+    Retient le client lu en base : un document qui change de client fait aussi
+    recalculer les cumuls de l'ancien client (voir inventory/cumuls_clients.py)
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._client_id_charge = instance.__dict__.get('client_id')
+        return instance
+
+    def clients_cumuls(self):
+        """Clients dont les cumuls dépendent du document : l'actuel et celui lu en base"""
+        return {getattr(self, '_client_id_charge', None), self.client_id}
+
+
+class Commande(DocumentClient, models.Model):
     STATUT_CHOICES = [
         ('EN_ATTENTE', 'En attente'),
         ('CONFIRMEE', 'Confirmée'),
@@ -133,7 +219,7 @@ class Commande(models.Model):
         ('ANNULEE', 'Annulée'),
     ]
 
-    numero_commande = models.CharField(max_length=50, unique=True)
+    numero_commande = models.CharField(max_length=50, unique=True, blank=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
     date_commande = models.DateTimeField(auto_now_add=True)
@@ -142,20 +228,62 @@ class Commande(models.Model):
     notes = models.TextField(blank=True)
     utilisateur = models.ForeignKey(User, on_delete=models.CASCADE)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Sorties de stock enregistrées à l'expédition (voir inventory/reservations.py)
+    stock_expedie = models.BooleanField(default=False, editable=False)
 
     class Meta:
         verbose_name = "Commande"
         verbose_name_plural = "Commandes"
         ordering = ['-date_commande']
+        indexes = [
+            models.Index(fields=['-date_commande'], name='commande_date_idx'),
+            models.Index(fields=['statut', '-date_commande'], name='commande_statut_date_idx'),
+            models.Index(fields=['client', '-date_commande'], name='commande_client_date_idx'),
+            models.Index(fields=['utilisateur', '-date_commande'], name='commande_user_date_idx'),
+        ]
 
     def __str__(self):
         return f"Commande {self.numero_commande} - {self.client.nom_complet}"
 
+    @staticmethod
+    def expression_total():
+        """Total calculé en SQL à partir des lignes (utilisable dans update/annotate)"""
+        return Round(somme_lignes(LigneCommande, 'commande', F('quantite') * F('prix_unitaire')), 2, output_field=MONTANT)
+
     def calculer_total(self):
-        total = sum([ligne.sous_total() for ligne in self.lignecommande_set.all()])
-        self.total = total
-        self.save()
-        return total
+        Commande.objects.filter(pk=self.pk).update(total=Commande.expression_total())
+        self.refresh_from_db(fields=['total'])
+        # UPDATE sans signal : cumuls du client recalculés ici
+        from .cumuls_clients import actualiser
+        actualiser(*self.clients_cumuls())
+        # Lignes enregistrées : réservations de stock ajustées
+        from .reservations import synchroniser
+        synchroniser(self)
+        return self.total
+
+    def save(self, *args, **kwargs):
+        if not self.numero_commande:
+            # Générer automatiquement le numéro de commande
+            from .numerotation import numero_document
+            self.numero_commande = numero_document(Commande, 'numero_commande', 'CMD', separateur='-', largeur=5)
+        super().save(*args, **kwargs)
+
+
+class ReservationStock(models.Model):
+    """Quantité d'un produit retenue par une commande confirmée (voir inventory/reservations.py)"""
+    commande = models.ForeignKey(Commande, on_delete=models.CASCADE, related_name='reservations')
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='reservations')
+    quantite = models.IntegerField(validators=[MinValueValidator(1)])
+
+    class Meta:
+        verbose_name = "Réservation de stock"
+        verbose_name_plural = "Réservations de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['commande', 'produit'], name='reservation_commande_produit_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.produit} : {self.quantite} pour {self.commande.numero_commande}"
 
 
 class LigneCommande(models.Model):
@@ -175,7 +303,7 @@ class LigneCommande(models.Model):
         return self.quantite * self.prix_unitaire
 
 
-class Vente(models.Model):
+class Vente(DocumentClient, models.Model):
     MODE_PAIEMENT_CHOICES = [
         ('ESPECES', 'Espèces'),
         ('CARTE', 'Carte bancaire'),
@@ -184,7 +312,7 @@ class Vente(models.Model):
         ('CREDIT', 'Crédit'),
     ]
 
-    numero_vente = models.CharField(max_length=50, unique=True)
+    numero_vente = models.CharField(max_length=50, unique=True, blank=True)
     client = models.ForeignKey(Client, on_delete=models.CASCADE, blank=True, null=True)
     mode_paiement = models.CharField(max_length=20, choices=MODE_PAIEMENT_CHOICES)
     date_vente = models.DateTimeField(auto_now_add=True)
@@ -197,17 +325,37 @@ class Vente(models.Model):
         verbose_name = "Vente"
         verbose_name_plural = "Ventes"
         ordering = ['-date_vente']
+        indexes = [
+            models.Index(fields=['-date_vente'], name='vente_date_idx'),
+            models.Index(fields=['client', '-date_vente'], name='vente_client_date_idx'),
+            models.Index(fields=['utilisateur', '-date_vente'], name='vente_user_date_idx'),
+        ]
 
     def __str__(self):
         client_info = f" - {self.client.nom_complet}" if self.client else " - Vente comptoir"
         return f"Vente {self.numero_vente}{client_info}"
 
+    @staticmethod
+    def expression_total():
+        """Total calculé en SQL à partir des lignes, remise globale déduite"""
+        sous_total = somme_lignes(LigneVente, 'vente', F('quantite') * F('prix_unitaire'))
+        return Round(sous_total - sous_total * F('remise') / Value(100), 2, output_field=MONTANT)
+
     def calculer_total(self):
-        sous_total = sum([ligne.sous_total() for ligne in self.lignevente_set.all()])
-        self.total = sous_total - (sous_total * self.remise / 100)
-        self.save()
+        Vente.objects.filter(pk=self.pk).update(total=Vente.expression_total())
+        self.refresh_from_db(fields=['total'])
+        # UPDATE sans signal : cumuls du client recalculés ici
+        from .cumuls_clients import actualiser
+        actualiser(*self.clients_cumuls())
         return self.total
 
+    def save(self, *args, **kwargs):
+        if not self.numero_vente:
+            # Générer automatiquement le numéro de vente
+            from .numerotation import numero_document
+            self.numero_vente = numero_document(Vente, 'numero_vente', 'VTE', separateur='-', largeur=5)
+        super().save(*args, **kwargs)
+
 
 class LigneVente(models.Model):
     vente = models.ForeignKey(Vente, on_delete=models.CASCADE)
@@ -228,7 +376,7 @@ class LigneVente(models.Model):
 
 # ========== NOUVEAUX MODÈLES POUR EXTENSION BIOMÉDICALE ==========
 
-class Devis(models.Model):
+class Devis(DocumentClient, models.Model):
     STATUT_CHOICES = [
         ('BROUILLON', 'Brouillon'),
         ('ENVOYE', 'Envoyé'),
@@ -251,27 +399,33 @@ class Devis(models.Model):
         verbose_name = "Devis"
         verbose_name_plural = "Devis"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['-date_creation'], name='devis_date_idx'),
+            models.Index(fields=['commercial', 'statut', '-date_creation'], name='devis_com_statut_date_idx'),
+        ]
 
     def __str__(self):
         return f"Devis {self.numero_devis} - {self.client.nom_complet}"
 
+    @staticmethod
+    def expression_total():
+        """Total calculé en SQL à partir des lignes, remise de chaque ligne déduite"""
+        montant_brut = F('quantite') * F('prix_unitaire')
+        return Round(somme_lignes(LigneDevis, 'devis', montant_brut - montant_brut * F('remise') / Value(100)), 2, output_field=MONTANT)
+
     def calculer_total(self):
-        total = sum([ligne.sous_total() for ligne in self.lignedevis_set.all()])
-        self.total = total
-        self.save()
-        return total
+        Devis.objects.filter(pk=self.pk).update(total=Devis.expression_total())
+        self.refresh_from_db(fields=['total'])
+        # UPDATE sans signal : cumuls du client recalculés ici
+        from .cumuls_clients import actualiser
+        actualiser(*self.clients_cumuls())
+        return self.total
 
     def save(self, *args, **kwargs):
         if not self.numero_devis:
             # Générer automatiquement le numéro de devis
-            from datetime import datetime
-            année = datetime.now().year
-            dernier_devis = Devis.objects.filter(numero_devis__startswith=f'DEV{année}').order_by('numero_devis').last()
-            if dernier_devis:
-                numero = int(dernier_devis.numero_devis[-4:]) + 1
-            else:
-                numero = 1
-            self.numero_devis = f'DEV{année}{numero:04d}'
+            from .numerotation import numero_document
+            self.numero_devis = numero_document(Devis, 'numero_devis', 'DEV')
         super().save(*args, **kwargs)
 
 
@@ -323,6 +477,9 @@ class Prospect(models.Model):
         verbose_name = "Prospect"
         verbose_name_plural = "Prospects"
         ordering = ['-date_derniere_interaction']
+        indexes = [
+            models.Index(fields=['commercial', 'statut', '-date_derniere_interaction'], name='prospect_com_statut_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nom} {self.prenom} - {self.entreprise}"
@@ -395,6 +552,10 @@ class AppareilVendu(models.Model):
         verbose_name = "Appareil Vendu"
         verbose_name_plural = "Appareils Vendus"
         ordering = ['prochaine_maintenance_preventive']
+        indexes = [
+            models.Index(fields=['prochaine_maintenance_preventive'], name='appareil_maintenance_idx'),
+            models.Index(fields=['technicien_responsable', 'prochaine_maintenance_preventive'], name='appareil_tech_maint_idx'),
+        ]
 
     def __str__(self):
         return f"{self.produit.nom} ({self.numero_serie}) - {self.client.nom_complet}"
@@ -445,6 +606,11 @@ class InterventionSAV(models.Model):
         verbose_name = "Intervention SAV"
         verbose_name_plural = "Interventions SAV"
         ordering = ['date_prevue']
+        indexes = [
+            models.Index(fields=['date_prevue'], name='intervention_date_idx'),
+            models.Index(fields=['statut', 'date_prevue'], name='intervention_statut_date_idx'),
+            models.Index(fields=['technicien', 'statut', 'date_prevue'], name='intervention_tech_statut_idx'),
+        ]
 
     def __str__(self):
         return f"{self.numero_intervention} - {self.appareil} - {self.get_type_intervention_display()}"
@@ -452,14 +618,8 @@ class InterventionSAV(models.Model):
     def save(self, *args, **kwargs):
         if not self.numero_intervention:
             # Générer automatiquement le numéro d'intervention
-            from datetime import datetime
-            année = datetime.now().year
-            derniere_intervention = InterventionSAV.objects.filter(numero_intervention__startswith=f'INT{année}').order_by('numero_intervention').last()
-            if derniere_intervention:
-                numero = int(derniere_intervention.numero_intervention[-4:]) + 1
-            else:
-                numero = 1
-            self.numero_intervention = f'INT{année}{numero:04d}'
+            from .numerotation import numero_document
+            self.numero_intervention = numero_document(InterventionSAV, 'numero_intervention', 'INT')
         
         # Assigner automatiquement le client depuis l'appareil si pas déjà défini
         if self.appareil and not self.client:
@@ -497,6 +657,10 @@ class TransfertStock(models.Model):
         verbose_name = "Transfert de Stock"
         verbose_name_plural = "Transferts de Stock"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['-date_creation'], name='transfert_date_idx'),
+            models.Index(fields=['statut', '-date_creation'], name='transfert_statut_date_idx'),
+        ]
 
     def __str__(self):
         return f"Transfert {self.numero_transfert} - {self.produit.nom} x{self.quantite}"
@@ -504,14 +668,8 @@ class TransfertStock(models.Model):
     def save(self, *args, **kwargs):
         if not self.numero_transfert:
             # Générer automatiquement le numéro de transfert
-            from datetime import datetime
-            année = datetime.now().year
-            dernier_transfert = TransfertStock.objects.filter(numero_transfert__startswith=f'TRA{année}').order_by('numero_transfert').last()
-            if dernier_transfert:
-                numero = int(dernier_transfert.numero_transfert[-4:]) + 1
-            else:
-                numero = 1
-            self.numero_transfert = f'TRA{année}{numero:04d}'
+            from .numerotation import numero_document
+            self.numero_transfert = numero_document(TransfertStock, 'numero_transfert', 'TRA')
         super().save(*args, **kwargs)
 
 
@@ -568,6 +726,11 @@ class ProspectionTelephonique(models.Model):
         verbose_name = "Prospection Téléphonique"
         verbose_name_plural = "Prospections Téléphoniques"
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['-date_creation'], name='prospection_date_idx'),
+            models.Index(fields=['statut', '-date_creation'], name='prospection_statut_date_idx'),
+            models.Index(fields=['commercial', 'statut', '-date_creation'], name='prospection_com_statut_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nom_complet} - {self.get_statut_display()} ({self.get_type_appel_display()})"
@@ -586,3 +749,224 @@ class ProspectionTelephonique(models.Model):
         """Retourne le badge HTML complet pour le statut"""
         couleur = self.get_couleur_statut()
         return f'<span class="px-2 py-1 rounded-full text-xs font-semibold {couleur}">{self.get_statut_display()}</span>'
+
+
+class StatistiqueTableauBord(models.Model):
+    """Instantané pré-calculé des statistiques du tableau de bord (global ou par utilisateur)"""
+    cle = models.CharField(max_length=100, unique=True)
+    donnees = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    perime = models.BooleanField(default=False)
+    date_calcul = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Statistique du tableau de bord"
+        verbose_name_plural = "Statistiques du tableau de bord"
+
+    def __str__(self):
+        return f"{self.cle} ({self.date_calcul:%d/%m/%Y %H:%M})"
+
+
+class CompteurDocument(models.Model):
+    """Compteur de numérotation des documents (une ligne par préfixe et par année)"""
+    cle = models.CharField(max_length=50, unique=True)
+    valeur = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Compteur de documents"
+        verbose_name_plural = "Compteurs de documents"
+
+    def __str__(self):
+        return f"{self.cle} : {self.valeur}"
+
+
+class ClotureStock(models.Model):
+    """Clôture de stock : état du stock à la fin d'une journée ou d'un mois (voir inventory/cloture_stock.py)"""
+    PERIODICITE_CHOICES = [
+        ('JOUR', 'Journalière'),
+        ('MOIS', 'Mensuelle'),
+    ]
+
+    date = models.DateField(unique=True)
+    periodicite = models.CharField(max_length=10, choices=PERIODICITE_CHOICES, default='JOUR')
+    quantite_totale = models.IntegerField(default=0)
+    valeur_totale = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    date_calcul = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Clôture de stock"
+        verbose_name_plural = "Clôtures de stock"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Clôture du {self.date:%d/%m/%Y} ({self.get_periodicite_display()})"
+
+
+class InstantaneStock(models.Model):
+    """Stock et valeur d'un produit à la date d'une clôture (produits à stock nul omis)"""
+    cloture = models.ForeignKey(ClotureStock, on_delete=models.CASCADE, related_name='instantanes')
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='instantanes_stock')
+    quantite = models.IntegerField()
+    prix_achat = models.DecimalField(max_digits=10, decimal_places=2)
+    valeur = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Instantané de stock"
+        verbose_name_plural = "Instantanés de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['cloture', 'produit'], name='instantane_cloture_produit_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.produit} : {self.quantite} au {self.cloture.date:%d/%m/%Y}"
+
+
+class VenteProduitJour(models.Model):
+    """Quantité vendue et chiffre d'affaires d'un produit sur une journée (voir inventory/compteurs_ventes.py)"""
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='ventes_par_jour')
+    jour = models.DateField()
+    quantite = models.IntegerField(default=0)
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Ventes d'un produit par jour"
+        verbose_name_plural = "Ventes des produits par jour"
+        constraints = [
+            models.UniqueConstraint(fields=['produit', 'jour'], name='vente_produit_jour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['jour'], name='vente_produit_jour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.produit} : {self.quantite} le {self.jour:%d/%m/%Y}"
+
+
+class CompteurVentesProduit(models.Model):
+    """Ventes glissantes d'un produit sur 7, 30 et 90 jours (popularité)"""
+    produit = models.OneToOneField(Produit, on_delete=models.CASCADE, primary_key=True, related_name='compteur_ventes')
+    quantite_7j = models.IntegerField(default=0)
+    quantite_30j = models.IntegerField(default=0)
+    quantite_90j = models.IntegerField(default=0)
+    ca_7j = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ca_30j = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ca_90j = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    date_compactage = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Compteur de ventes"
+        verbose_name_plural = "Compteurs de ventes"
+        indexes = [
+            models.Index(fields=['-quantite_7j'], name='compteur_ventes_7j_idx'),
+            models.Index(fields=['-quantite_30j'], name='compteur_ventes_30j_idx'),
+            models.Index(fields=['-quantite_90j'], name='compteur_ventes_90j_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.produit} : {self.quantite_30j} vendu(s) sur 30 jours"
+
+
+class CumulClient(models.Model):
+    """Cumuls d'un client : ventes, commandes et devis en cours (voir inventory/cumuls_clients.py)"""
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True, related_name='cumul')
+    # Ventes + commandes non annulées
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_ventes = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nombre_ventes = models.IntegerField(default=0)
+    total_commandes = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nombre_commandes = models.IntegerField(default=0)
+    date_dernier_achat = models.DateTimeField(null=True, blank=True)
+    montant_devis_ouverts = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    nombre_devis_ouverts = models.IntegerField(default=0)
+    date_calcul = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Cumul client"
+        verbose_name_plural = "Cumuls clients"
+        indexes = [
+            models.Index(fields=['-chiffre_affaires'], name='cumul_client_ca_idx'),
+            models.Index(fields=['-date_dernier_achat'], name='cumul_client_achat_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.client} : {self.chiffre_affaires} F CFA"
+
+
+class SuggestionReappro(models.Model):
+    """Point de commande et quantité à commander d'un produit, calculés sur l'historique des sorties (voir inventory/reapprovisionnement.py)"""
+    produit = models.OneToOneField(Produit, on_delete=models.CASCADE, primary_key=True, related_name='reappro')
+    fournisseur = models.ForeignKey(Fournisseur, on_delete=models.CASCADE, related_name='suggestions_reappro')
+    # Sorties par semaine sur l'historique du produit
+    demande_hebdo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    ecart_type_hebdo = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    semaines = models.IntegerField(default=0)
+    point_commande = models.IntegerField(default=0)
+    stock_cible = models.IntegerField(default=0)
+    # Stock + quantités en commande chez le fournisseur (brouillons et commandes envoyées)
+    stock_previsionnel = models.IntegerField(default=0)
+    quantite_suggeree = models.IntegerField(default=0)
+    date_calcul = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Suggestion de réapprovisionnement"
+        verbose_name_plural = "Suggestions de réapprovisionnement"
+        indexes = [
+            models.Index(
+                fields=['fournisseur'],
+                condition=models.Q(quantite_suggeree__gt=0),
+                name='reappro_a_commander_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.produit} : commander {self.quantite_suggeree} sous {self.point_commande}"
+
+
+class CommandeFournisseur(models.Model):
+    STATUT_CHOICES = [
+        ('BROUILLON', 'Brouillon'),
+        ('ENVOYEE', 'Envoyée'),
+        ('RECUE', 'Reçue'),
+        ('ANNULEE', 'Annulée'),
+    ]
+
+    numero_commande = models.CharField(max_length=50, unique=True, blank=True)
+    fournisseur = models.ForeignKey(Fournisseur, on_delete=models.CASCADE, related_name='commandes')
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='BROUILLON')
+    date_commande = models.DateTimeField(auto_now_add=True)
+    notes = models.TextField(blank=True)
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Commande fournisseur"
+        verbose_name_plural = "Commandes fournisseurs"
+        ordering = ['-date_commande']
+        indexes = [
+            models.Index(fields=['fournisseur', 'statut'], name='commande_fourn_statut_idx'),
+        ]
+
+    def __str__(self):
+        return f"Commande fournisseur {self.numero_commande} - {self.fournisseur.nom}"
+
+    def save(self, *args, **kwargs):
+        if not self.numero_commande:
+            from .numerotation import numero_document
+            self.numero_commande = numero_document(CommandeFournisseur, 'numero_commande', 'CF', separateur='-', largeur=5)
+        super().save(*args, **kwargs)
+
+
+class LigneCommandeFournisseur(models.Model):
+    commande = models.ForeignKey(CommandeFournisseur, on_delete=models.CASCADE, related_name='lignes')
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='lignes_commande_fournisseur')
+    quantite = models.IntegerField(validators=[MinValueValidator(1)])
+    prix_unitaire = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Ligne de commande fournisseur"
+        verbose_name_plural = "Lignes de commande fournisseur"
+
+    def __str__(self):
+        return f"{self.produit.nom} x {self.quantite}"
+
+    def sous_total(self):
+        return self.quantite * self.prix_unitaire
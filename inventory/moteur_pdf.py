@@ -0,0 +1,882 @@
+"""
+Moteur de rendu ReportLab des documents (factures, proformas, bons)
+
+Les feuilles de styles, les styles de tableaux et le logo sont construits une
+seule fois par processus (lru_cache) au lieu d'être recréés à chaque requête.
+Chaque type de document est décrit par une Disposition : une liste déclarative
+de blocs (texte, espace, tableau, bloc conditionnel, logo) évalués sur un
+contexte (document, lignes chargées en une requête, client, numéro, date).
+
+    pdf = rendre('proforma', contexte_commande(commande))
+
+Le temps de rendu et la mémoire de chaque disposition se mesurent avec
+`python manage.py benchmark_pdf`.
+"""
+
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+from io import BytesIO
+from typing import Callable
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch, cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+
+from .models import Commande, Vente
+from .cache_pdf import document_pdf, lignes_document
+
+
+# Company information for all documents - Style DIMAT MEDICAL
+COMPANY_INFO = {
+    'name': 'DIMAT MEDICAL',
+    'subtitle': 'CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE',
+    'address': '123 Rue Médicale, 75000 Paris, France',
+    'phone': '+33 1 23 45 67 89',
+    'fax': '+33 1 23 45 67 90',
+    'email': 'contact@dimatmedical.com',
+    'website': 'www.dimatmedical.com',
+    'siret': 'SIRET: 123 456 789 00012',
+    'vat': 'TVA: FR12123456789',
+    'logo_path': os.path.join('static', 'images', 'logo.png'),
+}
+
+
+# ================== RESSOURCES PARTAGÉES (UNE FOIS PAR PROCESSUS) ==================
+
+@lru_cache(maxsize=None)
+def feuille_styles():
+    """Styles de paragraphes de tous les documents (les polices sont les Helvetica standard)"""
+    base = getSampleStyleSheet()
+    styles = {
+        'normal': base['Normal'],
+        'titre_2': base['Heading2'],
+        'titre_3': base['Heading3'],
+    }
+
+    def ajouter(nom, parent, **options):
+        styles[nom] = ParagraphStyle(nom, parent=base[parent], **options)
+
+    # Documents standards (en-tête société et pied de page)
+    ajouter('doc_titre', 'Heading1', fontSize=18, spaceAfter=20, textColor=colors.HexColor('#1e3a8a'))
+    ajouter('doc_sous_titre', 'Heading2', fontSize=14, spaceAfter=15, textColor=colors.HexColor('#1e3a8a'))
+    ajouter('doc_normal', 'Normal', fontSize=10, spaceAfter=8)
+    ajouter('doc_pied', 'Normal', fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
+
+    # Modèle DIMAT MEDICAL (proformas, bon de livraison)
+    ajouter('dimat_societe', 'Normal', fontSize=16, fontName='Helvetica-Bold', alignment=TA_LEFT, spaceAfter=5)
+    ajouter('dimat_sous_titre', 'Normal', fontSize=10, alignment=TA_LEFT, spaceAfter=10)
+    ajouter('dimat_titre', 'Heading1', fontSize=20, fontName='Helvetica-Bold', alignment=TA_CENTER, spaceAfter=20)
+    ajouter('dimat_proforma', 'Heading1', fontSize=18, fontName='Helvetica-Bold', alignment=TA_CENTER, spaceAfter=20)
+    ajouter('dimat_pied', 'Normal', fontSize=9, alignment=TA_CENTER, spaceAfter=5)
+    ajouter('dimat_pied_2', 'Normal', fontSize=8, alignment=TA_CENTER, textColor=colors.HexColor('#666666'))
+    ajouter('dimat_conditions', 'Normal', fontSize=8, alignment=TA_JUSTIFY)
+
+    # Facture de vente détaillée
+    ajouter('vente_titre', 'Heading1', fontSize=24, spaceAfter=20, textColor=colors.HexColor('#059669'),
+            alignment=TA_CENTER, fontName='Helvetica-Bold')
+    ajouter('vente_societe', 'Normal', fontSize=14, textColor=colors.HexColor('#059669'),
+            fontName='Helvetica-Bold', alignment=TA_CENTER, spaceAfter=5)
+    ajouter('vente_contact', 'Normal', fontSize=10, alignment=TA_CENTER, spaceAfter=20)
+    ajouter('vente_section', 'Heading2', fontSize=14, textColor=colors.HexColor('#374151'), spaceAfter=15)
+    ajouter('vente_rubrique', 'Heading3', fontSize=12, textColor=colors.HexColor('#374151'), spaceAfter=10)
+    ajouter('vente_conditions', 'Normal', fontSize=9, textColor=colors.HexColor('#6b7280'))
+    ajouter('vente_merci', 'Heading3', fontSize=14, textColor=colors.HexColor('#059669'), alignment=TA_CENTER)
+    ajouter('vente_genere', 'Normal', fontSize=8, textColor=colors.HexColor('#9ca3af'), alignment=TA_CENTER)
+
+    # Fiches simples GGSTOCK
+    ajouter('simple_titre', 'Heading1', fontSize=24, spaceAfter=30, alignment=TA_CENTER,
+            textColor=colors.HexColor('#007bff'))
+    return styles
+
+
+@lru_cache(maxsize=None)
+def styles_tableaux():
+    """Styles de tableaux, construits une seule fois"""
+    return {
+        'societe': TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        'libelles': TableStyle([
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        'facture_a': TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        'detail_facture': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -4), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -4), colors.HexColor('#f3f4f6')),
+            ('BACKGROUND', (0, -3), (-1, -1), colors.HexColor('#e5e7eb')),
+            ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        'dimat_entete': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('BOX', (2, 0), (3, 2), 1, colors.black),
+            ('GRID', (2, 0), (3, 2), 0.5, colors.black),
+        ]),
+        'dimat_infos': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ]),
+        'dimat_livraison': TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+            # Corps du tableau
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),  # Référence à gauche
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),  # Désignation à gauche
+            ('ALIGN', (2, 1), (-1, -1), 'CENTER'),  # Qte et observation centrées
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ]),
+        'dimat_visa': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        'dimat_client_date': TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ]),
+        'dimat_proforma': TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (0, 1), (0, -2), 'LEFT'),  # Description à gauche
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+            ('TOPPADDING', (0, 0), (-1, 0), 10),
+            # Corps du tableau
+            ('FONTSIZE', (0, 1), (-1, -2), 10),
+            ('GRID', (0, 0), (-1, -2), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 1), (-1, -1), 8),
+            # Ligne de total
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f0f0f0')),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 12),
+            ('GRID', (0, -1), (-1, -1), 1, colors.black),
+        ]),
+        'dimat_garantie': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#e0e0e0')),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 10),
+        ]),
+        'vente_infos': TableStyle([
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ]),
+        'vente_detail': TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            # Corps du tableau
+            ('FONTSIZE', (0, 1), (-1, -5), 8),
+            ('ALIGN', (1, 1), (-1, -5), 'CENTER'),  # Centrer sauf première colonne
+            ('ALIGN', (0, 1), (0, -5), 'LEFT'),    # Première colonne à gauche
+            ('GRID', (0, 0), (-1, -5), 0.5, colors.HexColor('#d1d5db')),
+            # Ligne vide avant totaux
+            ('LINEBELOW', (0, -5), (-1, -5), 1, colors.HexColor('#059669')),
+            # Section totaux
+            ('FONTNAME', (0, -4), (-1, -1), 'Helvetica-Bold'),
+            ('ALIGN', (0, -4), (-1, -1), 'RIGHT'),
+            ('FONTSIZE', (0, -4), (-1, -1), 10),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f3f4f6')),
+            ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#059669')),
+        ]),
+        'simple_infos': TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]),
+        'simple_lignes_vente': TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            # Corps
+            ('FONTNAME', (0, 1), (-1, -4), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -4), 9),
+            ('GRID', (0, 0), (-1, -4), 1, colors.black),
+            # Totaux
+            ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+        ]),
+        'simple_lignes_commande': TableStyle([
+            # En-tête
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            # Corps
+            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -2), 9),
+            ('GRID', (0, 0), (-1, -2), 1, colors.black),
+            # Total
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
+            ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
+        ]),
+    }
+
+
+@lru_cache(maxsize=None)
+def logo():
+    """Octets du logo, lus et validés une seule fois (None si absent ou illisible)"""
+    chemin = os.path.join(settings.BASE_DIR, COMPANY_INFO['logo_path'])
+    try:
+        with open(chemin, 'rb') as fichier:
+            donnees = fichier.read()
+        ImageReader(BytesIO(donnees)).getSize()
+    except Exception:
+        return None
+    return donnees
+
+
+# ================== BLOCS ==================
+
+def valeur(source, ctx):
+    return source(ctx) if callable(source) else source
+
+
+@dataclass
+class Texte:
+    contenu: object  # texte ou callable(ctx) -> texte
+    style: str
+
+    def flowables(self, ctx, styles):
+        return [Paragraph(valeur(self.contenu, ctx), styles[self.style])]
+
+
+@dataclass
+class Espace:
+    hauteur: float
+
+    def flowables(self, ctx, styles):
+        return [Spacer(1, self.hauteur)]
+
+
+@dataclass
+class Tableau:
+    donnees: Callable  # callable(ctx, styles) -> lignes du tableau
+    largeurs: list
+    style: str
+    hauteurs: list = None
+
+    def flowables(self, ctx, styles):
+        table = Table(self.donnees(ctx, styles), colWidths=self.largeurs, rowHeights=self.hauteurs)
+        table.setStyle(styles_tableaux()[self.style])
+        return [table]
+
+
+@dataclass
+class Si:
+    condition: Callable  # callable(ctx) -> bool
+    blocs: list
+    sinon: list = field(default_factory=list)
+
+    def flowables(self, ctx, styles):
+        resultat = []
+        for bloc in (self.blocs if self.condition(ctx) else self.sinon):
+            resultat.extend(bloc.flowables(ctx, styles))
+        return resultat
+
+
+class Logo:
+    def flowables(self, ctx, styles):
+        donnees = logo()
+        if donnees is None:
+            return [Paragraph("Logo Placeholder", styles['doc_normal'])]
+        return [Image(BytesIO(donnees), width=1.5*inch, height=0.75*inch)]
+
+
+@dataclass
+class Disposition:
+    blocs: list
+    marges: dict = field(default_factory=dict)
+    pied_de_page: bool = False
+
+
+def pied_de_page(canvas, doc):
+    canvas.saveState()
+    footer_text = f"{COMPANY_INFO['name']} | {COMPANY_INFO['address']} | Tél: {COMPANY_INFO['phone']} | Email: {COMPANY_INFO['email']} | {COMPANY_INFO['siret']} | {COMPANY_INFO['vat']}"
+    footer = Paragraph(footer_text, feuille_styles()['doc_pied'])
+    footer.wrap(doc.width, doc.bottomMargin)
+    footer.drawOn(canvas, doc.leftMargin, doc.bottomMargin - 10)
+    canvas.restoreState()
+
+
+# ================== CONTEXTES ==================
+
+def contexte_commande(commande, lignes=None):
+    """Contexte de rendu d'une commande ; `lignes` peut être fourni déjà chargé"""
+    if lignes is None:
+        lignes = lignes_document(commande)
+    return {
+        'document': commande,
+        'numero': commande.numero_commande,
+        'date': commande.date_commande,
+        'client': commande.client,
+        'lignes': list(lignes),
+    }
+
+
+def contexte_vente(vente, lignes=None):
+    """Contexte de rendu d'une vente ; `lignes` peut être fourni déjà chargé"""
+    if lignes is None:
+        lignes = lignes_document(vente)
+    return {
+        'document': vente,
+        'numero': vente.numero_vente,
+        'date': vente.date_vente,
+        'client': vente.client,
+        'lignes': list(lignes),
+    }
+
+
+def a_lignes(ctx):
+    return bool(ctx['lignes'])
+
+
+def a_notes(ctx):
+    return bool(ctx['document'].notes)
+
+
+def nom_utilisateur(user):
+    return user.get_full_name() or user.username
+
+
+# ================== EN-TÊTE SOCIÉTÉ (DOCUMENTS STANDARDS) ==================
+
+def entete_societe(titre):
+    return [
+        Logo(),
+        Espace(10),
+        Texte(titre, 'doc_titre'),
+        Espace(10),
+        Tableau(lambda ctx, styles: [
+            [COMPANY_INFO['name']],
+            [COMPANY_INFO['address']],
+            [f"Tél: {COMPANY_INFO['phone']} | Email: {COMPANY_INFO['email']}"],
+            [f"{COMPANY_INFO['siret']} | {COMPANY_INFO['vat']}"]
+        ], [6*inch], 'societe'),
+        Espace(20),
+    ]
+
+
+# ================== FACTURE DE COMMANDE ==================
+
+def _facture_detail(ctx, styles):
+    data = [['Description', 'Qté', 'Prix unitaire HT', 'Total HT']]
+    subtotal = 0
+    for ligne in ctx['lignes']:
+        total_ligne = ligne.sous_total()
+        subtotal += total_ligne
+        data.append([
+            ligne.produit.nom,
+            str(ligne.quantite),
+            f"{ligne.prix_unitaire:.2f}F CFA",
+            f"{total_ligne:.2f}F CFA"
+        ])
+
+    tva_rate = Decimal('0.20')
+    tva_amount = subtotal * tva_rate
+    total_ttc = subtotal + tva_amount
+
+    data.append(['', '', 'Sous-total HT:', f"{subtotal:.2f}F CFA"])
+    data.append(['', '', f'TVA ({tva_rate*100:.0f}%):', f"{tva_amount:.2f}F CFA"])
+    data.append(['', '', 'TOTAL TTC:', f"{total_ttc:.2f}F CFA"])
+    return data
+
+
+def _date_livraison(commande):
+    return commande.date_livraison_prevue.strftime('%d/%m/%Y') if commande.date_livraison_prevue else 'Non définie'
+
+
+FACTURE_COMMANDE = Disposition(
+    marges={'rightMargin': 0.5*inch, 'leftMargin': 0.5*inch, 'topMargin': 0.5*inch, 'bottomMargin': 0.75*inch},
+    pied_de_page=True,
+    blocs=entete_societe("FACTURE") + [
+        Tableau(lambda ctx, styles: [
+            ['FACTURÉ À:'],
+            [ctx['client'].nom_complet],
+            [ctx['client'].email],
+            [ctx['client'].telephone or 'Non renseigné'],
+            [ctx['document'].adresse_livraison]
+        ], [6*inch], 'facture_a'),
+        Espace(20),
+        Tableau(lambda ctx, styles: [
+            ['Numéro de facture:', f"FACT-{ctx['numero']}"],
+            ['Date de facture:', ctx['date'].strftime('%d/%m/%Y')],
+            ['Numéro de commande:', ctx['numero']],
+            ['Date de livraison:', _date_livraison(ctx['document'])],
+        ], [2*inch, 4*inch], 'libelles'),
+        Espace(20),
+        Si(a_lignes, [
+            Texte("DÉTAIL DE LA FACTURE", 'doc_sous_titre'),
+            Espace(10),
+            Tableau(_facture_detail, [3*inch, 0.8*inch, 1.6*inch, 1.6*inch], 'detail_facture'),
+        ]),
+        Espace(20),
+        Texte("CONDITIONS DE PAIEMENT", 'doc_sous_titre'),
+        Texte("• Paiement à 30 jours fin de mois", 'doc_normal'),
+        Texte("• Escompte de 2% pour paiement à 8 jours", 'doc_normal'),
+        Texte("• Pénalités de retard : 3 fois le taux légal", 'doc_normal'),
+        Texte("• Indemnité forfaitaire de recouvrement : 40F CFA", 'doc_normal'),
+        Si(a_notes, [
+            Espace(20),
+            Texte("NOTES:", 'doc_sous_titre'),
+            Texte(lambda ctx: ctx['document'].notes, 'doc_normal'),
+        ]),
+    ],
+)
+
+
+# ================== MODÈLE DIMAT MEDICAL ==================
+
+MARGES_DIMAT = {'topMargin': 1*cm, 'bottomMargin': 2*cm}
+
+
+def _client_ou_comptoir(ctx, libelle='Client comptoir'):
+    return ctx['client'].nom_complet if ctx['client'] else libelle
+
+
+def _livraison_entete(ctx, styles):
+    commande = ctx['document']
+    return [
+        [Paragraph("DIMAT MEDICAL", styles['dimat_societe']), "", Paragraph("CODE CLIENT:", styles['normal']), commande.client.id if commande.client else ""],
+        [Paragraph("CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE", styles['dimat_sous_titre']), "", "", ""],
+        [Paragraph(f"Tél: {COMPANY_INFO['phone']} Fax: {COMPANY_INFO['fax']}", styles['normal']), "", Paragraph("DIVERS CLIENT", styles['normal']), ""],
+        [Paragraph(f"RC: 123456 - Email: {COMPANY_INFO['email']}", styles['normal']), "", "", ""]
+    ]
+
+
+def _livraison_lignes(ctx, styles):
+    data = [['Référence', 'Désignation', 'Qte', 'Observation']]
+    for ligne in ctx['lignes']:
+        data.append([
+            ligne.produit.reference or 'N/A',
+            ligne.produit.nom[:50] + '...' if len(ligne.produit.nom) > 50 else ligne.produit.nom,
+            str(ligne.quantite),
+            ""  # Observation vide par défaut
+        ])
+    return data
+
+
+CONDITIONS_LIVRAISON = """Conditions de ventes - La marchandise est sous la responsabilité du client dès la signature et le cachet du bon de livraison. Toutes les réclamations formulées après cette décharge ne seront pas prises en compte. Conformément à l'article 314 de l'Acte Uniforme du Droit Commercial Général, le transfert de propriété de la marchandise ne s'effectue qu'au jour du paiement complet et de toute satisfaction et notre propriété."""
+
+BON_LIVRAISON = Disposition(
+    marges=MARGES_DIMAT,
+    blocs=[
+        Tableau(_livraison_entete, [3*inch, 1*inch, 1.5*inch, 1.5*inch], 'dimat_entete'),
+        Espace(20),
+        Texte("BON DE LIVRAISON", 'dimat_titre'),
+        Espace(15),
+        Tableau(lambda ctx, styles: [
+            ["NUMERO", "DATE", "REFERENCE", "CLIENT SUIVI PAR:", "AFFAIRE/OBJECTIF"],
+            [ctx['numero'],
+             ctx['date'].strftime('%d/%m/%y'),
+             ctx['numero'],
+             nom_utilisateur(ctx['document'].utilisateur),
+             _client_ou_comptoir(ctx)]
+        ], [1.5*inch, 1.5*inch, 1.5*inch, 1.8*inch, 1.7*inch], 'dimat_infos'),
+        Espace(15),
+        Si(a_lignes, [
+            Tableau(_livraison_lignes, [1.5*inch, 3.5*inch, 1*inch, 2*inch], 'dimat_livraison'),
+            Espace(30),
+            Tableau(lambda ctx, styles: [["Cachet et Visa Client"], [""], [""], [""], [""]],
+                    [4*inch], 'dimat_visa',
+                    hauteurs=[0.4*inch, 0.6*inch, 0.6*inch, 0.6*inch, 0.6*inch]),
+        ]),
+        Espace(30),
+        Texte(CONDITIONS_LIVRAISON, 'dimat_conditions'),
+    ],
+)
+
+
+def _proforma_lignes(ctx, styles):
+    data = [['Description', 'Quantité', 'Prix unitaire', 'Prix Total']]
+    total_general = Decimal('0.00')
+    for ligne in ctx['lignes']:
+        total_ligne = ligne.prix_unitaire * ligne.quantite
+        total_general += total_ligne
+        data.append([
+            ligne.produit.nom,
+            str(ligne.quantite),
+            f"{ligne.prix_unitaire:.0f} 000",  # Style des prix dans l'image
+            f"{total_ligne:.0f} 000"
+        ])
+    data.append(['', 'TOTAL', '', f"{total_general:.0f} 000"])
+    return data
+
+
+PROFORMA = Disposition(
+    marges=MARGES_DIMAT,
+    blocs=[
+        Texte("DIMAT MEDICAL", 'dimat_societe'),
+        Texte("CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE", 'dimat_sous_titre'),
+        Espace(30),
+        Texte(lambda ctx: f"Proforma n° {ctx['numero']}", 'dimat_proforma'),
+        Espace(20),
+        Tableau(lambda ctx, styles: [[
+            f"Client: {_client_ou_comptoir(ctx)}",
+            f"DATE: {ctx['date'].strftime('%d/%m/%Y')}",
+        ]], [4*inch, 2*inch], 'dimat_client_date'),
+        Espace(30),
+        Si(a_lignes, [
+            Tableau(_proforma_lignes, [3*inch, 1.5*inch, 1.5*inch, 1.5*inch], 'dimat_proforma'),
+            Espace(30),
+        ]),
+        Tableau(lambda ctx, styles: [
+            ["Garantie 12 Mois"],
+            ["SAV Assuré"],
+            ["Validité de l'offre: 2 mois"]
+        ], [3*inch], 'dimat_garantie'),
+        Espace(30),
+        Texte("Route nationale en face EDK technologie Dakar - Tél : +221 33 833 03 17 - Email : info@dimatmedical.com", 'dimat_pied'),
+        Texte("Numéro compte CBAO : sn 01307 03816162A001 34/PC, SN DKR 2018-B-1833 - NINEA : 006890892 200", 'dimat_pied_2'),
+    ],
+)
+
+
+# ================== FACTURE DE VENTE DÉTAILLÉE ==================
+
+def _vente_infos(ctx, styles):
+    vente = ctx['document']
+    client = ctx['client']
+    if client:
+        entreprise = f"{client.entreprise}<br/>\n" if client.entreprise else ""
+        client_info = f"""
+        <b>FACTURER À:</b><br/>
+        {entreprise}{client.nom_complet}<br/>
+        {client.adresse if client.adresse else 'Adresse non renseignée'}<br/>
+        {client.code_postal or ''} {client.ville or ''}<br/>
+        Email: {client.email}<br/>
+        Tél: {client.telephone or 'Non renseigné'}
+        """
+    else:
+        client_info = """
+        <b>FACTURER À:</b><br/>
+        Client au comptoir<br/>
+        Vente directe
+        """
+
+    vente_info = f"""
+    <b>NUMÉRO:</b> {vente.numero_vente}<br/>
+    <b>DATE:</b> {vente.date_vente.strftime('%d/%m/%Y')}<br/>
+    <b>HEURE:</b> {vente.date_vente.strftime('%H:%M')}<br/>
+    <b>VENDEUR:</b> {nom_utilisateur(vente.utilisateur)}<br/>
+    <b>MODE DE PAIEMENT:</b> {vente.get_mode_paiement_display()}
+    """
+    return [[Paragraph(client_info, styles['normal']), Paragraph(vente_info, styles['normal'])]]
+
+
+def _vente_detail(ctx, styles):
+    data = [['Article', 'Réf.', 'Qté', 'Prix unit. HT', 'TVA', 'Prix unit. TTC', 'Total HT', 'Total TTC']]
+    total_ht = Decimal('0.00')
+    total_tva = Decimal('0.00')
+    total_ttc = Decimal('0.00')
+    taux_tva = Decimal('0.20')  # 20%
+
+    for ligne in ctx['lignes']:
+        prix_ht = ligne.prix_unitaire / (1 + taux_tva)
+        montant_tva = ligne.prix_unitaire - prix_ht
+        total_ligne_ht = prix_ht * ligne.quantite
+        total_ligne_ttc = ligne.prix_unitaire * ligne.quantite
+
+        total_ht += total_ligne_ht
+        total_tva += montant_tva * ligne.quantite
+        total_ttc += total_ligne_ttc
+
+        data.append([
+            ligne.produit.nom[:25] + '...' if len(ligne.produit.nom) > 25 else ligne.produit.nom,
+            ligne.produit.reference or 'N/A',
+            str(ligne.quantite),
+            f"{prix_ht:.2f}F CFA",
+            f"{taux_tva*100:.0f}%",
+            f"{ligne.prix_unitaire:.2f}F CFA",
+            f"{total_ligne_ht:.2f}F CFA",
+            f"{total_ligne_ttc:.2f}F CFA"
+        ])
+
+    data.append(['', '', '', '', '', '', '', ''])  # Ligne vide
+    data.append(['', '', '', '', '', 'TOTAL HT:', f"{total_ht:.2f}F CFA", ''])
+    data.append(['', '', '', '', '', 'TOTAL TVA:', f"{total_tva:.2f}F CFA", ''])
+    data.append(['', '', '', '', '', 'TOTAL TTC:', '', f"{total_ttc:.2f}F CFA"])
+    return data
+
+
+def _vente_paiement(ctx):
+    vente = ctx['document']
+    payment_info = f"""
+    <b>Mode de paiement:</b> {vente.get_mode_paiement_display()}<br/>
+    <b>Date de paiement:</b> {vente.date_vente.strftime('%d/%m/%Y')}<br/>
+    <b>Statut:</b> Payé
+    """
+    if vente.notes:
+        payment_info += f"<br/><b>Notes:</b> {vente.notes}"
+    return payment_info
+
+
+CONDITIONS_VENTE = """
+    • Les produits médicaux sont vendus conformément aux réglementations en vigueur.<br/>
+    • Garantie selon les conditions du fabricant.<br/>
+    • Retour possible sous 14 jours pour les produits non ouverts.<br/>
+    • Facturation TTC, TVA non applicable selon l'article 293 B du CGI.<br/>
+    • Paiement comptant à la livraison.
+    """
+
+FACTURE_VENTE = Disposition(
+    marges=MARGES_DIMAT,
+    blocs=[
+        Texte("GGStock", 'vente_societe'),
+        Texte("Système de Gestion d'Inventaire Médical", 'vente_contact'),
+        Texte("Email: contact@ggstock.com | Tél: +33 1 23 45 67 89", 'vente_contact'),
+        Espace(20),
+        Texte("FACTURE DE VENTE", 'vente_titre'),
+        Espace(15),
+        Tableau(_vente_infos, [4*inch, 3*inch], 'vente_infos'),
+        Espace(30),
+        Si(a_lignes, [
+            Texte("DÉTAIL DE LA VENTE", 'vente_section'),
+            Tableau(_vente_detail, [2.2*inch, 0.7*inch, 0.5*inch, 0.8*inch, 0.5*inch, 0.8*inch, 0.8*inch, 0.8*inch], 'vente_detail'),
+            Espace(30),
+        ]),
+        Texte("INFORMATIONS DE PAIEMENT", 'vente_rubrique'),
+        Texte(_vente_paiement, 'normal'),
+        Espace(30),
+        Texte("CONDITIONS GÉNÉRALES", 'vente_rubrique'),
+        Texte(CONDITIONS_VENTE, 'vente_conditions'),
+        Espace(40),
+        Texte("Merci de votre confiance !", 'vente_merci'),
+        # Date de la vente et non de l'impression : le PDF est servi depuis le cache disque
+        Texte(lambda ctx: f"Document établi le {ctx['date'].strftime('%d/%m/%Y')}", 'vente_genere'),
+    ],
+)
+
+
+# ================== FICHES SIMPLES GGSTOCK ==================
+
+def _lignes_simples(ctx):
+    data = [['Produit', 'Référence', 'Qté', 'Prix unitaire', 'Total']]
+    for ligne in ctx['lignes']:
+        data.append([
+            ligne.produit.nom,
+            ligne.produit.reference,
+            str(ligne.quantite),
+            f"{ligne.prix_unitaire:.2f} F CFA",
+            f"{ligne.sous_total():.2f} F CFA"
+        ])
+    return data
+
+
+def _lignes_simples_vente(ctx, styles):
+    vente = ctx['document']
+    data = _lignes_simples(ctx)
+    subtotal = sum(ligne.sous_total() for ligne in ctx['lignes'])
+    remise_amount = subtotal * vente.remise / 100
+    total = subtotal - remise_amount
+
+    data.append(['', '', '', 'Sous-total:', f"{subtotal:.2f} F CFA"])
+    if vente.remise > 0:
+        data.append(['', '', '', f'Remise ({vente.remise}%):', f"-{remise_amount:.2f} F CFA"])
+    data.append(['', '', '', 'TOTAL TTC:', f"{total:.2f} F CFA"])
+    return data
+
+
+def _lignes_simples_commande(ctx, styles):
+    data = _lignes_simples(ctx)
+    total = sum(ligne.sous_total() for ligne in ctx['lignes'])
+    data.append(['', '', '', 'TOTAL TTC:', f"{total:.2f} F CFA"])
+    return data
+
+
+def _infos_simples_commande(ctx, styles):
+    commande = ctx['document']
+    info_data = [
+        ['Numéro:', commande.numero_commande],
+        ['Date:', commande.date_commande.strftime('%d/%m/%Y %H:%M')],
+        ['Commercial:', nom_utilisateur(commande.utilisateur)],
+        ['Client:', commande.client.nom_complet],
+        ['Statut:', commande.get_statut_display()],
+    ]
+    if commande.date_livraison_prevue:
+        info_data.append(['Livraison prévue:', commande.date_livraison_prevue.strftime('%d/%m/%Y')])
+    return info_data
+
+
+FACTURE_VENTE_SIMPLE = Disposition(
+    blocs=[
+        Texte("GGSTOCK ENTERPRISE", 'simple_titre'),
+        Texte("FACTURE", 'titre_2'),
+        Espace(12),
+        Tableau(lambda ctx, styles: [
+            ['Numéro:', ctx['numero']],
+            ['Date:', ctx['date'].strftime('%d/%m/%Y %H:%M')],
+            ['Vendeur:', nom_utilisateur(ctx['document'].utilisateur)],
+            ['Client:', _client_ou_comptoir(ctx, 'VENTE COMPTOIR')],
+            ['Mode de paiement:', ctx['document'].get_mode_paiement_display()],
+        ], [2*inch, 3*inch], 'simple_infos'),
+        Espace(20),
+        Si(a_lignes,
+           [Tableau(_lignes_simples_vente, [2.5*inch, 1.5*inch, 0.8*inch, 1.2*inch, 1.2*inch], 'simple_lignes_vente')],
+           [Texte("Aucun produit dans cette vente", 'normal')]),
+        Espace(30),
+        Si(a_notes, [
+            Texte("Notes:", 'titre_3'),
+            Texte(lambda ctx: ctx['document'].notes, 'normal'),
+        ]),
+        Espace(50),
+        Texte("Merci pour votre confiance !", 'normal'),
+        Texte("GGSTOCK Enterprise - contact@ggstock.com", 'normal'),
+    ],
+)
+
+BON_COMMANDE_SIMPLE = Disposition(
+    blocs=[
+        Texte("GGSTOCK ENTERPRISE", 'simple_titre'),
+        Texte("BON DE COMMANDE", 'titre_2'),
+        Espace(12),
+        Tableau(_infos_simples_commande, [2*inch, 3*inch], 'simple_infos'),
+        Espace(20),
+        Si(lambda ctx: bool(ctx['document'].adresse_livraison), [
+            Texte("Adresse de livraison:", 'titre_3'),
+            Texte(lambda ctx: ctx['document'].adresse_livraison.replace('\n', '<br/>'), 'normal'),
+            Espace(12),
+        ]),
+        Si(a_lignes,
+           [Tableau(_lignes_simples_commande, [2.5*inch, 1.5*inch, 0.8*inch, 1.2*inch, 1.2*inch], 'simple_lignes_commande')],
+           [Texte("Aucun produit dans cette commande", 'normal')]),
+        Espace(30),
+        Si(a_notes, [
+            Texte("Notes et instructions:", 'titre_3'),
+            Texte(lambda ctx: ctx['document'].notes, 'normal'),
+        ]),
+        Espace(30),
+        Texte("Conditions:", 'titre_3'),
+        Texte("""
+        • Les délais de livraison sont donnés à titre indicatif<br/>
+        • Les prix sont valables au moment de la commande<br/>
+        • Toute modification doit être confirmée par écrit<br/>
+        • Signature requise à la livraison
+        """, 'normal'),
+        Espace(50),
+        Texte("GGSTOCK Enterprise - Votre partenaire de confiance", 'normal'),
+        Texte("contact@ggstock.com | +33 1 23 45 67 89", 'normal'),
+    ],
+)
+
+
+# Nom -> (disposition, modèles de documents acceptés)
+DISPOSITIONS = {
+    'facture_commande': (FACTURE_COMMANDE, (Commande,)),
+    'bon_livraison': (BON_LIVRAISON, (Commande,)),
+    'proforma': (PROFORMA, (Commande, Vente)),
+    'facture_vente': (FACTURE_VENTE, (Vente,)),
+    'facture_vente_simple': (FACTURE_VENTE_SIMPLE, (Vente,)),
+    'bon_commande_simple': (BON_COMMANDE_SIMPLE, (Commande,)),
+}
+
+
+# ================== RENDU ==================
+
+def rendre(nom, ctx):
+    """Rend la disposition `nom` pour le contexte donné et retourne les octets du PDF"""
+    disposition, _ = DISPOSITIONS[nom]
+    styles = feuille_styles()
+    story = []
+    for bloc in disposition.blocs:
+        story.extend(bloc.flowables(ctx, styles))
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, **disposition.marges)
+    if disposition.pied_de_page:
+        doc.build(story, onFirstPage=pied_de_page, onLaterPages=pied_de_page)
+    else:
+        doc.build(story)
+    return buffer.getvalue()
+
+
+def contexte(document, lignes=None):
+    if isinstance(document, Commande):
+        return contexte_commande(document, lignes)
+    return contexte_vente(document, lignes)
+
+
+# Documents de vente servis par le cache disque (inventory/cache_pdf.py)
+
+@document_pdf('facture_vente', Vente)
+def rendre_facture_vente(vente):
+    return rendre('facture_vente', contexte_vente(vente))
+
+
+@document_pdf('proforma_vente', Vente)
+def rendre_proforma_vente(vente):
+    return rendre('proforma', contexte_vente(vente))
+
+
+@document_pdf('facture_vente_simple', Vente)
+def rendre_facture_vente_simple(vente):
+    return rendre('facture_vente_simple', contexte_vente(vente))
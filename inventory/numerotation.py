@@ -0,0 +1,142 @@
+"""
+Numérotation atomique des documents (devis, interventions, transferts, commandes, ventes)
+
+Chaque séquence (ex. 'DEV2025') est une ligne de CompteurDocument verrouillée
+par select_for_update le temps de l'incrément : deux enregistrements
+concurrents ne peuvent pas obtenir le même numéro et aucune table de documents
+n'est parcourue.
+
+Avec NUMEROTATION_TAILLE_BLOC > 1, chaque processus réserve un bloc de numéros
+en une seule écriture et les distribue ensuite en mémoire. Les numéros d'un bloc
+non consommé sont perdus à l'arrêt du processus (trous dans la séquence), d'où
+une valeur par défaut de 1. Le bloc est réservé dans la transaction de
+l'appelant et n'est mis à disposition du processus qu'à sa validation
+(on_commit) : après un rollback, le compteur revient en arrière et aucun numéro
+du bloc annulé ne peut être distribué une seconde fois. D'ici là, les documents
+suivants de la même transaction puisent dans ce bloc plutôt que d'en réserver
+un nouveau.
+"""
+
+import re
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CompteurDocument
+
+
+# Blocs pré-alloués par processus : {cle: [prochain, dernier]}
+_blocs = {}
+_verrou = threading.Lock()
+
+
+def taille_bloc():
+    return max(1, getattr(settings, 'NUMEROTATION_TAILLE_BLOC', 1))
+
+
+def _amorce(model, champ, prefixe):
+    """Plus grand numéro déjà attribué pour ce préfixe (lu une seule fois, à la création du compteur)"""
+    numeros = model.objects.filter(**{f'{champ}__startswith': prefixe}).values_list(champ, flat=True)
+    valeurs = [int(m.group()) for m in (re.search(r'\d+$', n[len(prefixe):]) for n in numeros) if m]
+    return max(valeurs, default=0)
+
+
+def reserver(cle, quantite=1, amorce=None):
+    """
+    Réserve `quantite` numéros consécutifs pour la séquence `cle` et retourne le premier.
+
+    `amorce` est un callable appelé uniquement si le compteur n'existe pas encore,
+    pour repartir du dernier numéro déjà présent en base.
+    """
+    with transaction.atomic():
+        compteur = CompteurDocument.objects.select_for_update().filter(cle=cle).first()
+        if compteur is None:
+            compteur, _ = CompteurDocument.objects.get_or_create(
+                cle=cle, defaults={'valeur': amorce() if amorce else 0}
+            )
+            compteur = CompteurDocument.objects.select_for_update().get(pk=compteur.pk)
+        premier = compteur.valeur + 1
+        compteur.valeur += quantite
+        compteur.save(update_fields=['valeur'])
+    return premier
+
+
+def _publier(cle, prochain, dernier):
+    with _verrou:
+        _blocs[cle] = [prochain, dernier]
+
+
+class _BlocEnAttente:
+    """Reste d'un bloc réservé par la transaction en cours, publié à sa validation"""
+
+    def __init__(self, cle, prochain, dernier):
+        self.cle = cle
+        self.bloc = [prochain, dernier]
+
+    def __call__(self):
+        if self.bloc[0] <= self.bloc[1]:
+            _publier(self.cle, *self.bloc)
+
+
+def _bloc_en_attente(cle):
+    """
+    Bloc encore en attente de validation dans la transaction en cours.
+
+    Tant que la transaction n'est ni validée ni annulée, sa publication figure
+    dans les callbacks on_commit de la connexion ; un rollback (même partiel)
+    l'en retire avec la réservation.
+    """
+    connexion = transaction.get_connection()
+    if not connexion.in_atomic_block:
+        return None
+    for _, publication, _ in connexion.run_on_commit:
+        if isinstance(publication, _BlocEnAttente) and publication.cle == cle:
+            return publication.bloc
+    return None
+
+
+def prochain(cle, amorce=None):
+    """Prochain numéro de la séquence, servi depuis le bloc du processus si possible"""
+    taille = taille_bloc()
+    if taille == 1:
+        return reserver(cle, 1, amorce)
+
+    with _verrou:
+        bloc = _blocs.get(cle)
+        if bloc is not None and bloc[0] <= bloc[1]:
+            numero = bloc[0]
+            bloc[0] += 1
+            return numero
+
+    # Bloc déjà réservé plus tôt dans la même transaction : propre à la
+    # connexion (donc au thread), servi sans verrou ni nouvelle réservation
+    bloc = _bloc_en_attente(cle)
+    if bloc is not None and bloc[0] <= bloc[1]:
+        numero = bloc[0]
+        bloc[0] += 1
+        return numero
+
+    # Nouveau bloc : le premier numéro sert à l'appelant, le reste n'est
+    # distribué qu'une fois la réservation validée
+    premier = reserver(cle, taille, amorce)
+    transaction.on_commit(_BlocEnAttente(cle, premier + 1, premier + taille - 1))
+    return premier
+
+
+def numero_document(model, champ, prefixe, separateur='', largeur=4):
+    """
+    Génère le numéro suivant pour `model.champ`, au format
+    {prefixe}{separateur}{année}{separateur}{numéro sur `largeur` chiffres}.
+    """
+    base = f'{prefixe}{separateur}{timezone.localdate().year}{separateur}'
+    numero = prochain(base, amorce=lambda: _amorce(model, champ, base))
+    return f'{base}{numero:0{largeur}d}'
+
+
+def numeros(model, champ, prefixe, separateur, largeur, quantite):
+    """Réserve `quantite` numéros de la séquence du document en une écriture (même format que numero_document)"""
+    base = f'{prefixe}{separateur}{timezone.localdate().year}{separateur}'
+    premier = reserver(base, quantite, amorce=lambda: _amorce(model, champ, base))
+    return (f'{base}{numero:0{largeur}d}' for numero in range(premier, premier + quantite))
@@ -0,0 +1,301 @@
+"""
+Pagination par curseur (keyset) des pages de liste
+
+Paginator pagine avec OFFSET et compte toutes les lignes (COUNT(*)) à chaque
+page : les pages profondes parcourent toutes les lignes qui les précèdent. En
+mode curseur, une page est lue à partir de la dernière ligne affichée :
+    WHERE (date_vente, id) < (<date de la dernière vente>, <son id>)
+    ORDER BY date_vente DESC, id DESC LIMIT 21
+ce qui reste un parcours d'index quelle que soit la profondeur.
+
+Le tri est celui du queryset (ou l'ordering du modèle), complété par l'id
+pour départager les égalités. Le curseur transmis dans l'URL (?curseur=) est
+opaque et signé ; il contient le tri qui l'a produit, les valeurs de tri de
+la ligne de référence et le sens de lecture. Un curseur altéré ou produit
+par un autre tri (?sort= modifié) ramène à la première page.
+
+paginer() garde la pagination classique quand ?page= est fourni (liens
+existants, numéros de page) ou quand le tri ne s'y prête pas (relation,
+expression, champ nullable). Le total n'est calculé qu'à la demande, borné
+à PAGINATION_TOTAL_LIMITE lignes. apaginer() est l'équivalent pour les vues
+asynchrones.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+SEL = 'inventory.pagination'
+
+
+class CurseurInvalide(ValueError):
+    pass
+
+
+def limite_total():
+    return getattr(settings, 'PAGINATION_TOTAL_LIMITE', 1000)
+
+
+def compter(queryset, limite=None):
+    """(nombre, exact) : le comptage s'arrête à `limite` lignes"""
+    limite = limite or limite_total()
+    nombre = queryset.order_by()[:limite + 1].count()
+    return min(nombre, limite), nombre <= limite
+
+
+async def acompter(queryset, limite=None):
+    limite = limite or limite_total()
+    nombre = await queryset.order_by()[:limite + 1].acount()
+    return min(nombre, limite), nombre <= limite
+
+
+# ================== TRI ==================
+
+def ordre_keyset(queryset):
+    """
+    Champs de tri [(nom, descendant)] terminés par l'id, ou None si le tri
+    ne permet pas de pagination par curseur
+    """
+    ordre = list(queryset.query.order_by) or list(queryset.model._meta.ordering) or ['pk']
+    champs = []
+    for element in ordre:
+        if not isinstance(element, str) or '__' in element or element.lstrip('-') == '?':
+            return None
+        nom = element.lstrip('-')
+        nom = 'id' if nom == 'pk' else nom
+        if nom not in queryset.query.annotations:
+            try:
+                champ = queryset.model._meta.get_field(nom)
+            except FieldDoesNotExist:
+                return None
+            if champ.null or champ.is_relation:
+                return None
+        champs.append((nom, element.startswith('-')))
+    if champs[-1][0] != 'id' and all(nom != 'id' for nom, _ in champs):
+        champs.append(('id', champs[-1][1]))
+    return champs
+
+
+def condition_apres(champs, valeurs, inverse=False):
+    """Lignes situées après (ou avant avec inverse=True) les valeurs dans l'ordre `champs`"""
+    condition = Q()
+    egalites = {}
+    for (nom, descendant), valeur in zip(champs, valeurs):
+        operateur = 'lt' if descendant != inverse else 'gt'
+        condition |= Q(**egalites, **{f'{nom}__{operateur}': valeur})
+        egalites[nom] = valeur
+    return condition
+
+
+# ================== CURSEURS ==================
+
+def _serialiser(valeur):
+    if isinstance(valeur, (datetime, date)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return str(valeur)
+    return valeur
+
+
+def _tri(champs):
+    return [f'-{nom}' if descendant else nom for nom, descendant in champs]
+
+
+def encoder(valeurs, sens, champs):
+    return signing.dumps([sens, _tri(champs), [_serialiser(v) for v in valeurs]], salt=SEL, compress=True)
+
+
+def decoder(curseur, queryset, champs):
+    try:
+        sens, tri, valeurs = signing.loads(curseur, salt=SEL)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise CurseurInvalide(curseur)
+    # Curseur d'un autre tri : ses valeurs ne correspondent pas aux champs
+    if sens not in ('s', 'p') or tri != _tri(champs) or len(valeurs) != len(champs):
+        raise CurseurInvalide(curseur)
+    convertis = []
+    for (nom, _), valeur in zip(champs, valeurs):
+        if nom not in queryset.query.annotations:
+            try:
+                valeur = queryset.model._meta.get_field(nom).to_python(valeur)
+            except (ValidationError, InvalidOperation, ValueError, TypeError):
+                raise CurseurInvalide(curseur)
+        convertis.append(valeur)
+    return sens, convertis
+
+
+# ================== PAGES ==================
+
+class PageCurseur:
+    """Page lue par curseur ; s'itère comme une page de Paginator"""
+
+    est_curseur = True
+
+    def __init__(self, object_list, champs, has_next, has_previous, parametres, total=None, total_exact=True):
+        self.object_list = object_list
+        self.champs = champs
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.parametres = parametres
+        self.total = total
+        self.total_exact = total_exact
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def _valeurs(self, objet):
+        return [getattr(objet, nom) for nom, _ in self.champs]
+
+    @property
+    def curseur_suivant(self):
+        if self.has_next_page and self.object_list:
+            return encoder(self._valeurs(self.object_list[-1]), 's', self.champs)
+        return None
+
+    @property
+    def curseur_precedent(self):
+        if self.has_previous_page and self.object_list:
+            return encoder(self._valeurs(self.object_list[0]), 'p', self.champs)
+        return None
+
+    def _url(self, curseur):
+        parametres = self.parametres.copy()
+        parametres['curseur'] = curseur
+        return f'?{parametres.urlencode()}'
+
+    @property
+    def url_suivante(self):
+        curseur = self.curseur_suivant
+        return self._url(curseur) if curseur else ''
+
+    @property
+    def url_precedente(self):
+        curseur = self.curseur_precedent
+        return self._url(curseur) if curseur else ''
+
+    def en_dict(self):
+        """Champs de pagination des réponses JSON"""
+        return {
+            'suivant': self.curseur_suivant,
+            'precedent': self.curseur_precedent,
+            'total': self.total,
+            'total_exact': self.total_exact,
+        }
+
+
+def _lecture(queryset, champs, curseur, par_page):
+    """(sens, valeurs du curseur, queryset des par_page + 1 lignes à lire)"""
+    sens, valeurs = decoder(curseur, queryset, champs) if curseur else ('s', None)
+    if sens == 's':
+        lignes = queryset.order_by(*_tri(champs))
+        if valeurs is not None:
+            lignes = lignes.filter(condition_apres(champs, valeurs))
+    else:
+        # Page précédente : lecture à rebours depuis la première ligne affichée
+        inverse = [nom if descendant else f'-{nom}' for nom, descendant in champs]
+        lignes = queryset.order_by(*inverse).filter(condition_apres(champs, valeurs, inverse=True))
+    return sens, valeurs, lignes[:par_page + 1]
+
+
+def _page(lignes, sens, valeurs, champs, par_page, parametres, nombre, exact):
+    if sens == 's':
+        has_next, has_previous = len(lignes) > par_page, valeurs is not None
+        lignes = lignes[:par_page]
+    else:
+        has_next, has_previous = True, len(lignes) > par_page
+        lignes = lignes[:par_page][::-1]
+    return PageCurseur(lignes, champs, has_next, has_previous, parametres, nombre, exact)
+
+
+def page_curseur(queryset, champs, curseur=None, par_page=20, parametres=None, total=False):
+    sens, valeurs, lignes = _lecture(queryset, champs, curseur, par_page)
+    nombre, exact = compter(queryset) if total else (None, True)
+    return _page(list(lignes), sens, valeurs, champs, par_page, parametres, nombre, exact)
+
+
+async def apage_curseur(queryset, champs, curseur=None, par_page=20, parametres=None, total=False):
+    """page_curseur() pour les vues asynchrones (ORM asynchrone)"""
+    sens, valeurs, lignes = _lecture(queryset, champs, curseur, par_page)
+    nombre, exact = await acompter(queryset) if total else (None, True)
+    return _page([ligne async for ligne in lignes], sens, valeurs, champs, par_page, parametres, nombre, exact)
+
+
+def _mode(request, queryset):
+    """(champs du curseur, curseur, paramètres des liens), ou None pour la pagination classique"""
+    champs = ordre_keyset(queryset)
+    curseur = request.GET.get('curseur')
+    if (
+        champs is None
+        or 'page' in request.GET
+        or (not curseur and not getattr(settings, 'PAGINATION_CURSEUR', True))
+    ):
+        return None
+    parametres = request.GET.copy()
+    parametres.pop('curseur', None)
+    return champs, curseur, parametres
+
+
+def paginer(request, queryset, par_page=20, total=False):
+    """
+    Page de `queryset` pour la requête : par curseur (?curseur=, et par défaut
+    si PAGINATION_CURSEUR) ou classique avec ?page=.
+    """
+    mode = _mode(request, queryset)
+    if mode is None:
+        return Paginator(queryset, par_page).get_page(request.GET.get('page'))
+    champs, curseur, parametres = mode
+    try:
+        return page_curseur(queryset, champs, curseur, par_page, parametres, total)
+    except CurseurInvalide:
+        # Curseur altéré ou d'un autre tri : retour à la première page
+        return page_curseur(queryset, champs, None, par_page, parametres, total)
+
+
+async def apaginer(request, queryset, par_page=20, total=False):
+    """paginer() pour les vues asynchrones"""
+    mode = _mode(request, queryset)
+    if mode is None:
+        def page_classique():
+            page = Paginator(queryset, par_page).get_page(request.GET.get('page'))
+            page.object_list = list(page.object_list)
+            return page
+        return await sync_to_async(page_classique)()
+    champs, curseur, parametres = mode
+    try:
+        return await apage_curseur(queryset, champs, curseur, par_page, parametres, total)
+    except CurseurInvalide:
+        return await apage_curseur(queryset, champs, None, par_page, parametres, total)
+
+
+def pagination_json(page):
+    """Champs de pagination d'une réponse JSON, quel que soit le mode de la page"""
+    if getattr(page, 'est_curseur', False):
+        return page.en_dict()
+    return {
+        'page': page.number,
+        'pages': page.paginator.num_pages,
+        'total': page.paginator.count,
+        'total_exact': True,
+    }
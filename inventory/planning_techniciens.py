@@ -0,0 +1,270 @@
+"""
+Planning des techniciens : répartition des interventions SAV ouvertes par jour
+
+repartir() affecte les interventions d'une période (et celles en retard) aux
+techniciens, jour par jour, sans dépasser PLANNING_CAPACITE_MINUTES de
+travail prévu (duree_prevue) par technicien et par jour ouvré :
+- les interventions sont traitées par échéance croissante puis durée
+  décroissante (la plus urgente d'abord, les longues avant les courtes)
+- pour chaque intervention, à partir de son jour prévu : le technicien
+  désigné s'il a la place et n'est pas nettement plus chargé que les autres
+  (ECART_MINUTES), sinon un technicien déjà attendu dans la même ville ce
+  jour-là, sinon le moins chargé (tas par jour) ; si même le moins chargé n'a
+  pas la place, personne ne l'a et l'intervention passe au jour suivant
+- une intervention plus longue qu'une journée occupe seule une journée libre
+- les interventions en cours restent à leur technicien et à leur jour
+Le coût est en O(n log t) par jour essayé (n interventions, t techniciens).
+Dans la journée d'un technicien, les interventions sont regroupées par ville
+et par lieu, puis enchaînées à partir de PLANNING_HEURE_DEBUT.
+
+planning() lit les interventions et les techniciens en deux requêtes et garde
+le résultat dans le cache Django jusqu'à la prochaine écriture d'une
+intervention (version incrémentée par inventory/signals.py et par la
+planification des maintenances préventives).
+"""
+
+import bisect
+import datetime
+import heapq
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import InterventionSAV
+
+
+PREFIXE = 'planning_techniciens'
+ECART_MINUTES = 120
+STATUTS_A_PLANIFIER = ('PLANIFIEE', 'REPORTEE')
+
+
+def capacite():
+    return getattr(settings, 'PLANNING_CAPACITE_MINUTES', 480)
+
+
+def heure_debut():
+    return getattr(settings, 'PLANNING_HEURE_DEBUT', 8)
+
+
+def jours_ouvres():
+    return getattr(settings, 'PLANNING_JOURS_OUVRES', (0, 1, 2, 3, 4))
+
+
+def duree_cache():
+    return getattr(settings, 'PLANNING_CACHE_DUREE', 3600)
+
+
+@dataclass
+class Tache:
+    pk: int
+    numero: str
+    duree: int
+    echeance: datetime.date
+    technicien_id: int = None
+    ville: str = ''
+    lieu: str = ''
+    client: str = ''
+    en_cours: bool = False
+
+
+@dataclass
+class Planning:
+    debut: datetime.date
+    fin: datetime.date
+    capacite: int
+    # {technicien_id: {jour: [Tache]}}
+    affectations: dict = field(default_factory=dict)
+    non_planifiees: list = field(default_factory=list)
+
+
+# ================== RÉPARTITION ==================
+
+class Journee:
+    """Minutes affectées à chaque technicien un jour donné ; le moins chargé est en tête du tas"""
+
+    def __init__(self, techniciens):
+        self.minutes = dict.fromkeys(techniciens, 0)
+        self._tas = [(0, technicien_id) for technicien_id in techniciens]
+        heapq.heapify(self._tas)
+        self.villes = {}
+
+    def minimum(self):
+        while self._tas[0][0] != self.minutes[self._tas[0][1]]:
+            heapq.heappop(self._tas)
+        return self._tas[0]
+
+    def place(self, technicien_id, duree, capacite):
+        minutes = self.minutes[technicien_id]
+        return minutes + duree <= capacite or minutes == 0
+
+    def ajouter(self, technicien_id, tache):
+        self.minutes[technicien_id] += tache.duree
+        heapq.heappush(self._tas, (self.minutes[technicien_id], technicien_id))
+        self.villes.setdefault(tache.ville, set()).add(technicien_id)
+
+    def choisir(self, tache, capacite):
+        """Technicien retenu pour `tache` ce jour-là, ou None si aucun n'a la place"""
+        minimum, moins_charge = self.minimum()
+        if not self.place(moins_charge, tache.duree, capacite):
+            return None
+        candidats = [tache.technicien_id] if tache.technicien_id in self.minutes else []
+        candidats += sorted(self.villes.get(tache.ville, ()) if tache.ville else ())
+        for technicien_id in candidats:
+            if self.place(technicien_id, tache.duree, capacite) and self.minutes[technicien_id] <= minimum + ECART_MINUTES:
+                return technicien_id
+        return moins_charge
+
+
+def repartir(taches, techniciens, jours, capacite_minutes):
+    """
+    Affecte `taches` aux `techniciens` (identifiants) sur les `jours` (dates
+    ouvrées triées) ; retourne ({technicien_id: {jour: [Tache]}}, non planifiées)
+    """
+    journees = {jour: Journee(techniciens) for jour in jours}
+    affectations = {technicien_id: {} for technicien_id in techniciens}
+    non_planifiees = []
+    if not techniciens or not jours:
+        return affectations, list(taches)
+
+    # Interventions en cours : technicien et jour inchangés
+    a_repartir = []
+    for tache in taches:
+        if tache.en_cours and tache.technicien_id in affectations and tache.echeance in journees:
+            journees[tache.echeance].ajouter(tache.technicien_id, tache)
+            affectations[tache.technicien_id].setdefault(tache.echeance, []).append(tache)
+        else:
+            a_repartir.append(tache)
+
+    a_repartir.sort(key=lambda tache: (tache.echeance, -tache.duree, tache.pk))
+    for tache in a_repartir:
+        # Premier jour ouvré de la période à partir de l'échéance (dès le début si en retard)
+        technicien_id = None
+        for jour in jours[bisect.bisect_left(jours, tache.echeance):]:
+            technicien_id = journees[jour].choisir(tache, capacite_minutes)
+            if technicien_id is not None:
+                journees[jour].ajouter(technicien_id, tache)
+                affectations[technicien_id].setdefault(jour, []).append(tache)
+                break
+        if technicien_id is None:
+            non_planifiees.append(tache)
+    return affectations, non_planifiees
+
+
+def horaires(taches, jour, heure=None):
+    """Créneaux [(tache, debut, fin)] de la journée, regroupés par ville et par lieu"""
+    debut = datetime.datetime.combine(jour, datetime.time(heure_debut() if heure is None else heure))
+    creneaux = []
+    for tache in sorted(taches, key=lambda tache: (tache.ville, tache.lieu, tache.pk)):
+        fin = debut + datetime.timedelta(minutes=tache.duree)
+        creneaux.append((tache, debut, fin))
+        debut = fin
+    return creneaux
+
+
+# ================== LECTURE ET CACHE ==================
+
+def jours_de(debut, fin):
+    ouvres = set(jours_ouvres())
+    return [
+        debut + datetime.timedelta(days=n) for n in range((fin - debut).days + 1)
+        if (debut + datetime.timedelta(days=n)).weekday() in ouvres
+    ]
+
+
+def charger_taches(fin):
+    """Interventions ouvertes prévues au plus tard le jour `fin` (retards compris)"""
+    limite = timezone.make_aware(datetime.datetime.combine(fin + datetime.timedelta(days=1), datetime.time.min))
+    lignes = InterventionSAV.objects.filter(
+        statut__in=(*STATUTS_A_PLANIFIER, 'EN_COURS'), date_prevue__lt=limite
+    ).annotate(
+        ville=Coalesce(F('client__ville'), F('appareil__client__ville')),
+        nom_client=Coalesce(F('client__nom'), F('appareil__client__nom')),
+    ).order_by().values_list(
+        'pk', 'numero_intervention', 'duree_prevue', 'date_prevue', 'technicien_id', 'statut',
+        'ville', 'appareil__lieu_installation', 'nom_client'
+    )
+    return [
+        Tache(
+            pk=pk, numero=numero, duree=max(0, duree or 0), echeance=timezone.localdate(date_prevue),
+            technicien_id=technicien_id, ville=ville or '', lieu=lieu or '', client=client or '',
+            en_cours=statut == 'EN_COURS',
+        )
+        for pk, numero, duree, date_prevue, technicien_id, statut, ville, lieu, client in lignes
+    ]
+
+
+def techniciens_actifs():
+    return dict(
+        User.objects.filter(is_active=True, profile__role='TECHNICIEN').order_by('pk').values_list('pk', 'username')
+    )
+
+
+def calculer_planning(debut, fin):
+    jours = jours_de(debut, fin)
+    techniciens = techniciens_actifs()
+    affectations, non_planifiees = repartir(charger_taches(fin), list(techniciens), jours, capacite())
+    return Planning(debut, fin, capacite(), affectations, non_planifiees), techniciens
+
+
+def _tache_en_dict(tache):
+    return {
+        'id': tache.pk, 'numero': tache.numero, 'duree': tache.duree, 'echeance': tache.echeance.isoformat(),
+        'client': tache.client, 'ville': tache.ville, 'lieu': tache.lieu,
+    }
+
+
+def en_dict(planning, techniciens):
+    """Planning sérialisable en JSON"""
+    resultat = {
+        'debut': planning.debut.isoformat(),
+        'fin': planning.fin.isoformat(),
+        'capacite_minutes': planning.capacite,
+        'techniciens': [],
+        'non_planifiees': [_tache_en_dict(tache) for tache in planning.non_planifiees],
+    }
+    for technicien_id, jours in planning.affectations.items():
+        resultat['techniciens'].append({
+            'id': technicien_id,
+            'nom': techniciens.get(technicien_id, ''),
+            'minutes': sum(tache.duree for taches in jours.values() for tache in taches),
+            'jours': [
+                {
+                    'date': jour.isoformat(),
+                    'minutes': sum(tache.duree for tache in taches),
+                    'interventions': [
+                        {**_tache_en_dict(tache), 'debut': debut.time().isoformat('minutes'), 'fin': fin.time().isoformat('minutes')}
+                        for tache, debut, fin in horaires(taches, jour)
+                    ],
+                }
+                for jour, taches in sorted(jours.items())
+            ],
+        })
+    return resultat
+
+
+def _cle_version():
+    return f'{PREFIXE}:version'
+
+
+def invalider_planning():
+    """Périme les plannings en cache (écriture d'une intervention)"""
+    try:
+        cache.incr(_cle_version())
+    except ValueError:
+        cache.set(_cle_version(), 1, None)
+
+
+def planning(debut, fin):
+    """Planning de la période [debut, fin] (dict JSON), en cache jusqu'à la prochaine écriture d'une intervention"""
+    version = cache.get_or_set(_cle_version(), 1, None)
+    cle = f'{PREFIXE}:{version}:{debut.isoformat()}:{fin.isoformat()}'
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = en_dict(*calculer_planning(debut, fin))
+        cache.set(cle, resultat, duree_cache())
+    return resultat
@@ -0,0 +1,193 @@
+"""
+Profilage des requêtes SQL par vue
+
+mesurer() enregistre, pour un bloc de code, le nombre de requêtes SQL, leur
+durée cumulée, les requêtes répétées (même SQL, paramètres différents :
+symptôme d'une boucle N+1) et la durée totale. Les requêtes sont interceptées
+par connection.execute_wrapper : DEBUG n'a pas besoin d'être actif.
+
+ProfilageRequetesMiddleware (actif si PROFILAGE_REQUETES, par défaut DEBUG)
+mesure chaque requête HTTP :
+- en-têtes de réponse X-Requetes-SQL et Server-Timing (sql, rendu, total),
+  lisibles dans les outils de développement du navigateur
+- historique des dernières mesures du processus (PROFILAGE_HISTORIQUE),
+  servi en JSON par la vue profilage_requetes avec un agrégat par vue
+
+Dans les tests, budget_requetes() vérifie qu'un bloc reste dans son budget
+de requêtes et ne contient pas de N+1.
+"""
+
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+
+# Une requête répétée au moins autant de fois dans une mesure est signalée comme N+1
+SEUIL_DOUBLONS = 5
+
+_LITTERAUX = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_LISTES = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+
+
+def normaliser(sql):
+    """SQL sans valeurs littérales : deux requêtes N+1 ont la même forme"""
+    return _LISTES.sub('(...)', _LITTERAUX.sub('?', sql))
+
+
+@dataclass
+class Mesure:
+    chemin: str = ''
+    vue: str = ''
+    requetes: int = 0
+    duree_sql: float = 0.0  # millisecondes
+    duree_totale: float = 0.0
+    formes: Counter = field(default_factory=Counter)
+
+    @property
+    def duree_rendu(self):
+        """Temps passé hors base de données (vue et gabarit)"""
+        return max(self.duree_totale - self.duree_sql, 0.0)
+
+    def doublons(self, seuil=SEUIL_DOUBLONS):
+        """Formes de requêtes exécutées au moins `seuil` fois : {sql: nombre}"""
+        return {sql: nombre for sql, nombre in self.formes.items() if nombre >= seuil}
+
+    def en_dict(self):
+        return {
+            'chemin': self.chemin,
+            'vue': self.vue,
+            'requetes': self.requetes,
+            'duree_sql_ms': round(self.duree_sql, 2),
+            'duree_rendu_ms': round(self.duree_rendu, 2),
+            'duree_totale_ms': round(self.duree_totale, 2),
+            'doublons': self.doublons(),
+        }
+
+
+@contextmanager
+def mesurer(mesure=None):
+    """Enregistre dans une Mesure les requêtes exécutées sur la connexion par défaut"""
+    mesure = mesure or Mesure()
+
+    def intercepter(execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            mesure.duree_sql += (time.perf_counter() - debut) * 1000
+            mesure.requetes += 1
+            mesure.formes[normaliser(sql)] += 1
+
+    debut = time.perf_counter()
+    with connection.execute_wrapper(intercepter):
+        try:
+            yield mesure
+        finally:
+            mesure.duree_totale = (time.perf_counter() - debut) * 1000
+
+
+# ================== MIDDLEWARE ==================
+
+def actif():
+    return getattr(settings, 'PROFILAGE_REQUETES', settings.DEBUG)
+
+
+_historique = deque(maxlen=getattr(settings, 'PROFILAGE_HISTORIQUE', 200))
+
+
+def historique():
+    return list(_historique)
+
+
+def agregats_par_vue(mesures):
+    """Nombre d'appels, requêtes moyennes / maximum et durée moyenne par vue"""
+    vues = {}
+    for mesure in mesures:
+        agregat = vues.setdefault(mesure.vue, {'appels': 0, 'requetes': 0, 'requetes_max': 0, 'duree_ms': 0.0, 'n_plus_un': 0})
+        agregat['appels'] += 1
+        agregat['requetes'] += mesure.requetes
+        agregat['requetes_max'] = max(agregat['requetes_max'], mesure.requetes)
+        agregat['duree_ms'] += mesure.duree_totale
+        agregat['n_plus_un'] += bool(mesure.doublons())
+    return {
+        vue: {
+            'appels': agregat['appels'],
+            'requetes_moyenne': round(agregat['requetes'] / agregat['appels'], 1),
+            'requetes_max': agregat['requetes_max'],
+            'duree_moyenne_ms': round(agregat['duree_ms'] / agregat['appels'], 2),
+            'appels_avec_n_plus_un': agregat['n_plus_un'],
+        }
+        for vue, agregat in sorted(vues.items())
+    }
+
+
+class ProfilageRequetesMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not actif():
+            return self.get_response(request)
+
+        with mesurer(Mesure(chemin=request.path)) as mesure:
+            response = self.get_response(request)
+        return self.enregistrer(request, response, mesure)
+
+    async def __acall__(self, request):
+        if not actif():
+            return await self.get_response(request)
+
+        # L'ORM asynchrone exécute les requêtes dans le thread de sync_to_async :
+        # la mesure est installée sur la connexion de ce thread
+        mesure = Mesure(chemin=request.path)
+        contexte = mesurer(mesure)
+        await sync_to_async(contexte.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(contexte.__exit__)(None, None, None)
+        return self.enregistrer(request, response, mesure)
+
+    def enregistrer(self, request, response, mesure):
+        match = getattr(request, 'resolver_match', None)
+        mesure.vue = match.view_name if match else ''
+        _historique.append(mesure)
+
+        response['X-Requetes-SQL'] = f'{mesure.requetes}; doublons={len(mesure.doublons())}'
+        response['Server-Timing'] = (
+            f'sql;dur={mesure.duree_sql:.1f};desc="{mesure.requetes} requetes", '
+            f'rendu;dur={mesure.duree_rendu:.1f}, total;dur={mesure.duree_totale:.1f}'
+        )
+        return response
+
+
+# ================== TESTS ==================
+
+@contextmanager
+def budget_requetes(test_case, maximum, seuil_doublons=SEUIL_DOUBLONS, message=''):
+    """Échoue si le bloc dépasse `maximum` requêtes ou répète une requête `seuil_doublons` fois"""
+    with mesurer() as mesure:
+        yield mesure
+    prefixe = f'{message} : ' if message else ''
+    test_case.assertLessEqual(
+        mesure.requetes, maximum,
+        f'{prefixe}{mesure.requetes} requêtes pour un budget de {maximum}'
+    )
+    doublons = mesure.doublons(seuil_doublons)
+    test_case.assertFalse(
+        doublons,
+        f'{prefixe}requêtes répétées (N+1) : ' + '; '.join(f'{nombre} x {sql}' for sql, nombre in doublons.items())
+    )
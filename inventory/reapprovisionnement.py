@@ -0,0 +1,316 @@
+"""
+Réapprovisionnement : points de commande et quantités à commander par produit
+
+Le seuil_alerte des produits est saisi à la main ; calculer() l'estime à
+partir des sorties de stock (MouvementStock SORTIE) des
+REAPPRO_HISTORIQUE_SEMAINES dernières semaines complètes :
+- les produits actifs sont parcourus par lots de TAILLE_LOT (curseur sur la
+  clé primaire) ; la base agrège leurs sorties en une ligne par produit et une
+  colonne par semaine (une somme filtrée par semaine, sans fonction de
+  troncature de date évaluée ligne à ligne) : aucun objet Produit ni
+  MouvementStock n'est chargé
+- les lignes d'un lot forment une matrice NumPy produits x semaines, d'où la
+  demande hebdomadaire moyenne et son écart-type, sur les semaines écoulées
+  depuis la création du produit (ou sa première sortie)
+- point de commande = demande pendant le délai de livraison du fournisseur
+  + stock de sécurité (z x écart-type x racine du délai, z tiré de
+  REAPPRO_NIVEAU_SERVICE) ; stock cible = même calcul sur le délai plus
+  REAPPRO_COUVERTURE_JOURS
+- quantité suggérée = stock cible - stock prévisionnel (stock + quantités déjà
+  en commande chez le fournisseur) dès que celui-ci atteint le point de
+  commande
+
+Les résultats sont écrits dans SuggestionReappro, une ligne par produit actif.
+Avec seuils=True, seuil_alerte prend la valeur du point de commande pour les
+produits qui ont au moins SEMAINES_MINIMUM semaines d'historique : l'alerte
+de stock bas existante suit alors la demande.
+
+creer_brouillons() regroupe les quantités suggérées en une commande
+fournisseur BROUILLON par fournisseur.
+
+Lancement : `python manage.py compute_replenishment` (tâche nocturne). NumPy
+est optionnel : sans lui, les mêmes statistiques sont cumulées produit par
+produit en Python, plus lentement.
+"""
+
+import datetime
+import math
+from dataclasses import dataclass
+from decimal import Decimal
+from statistics import NormalDist
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    Produit, MouvementStock, SuggestionReappro, CommandeFournisseur, LigneCommandeFournisseur, MONTANT
+)
+from .numerotation import numeros
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel : statistiques calculées en Python pur
+    np = None
+
+
+TAILLE_LOT = 2000
+SEMAINES_MINIMUM = 8
+STATUTS_EN_COMMANDE = ('BROUILLON', 'ENVOYEE')
+
+CHAMPS = [
+    'fournisseur', 'demande_hebdo', 'ecart_type_hebdo', 'semaines', 'point_commande',
+    'stock_cible', 'stock_previsionnel', 'quantite_suggeree', 'date_calcul',
+]
+
+
+def historique_semaines():
+    return max(1, getattr(settings, 'REAPPRO_HISTORIQUE_SEMAINES', 104))
+
+
+def niveau_service():
+    return getattr(settings, 'REAPPRO_NIVEAU_SERVICE', 0.95)
+
+
+def couverture_jours():
+    return getattr(settings, 'REAPPRO_COUVERTURE_JOURS', 30)
+
+
+@dataclass
+class Resultat:
+    produits: int = 0
+    a_commander: int = 0
+    seuils: int = 0
+
+
+# ================== HISTORIQUE DES SORTIES ==================
+
+def periode(aujourd_hui):
+    """Semaines complètes de l'historique : [lundi de la première, lundi de la semaine en cours["""
+    fin = aujourd_hui - datetime.timedelta(days=aujourd_hui.weekday())
+    return fin - datetime.timedelta(weeks=historique_semaines()), fin
+
+
+def _minuit(jour):
+    return timezone.make_aware(datetime.datetime.combine(jour, datetime.time.min))
+
+
+def sorties_par_semaine(premier, dernier, debut):
+    """
+    Sorties hebdomadaires des produits premier..dernier depuis `debut` : une
+    ligne (produit_id, semaine 0, ..., semaine n-1) par produit ayant des
+    sorties, None pour une semaine sans sortie
+    """
+    semaines = historique_semaines()
+    bornes = [_minuit(debut + datetime.timedelta(weeks=n)) for n in range(semaines + 1)]
+    colonnes = {
+        f'semaine_{n}': Sum('quantite', filter=Q(date_mouvement__gte=bornes[n], date_mouvement__lt=bornes[n + 1]))
+        for n in range(semaines)
+    }
+    return MouvementStock.objects.filter(
+        type_mouvement='SORTIE', produit_id__gte=premier, produit_id__lte=dernier,
+        date_mouvement__gte=bornes[0], date_mouvement__lt=bornes[-1],
+    ).order_by().values('produit_id').annotate(**colonnes).values_list('produit_id', *colonnes)
+
+
+# ================== STATISTIQUES ==================
+
+def _statistiques_numpy(index, premieres, lignes, semaines):
+    demande = np.zeros((len(index), semaines))
+    lignes = [ligne for ligne in lignes if ligne[0] in index]
+    if lignes:
+        # None (semaine sans sortie) devient NaN, puis 0
+        demande[[index[ligne[0]] for ligne in lignes]] = np.nan_to_num(np.array(lignes, dtype=float)[:, 1:])
+
+    # Historique à partir de la création du produit, ou de sa première sortie si elle est antérieure
+    vendus = demande > 0
+    premieres = np.minimum(np.asarray(premieres), np.where(vendus.any(axis=1), vendus.argmax(axis=1), semaines))
+    premieres = np.minimum(premieres, semaines - 1)
+    actives = np.arange(semaines) >= premieres[:, None]
+    nombres = semaines - premieres
+    moyennes = demande.sum(axis=1) / nombres
+    ecarts = np.sqrt(((demande - moyennes[:, None]) ** 2 * actives).sum(axis=1) / np.maximum(nombres - 1, 1))
+    return moyennes, ecarts, nombres
+
+
+def _statistiques_python(index, premieres, lignes, semaines):
+    sommes = [0.0] * len(index)
+    carres = [0.0] * len(index)
+    premieres = list(premieres)
+    for produit_id, *quantites in lignes:
+        rang = index.get(produit_id)
+        if rang is None:
+            continue
+        for colonne, quantite in enumerate(quantites):
+            if quantite:
+                sommes[rang] += quantite
+                carres[rang] += quantite * quantite
+                premieres[rang] = min(premieres[rang], colonne)
+
+    moyennes, ecarts, nombres = [], [], []
+    for somme, carre, premiere in zip(sommes, carres, premieres):
+        nombre = semaines - min(premiere, semaines - 1)
+        moyenne = somme / nombre
+        # Somme des carrés des écarts = somme des carrés - n x moyenne² (semaines sans sortie comprises)
+        moyennes.append(moyenne)
+        ecarts.append(math.sqrt(max(carre - nombre * moyenne * moyenne, 0) / max(nombre - 1, 1)))
+        nombres.append(nombre)
+    return moyennes, ecarts, nombres
+
+
+def statistiques(index, premieres, lignes, semaines):
+    """
+    Demande hebdomadaire moyenne, écart-type et nombre de semaines d'historique
+    des produits `index` ({produit_id: rang}), à partir des lignes de
+    sorties_par_semaine() ; `premieres` : rang de la semaine de création de chaque produit
+    """
+    calcul = _statistiques_python if np is None else _statistiques_numpy
+    return calcul(index, premieres, lignes, semaines)
+
+
+def besoins(moyenne, ecart, delai, couverture, position, z, xp=math):
+    """
+    Point de commande, stock cible et quantité à commander (délai et couverture
+    en semaines) ; `xp` : math pour un produit, numpy pour un lot entier
+    """
+    # Marge d'arrondi : 10 x 14/7 doit donner 20, pas 21
+    point = xp.ceil(moyenne * delai + z * ecart * xp.sqrt(delai) - 1e-9)
+    cible = xp.ceil(moyenne * (delai + couverture) + z * ecart * xp.sqrt(delai + couverture) - 1e-9)
+    manque = (position <= point) * (cible - position)
+    return point, cible, manque * (manque > 0)
+
+
+# ================== CALCUL PAR LOTS ==================
+
+def _en_commande(premier, dernier):
+    """Quantités déjà en commande chez les fournisseurs (brouillons et commandes envoyées)"""
+    return dict(LigneCommandeFournisseur.objects.filter(
+        commande__statut__in=STATUTS_EN_COMMANDE, produit_id__gte=premier, produit_id__lte=dernier
+    ).order_by().values('produit_id').annotate(total=Sum('quantite')).values_list('produit_id', 'total'))
+
+
+def _calculer_lot(lot, debut, z, maintenant, seuils, resultat):
+    semaines = historique_semaines()
+    premier, dernier = lot[0][0], lot[-1][0]
+    index = {ligne[0]: rang for rang, ligne in enumerate(lot)}
+    premieres = [max(0, (timezone.localdate(ligne[4]) - debut).days // 7) for ligne in lot]
+    moyennes, ecarts, nombres = statistiques(index, premieres, sorties_par_semaine(premier, dernier, debut), semaines)
+
+    en_commande = _en_commande(premier, dernier)
+    positions = [ligne[2] + en_commande.get(ligne[0], 0) for ligne in lot]
+    delais = [ligne[5] / 7 for ligne in lot]
+    couverture = couverture_jours() / 7
+    if np is None:
+        points, cibles, quantites = zip(*(
+            besoins(moyenne, ecart, delai, couverture, position, z)
+            for moyenne, ecart, delai, position in zip(moyennes, ecarts, delais, positions)
+        ))
+    else:
+        points, cibles, quantites = (
+            tableau.astype(int).tolist()
+            for tableau in besoins(moyennes, ecarts, np.asarray(delais), couverture, np.asarray(positions), z, xp=np)
+        )
+        moyennes, ecarts, nombres = moyennes.tolist(), ecarts.tolist(), nombres.tolist()
+
+    suggestions, nouveaux_seuils = [], []
+    for rang, (pk, fournisseur_id, _, seuil, _, _) in enumerate(lot):
+        suggestions.append(SuggestionReappro(
+            produit_id=pk, fournisseur_id=fournisseur_id,
+            demande_hebdo=Decimal(f'{moyennes[rang]:.2f}'), ecart_type_hebdo=Decimal(f'{ecarts[rang]:.2f}'),
+            semaines=int(nombres[rang]), point_commande=int(points[rang]), stock_cible=int(cibles[rang]),
+            stock_previsionnel=positions[rang], quantite_suggeree=int(quantites[rang]), date_calcul=maintenant,
+        ))
+        if seuils and nombres[rang] >= SEMAINES_MINIMUM and seuil != points[rang]:
+            nouveaux_seuils.append(Produit(pk=pk, seuil_alerte=int(points[rang])))
+
+    SuggestionReappro.objects.bulk_create(
+        suggestions, batch_size=500, update_conflicts=True, unique_fields=['produit'], update_fields=CHAMPS
+    )
+    if nouveaux_seuils:
+        Produit.objects.bulk_update(nouveaux_seuils, ['seuil_alerte'], batch_size=500)
+    resultat.produits += len(lot)
+    resultat.a_commander += sum(1 for suggestion in suggestions if suggestion.quantite_suggeree > 0)
+    resultat.seuils += len(nouveaux_seuils)
+
+
+def calculer(aujourd_hui=None, seuils=False):
+    """
+    Recalcule les suggestions de tous les produits actifs ; avec `seuils`,
+    remplace aussi leur seuil_alerte par le point de commande calculé
+    """
+    aujourd_hui = aujourd_hui or timezone.localdate()
+    debut, _ = periode(aujourd_hui)
+    z = NormalDist().inv_cdf(niveau_service())
+    maintenant = timezone.now()
+    resultat = Resultat()
+
+    produits = Produit.objects.filter(actif=True).order_by('pk').values_list(
+        'pk', 'fournisseur_id', 'quantite_stock', 'seuil_alerte', 'date_creation', 'fournisseur__delai_livraison_jours'
+    )
+    apres = 0
+    while True:
+        lot = list(produits.filter(pk__gt=apres)[:TAILLE_LOT])
+        if not lot:
+            break
+        with transaction.atomic():
+            _calculer_lot(lot, debut, z, maintenant, seuils, resultat)
+        apres = lot[-1][0]
+
+    # Produits désactivés ou supprimés depuis le calcul précédent
+    SuggestionReappro.objects.filter(date_calcul__lt=maintenant).delete()
+    return resultat
+
+
+# ================== COMMANDES FOURNISSEURS ==================
+
+def a_commander(fournisseurs=None):
+    """Suggestions à commander, chez des fournisseurs actifs (`fournisseurs` : identifiants, tous par défaut)"""
+    suggestions = SuggestionReappro.objects.filter(quantite_suggeree__gt=0, fournisseur__actif=True)
+    if fournisseurs is not None:
+        suggestions = suggestions.filter(fournisseur_id__in=fournisseurs)
+    return suggestions
+
+
+def resume_par_fournisseur():
+    """Par fournisseur : nombre de produits à commander et montant estimé au prix d'achat"""
+    return a_commander().order_by().values(
+        'fournisseur_id', 'fournisseur__nom', 'fournisseur__delai_livraison_jours'
+    ).annotate(
+        produits=Count('produit'),
+        montant=Sum(F('quantite_suggeree') * F('produit__prix_achat'), output_field=MONTANT),
+    ).order_by('-montant', 'fournisseur_id')
+
+
+def creer_brouillons(utilisateur=None, fournisseurs=None):
+    """
+    Crée une commande fournisseur BROUILLON par fournisseur ayant des produits
+    à commander, et retourne les commandes créées. Les quantités commandées
+    passent dans le stock prévisionnel des suggestions.
+    """
+    with transaction.atomic():
+        suggestions = a_commander(fournisseurs)
+        par_fournisseur = {}
+        for fournisseur_id, produit_id, quantite, prix in suggestions.order_by('fournisseur_id', 'produit_id').values_list(
+            'fournisseur_id', 'produit_id', 'quantite_suggeree', 'produit__prix_achat'
+        ):
+            par_fournisseur.setdefault(fournisseur_id, []).append((produit_id, quantite, prix))
+        if not par_fournisseur:
+            return []
+
+        numeros_commande = numeros(CommandeFournisseur, 'numero_commande', 'CF', '-', 5, len(par_fournisseur))
+        commandes = CommandeFournisseur.objects.bulk_create([
+            CommandeFournisseur(
+                numero_commande=next(numeros_commande), fournisseur_id=fournisseur_id, utilisateur=utilisateur,
+                total=sum(quantite * prix for _, quantite, prix in lignes),
+                notes='Brouillon créé à partir des suggestions de réapprovisionnement',
+            )
+            for fournisseur_id, lignes in par_fournisseur.items()
+        ])
+        LigneCommandeFournisseur.objects.bulk_create([
+            LigneCommandeFournisseur(commande=commande, produit_id=produit_id, quantite=quantite, prix_unitaire=prix)
+            for commande, lignes in zip(commandes, par_fournisseur.values())
+            for produit_id, quantite, prix in lignes
+        ], batch_size=1000)
+        suggestions.update(stock_previsionnel=F('stock_previsionnel') + F('quantite_suggeree'), quantite_suggeree=0)
+    return commandes
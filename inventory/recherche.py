@@ -0,0 +1,176 @@
+"""
+Recherche plein texte des produits et des clients
+
+Backends (réglage RECHERCHE_BACKEND, 'auto' par défaut) :
+- 'fts5'      : tables virtuelles SQLite FTS5 (tokenizer unicode61 sans accents,
+                index de préfixes), synchronisées par les signaux post_save/post_delete
+- 'postgres'  : colonnes calculées recherche_vecteur (tsvector, configuration
+                'french_unaccent') et recherche_texte (texte sans accents), indexées
+                en GIN par la migration 0017 ; les préfixes passent par to_tsquery,
+                les fautes de frappe par le repli trigrammes (pg_trgm, opérateur <%)
+- 'icontains' : repli sur les filtres LIKE historiques
+
+rechercher() filtre le queryset et annote `rang_recherche` (plus petit = plus
+pertinent) pour que les vues puissent trier par pertinence.
+"""
+
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q, Value, BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Produit, Client
+
+
+# Modèle -> (table FTS5, champs indexés)
+INDEX_RECHERCHE = {
+    Produit: ('inventory_produit_fts', ['nom', 'reference', 'code_barre', 'description']),
+    Client: ('inventory_client_fts', ['nom', 'prenom', 'email', 'telephone', 'entreprise']),
+}
+
+_fts5_disponible = False
+_index_postgres_disponible = False
+
+
+def fts5_disponible():
+    """Vrai si la migration a pu créer les tables FTS5 (seul un résultat positif est mis en cache)"""
+    global _fts5_disponible
+    if not _fts5_disponible:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s",
+                           [INDEX_RECHERCHE[Produit][0]])
+            _fts5_disponible = cursor.fetchone() is not None
+    return _fts5_disponible
+
+
+def index_postgres_disponible():
+    """Vrai si la migration a pu créer les colonnes de recherche PostgreSQL (résultat positif mis en cache)"""
+    global _index_postgres_disponible
+    if not _index_postgres_disponible:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = 'recherche_vecteur'",
+                [Produit._meta.db_table]
+            )
+            _index_postgres_disponible = cursor.fetchone() is not None
+    return _index_postgres_disponible
+
+
+def backend():
+    """Backend de recherche actif"""
+    choix = getattr(settings, 'RECHERCHE_BACKEND', 'auto')
+    if choix != 'auto':
+        return choix
+    if connection.vendor == 'sqlite' and fts5_disponible():
+        return 'fts5'
+    if connection.vendor == 'postgresql' and index_postgres_disponible():
+        return 'postgres'
+    return 'icontains'
+
+
+def termes(texte):
+    """Découpe la saisie en termes (lettres et chiffres, comme le tokenizer unicode61)"""
+    return re.findall(r'\w+', texte or '')
+
+
+# ================== RECHERCHE ==================
+
+def rechercher(queryset, texte):
+    """Restreint `queryset` aux objets correspondant à `texte` (tous les termes, en préfixe)"""
+    mots = termes(texte)
+    if not mots:
+        return queryset.none()
+
+    mode = backend()
+    if mode == 'fts5':
+        return _rechercher_fts5(queryset, mots)
+    if mode == 'postgres':
+        return _rechercher_postgres(queryset, mots)
+    return _rechercher_icontains(queryset, mots)
+
+
+def _rechercher_fts5(queryset, mots):
+    table_fts, _ = INDEX_RECHERCHE[queryset.model]
+    table = queryset.model._meta.db_table
+    requete = ' AND '.join('"%s"*' % mot for mot in mots)
+    return queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {table_fts} WHERE {table_fts} MATCH %s', (requete,))
+    ).annotate(rang_recherche=RawSQL(
+        f'SELECT rank FROM {table_fts} WHERE {table_fts} MATCH %s AND rowid = "{table}"."id"',
+        (requete,),
+        output_field=FloatField()
+    ))
+
+
+def _rechercher_postgres(queryset, mots):
+    table = queryset.model._meta.db_table
+    requete = ' & '.join(f'{mot}:*' for mot in mots)
+    saisie = ' '.join(mots)
+    # Plein texte (index GIN du tsvector) ou, pour les fautes de frappe, mots proches
+    # de la saisie (index GIN trigrammes) ; les deux index se combinent en BitmapOr
+    correspond = RawSQL(
+        f'("{table}"."recherche_vecteur" @@ to_tsquery(\'french_unaccent\', %s) '
+        f'OR lower(inventory_unaccent(%s)) <%% "{table}"."recherche_texte")',
+        (requete, saisie),
+        output_field=BooleanField()
+    )
+    return queryset.filter(correspond).annotate(rang_recherche=RawSQL(
+        f'-(ts_rank_cd("{table}"."recherche_vecteur", to_tsquery(\'french_unaccent\', %s)) '
+        f'+ word_similarity(lower(inventory_unaccent(%s)), "{table}"."recherche_texte"))',
+        (requete, saisie),
+        output_field=FloatField()
+    ))
+
+
+def _rechercher_icontains(queryset, mots):
+    _, champs = INDEX_RECHERCHE[queryset.model]
+    for mot in mots:
+        condition = Q()
+        for champ in champs:
+            condition |= Q(**{f'{champ}__icontains': mot})
+        queryset = queryset.filter(condition)
+    return queryset.annotate(rang_recherche=Value(0.0, output_field=FloatField()))
+
+
+# ================== SYNCHRONISATION DE L'INDEX FTS5 ==================
+
+def indexer(instance):
+    """Met à jour la ligne FTS5 de l'objet (appelé après chaque enregistrement)"""
+    if backend() != 'fts5':
+        return
+    table_fts, champs = INDEX_RECHERCHE[type(instance)]
+    valeurs = [getattr(instance, champ) or '' for champ in champs]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table_fts} WHERE rowid = %s', [instance.pk])
+        cursor.execute(
+            f'INSERT INTO {table_fts} (rowid, {", ".join(champs)}) VALUES (%s{", %s" * len(champs)})',
+            [instance.pk] + valeurs
+        )
+
+
+def desindexer(instance):
+    if backend() != 'fts5':
+        return
+    table_fts, _ = INDEX_RECHERCHE[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table_fts} WHERE rowid = %s', [instance.pk])
+
+
+def reconstruire_index():
+    """Reconstruit entièrement les tables FTS5 ; retourne le nombre d'objets indexés"""
+    if backend() != 'fts5':
+        return 0
+    total = 0
+    with connection.cursor() as cursor:
+        for model, (table_fts, champs) in INDEX_RECHERCHE.items():
+            colonnes = ', '.join(champs)
+            source = ', '.join(f"COALESCE({champ}, '')" for champ in champs)
+            cursor.execute(f'DELETE FROM {table_fts}')
+            cursor.execute(
+                f'INSERT INTO {table_fts} (rowid, {colonnes}) '
+                f'SELECT id, {source} FROM {model._meta.db_table}'
+            )
+            total += cursor.rowcount
+    return total
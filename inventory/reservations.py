@@ -0,0 +1,161 @@
+"""
+Réservations de stock des commandes
+
+Une commande confirmée retient ses produits sans les sortir du stock :
+Produit.quantite_reservee cumule les ReservationStock des commandes
+confirmées, et Produit.quantite_disponible (colonne calculée par la base,
+quantite_stock - quantite_reservee) est le stock encore promis à personne,
+lu tel quel par la recherche, le catalogue et la saisie des ventes.
+
+synchroniser() aligne les réservations d'une commande sur son statut et ses
+lignes (appelée après l'enregistrement de la commande et par calculer_total) :
+- EN_ATTENTE, ANNULEE : aucune réservation
+- CONFIRMEE : les quantités des lignes, par produit
+- EXPEDIEE, LIVREE : réservations libérées et sorties de stock enregistrées
+  par le registre (inventory/stock.py), une seule fois par commande
+Les écarts avec les réservations existantes sont appliqués en une requête
+UPDATE ... SET quantite_reservee = quantite_reservee + CASE ... WHERE
+quantite_disponible >= <hausse>, comme les mouvements de stock : une
+réservation qui dépasse le disponible n'est pas écrite et la synchronisation
+est annulée (StockInsuffisant), même entre confirmations concurrentes.
+
+Une commande expédiée qui revient à un autre statut ne remet rien en stock :
+un retour est saisi comme mouvement d'entrée.
+"""
+
+from django.db import transaction
+from django.db.models import Case, When, F, Q, Sum, Value
+
+from .models import Commande, LigneCommande, Produit, ReservationStock
+from .stock import Mouvement, StockInsuffisant, appliquer_mouvements
+from .cache_catalogue import invalider_catalogue
+
+
+STATUTS_RESERVES = ('CONFIRMEE',)
+STATUTS_EXPEDIES = ('EXPEDIEE', 'LIVREE')
+
+
+def quantites_commande(commande_id):
+    """{produit_id: quantité} des lignes de la commande"""
+    return dict(
+        LigneCommande.objects.filter(commande_id=commande_id).values('produit_id').annotate(
+            total=Sum('quantite')
+        ).order_by().values_list('produit_id', 'total')
+    )
+
+
+def _ajuster(commande_id, voulues):
+    """Fait passer les réservations de la commande à `voulues` ({produit_id: quantité})"""
+    actuelles = dict(
+        ReservationStock.objects.filter(commande_id=commande_id).values_list('produit_id', 'quantite')
+    )
+    ecarts = {
+        pk: voulues.get(pk, 0) - actuelles.get(pk, 0)
+        for pk in set(voulues) | set(actuelles)
+        if voulues.get(pk, 0) != actuelles.get(pk, 0)
+    }
+    if not ecarts:
+        return
+
+    # Une hausse n'est écrite que si le disponible la couvre
+    condition = Q()
+    for pk, ecart in ecarts.items():
+        condition |= Q(pk=pk, quantite_disponible__gte=ecart) if ecart > 0 else Q(pk=pk)
+    avant = {
+        pk: (disponible, categorie_id) for pk, disponible, categorie_id in
+        Produit.objects.filter(pk__in=ecarts).values_list('pk', 'quantite_disponible', 'categorie_id')
+    }
+    mis_a_jour = Produit.objects.filter(condition).update(
+        quantite_reservee=Case(
+            *[When(pk=pk, then=F('quantite_reservee') + Value(ecart)) for pk, ecart in ecarts.items()],
+            default=F('quantite_reservee'),
+        )
+    )
+    if mis_a_jour != len(ecarts):
+        # Disponibles d'avant l'UPDATE : un produit déjà réservé par cet UPDATE n'est pas mis en cause
+        for pk, ecart in sorted(ecarts.items()):
+            disponible = avant[pk][0] if pk in avant else 0
+            if ecart > 0 and disponible < ecart:
+                raise StockInsuffisant(Produit.objects.get(pk=pk), disponible, ecart)
+        raise Produit.DoesNotExist('Produit introuvable')
+
+    ReservationStock.objects.filter(commande_id=commande_id).exclude(
+        produit_id__in=[pk for pk, quantite in voulues.items() if quantite > 0]
+    ).delete()
+    for pk in ecarts.keys() & actuelles.keys() & voulues.keys():
+        ReservationStock.objects.filter(commande_id=commande_id, produit_id=pk).update(quantite=voulues[pk])
+    ReservationStock.objects.bulk_create([
+        ReservationStock(commande_id=commande_id, produit_id=pk, quantite=voulues[pk])
+        for pk in ecarts.keys() - actuelles.keys()
+    ])
+
+    # UPDATE sans signal : le catalogue ne change que si un produit passe en rupture ou en sort
+    ruptures = {
+        categorie_id for pk, (disponible, categorie_id) in avant.items()
+        if (disponible > 0) != (disponible - ecarts[pk] > 0)
+    }
+    if ruptures:
+        invalider_catalogue(ruptures)
+
+
+def synchroniser(commande, utilisateur=None):
+    """
+    Aligne les réservations (et, à l'expédition, le stock) sur le statut et les
+    lignes de la commande ; lève StockInsuffisant si le disponible ne couvre pas
+    une réservation ou une expédition
+    """
+    with transaction.atomic():
+        # Ligne de la commande verrouillée : deux synchronisations de la même commande s'enchaînent
+        statut, stock_expedie = Commande.objects.select_for_update().filter(pk=commande.pk).values_list(
+            'statut', 'stock_expedie'
+        ).get()
+        quantites = quantites_commande(commande.pk)
+        _ajuster(commande.pk, quantites if statut in STATUTS_RESERVES else {})
+
+        # Sans lignes, rien à sortir : la commande n'est pas marquée expédiée pour autant
+        if statut in STATUTS_EXPEDIES and not stock_expedie and quantites:
+            # Réservation déjà libérée : la sortie ne peut pas prendre le stock réservé par d'autres
+            produits = Produit.objects.in_bulk(quantites)
+            appliquer_mouvements([
+                Mouvement(produits[pk], 'SORTIE', quantite, f'Expédition commande {commande.numero_commande}')
+                for pk, quantite in sorted(quantites.items())
+            ], utilisateur or commande.utilisateur, hors_reservations=True)
+            Commande.objects.filter(pk=commande.pk).update(stock_expedie=True)
+            commande.stock_expedie = True
+
+
+def liberer(commande):
+    """Libère toutes les réservations de la commande (suppression)"""
+    with transaction.atomic():
+        _ajuster(commande.pk, {})
+
+
+def reconstruire():
+    """
+    Reconstruit les réservations à partir des lignes des commandes confirmées, puis
+    quantite_reservee de tous les produits (réparation après des écritures hors de ce
+    module : bulk_create, import) ; retourne le nombre de produits corrigés
+
+    Le disponible n'est pas contrôlé : une réservation qui dépasse le stock le rend négatif.
+    """
+    with transaction.atomic():
+        ReservationStock.objects.all().delete()
+        lignes = LigneCommande.objects.filter(commande__statut__in=STATUTS_RESERVES).values(
+            'commande_id', 'produit_id'
+        ).annotate(total=Sum('quantite')).order_by()
+        ReservationStock.objects.bulk_create([
+            ReservationStock(commande_id=ligne['commande_id'], produit_id=ligne['produit_id'], quantite=ligne['total'])
+            for ligne in lignes.iterator()
+        ], batch_size=500)
+
+        reservees = dict(
+            ReservationStock.objects.values('produit_id').annotate(total=Sum('quantite')).order_by().values_list(
+                'produit_id', 'total'
+            )
+        )
+        corriges = Produit.objects.exclude(quantite_reservee=0).exclude(pk__in=reservees).update(quantite_reservee=0)
+        for pk, total in reservees.items():
+            corriges += Produit.objects.filter(pk=pk).exclude(quantite_reservee=total).update(quantite_reservee=total)
+    if corriges:
+        invalider_catalogue()
+    return corriges
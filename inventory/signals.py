@@ -0,0 +1,135 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import (
+    Vente, Commande, MouvementStock, Devis, Prospect, Produit, Client, Categorie,
+    LigneVente, LigneCommande, LigneDevis, ProspectionTelephonique, InterventionSAV
+)
+from .compteurs_ventes import enregistrer_ventes
+from .statistiques import invalider_statistiques
+from .stats_listes import invalider_stats
+from .recherche import indexer, desindexer
+from .cache_catalogue import invalider_catalogue
+from .cumuls_clients import actualiser as actualiser_cumuls
+from .planning_techniciens import invalider_planning
+from .cache_pdf import LIGNES_DOCUMENT, invalider_pdf, planifier_pre_rendu
+from .reservations import synchroniser, liberer
+
+
+@receiver([post_save, post_delete], sender=Vente)
+@receiver([post_save, post_delete], sender=Commande)
+@receiver([post_save, post_delete], sender=MouvementStock)
+def invalider_statistiques_utilisateur(sender, instance, **kwargs):
+    # Les instantanés du tableau de bord sont recalculés au prochain affichage
+    invalider_statistiques(instance.utilisateur_id)
+
+
+@receiver([post_save, post_delete], sender=Devis)
+@receiver([post_save, post_delete], sender=Prospect)
+def invalider_statistiques_commercial(sender, instance, **kwargs):
+    invalider_statistiques(instance.commercial_id)
+
+
+@receiver([post_save, post_delete], sender=Vente)
+@receiver([post_save, post_delete], sender=Commande)
+@receiver([post_save, post_delete], sender=Devis)
+@receiver([post_save, post_delete], sender=ProspectionTelephonique)
+def invalider_stats_listes(sender, instance, **kwargs):
+    # Badges des pages de liste en cache (voir inventory/stats_listes.py)
+    invalider_stats(sender)
+
+
+@receiver(post_save, sender=Produit)
+@receiver(post_save, sender=Client)
+def indexer_recherche(sender, instance, **kwargs):
+    # Garder l'index plein texte synchronisé (voir inventory/recherche.py)
+    indexer(instance)
+
+
+@receiver(post_delete, sender=Produit)
+@receiver(post_delete, sender=Client)
+def desindexer_recherche(sender, instance, **kwargs):
+    desindexer(instance)
+
+
+@receiver([post_save, post_delete], sender=Produit)
+def invalider_catalogue_produit(sender, instance, **kwargs):
+    # Pages publiques du catalogue en cache (voir inventory/cache_catalogue.py), y compris
+    # celles de l'ancienne catégorie d'un produit déplacé
+    invalider_catalogue(instance.categories_catalogue())
+    if kwargs['signal'] is post_save:
+        instance._categorie_id_charge = instance.categorie_id
+
+
+@receiver([post_save, post_delete], sender=Categorie)
+def invalider_catalogue_categorie(sender, instance, **kwargs):
+    invalider_catalogue([instance.pk], liste_categories=True)
+
+
+@receiver([post_save, post_delete], sender=Vente)
+@receiver([post_save, post_delete], sender=Commande)
+@receiver([post_save, post_delete], sender=Devis)
+def invalider_pdf_document(sender, instance, **kwargs):
+    # Les PDF en cache du document ne correspondent plus (voir inventory/cache_pdf.py)
+    invalider_pdf(sender, instance.pk)
+    if kwargs['signal'] is post_save:
+        planifier_pre_rendu(sender, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=LigneVente)
+@receiver([post_save, post_delete], sender=LigneCommande)
+@receiver([post_save, post_delete], sender=LigneDevis)
+def invalider_pdf_ligne(sender, instance, **kwargs):
+    for model_document, (model_ligne, champ) in LIGNES_DOCUMENT.items():
+        if model_ligne is sender:
+            document_id = getattr(instance, f'{champ}_id')
+            invalider_pdf(model_document, document_id)
+            if kwargs['signal'] is post_save:
+                planifier_pre_rendu(model_document, document_id)
+
+
+@receiver(post_save, sender=LigneVente)
+def compter_ligne_vente(sender, instance, created, **kwargs):
+    # Lignes créées une à une (les ventes saisies passent par bulk_create et enregistrer_ventes)
+    if created:
+        enregistrer_ventes([instance], Vente.objects.filter(pk=instance.vente_id).values_list('date_vente', flat=True).first())
+
+
+@receiver(post_delete, sender=LigneVente)
+def decompter_ligne_vente(sender, instance, **kwargs):
+    enregistrer_ventes([instance], Vente.objects.filter(pk=instance.vente_id).values_list('date_vente', flat=True).first(), signe=-1)
+
+
+@receiver([post_save, post_delete], sender=Vente)
+@receiver([post_save, post_delete], sender=Commande)
+@receiver([post_save, post_delete], sender=Devis)
+def actualiser_cumul_client(sender, instance, **kwargs):
+    # Cumuls du client (voir inventory/cumuls_clients.py), sauf si le client lui-même est supprimé
+    origine = kwargs.get('origin')
+    if isinstance(origine, Client) or getattr(origine, 'model', None) is Client:
+        return
+    # Document passé à un autre client : l'ancien client est recalculé aussi
+    actualiser_cumuls(*instance.clients_cumuls())
+    if kwargs['signal'] is post_save:
+        instance._client_id_charge = instance.client_id
+
+
+@receiver([post_save, post_delete], sender=InterventionSAV)
+def invalider_planning_techniciens(sender, instance, **kwargs):
+    # Planning des techniciens en cache (voir inventory/planning_techniciens.py)
+    invalider_planning()
+
+
+@receiver(post_save, sender=Commande)
+def synchroniser_reservations(sender, instance, created, raw=False, **kwargs):
+    # Réservations de stock selon le statut (voir inventory/reservations.py) ; à la
+    # création ou pendant le remplacement des lignes (commande_update), les lignes ne
+    # sont pas encore enregistrées : calculer_total s'en charge
+    if created or raw or getattr(instance, 'lignes_en_remplacement', False):
+        return
+    synchroniser(instance)
+
+
+@receiver(pre_delete, sender=Commande)
+def liberer_reservations(sender, instance, **kwargs):
+    liberer(instance)
@@ -0,0 +1,277 @@
+"""
+Statistiques pré-calculées du tableau de bord
+
+Les agrégats du dashboard sont stockés dans StatistiqueTableauBord :
+- un instantané 'global' partagé par tous les rôles
+- un instantané 'utilisateur:<id>' par utilisateur (statistiques propres au rôle)
+
+Le dashboard lit les deux instantanés en une seule requête. Un instantané est
+recalculé lorsqu'il est marqué périmé (écriture sur Vente, Commande,
+MouvementStock, Devis ou Prospect) ou lorsqu'il dépasse la durée maximale
+TABLEAU_BORD_STATS_DUREE_MAX (en secondes).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum, Count, F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.models import Profile
+from .compteurs_ventes import produits_populaires as populaires
+from .models import (
+    Produit, Categorie, Fournisseur, Client, Commande, Vente, MouvementStock,
+    Devis, Prospect, AppareilVendu, InterventionSAV, TransfertStock,
+    StatistiqueTableauBord
+)
+
+
+CLE_GLOBALE = 'global'
+
+
+def cle_utilisateur(user_id):
+    return f'utilisateur:{user_id}'
+
+
+def duree_max():
+    """Durée de validité maximale d'un instantané"""
+    return timedelta(seconds=getattr(settings, 'TABLEAU_BORD_STATS_DUREE_MAX', 300))
+
+
+def limite_produits_critiques():
+    """Produits critiques conservés dans l'instantané (les plus bas d'abord ; la liste complète est sur la page du stock)"""
+    return getattr(settings, 'TABLEAU_BORD_PRODUITS_CRITIQUES', 20)
+
+
+# ================== CALCUL DES INSTANTANÉS ==================
+
+def _mouvements(queryset):
+    return [{
+        'produit': {'nom': m['produit__nom']},
+        'type_mouvement': m['type_mouvement'],
+        'get_type_mouvement_display': dict(MouvementStock.TYPE_MOUVEMENT_CHOICES).get(m['type_mouvement'], m['type_mouvement']),
+        'quantite': m['quantite'],
+        'motif': m['motif'],
+        'date_mouvement': m['date_mouvement'],
+        'utilisateur': {
+            'username': m['utilisateur__username'],
+            'get_full_name': f"{m['utilisateur__first_name']} {m['utilisateur__last_name']}".strip(),
+        },
+    } for m in queryset.values(
+        'produit__nom', 'type_mouvement', 'quantite', 'motif', 'date_mouvement',
+        'utilisateur__username', 'utilisateur__first_name', 'utilisateur__last_name'
+    )]
+
+
+def calculer_statistiques_globales():
+    """Calcule les statistiques communes à tous les rôles"""
+    maintenant = timezone.now()
+    debut_mois = timezone.localtime(maintenant).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    aujourd_hui = timezone.localdate()
+
+    produits = Produit.objects.aggregate(
+        total_produits=Count('id', filter=Q(actif=True)),
+        produits_stock_bas=Count('id', filter=Q(actif=True, quantite_stock__lte=F('seuil_alerte'))),
+        valeur_stock=Sum(F('prix_vente') * F('quantite_stock'), filter=Q(actif=True)),
+    )
+
+    ventes_mois = Vente.objects.filter(date_vente__gte=debut_mois).aggregate(
+        total=Sum('total'),
+        count=Count('id')
+    )
+
+    mouvements_jour = MouvementStock.objects.filter(date_mouvement__date=aujourd_hui).aggregate(
+        count=Count('id'),
+        entrees=Sum('quantite', filter=Q(type_mouvement='ENTREE')),
+        sorties=Sum('quantite', filter=Q(type_mouvement='SORTIE')),
+    )
+
+    # Compteurs de ventes sur 30 jours (voir inventory/compteurs_ventes.py)
+    produits_populaires = list(populaires(30, 5).values(
+        'id', 'nom', 'reference', 'prix_vente', 'quantite_stock', 'seuil_alerte', 'total_vendu'
+    ))
+
+    dernieres_ventes = [{
+        'id': v['id'],
+        'numero_vente': v['numero_vente'],
+        'client': {
+            'nom': v['client__nom'],
+            'nom_complet': f"{v['client__prenom']} {v['client__nom']}",
+        } if v['client__nom'] is not None else None,
+        'date_vente': v['date_vente'],
+        'total': v['total'],
+        'lignes': {'count': v['nb_lignes']},
+    } for v in Vente.objects.order_by('-date_vente').annotate(nb_lignes=Count('lignevente')).values(
+        'id', 'numero_vente', 'client__nom', 'client__prenom', 'date_vente', 'total', 'nb_lignes'
+    )[:5]]
+
+    statuts_commande = dict(Commande.STATUT_CHOICES)
+    dernieres_commandes = [{
+        'id': c['id'],
+        'numero_commande': c['numero_commande'],
+        'client': {
+            'nom': c['client__nom'],
+            'nom_complet': f"{c['client__prenom']} {c['client__nom']}",
+        },
+        'date_commande': c['date_commande'],
+        'statut': c['statut'],
+        'get_statut_display': statuts_commande.get(c['statut'], c['statut']),
+    } for c in Commande.objects.order_by('-date_commande').values(
+        'id', 'numero_commande', 'client__nom', 'client__prenom', 'date_commande', 'statut'
+    )[:5]]
+
+    fournisseurs_principaux = list(Fournisseur.objects.annotate(
+        produits_count=Count('produit', filter=Q(produit__actif=True))
+    ).order_by('-produits_count').values('nom', 'produits_count')[:5])
+
+    produits_critiques = list(Produit.objects.filter(
+        actif=True, quantite_stock__lte=F('seuil_alerte')
+    ).order_by('quantite_stock').values('id', 'nom', 'quantite_stock', 'seuil_alerte')[:limite_produits_critiques()])
+
+    return {
+        'total_produits': produits['total_produits'],
+        'total_clients': Client.objects.filter(actif=True).count(),
+        'total_fournisseurs': Fournisseur.objects.filter(actif=True).count(),
+        'total_categories': Categorie.objects.count(),
+        'total_utilisateurs': Profile.objects.count(),
+        'produits_stock_bas': produits['produits_stock_bas'],
+        'valeur_stock': produits['valeur_stock'] or 0,
+        'ventes_mois': ventes_mois,
+        'commandes_attente': Commande.objects.filter(statut__in=['EN_ATTENTE', 'CONFIRMEE']).count(),
+        'mouvements_jour': mouvements_jour['count'],
+        'entrees_jour': mouvements_jour['entrees'] or 0,
+        'sorties_jour': mouvements_jour['sorties'] or 0,
+        'derniers_mouvements': _mouvements(MouvementStock.objects.order_by('-date_mouvement')[:10]),
+        'produits_populaires': produits_populaires,
+        'dernieres_ventes': dernieres_ventes,
+        'dernieres_commandes': dernieres_commandes,
+        'fournisseurs_principaux': fournisseurs_principaux,
+        'produits_critiques': produits_critiques,
+    }
+
+
+def calculer_statistiques_utilisateur(user, role):
+    """Calcule les statistiques propres à l'utilisateur selon son rôle"""
+    debut_mois = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    donnees = {'role': role}
+
+    if role == 'COMMERCIAL_SHOWROOM':
+        donnees['mes_ventes'] = Vente.objects.filter(
+            utilisateur=user, date_vente__gte=debut_mois
+        ).aggregate(total=Sum('total'), count=Count('id'))
+        donnees['mes_commandes'] = Commande.objects.filter(utilisateur=user).aggregate(
+            total=Sum('total', filter=Q(date_commande__gte=debut_mois)),
+            count=Count('id', filter=Q(date_commande__gte=debut_mois)),
+            en_cours=Count('id', filter=Q(statut__in=['EN_ATTENTE', 'CONFIRMEE'])),
+        )
+
+    elif role == 'COMMERCIAL_TERRAIN':
+        donnees['mes_devis'] = Devis.objects.filter(commercial=user).aggregate(
+            total=Count('id'),
+            brouillon=Count('id', filter=Q(statut='BROUILLON')),
+            envoyes=Count('id', filter=Q(statut='ENVOYE')),
+            acceptes=Count('id', filter=Q(statut='ACCEPTE'))
+        )
+        donnees['mes_prospects'] = Prospect.objects.filter(commercial=user).aggregate(
+            total=Count('id'),
+            nouveaux=Count('id', filter=Q(statut='NOUVEAU')),
+            qualifies=Count('id', filter=Q(statut='QUALIFIE')),
+            convertis=Count('id', filter=Q(statut='CONVERTI'))
+        )
+
+    elif role == 'TECHNICIEN':
+        donnees['mes_mouvements'] = _mouvements(
+            MouvementStock.objects.filter(utilisateur=user).order_by('-date_mouvement')[:5]
+        )
+        donnees['mes_appareils'] = AppareilVendu.objects.filter(technicien_responsable=user).aggregate(
+            total=Count('id'),
+            maintenance_due=Count('id', filter=Q(prochaine_maintenance_preventive__lte=timezone.localdate())),
+            en_service=Count('id', filter=Q(statut='EN_SERVICE'))
+        )
+        donnees['mes_interventions'] = InterventionSAV.objects.filter(technicien=user).aggregate(
+            total=Count('id'),
+            planifiees=Count('id', filter=Q(statut='PLANIFIEE')),
+            maintenance_preventive=Count('id', filter=Q(type_intervention='PREVENTIVE'))
+        )
+        donnees['mes_transferts'] = TransfertStock.objects.filter(
+            Q(demandeur=user) | Q(expediteur=user) | Q(recepteur=user)
+        ).aggregate(
+            total=Count('id'),
+            en_attente=Count('id', filter=Q(statut='EN_ATTENTE')),
+            expedies=Count('id', filter=Q(statut='EXPEDIE'))
+        )
+
+    return donnees
+
+
+def _enregistrer(cle, donnees):
+    instantane, _ = StatistiqueTableauBord.objects.update_or_create(
+        cle=cle,
+        defaults={'donnees': donnees, 'perime': False, 'date_calcul': timezone.now()}
+    )
+    # Relire via le même chemin que la base (Decimal/datetime sérialisés)
+    instantane.refresh_from_db(fields=['donnees'])
+    return instantane.donnees
+
+
+def _hydrater(valeur):
+    """Reconvertit les dates sérialisées en JSON pour les filtres de template"""
+    if isinstance(valeur, dict):
+        return {
+            cle: (parse_datetime(v) or v) if cle.startswith('date_') and isinstance(v, str) else _hydrater(v)
+            for cle, v in valeur.items()
+        }
+    if isinstance(valeur, list):
+        return [_hydrater(v) for v in valeur]
+    return valeur
+
+
+def _est_valide(instantane, limite):
+    return instantane is not None and not instantane.perime and instantane.date_calcul >= limite
+
+
+# ================== LECTURE ==================
+
+def obtenir_statistiques(user, role):
+    """
+    Retourne (statistiques globales, statistiques utilisateur) en une seule
+    lecture ; recalcule uniquement les instantanés absents, périmés ou trop anciens.
+    """
+    cles = [CLE_GLOBALE, cle_utilisateur(user.pk)]
+    instantanes = {s.cle: s for s in StatistiqueTableauBord.objects.filter(cle__in=cles)}
+    limite = timezone.now() - duree_max()
+
+    globales = instantanes.get(CLE_GLOBALE)
+    if _est_valide(globales, limite):
+        globales = globales.donnees
+    else:
+        globales = _enregistrer(CLE_GLOBALE, calculer_statistiques_globales())
+
+    personnelles = instantanes.get(cle_utilisateur(user.pk))
+    if _est_valide(personnelles, limite) and personnelles.donnees.get('role') == role:
+        personnelles = personnelles.donnees
+    else:
+        personnelles = _enregistrer(cle_utilisateur(user.pk), calculer_statistiques_utilisateur(user, role))
+
+    return _hydrater(globales), _hydrater(personnelles)
+
+
+# ================== INVALIDATION ET RECONSTRUCTION ==================
+
+def invalider_statistiques(*user_ids):
+    """Marque comme périmés l'instantané global et ceux des utilisateurs indiqués"""
+    cles = [CLE_GLOBALE] + [cle_utilisateur(user_id) for user_id in user_ids if user_id]
+    StatistiqueTableauBord.objects.filter(cle__in=cles, perime=False).update(perime=True)
+
+
+def reconstruire_statistiques():
+    """Recalcule tous les instantanés ; retourne le nombre d'utilisateurs traités"""
+    _enregistrer(CLE_GLOBALE, calculer_statistiques_globales())
+    profils = Profile.objects.select_related('user')
+    for profil in profils:
+        _enregistrer(cle_utilisateur(profil.user_id), calculer_statistiques_utilisateur(profil.user, profil.role))
+    StatistiqueTableauBord.objects.exclude(
+        cle__in=[CLE_GLOBALE] + [cle_utilisateur(p.user_id) for p in profils]
+    ).delete()
+    return len(profils)
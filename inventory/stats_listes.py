@@ -0,0 +1,99 @@
+"""
+Statistiques des badges des pages de liste
+
+Chaque page de liste calcule ses badges (nombre par statut, montants) en une
+seule requête : un aggregate() de Count / Sum conditionnels,
+    SELECT COUNT(id) FILTER (WHERE statut = 'BROUILLON'),
+           COUNT(id) FILTER (WHERE statut = 'ENVOYE'), ... FROM devis
+plutôt qu'un .count() par badge.
+
+Le résultat est gardé STATS_LISTES_DUREE secondes dans le cache Django. La
+clé dépend de l'utilisateur, du SQL du queryset (donc des filtres de la page)
+et des agrégats demandés, ainsi que d'une version par modèle incrémentée à
+chaque écriture (inventory/signals.py) : un badge n'est jamais en retard sur
+une création ou une suppression faite par l'application.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+
+
+PREFIXE = 'stats_listes'
+
+
+def duree():
+    return getattr(settings, 'STATS_LISTES_DUREE', 30)
+
+
+def _cle_version(model):
+    return f'{PREFIXE}:version:{model._meta.label_lower}'
+
+
+def version(model):
+    return cache.get_or_set(_cle_version(model), 1, None)
+
+
+async def aversion(model):
+    return await cache.aget_or_set(_cle_version(model), 1, None)
+
+
+def invalider_stats(model):
+    """Périme les statistiques en cache des listes de `model`"""
+    try:
+        cache.incr(_cle_version(model))
+    except ValueError:
+        cache.set(_cle_version(model), 1, None)
+
+
+def dans(queryset):
+    """Condition « fait partie de queryset », pour compter un sous-ensemble filtré dans un agrégat plus large"""
+    if not queryset.query.where:
+        # Queryset non filtré : toutes les lignes, sans sous-requête
+        return Q(pk__isnull=False)
+    return Q(pk__in=queryset.order_by().values('pk'))
+
+
+def _empreinte(queryset, user, agregats):
+    """Partie de la clé propre au queryset filtré, à l'utilisateur et aux agrégats (None si vide)"""
+    try:
+        # SQL des agrégats sur le queryset filtré (annotate n'est pas exécuté, seulement compilé)
+        sql = str(queryset.annotate(**{f'_{nom}': agregat for nom, agregat in agregats.items()}).query)
+    except EmptyResultSet:
+        return None
+    return f'{getattr(user, "pk", "")}:{hashlib.sha1(sql.encode()).hexdigest()}'
+
+
+def _cle(queryset, version, empreinte):
+    return f'{PREFIXE}:{queryset.model._meta.label_lower}:{version}:{empreinte}'
+
+
+def statistiques(queryset, user=None, **agregats):
+    """queryset.aggregate(**agregats), en une requête et mis en cache par utilisateur et par filtre"""
+    queryset = queryset.order_by()
+    empreinte = _empreinte(queryset, user, agregats)
+    if empreinte is None:
+        return queryset.aggregate(**agregats)
+    cle = _cle(queryset, version(queryset.model), empreinte)
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = queryset.aggregate(**agregats)
+        cache.set(cle, resultat, duree())
+    return resultat
+
+
+async def astatistiques(queryset, user=None, **agregats):
+    """statistiques() pour les vues asynchrones"""
+    queryset = queryset.order_by()
+    empreinte = _empreinte(queryset, user, agregats)
+    if empreinte is None:
+        return await queryset.aaggregate(**agregats)
+    cle = _cle(queryset, await aversion(queryset.model), empreinte)
+    resultat = await cache.aget(cle)
+    if resultat is None:
+        resultat = await queryset.aaggregate(**agregats)
+        await cache.aset(cle, resultat, duree())
+    return resultat
@@ -0,0 +1,151 @@
+"""
+Registre des mouvements de stock
+
+Toute modification de Produit.quantite_stock passe par appliquer_mouvements() :
+le stock n'est jamais lu en Python, modifié puis réenregistré avec save()
+(deux requêtes concurrentes s'écrasaient). Pour un lot de mouvements :
+- une requête UPDATE ... SET quantite_stock = quantite_stock + CASE ... WHERE
+  quantite_stock >= <sortie> applique toutes les variations ; un produit dont
+  le stock ne couvre pas la sortie n'est pas mis à jour et le lot est annulé
+  (StockInsuffisant) ; l'UPDATE est alors défait jusqu'à son point de
+  sauvegarde pour signaler le produit d'après son stock d'avant le lot
+- une requête relit les stocks résultants, d'où sont déduits quantite_avant et
+  quantite_apres de chaque mouvement
+- les mouvements sont insérés avec bulk_create
+
+Aucun verrou n'est pris avant l'écriture : la condition de l'UPDATE suffit à
+empêcher un stock négatif, même entre ventes concurrentes.
+
+Avec hors_reservations, la condition porte sur quantite_disponible : une
+sortie (vente, expédition) ne peut pas prendre le stock retenu par les
+commandes confirmées (voir inventory/reservations.py).
+"""
+
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Case, When, F, Q, Value
+
+from .models import Produit, MouvementStock
+from .statistiques import invalider_statistiques
+from .cache_catalogue import invalider_catalogue
+
+
+# Comme la saisie des mouvements : seules les entrées augmentent le stock
+TYPES_ENTRANTS = {'ENTREE'}
+
+
+class StockInsuffisant(ValueError):
+    def __init__(self, produit, disponible, demande):
+        self.produit = produit
+        self.disponible = disponible
+        self.demande = demande
+        super().__init__(
+            f'Stock insuffisant pour {produit.nom}. Stock disponible: {disponible}, Demandé: {demande}'
+        )
+
+
+@dataclass
+class Mouvement:
+    produit: Produit
+    type_mouvement: str
+    quantite: int
+    motif: str
+    numero_lot: str = ''
+
+    @property
+    def variation(self):
+        return self.quantite if self.type_mouvement in TYPES_ENTRANTS else -self.quantite
+
+
+def appliquer_mouvements(mouvements, utilisateur, hors_reservations=False):
+    """
+    Applique un lot de mouvements de manière atomique et retourne les
+    MouvementStock créés. Les instances Produit reçues sont mises à jour avec
+    le stock résultant. Avec hors_reservations, les sorties ne peuvent pas
+    entamer le stock réservé.
+    """
+    if not mouvements:
+        return []
+
+    variations = {}
+    for mouvement in mouvements:
+        pk = mouvement.produit.pk
+        variations[pk] = variations.get(pk, 0) + mouvement.variation
+
+    # Un produit n'est mis à jour que si son stock (ou son disponible) couvre la sortie nette du lot
+    champ_controle = 'quantite_disponible' if hors_reservations else 'quantite_stock'
+    condition = Q()
+    for pk, variation in variations.items():
+        condition |= Q(pk=pk, **{f'{champ_controle}__gte': -variation}) if variation < 0 else Q(pk=pk)
+
+    with transaction.atomic():
+        with transaction.atomic():
+            mis_a_jour = Produit.objects.filter(condition).update(
+                quantite_stock=Case(
+                    *[When(pk=pk, then=F('quantite_stock') + Value(variation)) for pk, variation in variations.items()],
+                    default=F('quantite_stock'),
+                )
+            )
+            if mis_a_jour != len(variations):
+                # Lot refusé : UPDATE annulé (point de sauvegarde) pour relire les stocks d'avant le lot
+                transaction.set_rollback(True)
+
+        if mis_a_jour != len(variations):
+            # Le premier produit dont la sortie dépasse son stock d'avant le lot est signalé
+            avant = dict(Produit.objects.filter(pk__in=variations).values_list('pk', champ_controle))
+            for mouvement in mouvements:
+                pk = mouvement.produit.pk
+                if variations[pk] < 0 and avant.get(pk, 0) < -variations[pk]:
+                    raise StockInsuffisant(mouvement.produit, avant.get(pk, 0), -variations[pk])
+            raise Produit.DoesNotExist('Produit introuvable')
+
+        lus = {
+            pk: (stock, disponible) for pk, stock, disponible in
+            Produit.objects.filter(pk__in=variations).values_list('pk', 'quantite_stock', 'quantite_disponible')
+        }
+        stocks = {pk: stock for pk, (stock, disponible) in lus.items()}
+        disponibles = {pk: disponible for pk, (stock, disponible) in lus.items()}
+
+        # Stock de départ de chaque produit, puis cumul dans l'ordre du lot
+        courant = {pk: stocks[pk] - variation for pk, variation in variations.items()}
+        objets = []
+        for mouvement in mouvements:
+            produit = mouvement.produit
+            quantite_avant = courant[produit.pk]
+            courant[produit.pk] += mouvement.variation
+            produit.quantite_stock = stocks[produit.pk]
+            produit.quantite_disponible = disponibles[produit.pk]
+            objets.append(MouvementStock(
+                produit=produit,
+                type_mouvement=mouvement.type_mouvement,
+                quantite=mouvement.quantite,
+                quantite_avant=quantite_avant,
+                quantite_apres=courant[produit.pk],
+                motif=mouvement.motif,
+                numero_lot=mouvement.numero_lot,
+                utilisateur=utilisateur,
+            ))
+        crees = MouvementStock.objects.bulk_create(objets)
+
+        # bulk_create n'envoie pas post_save : invalider comme le signal des mouvements
+        invalider_statistiques(utilisateur.pk)
+
+        # UPDATE sans signal de Produit : le catalogue public ne change que si un produit
+        # passe en rupture de disponible ou en sort (la quantité affichée est reprise à l'expiration du cache)
+        ruptures = set()
+        for pk, variation in variations.items():
+            if (disponibles[pk] > 0) != (disponibles[pk] - variation > 0):
+                ruptures.add(next(m.produit.categorie_id for m in mouvements if m.produit.pk == pk))
+        if ruptures:
+            invalider_catalogue(ruptures)
+    return crees
+
+
+def mouvement_ajustement(produit, ancien_stock, nouveau_stock, motif):
+    """Mouvement d'entrée ou de sortie qui fait passer le stock de ancien_stock à nouveau_stock (None si inchangé)"""
+    if nouveau_stock == ancien_stock:
+        return None
+    if nouveau_stock > ancien_stock:
+        return Mouvement(produit, 'ENTREE', nouveau_stock - ancien_stock, motif)
+    return Mouvement(produit, 'SORTIE', ancien_stock - nouveau_stock, motif)
@@ -1,6 +1,7 @@
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 from decimal import Decimal
 from datetime import date, datetime, timedelta
@@ -9,8 +10,12 @@ from .models import (
     Categorie, Fournisseur, Produit, Client as ClientModel, 
     Commande, LigneCommande, Vente, LigneVente, MouvementStock,
     Devis, LigneDevis, Prospect, NoteObservation, AppareilVendu, 
-    InterventionSAV, TransfertStock
+    InterventionSAV, TransfertStock, StatistiqueTableauBord, CompteurDocument,
+    ProspectionTelephonique, ClotureStock, VenteProduitJour, CompteurVentesProduit, CumulClient,
+    SuggestionReappro, CommandeFournisseur, ReservationStock
 )
+from .compteurs_ventes import compacter, reconstruire, produits_populaires
+from .cumuls_clients import reconstruire as reconstruire_cumuls
 
 
 class CategorieModelTest(TestCase):
@@ -823,6 +828,2178 @@ class SecurityTest(TestCase):
         self.assertEqual(response.status_code, 403)
 
 
+class StatistiqueTableauBordTest(TestCase):
+    """Tests pour les statistiques pré-calculées du tableau de bord"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username="showroom",
+            password="testpass123"
+        )
+        self.user.profile.role = "COMMERCIAL_SHOWROOM"
+        self.user.profile.save()
+        self.client.login(username="showroom", password="testpass123")
+    
+    def test_instantanes_crees_au_premier_affichage(self):
+        response = self.client.get(reverse('inventory:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        cles = set(StatistiqueTableauBord.objects.values_list('cle', flat=True))
+        self.assertEqual(cles, {'global', f'utilisateur:{self.user.pk}'})
+    
+    def test_instantanes_reutilises(self):
+        self.client.get(reverse('inventory:dashboard'))
+        date_calcul = StatistiqueTableauBord.objects.get(cle='global').date_calcul
+        self.client.get(reverse('inventory:dashboard'))
+        self.assertEqual(StatistiqueTableauBord.objects.get(cle='global').date_calcul, date_calcul)
+    
+    def test_invalidation_apres_vente(self):
+        self.client.get(reverse('inventory:dashboard'))
+        Vente.objects.create(
+            numero_vente="VTE-STAT-001",
+            utilisateur=self.user,
+            mode_paiement='ESPECES',
+            total=Decimal("150.00")
+        )
+        self.assertTrue(StatistiqueTableauBord.objects.get(cle='global').perime)
+        self.assertTrue(StatistiqueTableauBord.objects.get(cle=f'utilisateur:{self.user.pk}').perime)
+        
+        response = self.client.get(reverse('inventory:dashboard'))
+        self.assertEqual(response.context['ventes_mois']['count'], 1)
+        self.assertEqual(response.context['mes_ventes']['count'], 1)
+        self.assertFalse(StatistiqueTableauBord.objects.get(cle='global').perime)
+    
+    def test_commande_reconstruction(self):
+        from django.core.management import call_command
+        from io import StringIO
+        call_command('rebuild_dashboard_stats', stdout=StringIO())
+        self.assertTrue(StatistiqueTableauBord.objects.filter(cle='global', perime=False).exists())
+        self.assertTrue(StatistiqueTableauBord.objects.filter(cle=f'utilisateur:{self.user.pk}').exists())
+    
+    def test_produits_critiques_bornes_avec_lien(self):
+        technicien = User.objects.create_user(username="technicien", password="testpass123")
+        technicien.profile.role = "TECHNICIEN"
+        technicien.profile.save()
+        categorie = Categorie.objects.create(nom="Consommables")
+        fournisseur = Fournisseur.objects.create(
+            nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0"
+        )
+        for i in range(3):
+            Produit.objects.create(
+                nom=f"Critique {i}", reference=f"CRIT-{i}", categorie=categorie, fournisseur=fournisseur,
+                prix_achat=Decimal("1.00"), prix_vente=Decimal("2.00"), quantite_stock=i, seuil_alerte=5,
+            )
+        self.client.login(username="technicien", password="testpass123")
+        with self.settings(TABLEAU_BORD_PRODUITS_CRITIQUES=2):
+            response = self.client.get(reverse('inventory:dashboard'))
+        self.assertEqual([p['nom'] for p in response.context['produits_critiques']], ["Critique 0", "Critique 1"])
+        self.assertContains(response, "Voir tout (3 produits en stock bas)")
+
+
+class NumerotationDocumentTest(TestCase):
+    """Tests pour la numérotation atomique des documents"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="numerotation", password="testpass123")
+        self.client_obj = ClientModel.objects.create(
+            nom="Durand",
+            prenom="Paul",
+            email="paul.durand@email.fr",
+            telephone="0123456789",
+            adresse="1 Rue Test",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.annee = date.today().year
+    
+    def creer_devis(self):
+        return Devis.objects.create(
+            client=self.client_obj,
+            commercial=self.user,
+            date_validite=date.today() + timedelta(days=30)
+        )
+    
+    def test_numeros_devis_sequentiels(self):
+        numeros = [self.creer_devis().numero_devis for _ in range(3)]
+        self.assertEqual(numeros, [f"DEV{self.annee}{n:04d}" for n in (1, 2, 3)])
+        self.assertEqual(CompteurDocument.objects.get(cle=f"DEV{self.annee}").valeur, 3)
+    
+    def test_compteur_amorce_depuis_numeros_existants(self):
+        Devis.objects.create(
+            numero_devis=f"DEV{self.annee}0041",
+            client=self.client_obj,
+            commercial=self.user,
+            date_validite=date.today()
+        )
+        self.assertEqual(self.creer_devis().numero_devis, f"DEV{self.annee}0042")
+    
+    def test_numero_vente_et_commande_automatiques(self):
+        vente = Vente.objects.create(utilisateur=self.user, mode_paiement='ESPECES')
+        commande = Commande.objects.create(
+            client=self.client_obj,
+            utilisateur=self.user,
+            adresse_livraison="1 Rue Test"
+        )
+        self.assertEqual(vente.numero_vente, f"VTE-{self.annee}-00001")
+        self.assertEqual(commande.numero_commande, f"CMD-{self.annee}-00001")
+    
+    def test_preallocation_par_bloc(self):
+        from django.test import override_settings
+        from inventory import numerotation
+        numerotation._blocs.clear()
+        numeros = []
+        with override_settings(NUMEROTATION_TAILLE_BLOC=10):
+            for _ in range(3):
+                # Une transaction validée par devis (bloc publié à la validation)
+                with self.captureOnCommitCallbacks(execute=True):
+                    numeros.append(self.creer_devis().numero_devis)
+        numerotation._blocs.clear()
+        self.assertEqual(len(set(numeros)), 3)
+        # Un seul bloc réservé pour les trois devis
+        self.assertEqual(CompteurDocument.objects.get(cle=f"DEV{self.annee}").valeur, 10)
+    
+    def test_bloc_annule_non_distribue(self):
+        from django.db import transaction
+        from django.test import override_settings
+        from inventory import numerotation
+        numerotation._blocs.clear()
+        with override_settings(NUMEROTATION_TAILLE_BLOC=10):
+            # Bloc réservé dans une transaction annulée (stock insuffisant, ...)
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.creer_devis()
+                raise ValueError('Annulation')
+            self.assertEqual(numerotation._blocs, {})
+            with self.captureOnCommitCallbacks(execute=True):
+                numero = self.creer_devis().numero_devis
+        numerotation._blocs.clear()
+        # Le compteur est revenu en arrière : la séquence repart sans doublon
+        self.assertEqual(numero, f"DEV{self.annee}0001")
+    
+    def test_bloc_en_attente_reutilise_dans_la_transaction(self):
+        from django.test import override_settings
+        from inventory import numerotation
+        numerotation._blocs.clear()
+        with override_settings(NUMEROTATION_TAILLE_BLOC=10):
+            # Plusieurs documents dans une seule transaction (import, lot, ...)
+            with self.captureOnCommitCallbacks(execute=True):
+                numeros = [self.creer_devis().numero_devis for _ in range(3)]
+                self.assertEqual(CompteurDocument.objects.get(cle=f"DEV{self.annee}").valeur, 10)
+            suivant = self.creer_devis().numero_devis
+        numerotation._blocs.clear()
+        self.assertEqual(numeros, [f"DEV{self.annee}{n:04d}" for n in (1, 2, 3)])
+        # Le reste du bloc est publié à la validation, sans numéro perdu
+        self.assertEqual(suivant, f"DEV{self.annee}0004")
+        self.assertEqual(CompteurDocument.objects.get(cle=f"DEV{self.annee}").valeur, 10)
+
+
+class LignesSaisieTest(TestCase):
+    """Tests pour la saisie groupée des lignes (commandes, ventes)"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="vendeur", password="testpass123")
+        self.user.profile.role = "COMMERCIAL_SHOWROOM"
+        self.user.profile.save()
+        self.client.login(username="vendeur", password="testpass123")
+        categorie = Categorie.objects.create(nom="Consommables")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.produits = [
+            Produit.objects.create(
+                nom=f"Produit {i}",
+                reference=f"LIG-{i}",
+                categorie=categorie,
+                fournisseur=fournisseur,
+                prix_achat=Decimal("10.00"),
+                prix_vente=Decimal("20.00"),
+                quantite_stock=10
+            ) for i in range(3)
+        ]
+        self.client_obj = ClientModel.objects.create(
+            nom="Durand",
+            prenom="Paul",
+            email="paul.durand@email.fr",
+            telephone="0123456789",
+            adresse="1 Rue Test",
+            ville="Paris",
+            code_postal="75001"
+        )
+    
+    def donnees_lignes(self, quantites):
+        data = {}
+        for i, (produit, quantite) in enumerate(zip(self.produits, quantites)):
+            data[f'ligne_{i}_produit'] = produit.pk
+            data[f'ligne_{i}_quantite'] = quantite
+            data[f'ligne_{i}_prix_unitaire'] = '20.00'
+        return data
+    
+    def test_vente_decremente_stock_et_cree_mouvements(self):
+        data = {'mode_paiement': 'ESPECES', 'remise': '0', 'action': 'finalize'}
+        data.update(self.donnees_lignes([2, 3, 1]))
+        response = self.client.post(reverse('inventory:vente_create'), data)
+        
+        vente = Vente.objects.get()
+        self.assertRedirects(response, reverse('inventory:vente_detail', args=[vente.pk]))
+        self.assertEqual(vente.lignevente_set.count(), 3)
+        self.assertEqual(vente.total, Decimal("120.00"))
+        stocks = [Produit.objects.get(pk=p.pk).quantite_stock for p in self.produits]
+        self.assertEqual(stocks, [8, 7, 9])
+        mouvement = MouvementStock.objects.get(produit=self.produits[1])
+        self.assertEqual((mouvement.quantite_avant, mouvement.quantite_apres), (10, 7))
+    
+    def test_vente_stock_insuffisant_annule_tout(self):
+        data = {'mode_paiement': 'ESPECES', 'remise': '0'}
+        data.update(self.donnees_lignes([2, 50, 1]))
+        response = self.client.post(reverse('inventory:vente_create'), data)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Vente.objects.exists())
+        self.assertFalse(MouvementStock.objects.exists())
+        self.assertEqual(Produit.objects.get(pk=self.produits[0].pk).quantite_stock, 10)
+        erreurs = [str(m) for m in response.context['messages']]
+        self.assertIn("Stock insuffisant pour Produit 1. Stock disponible: 10, Demandé: 50", erreurs)
+    
+    def test_commande_lignes_invalides_signalees_par_ligne(self):
+        data = {'client': self.client_obj.pk, 'statut': 'EN_ATTENTE', 'adresse_livraison': '1 Rue Test'}
+        data.update(self.donnees_lignes([2, 0, 1]))
+        data['ligne_2_produit'] = 999999
+        response = self.client.post(reverse('inventory:commande_create'), data)
+        
+        self.assertFalse(Commande.objects.exists())
+        erreurs = [str(m) for m in response.context['messages']]
+        self.assertIn("Produit 1: La quantité doit être positive", erreurs)
+        self.assertIn("Ligne 3: Produit introuvable", erreurs)
+    
+    def test_commande_creee_avec_toutes_ses_lignes(self):
+        data = {'client': self.client_obj.pk, 'statut': 'EN_ATTENTE', 'adresse_livraison': '1 Rue Test'}
+        data.update(self.donnees_lignes([2, 3, 1]))
+        response = self.client.post(reverse('inventory:commande_create'), data)
+        
+        commande = Commande.objects.get()
+        self.assertRedirects(response, reverse('inventory:commande_detail', args=[commande.pk]), fetch_redirect_response=False)
+        self.assertEqual(commande.lignecommande_set.count(), 3)
+        self.assertEqual(commande.statut, 'CONFIRMEE')
+
+
+class CalculTotalSQLTest(TestCase):
+    """Tests pour le calcul des totaux en SQL"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="totaux", password="testpass123")
+        categorie = Categorie.objects.create(nom="Diagnostic")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.produit = Produit.objects.create(
+            nom="Tensiomètre",
+            reference="TOT-001",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("10.00"),
+            prix_vente=Decimal("20.00"),
+            quantite_stock=10
+        )
+        self.client_obj = ClientModel.objects.create(
+            nom="Durand",
+            prenom="Paul",
+            email="paul.durand@email.fr",
+            telephone="0123456789",
+            adresse="1 Rue Test",
+            ville="Paris",
+            code_postal="75001"
+        )
+    
+    def test_total_vente_avec_remise(self):
+        vente = Vente.objects.create(utilisateur=self.user, mode_paiement='CARTE', remise=Decimal("10"))
+        LigneVente.objects.create(vente=vente, produit=self.produit, quantite=3, prix_unitaire=Decimal("33.33"))
+        self.assertEqual(vente.calculer_total(), Decimal("89.99"))
+        self.assertEqual(Vente.objects.get(pk=vente.pk).total, Decimal("89.99"))
+    
+    def test_total_devis_avec_remise_par_ligne(self):
+        devis = Devis.objects.create(client=self.client_obj, commercial=self.user, date_validite=date.today())
+        LigneDevis.objects.create(devis=devis, produit=self.produit, quantite=2, prix_unitaire=Decimal("100"), remise=Decimal("12.5"))
+        LigneDevis.objects.create(devis=devis, produit=self.produit, quantite=1, prix_unitaire=Decimal("50"))
+        self.assertEqual(devis.calculer_total(), Decimal("225.00"))
+    
+    def test_total_commande_sans_ligne(self):
+        commande = Commande.objects.create(client=self.client_obj, utilisateur=self.user, adresse_livraison="1 Rue Test", total=Decimal("99"))
+        self.assertEqual(commande.calculer_total(), Decimal("0"))
+    
+    def test_commande_recompute_totals(self):
+        from django.core.management import call_command
+        from io import StringIO
+        commande = Commande.objects.create(client=self.client_obj, utilisateur=self.user, adresse_livraison="1 Rue Test")
+        LigneCommande.objects.create(commande=commande, produit=self.produit, quantite=4, prix_unitaire=Decimal("12.50"))
+        vente = Vente.objects.create(utilisateur=self.user, mode_paiement='CARTE', total=Decimal("1"))
+        
+        sortie = StringIO()
+        call_command('recompute_totals', stdout=sortie)
+        self.assertEqual(Commande.objects.get(pk=commande.pk).total, Decimal("50.00"))
+        self.assertEqual(Vente.objects.get(pk=vente.pk).total, Decimal("0"))
+        self.assertIn("1 total(aux) corrigé(s)", sortie.getvalue())
+
+
+class PlanRequetesListesTest(TestCase):
+    """Vérifie via EXPLAIN que les requêtes exécutées par les pages de liste utilisent un index"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="explain", password="testpass123")
+        self.client.login(username="explain", password="testpass123")
+        categorie = Categorie.objects.create(nom="Explain")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions", email="contact@medtech.fr", telephone="0123456789",
+            adresse="123 Rue de la Santé", ville="Paris", code_postal="75001"
+        )
+        self.produit = Produit.objects.create(
+            nom="Produit explain", reference="EXP-1", categorie=categorie, fournisseur=fournisseur,
+            prix_achat=Decimal("1.00"), prix_vente=Decimal("2.00"), quantite_stock=5
+        )
+        self.client_liste = ClientModel.objects.create(nom="Explain", prenom="Client", email="explain@client.fr", telephone="0600000000")
+        # Une ligne par liste : une page vide n'exécute pas la requête de la page
+        from django.utils import timezone
+        Commande.objects.create(client=self.client_liste, utilisateur=self.user, adresse_livraison="1 Rue Test")
+        vente = Vente.objects.create(client=self.client_liste, utilisateur=self.user, mode_paiement='CARTE')
+        MouvementStock.objects.create(produit=self.produit, type_mouvement="ENTREE", quantite=1, quantite_avant=4, quantite_apres=5, motif="Réception", utilisateur=self.user)
+        appareil = AppareilVendu.objects.create(
+            produit=self.produit, numero_serie="SN-EXP-1", client=self.client_liste, vente=vente,
+            date_installation=date.today(), lieu_installation="Salle 1",
+            prochaine_maintenance_preventive=date.today(), technicien_responsable=self.user
+        )
+        InterventionSAV.objects.create(
+            type_intervention="PREVENTIVE", appareil=appareil, technicien=self.user,
+            date_prevue=timezone.now(), duree_prevue=60, description="Maintenance préventive"
+        )
+        Devis.objects.create(client=self.client_liste, commercial=self.user, date_validite=date.today() + timedelta(days=30))
+        Prospect.objects.create(nom="Prospect", prenom="Explain", email="prospect@explain.fr", telephone="0600000000", commercial=self.user)
+        TransfertStock.objects.create(produit=self.produit, quantite=1, demandeur=self.user)
+        ProspectionTelephonique.objects.create(
+            nom_complet="Dr Explain", numero_telephone="0601020304", description="Appel", type_appel='SORTANT', commercial=self.user
+        )
+    
+    def pages_listes(self):
+        return [
+            # (vue, arguments, paramètres GET, rôle, table, index attendu)
+            ('commandes_list', None, {}, 'MANAGER', 'inventory_commande', 'commande_date_idx'),
+            ('commandes_list', None, {'statut': 'EN_ATTENTE'}, 'MANAGER', 'inventory_commande', 'commande_statut_date_idx'),
+            ('client_detail', [self.client_liste.pk], {}, 'MANAGER', 'inventory_commande', 'commande_client_date_idx'),
+            ('ventes_list', None, {}, 'MANAGER', 'inventory_vente', 'vente_date_idx'),
+            ('client_detail', [self.client_liste.pk], {}, 'MANAGER', 'inventory_vente', 'vente_client_date_idx'),
+            ('produit_detail', [self.produit.pk], {}, 'MANAGER', 'inventory_mouvementstock', 'mouvement_produit_date_idx'),
+            ('dashboard', None, {}, 'MANAGER', 'inventory_mouvementstock', 'mouvement_date_idx'),
+            ('stock_list', None, {'stock_bas': '1'}, 'MANAGER', 'inventory_produit', 'produit_stock_bas_idx'),
+            ('client_homepage', None, {}, 'MANAGER', 'inventory_produit', 'produit_catalogue_idx'),
+            ('appareil_list', None, {}, 'TECHNICIEN', 'inventory_appareilvendu', 'appareil_tech_maint_idx'),
+            ('appareil_list', None, {'maintenance_due': 'true'}, 'MANAGER', 'inventory_appareilvendu', 'appareil_maintenance_idx'),
+            ('intervention_list', None, {}, 'MANAGER', 'inventory_interventionsav', 'intervention_date_idx'),
+            ('intervention_list', None, {'statut': 'PLANIFIEE'}, 'TECHNICIEN', 'inventory_interventionsav', 'intervention_tech_statut_idx'),
+            ('devis_list', None, {}, 'MANAGER', 'inventory_devis', 'devis_date_idx'),
+            ('devis_list', None, {'statut': 'BROUILLON'}, 'COMMERCIAL_TERRAIN', 'inventory_devis', 'devis_com_statut_date_idx'),
+            ('prospect_list', None, {'statut': 'NOUVEAU'}, 'COMMERCIAL_TERRAIN', 'inventory_prospect', 'prospect_com_statut_date_idx'),
+            ('transfert_list', None, {'statut': 'EN_ATTENTE'}, 'MANAGER', 'inventory_transfertstock', 'transfert_statut_date_idx'),
+            ('prospection_list', None, {}, 'MANAGER', 'inventory_prospectiontelephonique', 'prospection_date_idx'),
+            ('prospection_list', None, {'statut': 'RDV'}, 'COMMERCIAL_TERRAIN', 'inventory_prospectiontelephonique', 'prospection_com_statut_idx'),
+        ]
+    
+    def plans(self, vue, arguments, parametres, table):
+        """Plans EXPLAIN QUERY PLAN des requêtes de la vue qui lisent `table`"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as capture:
+            response = self.client.get(reverse(f'inventory:{vue}', args=arguments), parametres)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for requete in capture.captured_queries:
+                sql = requete['sql']
+                if sql.startswith('SELECT') and f'FROM "{table}"' in sql:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plans.append('\n'.join(str(ligne[-1]) for ligne in cursor.fetchall()))
+        return plans
+    
+    def test_listes_utilisent_un_index(self):
+        from django.db import connection
+        if connection.vendor != 'sqlite':
+            self.skipTest("Plans EXPLAIN vérifiés uniquement sous SQLite")
+        for vue, arguments, parametres, role, table, index in self.pages_listes():
+            with self.subTest(vue=vue, parametres=parametres, index=index):
+                self.user.profile.role = role
+                self.user.profile.save()
+                plans = [plan for plan in self.plans(vue, arguments, parametres, table) if index in plan]
+                self.assertTrue(plans, f'{vue} : aucune requête sur {table} ne passe par {index}')
+                for plan in plans:
+                    self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+
+class RecherchePleinTexteTest(TestCase):
+    """Tests pour la recherche plein texte des produits et des clients"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="recherche", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.client.login(username="recherche", password="testpass123")
+        categorie = Categorie.objects.create(nom="Imagerie")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.echographe = Produit.objects.create(
+            nom="Échographe portable",
+            reference="ECH-2024",
+            description="Sonde linéaire haute fréquence",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("1000.00"),
+            prix_vente=Decimal("1500.00"),
+            quantite_stock=5
+        )
+        self.stethoscope = Produit.objects.create(
+            nom="Stéthoscope",
+            reference="STH-001",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("50.00"),
+            prix_vente=Decimal("80.00"),
+            quantite_stock=5
+        )
+        ClientModel.objects.create(
+            nom="Hôpital Général",
+            prenom="Service",
+            email="achats@hopital.fr",
+            telephone="0145000000",
+            adresse="1 Rue Test",
+            ville="Paris",
+            code_postal="75001"
+        )
+    
+    def test_recherche_sans_accents_et_par_prefixe(self):
+        from inventory.recherche import rechercher
+        self.assertEqual(list(rechercher(Produit.objects.all(), "echo")), [self.echographe])
+        self.assertEqual(list(rechercher(Produit.objects.all(), "stetho")), [self.stethoscope])
+        self.assertEqual(list(rechercher(Produit.objects.all(), "sonde lin")), [self.echographe])
+        self.assertEqual(list(rechercher(Produit.objects.all(), "STH-001")), [self.stethoscope])
+
+    def test_repli_trigrammes_postgres(self):
+        from inventory.recherche import backend, rechercher
+        if backend() != 'postgres':
+            self.skipTest("Colonnes de recherche PostgreSQL absentes")
+        # Faute de frappe : aucun préfixe ne correspond, les trigrammes retrouvent le produit
+        self.assertEqual(list(rechercher(Produit.objects.all(), "stetoscope")), [self.stethoscope])
+        self.assertEqual(list(rechercher(Produit.objects.all(), "Echographe")), [self.echographe])
+
+    def test_index_synchronise_apres_modification_et_suppression(self):
+        from inventory.recherche import rechercher
+        self.stethoscope.nom = "Tensiomètre"
+        self.stethoscope.save()
+        self.assertFalse(rechercher(Produit.objects.all(), "stetho").exists())
+        self.assertTrue(rechercher(Produit.objects.all(), "tensiometre").exists())
+        self.stethoscope.delete()
+        self.assertFalse(rechercher(Produit.objects.all(), "tensio").exists())
+    
+    def test_api_produit_search(self):
+        response = self.client.get(reverse('inventory:api_produit_search'), {'q': 'écho'})
+        resultats = response.json()['results']
+        self.assertEqual([r['id'] for r in resultats], [self.echographe.id])
+    
+    def test_api_client_search(self):
+        response = self.client.get(reverse('inventory:api_client_search'), {'q': 'hopital'})
+        self.assertEqual(len(response.json()['results']), 1)
+    
+    def test_catalogue_recherche(self):
+        response = self.client.get(reverse('inventory:ecommerce_catalogue'), {'search': 'portable'})
+        self.assertEqual(list(response.context['page_obj']), [self.echographe])
+
+
+class ExportDonneesTest(TestCase):
+    """Tests pour les exports CSV en flux des listes"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="export", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.client.login(username="export", password="testpass123")
+        categorie = Categorie.objects.create(nom="Imagerie")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.produit = Produit.objects.create(
+            nom="Échographe portable",
+            reference="ECH-2024",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("1000.00"),
+            prix_vente=Decimal("1500.00"),
+            quantite_stock=5
+        )
+        self.vente_carte = Vente.objects.create(mode_paiement='CARTE', utilisateur=self.user)
+        LigneVente.objects.create(vente=self.vente_carte, produit=self.produit, quantite=2, prix_unitaire=Decimal("1500.00"))
+        self.vente_especes = Vente.objects.create(mode_paiement='ESPECES', utilisateur=self.user)
+    
+    def lire_csv(self, response):
+        import csv
+        contenu = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(contenu.startswith('\ufeff'))
+        return list(csv.reader(contenu[1:].splitlines(), delimiter=';'))
+    
+    def test_export_ventes_applique_les_filtres_de_la_liste(self):
+        response = self.client.get(
+            reverse('inventory:export_donnees', args=['ventes']), {'mode_paiement': 'CARTE'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lignes = self.lire_csv(response)
+        self.assertEqual(lignes[0][0], 'Numéro')
+        self.assertEqual([ligne[0] for ligne in lignes[1:]], [self.vente_carte.numero_vente])
+        self.assertEqual(lignes[1][3], 'Carte bancaire')
+    
+    def test_export_lignes_vente(self):
+        lignes = self.lire_csv(self.client.get(reverse('inventory:export_donnees', args=['lignes_vente'])))
+        self.assertEqual(len(lignes), 2)
+        self.assertEqual(lignes[1][3], 'ECH-2024')
+        self.assertEqual(Decimal(lignes[1][-1]), Decimal("3000.00"))
+    
+    def test_export_refuse_sans_permission(self):
+        User.objects.create_user(username="tech_export", password="testpass123")
+        self.client.login(username="tech_export", password="testpass123")
+        response = self.client.get(reverse('inventory:export_donnees', args=['ventes']))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('inventory:export_donnees', args=['inconnu']))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_export_prospections_compatible(self):
+        ProspectionTelephonique.objects.create(
+            nom_complet="Dr Martin",
+            numero_telephone="0601020304",
+            description="Intéressé par un échographe",
+            type_appel='SORTANT',
+            statut='RDV',
+            commercial=self.user
+        )
+        lignes = self.lire_csv(self.client.get(reverse('inventory:prospection_export_excel'), {'statut': 'RDV'}))
+        self.assertEqual(lignes[0][0], 'Nom Complet')
+        self.assertEqual(lignes[1][:5], ['Dr Martin', '0601020304', '', 'Appel sortant', 'RDV'])
+
+
+class CachePDFTest(TestCase):
+    """Tests pour le cache disque des PDF de documents"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        self.repertoire = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repertoire, ignore_errors=True)
+        reglages = override_settings(PDF_CACHE_ROOT=self.repertoire)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        
+        self.client = Client()
+        self.user = User.objects.create_user(username="pdf", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.client.login(username="pdf", password="testpass123")
+        categorie = Categorie.objects.create(nom="Diagnostic")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.produit = Produit.objects.create(
+            nom="Tensiomètre",
+            reference="PDF-001",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("10.00"),
+            prix_vente=Decimal("20.00"),
+            quantite_stock=10
+        )
+        self.vente = Vente.objects.create(utilisateur=self.user, mode_paiement='CARTE')
+        self.ligne = LigneVente.objects.create(vente=self.vente, produit=self.produit, quantite=2, prix_unitaire=Decimal("20.00"))
+    
+    def test_rendu_unique_tant_que_le_document_ne_change_pas(self):
+        from unittest import mock
+        from inventory.cache_pdf import RENDUS, pdf_en_cache
+        rendu = mock.Mock(return_value=b'%PDF-1.4 test')
+        with mock.patch.dict(RENDUS, {'test': (Vente, rendu)}):
+            self.assertEqual(pdf_en_cache(self.vente, 'test'), b'%PDF-1.4 test')
+            pdf_en_cache(self.vente, 'test')
+            self.assertEqual(rendu.call_count, 1)
+            
+            self.ligne.quantite = 3
+            self.ligne.save()
+            pdf_en_cache(self.vente, 'test')
+            self.assertEqual(rendu.call_count, 2)
+    
+    def test_vue_vente_servie_depuis_le_cache(self):
+        import os
+        from inventory.cache_pdf import repertoire_document
+        response = self.client.get(reverse('inventory:vente_print', args=[self.vente.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        fichiers = os.listdir(repertoire_document(Vente, self.vente.pk))
+        self.assertEqual(len(fichiers), 1)
+        self.assertTrue(fichiers[0].startswith('facture_vente-'))
+        
+        self.vente.notes = "Livraison urgente"
+        self.vente.save()
+        self.assertFalse(os.path.exists(repertoire_document(Vente, self.vente.pk)))
+    
+    def test_pre_rendu_de_tous_les_types_du_document(self):
+        import os
+        from inventory.cache_pdf import pre_rendre, repertoire_document
+        pre_rendre(Vente, self.vente.pk)
+        types = sorted(f.rsplit('-', 1)[0] for f in os.listdir(repertoire_document(Vente, self.vente.pk)))
+        self.assertEqual(types, ['facture_vente', 'facture_vente_simple', 'proforma_vente'])
+
+
+class MoteurPDFTest(TestCase):
+    """Tests pour le moteur de rendu ReportLab des documents"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="moteur", password="testpass123")
+        categorie = Categorie.objects.create(nom="Imagerie")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        produit = Produit.objects.create(
+            nom="Échographe portable",
+            reference="MOT-001",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("100.00"),
+            prix_vente=Decimal("150.00"),
+            quantite_stock=5
+        )
+        client = ClientModel.objects.create(
+            nom="Martin", prenom="Claire", email="claire@example.com", telephone="0102030405",
+            adresse="2 Rue Test", ville="Paris", code_postal="75002"
+        )
+        self.commande = Commande.objects.create(client=client, utilisateur=self.user, adresse_livraison="2 Rue Test")
+        LigneCommande.objects.create(commande=self.commande, produit=produit, quantite=2, prix_unitaire=Decimal("150.00"))
+        self.vente = Vente.objects.create(utilisateur=self.user, mode_paiement='ESPECES', remise=Decimal("5"))
+        LigneVente.objects.create(vente=self.vente, produit=produit, quantite=1, prix_unitaire=Decimal("150.00"))
+    
+    def test_toutes_les_dispositions_produisent_un_pdf(self):
+        from inventory.moteur_pdf import DISPOSITIONS, contexte, rendre
+        for nom, (_, modeles) in DISPOSITIONS.items():
+            for model in modeles:
+                document = self.commande if model is Commande else self.vente
+                with self.subTest(disposition=nom, modele=model.__name__):
+                    self.assertTrue(rendre(nom, contexte(document)).startswith(b'%PDF'))
+    
+    def test_styles_construits_une_seule_fois(self):
+        from inventory.moteur_pdf import contexte, feuille_styles, rendre, styles_tableaux
+        ctx = contexte(self.vente)
+        rendre('proforma', ctx)
+        styles = feuille_styles()
+        tableaux = styles_tableaux()
+        rendre('facture_vente', ctx)
+        self.assertIs(feuille_styles(), styles)
+        self.assertIs(styles_tableaux(), tableaux)
+    
+    def test_contexte_charge_les_lignes_en_une_requete(self):
+        from inventory.moteur_pdf import contexte, rendre
+        commande = Commande.objects.get(pk=self.commande.pk)
+        with self.assertNumQueries(3):
+            # Lignes avec leurs produits, client, utilisateur
+            ctx = contexte(commande)
+            rendre('bon_livraison', ctx)
+    
+    def test_documents_en_cache_dates_par_le_document(self):
+        import datetime
+        from unittest import mock
+        from django.template.loader import render_to_string
+        from inventory import views_pdf_commandes
+        rendus = mock.Mock(wraps=render_to_string)
+        plus_tard = datetime.datetime(2031, 5, 17, 9, 30)
+        with mock.patch.object(views_pdf_commandes, 'render_to_string', rendus), \
+                mock.patch.object(views_pdf_commandes, 'HTML'), \
+                mock.patch('django.utils.timezone.now', return_value=plus_tard):
+            for rendu in (views_pdf_commandes.rendre_bon_commande,
+                          views_pdf_commandes.rendre_proforma_commande,
+                          views_pdf_commandes.rendre_bon_livraison):
+                rendu(self.commande)
+        date_commande = self.commande.date_commande.strftime('%d/%m/%Y')
+        self.assertEqual(rendus.call_count, 3)
+        for appel in rendus.call_args_list:
+            html = render_to_string(*appel.args, **appel.kwargs)
+            with self.subTest(template=appel.args[0]):
+                self.assertNotIn('now', appel.args[1])
+                self.assertRegex(html, f'établie? le {date_commande}')
+                self.assertNotIn('17/05/2031', html)
+
+
+class DocumentsLotTest(TestCase):
+    """Tests pour la génération de PDF par lot"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        self.repertoire = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.repertoire, ignore_errors=True)
+        reglages = override_settings(PDF_LOT_TRAVAILLEURS=1, PDF_CACHE_ROOT=self.repertoire)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        
+        self.client = Client()
+        self.user = User.objects.create_user(username="lot", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.client.login(username="lot", password="testpass123")
+        categorie = Categorie.objects.create(nom="Consommables")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        produit = Produit.objects.create(
+            nom="Gants nitrile",
+            reference="LOT-001",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("2.00"),
+            prix_vente=Decimal("5.00"),
+            quantite_stock=100
+        )
+        client = ClientModel.objects.create(
+            nom="Durand", prenom="Paul", email="paul@example.com", telephone="0102030405",
+            adresse="3 Rue Test", ville="Lyon", code_postal="69001"
+        )
+        for _ in range(2):
+            commande = Commande.objects.create(client=client, utilisateur=self.user, adresse_livraison="3 Rue Test", statut='LIVREE')
+            LigneCommande.objects.create(commande=commande, produit=produit, quantite=4, prix_unitaire=Decimal("5.00"))
+            vente = Vente.objects.create(utilisateur=self.user, client=client, mode_paiement='CARTE')
+            LigneVente.objects.create(vente=vente, produit=produit, quantite=1, prix_unitaire=Decimal("5.00"))
+    
+    def test_chargement_en_une_requete_par_type(self):
+        from inventory.lot_pdf import TYPES_LOT, charger_documents, rendre_lot
+        with self.assertNumQueries(4):
+            # Commandes + lignes, ventes + lignes
+            taches = charger_documents([TYPES_LOT['bon_livraison'], TYPES_LOT['facture_vente']])
+        self.assertEqual(len(taches), 4)
+        with self.assertNumQueries(6):
+            # Empreintes du cache : document, client et lignes, par modèle
+            pdfs = list(rendre_lot(taches))
+        self.assertTrue(all(pdf.startswith(b'%PDF') for pdf in pdfs))
+    
+    def test_rendu_servi_par_le_cache_disque(self):
+        from unittest import mock
+        from inventory.cache_pdf import RENDUS, charger_rendus, pdf_en_cache
+        from inventory.lot_pdf import TYPES_LOT, charger_documents, rendre_lot
+        taches = charger_documents([TYPES_LOT['bon_livraison'], TYPES_LOT['facture_vente']])
+        # Un document déjà imprimé seul n'est pas rendu à nouveau par le lot, et inversement
+        type_lot, document = taches[0]
+        deja_imprime = pdf_en_cache(document, type_lot.type_document)
+        pdfs = list(rendre_lot(taches))
+        self.assertEqual(pdfs[0], deja_imprime)
+        
+        charger_rendus()
+        sans_rendu = {
+            type_document: (model, mock.Mock(side_effect=AssertionError("rendu hors cache")))
+            for type_document, (model, _) in RENDUS.items()
+        }
+        with mock.patch.dict(RENDUS, sans_rendu):
+            self.assertEqual(list(rendre_lot(taches)), pdfs)
+            self.assertEqual(pdf_en_cache(taches[-1][1], taches[-1][0].type_document), pdfs[-1])
+    
+    def test_lot_borne(self):
+        from django.test import override_settings
+        from inventory.lot_pdf import TYPES_LOT, LotTropVolumineux, charger_documents
+        with override_settings(PDF_LOT_MAX_DOCUMENTS=3):
+            with self.assertRaises(LotTropVolumineux):
+                charger_documents([TYPES_LOT['bon_livraison'], TYPES_LOT['facture_vente']])
+            response = self.client.get(reverse('inventory:documents_lot'), {'type': ['bon_livraison', 'facture_vente']})
+        self.assertRedirects(response, reverse('inventory:dashboard'), fetch_redirect_response=False)
+    
+    def test_filtre_statut_ignore_pour_les_ventes(self):
+        from inventory.lot_pdf import TYPES_LOT, charger_documents
+        taches = charger_documents([TYPES_LOT['bon_livraison'], TYPES_LOT['facture_vente']], statut='EXPEDIEE')
+        self.assertEqual([type_lot.type_document for type_lot, _ in taches], ['facture_vente', 'facture_vente'])
+    
+    def test_vue_archive_zip(self):
+        import io
+        import zipfile
+        response = self.client.get(reverse('inventory:documents_lot'), {'type': ['bon_livraison', 'facture_vente']})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 4)
+        self.assertIsNone(archive.testzip())
+    
+    def test_parametres_invalides_rediriges(self):
+        for parametres in ({'date_debut': 'notadate'}, {'date_fin': '2026-13-45'}, {'client': 'abc'}):
+            with self.subTest(**parametres):
+                response = self.client.get(reverse('inventory:documents_lot'), {'type': 'facture_vente', **parametres})
+                self.assertRedirects(response, reverse('inventory:dashboard'), fetch_redirect_response=False)
+        aujourd_hui = timezone.localdate().isoformat()
+        response = self.client.get(reverse('inventory:documents_lot'), {
+            'type': 'facture_vente', 'date_debut': aujourd_hui, 'date_fin': aujourd_hui, 'client': Vente.objects.first().client_id,
+        })
+        self.assertEqual(response['Content-Type'], 'application/zip')
+    
+    def test_permissions_sans_requete_sur_le_profil(self):
+        from users.permissions import droits
+        from inventory.lot_pdf import TYPES_LOT, peut_generer
+        droits(User.objects.get(pk=self.user.pk))
+        utilisateur = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(all(peut_generer(utilisateur, type_lot) for type_lot in TYPES_LOT.values()))
+    
+    def test_vue_refusee_sans_permission(self):
+        self.user.profile.role = "TECHNICIEN"
+        self.user.profile.save()
+        response = self.client.get(reverse('inventory:documents_lot'), {'type': 'facture_vente'})
+        self.assertEqual(response.status_code, 403)
+
+
+class RegistreStockTest(TestCase):
+    """Tests pour le registre des mouvements de stock"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username="stock", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.client.login(username="stock", password="testpass123")
+        categorie = Categorie.objects.create(nom="Stérilisation")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.produits = [
+            Produit.objects.create(
+                nom=f"Autoclave {i}",
+                reference=f"STK-{i}",
+                categorie=categorie,
+                fournisseur=fournisseur,
+                prix_achat=Decimal("10.00"),
+                prix_vente=Decimal("20.00"),
+                quantite_stock=10
+            )
+            for i in range(2)
+        ]
+    
+    def test_lot_applique_en_une_mise_a_jour_avec_quantites_avant_apres(self):
+        from inventory.stock import Mouvement, appliquer_mouvements
+        premier, second = self.produits
+        with self.assertNumQueries(8):
+            # Savepoints (lot et UPDATE), UPDATE, relecture des stocks, INSERT groupé, invalidation des statistiques, releases
+            mouvements = appliquer_mouvements([
+                Mouvement(premier, 'SORTIE', 3, 'Vente'),
+                Mouvement(premier, 'SORTIE', 2, 'Vente'),
+                Mouvement(second, 'ENTREE', 5, 'Réception', 'LOT-42'),
+            ], self.user)
+        self.assertEqual([(m.quantite_avant, m.quantite_apres) for m in mouvements], [(10, 7), (7, 5), (10, 15)])
+        self.assertEqual(Produit.objects.get(pk=premier.pk).quantite_stock, 5)
+        self.assertEqual(Produit.objects.get(pk=second.pk).quantite_stock, 15)
+        self.assertEqual(premier.quantite_stock, 5)
+    
+    def test_sortie_superieure_au_stock_annule_le_lot(self):
+        from inventory.stock import Mouvement, StockInsuffisant, appliquer_mouvements
+        premier, second = self.produits
+        # Stock modifié par une autre requête après le chargement des instances
+        Produit.objects.filter(pk=second.pk).update(quantite_stock=1)
+        with self.assertRaises(StockInsuffisant) as erreur:
+            appliquer_mouvements([
+                Mouvement(premier, 'SORTIE', 2, 'Vente'),
+                Mouvement(second, 'SORTIE', 2, 'Vente'),
+            ], self.user)
+        self.assertEqual((erreur.exception.disponible, erreur.exception.demande), (1, 2))
+        self.assertEqual(Produit.objects.get(pk=premier.pk).quantite_stock, 10)
+        self.assertFalse(MouvementStock.objects.exists())
+    
+    def test_seul_le_produit_insuffisant_est_signale(self):
+        from inventory.stock import Mouvement, StockInsuffisant, appliquer_mouvements
+        premier, second = self.produits
+        Produit.objects.filter(pk=second.pk).update(quantite_stock=1)
+        # Le premier produit, décrémenté par l'UPDATE, n'est pas mis en cause
+        with self.assertRaises(StockInsuffisant) as erreur:
+            appliquer_mouvements([
+                Mouvement(premier, 'SORTIE', 8, 'Vente'),
+                Mouvement(second, 'SORTIE', 5, 'Vente'),
+            ], self.user)
+        self.assertEqual(erreur.exception.produit, second)
+        self.assertEqual((erreur.exception.disponible, erreur.exception.demande), (1, 5))
+        self.assertEqual(Produit.objects.get(pk=premier.pk).quantite_stock, 10)
+    
+    def test_vue_mouvement_refuse_un_stock_negatif(self):
+        response = self.client.post(reverse('inventory:mouvement_create'), {
+            'produit': self.produits[0].pk, 'type_mouvement': 'SORTIE', 'quantite': 11, 'motif': 'Casse',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('quantite', response.context['form'].errors)
+        self.assertEqual(Produit.objects.get(pk=self.produits[0].pk).quantite_stock, 10)
+        
+        response = self.client.post(reverse('inventory:mouvement_create'), {
+            'produit': self.produits[0].pk, 'type_mouvement': 'SORTIE', 'quantite': 4, 'motif': 'Casse',
+        })
+        self.assertRedirects(response, reverse('inventory:stock_list'))
+        mouvement = MouvementStock.objects.get()
+        self.assertEqual((mouvement.quantite_avant, mouvement.quantite_apres), (10, 6))
+
+
+    def test_modification_produit_applique_la_difference_de_stock(self):
+        produit = self.produits[0]
+        response = self.client.post(reverse('inventory:produit_update', args=[produit.pk]), {
+            'nom': produit.nom, 'reference': produit.reference, 'categorie': produit.categorie_id,
+            'fournisseur': produit.fournisseur_id, 'prix_achat': '12.00', 'prix_vente': '20.00',
+            'quantite_stock': 14, 'seuil_alerte': 10, 'actif': 'on',
+        })
+        self.assertRedirects(response, reverse('inventory:produit_detail', args=[produit.pk]))
+        produit.refresh_from_db()
+        self.assertEqual((produit.quantite_stock, produit.prix_achat), (14, Decimal("12.00")))
+        mouvement = MouvementStock.objects.get()
+        self.assertEqual((mouvement.type_mouvement, mouvement.quantite, mouvement.quantite_apres), ('ENTREE', 4, 14))
+
+
+class ClotureStockTest(TestCase):
+    """Tests pour les clôtures de stock et la valorisation à une date"""
+    
+    def setUp(self):
+        from django.utils import timezone
+        from inventory.stock import Mouvement, appliquer_mouvements
+        self.client = Client()
+        self.user = User.objects.create_user(username="cloture", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.client.login(username="cloture", password="testpass123")
+        categorie = Categorie.objects.create(nom="Radiologie")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions",
+            email="contact@medtech.fr",
+            telephone="0123456789",
+            adresse="123 Rue de la Santé",
+            ville="Paris",
+            code_postal="75001"
+        )
+        self.produit = Produit.objects.create(
+            nom="Tablier plombé",
+            reference="CLO-001",
+            categorie=categorie,
+            fournisseur=fournisseur,
+            prix_achat=Decimal("50.00"),
+            prix_vente=Decimal("80.00"),
+            quantite_stock=0
+        )
+        self.aujourd_hui = timezone.localdate()
+        # Entrée de 10 il y a 5 jours, sortie de 3 il y a 2 jours : stock actuel 7
+        for jours, type_mouvement, quantite in [(5, 'ENTREE', 10), (2, 'SORTIE', 3)]:
+            mouvement, = appliquer_mouvements([Mouvement(self.produit, type_mouvement, quantite, 'Test')], self.user)
+            MouvementStock.objects.filter(pk=mouvement.pk).update(
+                date_mouvement=timezone.now() - timedelta(days=jours)
+            )
+    
+    def jour(self, decalage):
+        return self.aujourd_hui - timedelta(days=decalage)
+    
+    def test_stock_au_sans_cloture_part_du_stock_actuel(self):
+        from inventory.cloture_stock import stock_au
+        self.assertEqual(stock_au(self.jour(3)), {self.produit.pk: (10, Decimal("50.00"))})
+        self.assertEqual(stock_au(self.jour(6)), {})
+    
+    def test_stock_au_depuis_la_derniere_cloture(self):
+        from inventory.cloture_stock import cloturer_stock, valorisation_au
+        cloture = cloturer_stock(self.jour(4))
+        self.assertEqual((cloture.quantite_totale, cloture.valeur_totale), (10, Decimal("500.00")))
+        # Le stock actuel n'est plus lu : seule la clôture et les mouvements depuis comptent
+        Produit.objects.filter(pk=self.produit.pk).update(quantite_stock=999)
+        valorisation = valorisation_au(self.jour(1))
+        self.assertEqual((valorisation['quantite_totale'], valorisation['valeur_totale']), (7, Decimal("350.00")))
+    
+    def test_commande_close_stock(self):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command('close_stock', '--date', self.jour(1).isoformat(), '--mensuel', stdout=StringIO())
+        cloture = ClotureStock.objects.get()
+        self.assertEqual((cloture.periodicite, cloture.quantite_totale), ('MOIS', 7))
+    
+    def test_statistiques_stock_list_en_une_agregation(self):
+        response = self.client.get(reverse('inventory:stock_list'), {'date_valorisation': self.jour(3).isoformat()})
+        stats = response.context['stats']
+        self.assertEqual((stats['total_produits'], stats['produits_stock_bas'], stats['valeur_stock']), (1, 1, Decimal("350.00")))
+        self.assertEqual(response.context['valorisation']['quantite_totale'], 10)
+
+
+class BudgetRequetesTest(TestCase):
+    """Budget de requêtes SQL de chaque page de inventory/urls.py et users/urls.py sur le jeu synthétique 'petite' (inventory/donnees_synthetiques.py)"""
+    
+    # Déconnexions (fermeraient la session du parcours) ; note_create : gabarit note_form.html absent
+    EXCLUES = {'inventory:admin_logout', 'users:logout', 'inventory:note_create'}
+    BUDGET_DEFAUT = 15
+    # Le premier affichage du dashboard recalcule les instantanés de statistiques ;
+    # le lot de PDF ajoute les empreintes du cache disque (trois requêtes par modèle)
+    BUDGETS = {'inventory:dashboard': 35, 'inventory:documents_lot': 20}
+    
+    @classmethod
+    def setUpTestData(cls):
+        from inventory.donnees_synthetiques import echelle, generer
+        # Jeu synthétique de la plus petite échelle : chaque liste s'étend sur plusieurs pages
+        generer(echelle('petite'), graine=5)
+        cls.user = User.objects.create_superuser(username="budget", email="budget@test.fr", password="testpass123")
+        cls.user.profile.role = "MANAGER"
+        cls.user.profile.save()
+        
+        # Modèles absents du générateur : transferts, notes et appels de prospection
+        produits = list(Produit.objects.order_by('pk')[:60])
+        prospects = list(Prospect.objects.order_by('pk')[:60])
+        for i in range(60):
+            TransfertStock.objects.create(produit=produits[i], quantite=1, demandeur=cls.user)
+            NoteObservation.objects.create(prospect=prospects[i], auteur=cls.user, type_note="RELANCE", titre="Relance", contenu="Rappeler")
+            ProspectionTelephonique.objects.create(
+                nom_complet=f"Dr Budget {i}",
+                numero_telephone="0601020304",
+                description="Appel",
+                type_appel='SORTANT',
+                commercial=cls.user
+            )
+        cls.objets = {
+            'ecommerce_produit': produits[0], 'produit': produits[0], 'client': ClientModel.objects.order_by('pk').first(),
+            'fournisseur': Fournisseur.objects.order_by('pk').first(), 'commande': Commande.objects.order_by('pk').last(),
+            'vente': Vente.objects.order_by('pk').last(), 'devis': Devis.objects.order_by('pk').last(),
+            'prospection': ProspectionTelephonique.objects.first(), 'prospect': prospects[0],
+            'appareil': AppareilVendu.objects.order_by('pk').first(), 'intervention': InterventionSAV.objects.order_by('pk').first(),
+            'transfert': TransfertStock.objects.first(), 'profil': cls.user.profile,
+        }
+    
+    def setUp(self):
+        self.client = Client()
+        self.client.login(username="budget", password="testpass123")
+    
+    def pages(self):
+        from inventory.urls import urlpatterns as inventory_urls
+        from users.urls import urlpatterns as users_urls
+        for espace, urlpatterns in (('inventory', inventory_urls), ('users', users_urls)):
+            for pattern in urlpatterns:
+                nom = f'{espace}:{pattern.name}'
+                if nom in self.EXCLUES:
+                    continue
+                kwargs = {}
+                for parametre in pattern.pattern.converters:
+                    if parametre == 'type_export':
+                        kwargs[parametre] = 'produits'
+                    else:
+                        objet = next(objet for prefixe, objet in self.objets.items() if pattern.name.startswith(prefixe))
+                        kwargs[parametre] = objet.pk
+                yield nom, reverse(nom, kwargs=kwargs)
+    
+    def test_budget_de_requetes_par_page(self):
+        from inventory.profilage import budget_requetes
+        for nom, url in self.pages():
+            with self.subTest(page=nom):
+                with budget_requetes(self, self.BUDGETS.get(nom, self.BUDGET_DEFAUT), message=nom):
+                    response = self.client.get(url)
+                    if hasattr(response, 'streaming_content'):
+                        b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 500)
+    
+    def test_entetes_et_historique_du_middleware(self):
+        """Le middleware expose les mesures en en-têtes et dans l'historique JSON"""
+        response = self.client.get(reverse('inventory:produits_list'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        self.assertTrue(response['X-Requetes-SQL'].split(';')[0].isdigit())
+        donnees = self.client.get(reverse('inventory:profilage_requetes'), {'vue': 'inventory:produits_list'}).json()
+        self.assertEqual(donnees['mesures'][0]['chemin'], reverse('inventory:produits_list'))
+        self.assertGreaterEqual(donnees['vues']['inventory:produits_list']['appels'], 1)
+    
+    def test_detection_n_plus_un(self):
+        """Une requête répétée par ligne est signalée comme N+1"""
+        from inventory.profilage import mesurer
+        with mesurer() as mesure:
+            for produit in Produit.objects.all()[:6]:
+                produit.categorie.nom
+        self.assertEqual(list(mesure.doublons().values()), [6])
+
+
+class DonneesSynthetiquesTest(TestCase):
+    """Tests du générateur de données synthétiques et du benchmark des vues"""
+    
+    def echelle(self):
+        from inventory.donnees_synthetiques import Echelle
+        return Echelle(produits=20, clients=10, mouvements=200, ventes=15, commandes=5, devis=5, prospects=5, appareils=3, jours=30)
+    
+    def test_generation_coherente(self):
+        from django.db.models import Max
+        from django.utils import timezone
+        from inventory.donnees_synthetiques import generer
+        generer(self.echelle(), graine=7)
+        self.assertEqual(Produit.objects.count(), 20)
+        self.assertEqual(MouvementStock.objects.count(), 200)
+        # Le stock de chaque produit est celui de son dernier mouvement
+        for produit in Produit.objects.all():
+            dernier = MouvementStock.objects.filter(produit=produit).order_by('-date_mouvement', '-pk').first()
+            self.assertEqual(produit.quantite_stock, dernier.quantite_apres if dernier else 0)
+        vente = Vente.objects.order_by('pk').first()
+        self.assertEqual(vente.calculer_total(), vente.total)
+        self.assertEqual(Vente.objects.values('numero_vente').distinct().count(), 15)
+        self.assertLessEqual(Vente.objects.aggregate(d=Max('date_vente'))['d'], timezone.now())
+        
+        # Réservations des commandes confirmées ; commandes expédiées déjà sorties du stock
+        from django.db.models import Sum
+        from inventory.reservations import synchroniser
+        confirmees = LigneCommande.objects.filter(commande__statut='CONFIRMEE')
+        self.assertEqual(
+            ReservationStock.objects.aggregate(total=Sum('quantite'))['total'],
+            confirmees.aggregate(total=Sum('quantite'))['total']
+        )
+        self.assertEqual(
+            Produit.objects.aggregate(total=Sum('quantite_reservee'))['total'],
+            confirmees.aggregate(total=Sum('quantite'))['total'] or 0
+        )
+        self.assertFalse(Commande.objects.filter(statut__in=('EXPEDIEE', 'LIVREE'), stock_expedie=False).exists())
+        mouvements = MouvementStock.objects.count()
+        for commande in Commande.objects.filter(statut__in=('EXPEDIEE', 'LIVREE')):
+            synchroniser(commande)
+        self.assertEqual(MouvementStock.objects.count(), mouvements)
+    
+    def donnees_generees(self):
+        """Contenu comparable d'une génération : références, quantités, totaux et statuts (sans les pk)"""
+        return {
+            'produits': list(Produit.objects.order_by('reference').values_list(
+                'reference', 'nom', 'prix_achat', 'prix_vente', 'quantite_stock', 'quantite_reservee'
+            )),
+            'mouvements': sorted(MouvementStock.objects.values_list(
+                'produit__reference', 'type_mouvement', 'quantite', 'quantite_avant', 'quantite_apres'
+            )),
+            'ventes': list(Vente.objects.order_by('numero_vente').values_list(
+                'numero_vente', 'client__email', 'mode_paiement', 'total'
+            )),
+            'lignes_vente': sorted(LigneVente.objects.values_list(
+                'vente__numero_vente', 'produit__reference', 'quantite', 'prix_unitaire'
+            )),
+            'commandes': list(Commande.objects.order_by('numero_commande').values_list(
+                'numero_commande', 'client__email', 'statut', 'total', 'stock_expedie'
+            )),
+            'devis': list(Devis.objects.order_by('numero_devis').values_list('numero_devis', 'statut', 'total')),
+            'reservations': sorted(ReservationStock.objects.values_list(
+                'commande__numero_commande', 'produit__reference', 'quantite'
+            )),
+        }
+    
+    def test_meme_graine_memes_donnees(self):
+        from django.db import transaction
+        from inventory.donnees_synthetiques import generer
+        # Première génération annulée : la seconde part de la même base vide
+        with transaction.atomic():
+            generer(self.echelle(), graine=3)
+            premiere = self.donnees_generees()
+            transaction.set_rollback(True)
+        self.assertFalse(Produit.objects.exists())
+        
+        generer(self.echelle(), graine=3)
+        seconde = self.donnees_generees()
+        self.assertEqual((len(premiere['ventes']), len(premiere['commandes'])), (15, 5))
+        for table in premiere:
+            with self.subTest(table=table):
+                self.assertEqual(premiere[table], seconde[table])
+        
+        # Une autre graine donne d'autres données ; la même graine ne se régénère pas par-dessus
+        with self.assertRaises(ValueError):
+            generer(self.echelle(), graine=3)
+        generer(self.echelle(), graine=4)
+        self.assertNotEqual(
+            list(Produit.objects.filter(reference__startswith='SYN4-').values_list('quantite_stock', flat=True)),
+            [quantite for _, _, _, _, quantite, _ in seconde['produits']]
+        )
+    
+    def test_benchmark_produit_des_resultats_comparables(self):
+        from inventory.donnees_synthetiques import generer
+        from inventory.benchmark import lancer, comparer
+        generer(self.echelle(), graine=11)
+        resultats = lancer(iterations=1, noms=['produits_list', 'vente_create'])
+        self.assertEqual(set(resultats['resultats']), {'produits_list', 'vente_create'})
+        self.assertEqual(resultats['resultats']['produits_list']['statut'], 200)
+        self.assertEqual(resultats['resultats']['vente_create']['statut'], 302)
+        self.assertEqual(resultats['volumes']['produit'], 20)
+        self.assertEqual(comparer(resultats, resultats)['produits_list'], (0.0, 0))
+    
+    def test_scenario_de_recherche_filtre_la_liste(self):
+        from inventory.benchmark import SCENARIOS, clients_par_role
+        from inventory.donnees_synthetiques import generer
+        from inventory.recherche import rechercher
+        generer(self.echelle(), graine=12)
+        scenario = next(s for s in SCENARIOS if s.nom == 'produits_list_recherche')
+        response = clients_par_role()[scenario.role].get(reverse(scenario.vue), scenario.params)
+        affiches = {produit.pk for produit in response.context['produits']}
+        attendus = set(rechercher(Produit.objects.all(), scenario.params['q']).values_list('pk', flat=True))
+        self.assertEqual(affiches, attendus)
+        self.assertLess(len(affiches), Produit.objects.count())
+
+
+class PaginationCurseurTest(TestCase):
+    """Tests de la pagination par curseur (keyset) des listes"""
+    
+    @classmethod
+    def setUpTestData(cls):
+        from django.utils import timezone
+        cls.user = User.objects.create_superuser(username="curseur", email="curseur@test.fr", password="testpass123")
+        client = ClientModel.objects.create(nom="Curseur", prenom="Test", email="curseur@client.fr", telephone="0600000000")
+        ventes = [Vente.objects.create(client=client, utilisateur=cls.user, mode_paiement='CARTE') for _ in range(25)]
+        # Dates de vente en partie identiques : l'id départage les égalités
+        debut = timezone.now() - timedelta(days=10)
+        for i, vente in enumerate(ventes):
+            Vente.objects.filter(pk=vente.pk).update(date_vente=debut + timedelta(days=i // 3))
+    
+    def requete(self, **params):
+        from django.test import RequestFactory
+        return RequestFactory().get('/ventes/', params)
+    
+    def test_parcours_complet_sans_doublon(self):
+        from inventory.pagination import paginer
+        attendu = list(Vente.objects.order_by('-date_vente', '-id').values_list('pk', flat=True))
+        vus, curseur = [], None
+        while True:
+            page = paginer(self.requete(**({'curseur': curseur} if curseur else {})), Vente.objects.all(), 10)
+            self.assertTrue(page.est_curseur)
+            vus += [vente.pk for vente in page]
+            curseur = page.curseur_suivant
+            if not curseur:
+                break
+        self.assertEqual(vus, attendu)
+    
+    def test_page_precedente(self):
+        from inventory.pagination import paginer
+        premiere = paginer(self.requete(), Vente.objects.all(), 10)
+        seconde = paginer(self.requete(curseur=premiere.curseur_suivant), Vente.objects.all(), 10)
+        self.assertTrue(seconde.has_previous())
+        retour = paginer(self.requete(curseur=seconde.curseur_precedent), Vente.objects.all(), 10)
+        self.assertEqual([v.pk for v in retour], [v.pk for v in premiere])
+        self.assertFalse(retour.has_previous())
+        self.assertTrue(retour.has_next())
+    
+    def test_page_numerotee_et_curseur_altere(self):
+        from inventory.pagination import paginer
+        page = paginer(self.requete(page='2'), Vente.objects.all(), 10)
+        self.assertFalse(getattr(page, 'est_curseur', False))
+        self.assertEqual(page.number, 2)
+        page = paginer(self.requete(curseur='altere'), Vente.objects.all(), 10)
+        self.assertFalse(page.has_previous())
+        self.assertEqual(len(page), 10)
+    
+    def test_curseur_d_un_autre_tri(self):
+        from inventory.pagination import encoder, paginer
+        # Curseur émis pour un tri par mode de paiement, rejoué sur le tri par date
+        curseur = paginer(self.requete(), Vente.objects.order_by('mode_paiement'), 10).curseur_suivant
+        page = paginer(self.requete(curseur=curseur), Vente.objects.all(), 10)
+        self.assertFalse(page.has_previous())
+        self.assertEqual(len(page), 10)
+        # Valeur signée mais non convertible : première page, pas d'erreur
+        curseur = encoder(['pas une date', 1], 's', [('date_vente', True), ('id', True)])
+        page = paginer(self.requete(curseur=curseur), Vente.objects.all(), 10)
+        self.assertFalse(page.has_previous())
+    
+    def test_total_borne(self):
+        from inventory.pagination import paginer
+        with self.settings(PAGINATION_TOTAL_LIMITE=20):
+            page = paginer(self.requete(), Vente.objects.all(), 10, total=True)
+        self.assertEqual((page.total, page.total_exact), (20, False))
+        page = paginer(self.requete(), Vente.objects.all(), 10, total=True)
+        self.assertEqual((page.total, page.total_exact), (25, True))
+    
+    def test_page_sans_comptage(self):
+        from inventory.pagination import paginer
+        premiere = paginer(self.requete(), Vente.objects.all(), 10)
+        with self.assertNumQueries(1):
+            page = paginer(self.requete(curseur=premiere.curseur_suivant), Vente.objects.all(), 10)
+            list(page)
+    
+    def test_liste_ventes(self):
+        client = Client()
+        client.login(username="curseur", password="testpass123")
+        response = client.get(reverse('inventory:ventes_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'curseur=')
+        response = client.get(reverse('inventory:ventes_list'), {'page': '2'})
+        self.assertEqual(response.status_code, 200)
+
+
+class StatsListesTest(TestCase):
+    """Tests des badges des pages de liste calculés en une requête et mis en cache"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(username="terrain", email="terrain@test.fr", password="testpass123")
+        self.user.profile.role = "COMMERCIAL_TERRAIN"
+        self.user.profile.save()
+        self.autre = User.objects.create_user(username="autre", email="autre@test.fr", password="testpass123")
+        for statut, type_appel, commercial in [
+            ('RDV', 'SORTANT', self.user), ('RDV', 'ENTRANT', self.user),
+            ('BV', 'SORTANT', self.user), ('RDV', 'SORTANT', self.autre),
+        ]:
+            ProspectionTelephonique.objects.create(
+                nom_complet="Dr Badge", numero_telephone="0601020304", description="Appel",
+                type_appel=type_appel, statut=statut, commercial=commercial
+            )
+        self.client = Client()
+        self.client.login(username="terrain", password="testpass123")
+    
+    def test_badges_prospection_en_une_requete(self):
+        response = self.client.get(reverse('inventory:prospection_list'), {'type_appel': 'SORTANT'})
+        stats = response.context['stats']
+        # Total des prospects du commercial, badges sur la liste filtrée
+        self.assertEqual(stats['total'], 3)
+        self.assertEqual((stats['rdv'], stats['bv'], stats['appel_entrant']), (1, 1, 0))
+        
+        response = self.client.get(reverse('inventory:prospection_stats_api'))
+        self.assertEqual(response.json()['par_statut']['RDV'], 2)
+        self.assertEqual(response.json()['total'], 3)
+    
+    def test_cache_et_invalidation(self):
+        from django.db.models import Count, Q
+        from inventory.stats_listes import statistiques
+        prospections = ProspectionTelephonique.objects.filter(commercial=self.user)
+        with self.assertNumQueries(1):
+            statistiques(prospections, self.user, total=Count('id'), rdv=Count('id', filter=Q(statut='RDV')))
+        with self.assertNumQueries(0):
+            stats = statistiques(prospections, self.user, total=Count('id'), rdv=Count('id', filter=Q(statut='RDV')))
+        self.assertEqual(stats, {'total': 3, 'rdv': 2})
+        # Autre filtre : autre entrée du cache
+        with self.assertNumQueries(1):
+            statistiques(prospections.filter(type_appel='ENTRANT'), self.user, total=Count('id'))
+        # Une écriture périme les statistiques du modèle
+        ProspectionTelephonique.objects.filter(commercial=self.user).first().delete()
+        stats = statistiques(prospections, self.user, total=Count('id'), rdv=Count('id', filter=Q(statut='RDV')))
+        self.assertEqual(stats['total'], 2)
+    
+    def test_ventes_du_jour_hors_filtre(self):
+        client = ClientModel.objects.create(nom="Badge", prenom="Test", email="badge@client.fr", telephone="0600000000")
+        manager = User.objects.create_superuser(username="chef", email="chef@test.fr", password="testpass123")
+        Vente.objects.create(client=client, utilisateur=manager, mode_paiement='CARTE', total=Decimal('100.00'))
+        Vente.objects.create(client=client, utilisateur=manager, mode_paiement='ESPECES', total=Decimal('50.00'))
+        self.client.login(username="chef", password="testpass123")
+        response = self.client.get(reverse('inventory:ventes_list'), {'mode_paiement': 'CARTE'})
+        self.assertEqual(response.context['total_ventes']['count'], 1)
+        self.assertEqual(response.context['total_ventes']['total'], Decimal('100.00'))
+        self.assertEqual(response.context['ventes_aujourdhui'], Decimal('150.00'))
+
+
+class VuesAsynchronesTest(TestCase):
+    """Tests des vues JSON asynchrones servies par le gestionnaire ASGI"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.terrain = User.objects.create_user(username="terrain", email="terrain@test.fr", password="testpass123")
+        self.terrain.profile.role = "COMMERCIAL_TERRAIN"
+        self.terrain.profile.save()
+        self.technicien = User.objects.create_user(username="tech", email="tech@test.fr", password="testpass123")
+        self.technicien.profile.role = "TECHNICIEN"
+        self.technicien.profile.save()
+        autre = User.objects.create_user(username="autre", email="autre@test.fr", password="testpass123")
+        for commercial, statut in [(self.terrain, 'RDV'), (self.terrain, 'BV'), (autre, 'RDV')]:
+            ProspectionTelephonique.objects.create(
+                nom_complet="Dr Async", numero_telephone="0601020304", description="Appel",
+                type_appel='SORTANT', statut=statut, commercial=commercial
+            )
+        for i in range(12):
+            ClientModel.objects.create(nom=f"Async{i}", prenom="Client", email=f"async{i}@client.fr", telephone="0600000000")
+    
+    async def test_recherche_clients_par_curseur(self):
+        await self.async_client.aforce_login(self.terrain)
+        response = await self.async_client.get(reverse('inventory:api_client_search'), {'q': 'async'})
+        donnees = response.json()
+        self.assertEqual(len(donnees['results']), 10)
+        self.assertIsNone(donnees['precedent'])
+        response = await self.async_client.get(reverse('inventory:api_client_search'), {'q': 'async', 'curseur': donnees['suivant']})
+        suite = response.json()
+        self.assertEqual(len(suite['results']), 2)
+        self.assertFalse({r['id'] for r in donnees['results']} & {r['id'] for r in suite['results']})
+    
+    async def test_statistiques_prospection(self):
+        await self.async_client.aforce_login(self.terrain)
+        response = await self.async_client.get(reverse('inventory:prospection_stats_api'))
+        # Le commercial terrain ne compte que ses propres prospects
+        self.assertEqual(response.json()['total'], 2)
+        self.assertEqual(response.json()['par_statut']['RDV'], 1)
+    
+    async def test_controle_acces(self):
+        response = await self.async_client.get(reverse('inventory:prospection_stats_api'))
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.technicien)
+        response = await self.async_client.get(reverse('inventory:prospection_stats_api'))
+        self.assertEqual(response.status_code, 403)
+    
+    async def test_profilage_sous_asgi(self):
+        await self.async_client.aforce_login(self.terrain)
+        with self.settings(PROFILAGE_REQUETES=True):
+            response = await self.async_client.get(reverse('inventory:api_client_search'), {'q': 'async'})
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-Requetes-SQL'].split(';')[0]), 0)
+
+
+class CompteursVentesTest(TestCase):
+    """Tests des compteurs de ventes par produit (fenêtres glissantes)"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="vendeur", password="testpass123")
+        self.user.profile.role = "COMMERCIAL_SHOWROOM"
+        self.user.profile.save()
+        categorie = Categorie.objects.create(nom="Consommables")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions", email="contact@medtech.fr", telephone="0123456789",
+            adresse="123 Rue de la Santé", ville="Paris", code_postal="75001"
+        )
+        self.produits = [
+            Produit.objects.create(
+                nom=f"Produit {i}", reference=f"CPT-{i}", categorie=categorie, fournisseur=fournisseur,
+                prix_achat=Decimal("10.00"), prix_vente=Decimal("20.00"), quantite_stock=100
+            ) for i in range(3)
+        ]
+        self.client = Client()
+        self.client.login(username="vendeur", password="testpass123")
+    
+    def vendre(self, produit, quantite, jours=0):
+        """Vente datée d'il y a `jours` jours, lignes créées une à une (signaux)"""
+        vente = Vente.objects.create(mode_paiement='ESPECES', utilisateur=self.user)
+        Vente.objects.filter(pk=vente.pk).update(date_vente=timezone.now() - timedelta(days=jours))
+        return LigneVente.objects.create(vente=vente, produit=produit, quantite=quantite, prix_unitaire=Decimal("20.00"))
+    
+    def compteur(self, produit):
+        return CompteurVentesProduit.objects.get(produit=produit)
+    
+    def test_vente_create_incremente_les_compteurs(self):
+        data = {'mode_paiement': 'ESPECES', 'remise': '0'}
+        for i, (produit, quantite) in enumerate(zip(self.produits, [2, 5])):
+            data.update({
+                f'ligne_{i}_produit': produit.pk, f'ligne_{i}_quantite': quantite,
+                f'ligne_{i}_prix_unitaire': '20.00',
+            })
+        self.client.post(reverse('inventory:vente_create'), data)
+        compteur = self.compteur(self.produits[1])
+        self.assertEqual((compteur.quantite_7j, compteur.quantite_30j, compteur.quantite_90j), (5, 5, 5))
+        self.assertEqual(compteur.ca_30j, Decimal("100.00"))
+        self.assertEqual(VenteProduitJour.objects.get(produit=self.produits[0]).quantite, 2)
+    
+    def test_fenetres_et_compactage(self):
+        self.vendre(self.produits[0], 3, jours=10)
+        ligne = self.vendre(self.produits[0], 4, jours=40)
+        self.vendre(self.produits[1], 1, jours=100)
+        compteur = self.compteur(self.produits[0])
+        self.assertEqual((compteur.quantite_7j, compteur.quantite_30j, compteur.quantite_90j), (0, 3, 7))
+        self.assertFalse(CompteurVentesProduit.objects.filter(produit=self.produits[1]).exists())
+        
+        # Vingt-cinq jours plus tard, la vente d'il y a 10 jours sort de la fenêtre de 30 jours
+        self.assertEqual(compacter(timezone.localdate() + timedelta(days=25)), 1)
+        compteur = self.compteur(self.produits[0])
+        self.assertEqual((compteur.quantite_30j, compteur.quantite_90j), (0, 7))
+        
+        ligne.delete()
+        compacter()
+        compteur = self.compteur(self.produits[0])
+        self.assertEqual((compteur.quantite_30j, compteur.quantite_90j), (3, 3))
+        self.assertFalse(VenteProduitJour.objects.filter(produit=self.produits[1]).exists())
+    
+    def test_reconstruire_depuis_les_lignes(self):
+        self.vendre(self.produits[0], 3, jours=2)
+        self.vendre(self.produits[2], 6, jours=20)
+        VenteProduitJour.objects.all().delete()
+        CompteurVentesProduit.objects.all().delete()
+        self.assertEqual(reconstruire(), 2)
+        self.assertEqual(self.compteur(self.produits[0]).quantite_7j, 3)
+        self.assertEqual(self.compteur(self.produits[2]).ca_30j, Decimal("120.00"))
+    
+    def test_classement_boutique(self):
+        self.vendre(self.produits[0], 1)
+        self.vendre(self.produits[2], 8)
+        response = self.client.get(reverse('inventory:ecommerce_home'))
+        self.assertEqual(
+            [p.pk for p in response.context['produits_populaires']],
+            [self.produits[2].pk, self.produits[0].pk, self.produits[1].pk]
+        )
+        populaires = list(produits_populaires(30, 5))
+        self.assertEqual([(p.pk, p.total_vendu) for p in populaires], [(self.produits[2].pk, 8), (self.produits[0].pk, 1)])
+
+
+class CacheCatalogueTest(TestCase):
+    """Tests du cache des pages publiques du catalogue"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.categorie = Categorie.objects.create(nom="Consommables")
+        self.autre_categorie = Categorie.objects.create(nom="Imagerie")
+        fournisseur = Fournisseur.objects.create(
+            nom="MedTech Solutions", email="contact@medtech.fr", telephone="0123456789",
+            adresse="123 Rue de la Santé", ville="Paris", code_postal="75001"
+        )
+        self.produits = [
+            Produit.objects.create(
+                nom=f"Gant {i}", reference=f"CAT-{i}", categorie=self.categorie, fournisseur=fournisseur,
+                prix_achat=Decimal("10.00"), prix_vente=Decimal(f"{20 + i}.00"), quantite_stock=5
+            ) for i in range(3)
+        ]
+        self.user = User.objects.create_user(username="technicien", password="testpass123")
+        self.client = Client()
+    
+    def test_page_anonyme_servie_depuis_le_cache(self):
+        url = reverse('inventory:ecommerce_catalogue')
+        premiere = self.client.get(url, {'sort': 'prix_desc'})
+        with self.assertNumQueries(0):
+            seconde = self.client.get(url, {'sort': 'prix_desc', 'utm_source': 'mail'})
+        self.assertEqual(premiere.content, seconde.content)
+        # Autre tri : autre page
+        response = self.client.get(url, {'sort': 'prix_asc'})
+        self.assertIsNotNone(response.context)
+        
+        # Versions incrémentées à la validation de la transaction
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produits[0].nom = "Gant renommé"
+            self.produits[0].save()
+        self.assertContains(self.client.get(url, {'sort': 'prix_desc'}), "Gant renommé")
+    
+    def test_rupture_de_stock(self):
+        from inventory.stock import Mouvement, appliquer_mouvements
+        url = reverse('inventory:ecommerce_produit_detail', args=[self.produits[1].pk])
+        self.client.get(url)
+        self.client.get(reverse('inventory:ecommerce_catalogue'))
+        
+        # Le stock baisse sans rupture : pages gardées en cache
+        with self.captureOnCommitCallbacks(execute=True):
+            appliquer_mouvements([Mouvement(self.produits[0], 'SORTIE', 2, 'Vente')], self.user)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        
+        # Rupture : la fiche d'un produit de la même catégorie et le catalogue sont recalculés
+        with self.captureOnCommitCallbacks(execute=True):
+            appliquer_mouvements([Mouvement(self.produits[0], 'SORTIE', 3, 'Vente')], self.user)
+        response = self.client.get(url)
+        self.assertNotIn(self.produits[0], response.context['produits_similaires'])
+        response = self.client.get(reverse('inventory:ecommerce_catalogue'))
+        self.assertNotContains(response, "Gant 0")
+    
+    def test_categories_et_utilisateur_connecte(self):
+        self.client.get(reverse('inventory:client_homepage'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autre_categorie.nom = "Radiologie"
+            self.autre_categorie.save()
+        self.assertContains(self.client.get(reverse('inventory:client_homepage')), "Radiologie")
+        
+        # Page d'un utilisateur connecté jamais servie depuis le cache anonyme
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('inventory:client_homepage'))
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, "technicien")
+    
+    def test_cache_fichiers(self):
+        import os
+        import tempfile
+        with tempfile.TemporaryDirectory() as dossier:
+            caches = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': dossier}}
+            with self.settings(CACHES=caches):
+                url = reverse('inventory:ecommerce_home')
+                self.client.get(url)
+                self.assertTrue(os.listdir(dossier))
+                with self.assertNumQueries(0):
+                    self.client.get(url)
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.produits[2].nom = "Gant stérile"
+                    self.produits[2].save()
+                self.assertContains(self.client.get(url), "Gant stérile")
+    
+    def test_invalidation_a_la_validation_de_la_transaction(self):
+        from inventory.cache_catalogue import versions
+        avant = versions('produits')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produits[0].nom = "Gant renommé"
+            self.produits[0].save()
+            # Une page servie avant la validation reste sous l'ancienne version
+            self.assertEqual(versions('produits'), avant)
+        self.assertNotEqual(versions('produits'), avant)
+    
+    def test_changement_de_categorie(self):
+        from inventory.cache_catalogue import versions
+        produit = Produit.objects.get(pk=self.produits[0].pk)
+        avant = versions(f'categorie:{self.categorie.pk}', f'categorie:{self.autre_categorie.pk}')
+        with self.captureOnCommitCallbacks(execute=True):
+            produit.categorie = self.autre_categorie
+            produit.save()
+        apres = versions(f'categorie:{self.categorie.pk}', f'categorie:{self.autre_categorie.pk}')
+        # Ancienne et nouvelle catégorie périmées
+        self.assertNotEqual(apres[0], avant[0])
+        self.assertNotEqual(apres[1], avant[1])
+
+
+class CumulsClientsTest(TestCase):
+    """Tests des cumuls par client (fiche, liste et classement des clients)"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="manager", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.clients = [
+            ClientModel.objects.create(nom=f"Cumul{i}", prenom="Client", email=f"cumul{i}@client.fr", telephone="0600000000")
+            for i in range(3)
+        ]
+        self.client = Client()
+        self.client.login(username="manager", password="testpass123")
+    
+    def vente(self, client, total):
+        return Vente.objects.create(client=client, mode_paiement='ESPECES', utilisateur=self.user, total=Decimal(total))
+    
+    def test_cumuls_tenus_a_jour(self):
+        premier = self.clients[0]
+        vente = self.vente(premier, "150.00")
+        Commande.objects.create(client=premier, utilisateur=self.user, adresse_livraison="Dakar", total=Decimal("300.00"))
+        Commande.objects.create(
+            client=premier, utilisateur=self.user, adresse_livraison="Dakar", total=Decimal("1000.00"), statut='ANNULEE'
+        )
+        Devis.objects.create(client=premier, commercial=self.user, date_validite=date.today(), total=Decimal("80.00"))
+        Devis.objects.create(client=premier, commercial=self.user, date_validite=date.today(), total=Decimal("90.00"), statut='ACCEPTE')
+        
+        cumul = CumulClient.objects.get(client=premier)
+        self.assertEqual((cumul.nombre_ventes, cumul.nombre_commandes), (1, 2))
+        self.assertEqual(cumul.total_commandes, Decimal("1300.00"))
+        # Les commandes annulées ne comptent pas dans le chiffre d'affaires
+        self.assertEqual(cumul.chiffre_affaires, Decimal("450.00"))
+        self.assertEqual((cumul.nombre_devis_ouverts, cumul.montant_devis_ouverts), (1, Decimal("80.00")))
+        self.assertIsNotNone(cumul.date_dernier_achat)
+        
+        # Total recalculé depuis les lignes (UPDATE sans signal)
+        produit = Produit.objects.create(
+            nom="Gant", reference="CUM-1", prix_achat=Decimal("1.00"), prix_vente=Decimal("5.00"),
+            categorie=Categorie.objects.create(nom="Consommables"),
+            fournisseur=Fournisseur.objects.create(nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0"),
+        )
+        LigneVente.objects.bulk_create([LigneVente(vente=vente, produit=produit, quantite=4, prix_unitaire=Decimal("5.00"))])
+        vente.calculer_total()
+        self.assertEqual(CumulClient.objects.get(client=premier).chiffre_affaires, Decimal("320.00"))
+        
+        vente.delete()
+        cumul = CumulClient.objects.get(client=premier)
+        self.assertEqual((cumul.nombre_ventes, cumul.chiffre_affaires), (0, Decimal("300.00")))
+        
+        # Supprimer le client supprime ses documents et ses cumuls
+        premier.delete()
+        self.assertFalse(CumulClient.objects.exists())
+    
+    def test_changement_de_client(self):
+        premier, second = self.clients[:2]
+        Commande.objects.create(client=premier, utilisateur=self.user, adresse_livraison="Dakar", total=Decimal("300.00"))
+        self.vente(premier, "40.00")
+        
+        # Vente rechargée puis passée à un autre client : les deux cumuls sont recalculés
+        vente = Vente.objects.get()
+        vente.client = second
+        vente.save()
+        self.assertEqual(CumulClient.objects.get(client=premier).nombre_ventes, 0)
+        self.assertEqual(CumulClient.objects.get(client=second).total_ventes, Decimal("40.00"))
+        
+        # Commande modifiée par le formulaire (lignes recréées, puis calculer_total)
+        commande = Commande.objects.get()
+        produit = Produit.objects.create(
+            nom="Gant", reference="CUM-2", prix_achat=Decimal("1.00"), prix_vente=Decimal("5.00"), quantite_stock=10,
+            categorie=Categorie.objects.create(nom="Consommables"),
+            fournisseur=Fournisseur.objects.create(nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0"),
+        )
+        response = self.client.post(reverse('inventory:commande_update', args=[commande.pk]), {
+            'numero_commande': commande.numero_commande, 'client': second.pk, 'statut': 'EN_ATTENTE',
+            'adresse_livraison': 'Dakar', 'ligne_0_produit': produit.pk, 'ligne_0_quantite': 2, 'ligne_0_prix_unitaire': '5.00',
+        })
+        self.assertRedirects(response, reverse('inventory:commande_detail', args=[commande.pk]))
+        self.assertEqual(CumulClient.objects.get(client=premier).total_commandes, Decimal("0"))
+        self.assertEqual(CumulClient.objects.get(client=second).total_commandes, Decimal("10.00"))
+    
+    def test_reconstruire(self):
+        self.vente(self.clients[1], "70.00")
+        CumulClient.objects.all().delete()
+        self.assertEqual(reconstruire_cumuls(), 3)
+        self.assertEqual(CumulClient.objects.get(client=self.clients[1]).chiffre_affaires, Decimal("70.00"))
+        self.assertEqual(CumulClient.objects.get(client=self.clients[2]).chiffre_affaires, Decimal("0"))
+    
+    def test_pages_clients(self):
+        self.vente(self.clients[1], "500.00")
+        self.vente(self.clients[2], "200.00")
+        response = self.client.get(reverse('inventory:clients_list'), {'tri': 'ca', 'ca_min': '100'})
+        self.assertEqual([c.pk for c in response.context['clients']], [self.clients[1].pk, self.clients[2].pk])
+        
+        response = self.client.get(reverse('inventory:clients_top'))
+        self.assertEqual([c.client_id for c in response.context['cumuls']], [self.clients[1].pk, self.clients[2].pk])
+        
+        # Fiche client : session, utilisateur, profil, client et cumuls (une jointure), derniers documents
+        url = reverse('inventory:client_detail', args=[self.clients[1].pk])
+        self.client.get(url)
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.context['cumul'].total_ventes, Decimal("500.00"))
+        self.assertEqual(self.client.get(reverse('inventory:client_detail', args=[self.clients[0].pk])).context['cumul'].nombre_ventes, 0)
+
+
+class MaintenancePreventiveTest(TestCase):
+    """Tests de la planification des maintenances préventives"""
+    
+    def setUp(self):
+        self.techniciens = []
+        for i in range(2):
+            technicien = User.objects.create_user(username=f"tech{i}", password="testpass123")
+            technicien.profile.role = "TECHNICIEN"
+            technicien.profile.save()
+            self.techniciens.append(technicien)
+        self.aujourd_hui = timezone.localdate()
+        client = ClientModel.objects.create(nom="Clinique", prenom="Centrale", email="clinique@client.fr", telephone="0600000000")
+        produit = Produit.objects.create(
+            nom="Échographe", reference="MAINT-1", prix_achat=Decimal("100.00"), prix_vente=Decimal("200.00"),
+            categorie=Categorie.objects.create(nom="Imagerie"),
+            fournisseur=Fournisseur.objects.create(nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0"),
+        )
+        vente = Vente.objects.create(client=client, mode_paiement='ESPECES', utilisateur=self.techniciens[0])
+        
+        def appareil(nom, jours, intervalle=365, statut='EN_SERVICE'):
+            return AppareilVendu.objects.create(
+                numero_serie=nom, produit=produit, client=client, vente=vente, statut=statut,
+                date_installation=self.aujourd_hui - timedelta(days=400), lieu_installation="Bloc",
+                prochaine_maintenance_preventive=self.aujourd_hui + timedelta(days=jours),
+                intervalle_maintenance_jours=intervalle,
+            )
+        self.en_retard = appareil("SN-RETARD", -1)
+        self.hebdomadaire = appareil("SN-HEBDO", 10, intervalle=7)
+        self.lointain = appareil("SN-LOINTAIN", 60)
+        appareil("SN-HS", 0, statut='HORS_SERVICE')
+        deja_planifie = appareil("SN-PLANIFIE", 5)
+        InterventionSAV.objects.create(
+            type_intervention='PREVENTIVE', appareil=deja_planifie, technicien=self.techniciens[0],
+            date_prevue=timezone.now() + timedelta(days=5), duree_prevue=60, description="Planifiée à la main"
+        )
+    
+    def test_planification_par_lots(self):
+        from unittest import mock
+        from inventory import maintenance_preventive
+        with mock.patch.object(maintenance_preventive, 'TAILLE_LOT', 1):
+            resultat = maintenance_preventive.planifier(self.aujourd_hui, 30)
+        
+        # En retard : une intervention dès aujourd'hui ; hebdomadaire : J+10, J+17, J+24
+        self.assertEqual((resultat.appareils, resultat.interventions), (2, 4))
+        dates = sorted(
+            timezone.localtime(d).date() for d in
+            InterventionSAV.objects.filter(appareil=self.hebdomadaire).values_list('date_prevue', flat=True)
+        )
+        self.assertEqual(dates, [self.aujourd_hui + timedelta(days=j) for j in (10, 17, 24)])
+        self.en_retard.refresh_from_db()
+        self.hebdomadaire.refresh_from_db()
+        self.assertEqual(self.en_retard.prochaine_maintenance_preventive, self.aujourd_hui + timedelta(days=365))
+        self.assertEqual(self.hebdomadaire.prochaine_maintenance_preventive, self.aujourd_hui + timedelta(days=31))
+        
+        # Répartition selon la charge (le premier technicien a déjà une intervention)
+        self.assertEqual(resultat.par_technicien, {self.techniciens[0].pk: 2, self.techniciens[1].pk: 2})
+        self.assertTrue(all(i.numero_intervention.startswith('INT') for i in InterventionSAV.objects.all()))
+        
+        # Rien de plus à planifier au second passage
+        self.assertEqual(maintenance_preventive.planifier(self.aujourd_hui, 30).interventions, 0)
+    
+    def test_technicien_responsable_et_commande(self):
+        from io import StringIO
+        from django.core.management import call_command
+        AppareilVendu.objects.filter(pk=self.hebdomadaire.pk).update(technicien_responsable=self.techniciens[0])
+        sortie = StringIO()
+        call_command('schedule_maintenance', '--jours', '30', stdout=sortie)
+        self.assertIn('4 intervention(s) planifiée(s) pour 2 appareil(s)', sortie.getvalue())
+        # Le responsable garde ses appareils tant que sa charge reste proche de celle des autres
+        self.assertEqual(
+            set(InterventionSAV.objects.filter(appareil=self.hebdomadaire).values_list('technicien', flat=True)),
+            {self.techniciens[0].pk}
+        )
+    
+    def test_tache_periodique_demarree_par_le_serveur_seulement(self):
+        import importlib
+        from unittest import mock
+        from django.apps import apps
+        from django.test import override_settings
+        from enterprise_inventory import wsgi
+        with override_settings(MAINTENANCE_PLANIFICATION_AUTO=True), \
+                mock.patch('inventory.maintenance_preventive.demarrer') as demarrer:
+            # migrate, shell, tests : chargement des applications sans thread
+            apps.get_app_config('inventory').ready()
+            demarrer.assert_not_called()
+            importlib.reload(wsgi)
+            demarrer.assert_called_once_with()
+        with override_settings(MAINTENANCE_PLANIFICATION_AUTO=False), \
+                mock.patch('inventory.maintenance_preventive.demarrer') as demarrer:
+            importlib.reload(wsgi)
+            demarrer.assert_not_called()
+
+
+class PlanningTechniciensTest(TestCase):
+    """Tests du planning des techniciens"""
+    
+    def setUp(self):
+        self.techniciens = []
+        for i in range(2):
+            technicien = User.objects.create_user(username=f"tech{i}", password="testpass123")
+            technicien.profile.role = "TECHNICIEN"
+            technicien.profile.save()
+            self.techniciens.append(technicien)
+        self.lundi = timezone.localdate() - timedelta(days=timezone.localdate().weekday()) + timedelta(days=7)
+    
+    def taches(self, *durees, echeance=None, **kwargs):
+        from inventory.planning_techniciens import Tache
+        return [
+            Tache(pk=i, numero=f"INT{i}", duree=duree, echeance=echeance or self.lundi, **kwargs)
+            for i, duree in enumerate(durees, start=1)
+        ]
+    
+    def test_capacite_et_report(self):
+        from inventory.planning_techniciens import repartir, jours_de
+        jours = jours_de(self.lundi, self.lundi + timedelta(days=6))
+        self.assertEqual(len(jours), 5)
+        ids = [t.pk for t in self.techniciens]
+        
+        # 5 interventions de 4 h pour 2 techniciens à 8 h : la cinquième passe au mardi
+        affectations, non_planifiees = repartir(self.taches(240, 240, 240, 240, 240), ids, jours, 480)
+        self.assertEqual(non_planifiees, [])
+        for technicien_id in ids:
+            for jour, taches in affectations[technicien_id].items():
+                self.assertLessEqual(sum(t.duree for t in taches), 480)
+        self.assertEqual(
+            sum(len(affectations[i].get(self.lundi + timedelta(days=1), [])) for i in ids), 1
+        )
+        
+        # Plus de place sur la période : intervention non planifiée
+        affectations, non_planifiees = repartir(self.taches(*[480] * 11), ids, jours, 480)
+        self.assertEqual(len(non_planifiees), 1)
+    
+    def test_en_cours_et_meme_ville(self):
+        from inventory.planning_techniciens import repartir, jours_de
+        jours = jours_de(self.lundi, self.lundi + timedelta(days=4))
+        ids = [t.pk for t in self.techniciens]
+        en_cours, = self.taches(60, technicien_id=ids[1], en_cours=True, ville="Thiès")
+        a_repartir = self.taches(30, 30, ville="Thiès")
+        for i, tache in enumerate(a_repartir, start=10):
+            tache.pk = i
+        affectations, _ = repartir([en_cours, *a_repartir], ids, jours, 480)
+        # L'intervention en cours reste au second technicien, qui prend aussi les autres de la ville
+        self.assertEqual([t.pk for t in affectations[ids[1]][self.lundi]], [1, 10, 11])
+        self.assertEqual(affectations[ids[0]], {})
+    
+    def test_repartition_volumineuse(self):
+        import time
+        from inventory.planning_techniciens import Tache, repartir, jours_de
+        jours = jours_de(self.lundi, self.lundi + timedelta(days=6))
+        taches = [
+            Tache(pk=i, numero=f"INT{i}", duree=30 + (i * 37) % 150, echeance=self.lundi + timedelta(days=i % 5),
+                  technicien_id=i % 40, ville=f"Ville{i % 12}")
+            for i in range(2000)
+        ]
+        debut = time.perf_counter()
+        affectations, non_planifiees = repartir(taches, list(range(30)), jours, 480)
+        self.assertLess(time.perf_counter() - debut, 1)
+        planifiees = sum(len(t) for jours_technicien in affectations.values() for t in jours_technicien.values())
+        self.assertEqual(planifiees + len(non_planifiees), 2000)
+    
+    def test_api_cache_et_filtrage(self):
+        from django.core.cache import cache
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        cache.clear()
+        client = ClientModel.objects.create(nom="Clinique", prenom="Sud", email="sud@client.fr", telephone="0600000001", ville="Thiès")
+        produit = Produit.objects.create(
+            nom="Moniteur", reference="PLAN-1", prix_achat=Decimal("100.00"), prix_vente=Decimal("200.00"),
+            categorie=Categorie.objects.create(nom="Surveillance"),
+            fournisseur=Fournisseur.objects.create(nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0"),
+        )
+        appareil = AppareilVendu.objects.create(
+            numero_serie="SN-PLAN", produit=produit, client=client, lieu_installation="Bloc",
+            vente=Vente.objects.create(client=client, mode_paiement='ESPECES', utilisateur=self.techniciens[0]),
+            date_installation=self.lundi - timedelta(days=30), prochaine_maintenance_preventive=self.lundi + timedelta(days=300),
+        )
+        maintenant = timezone.make_aware(datetime.combine(self.lundi, datetime.min.time()))
+        for i, technicien in enumerate(self.techniciens):
+            InterventionSAV.objects.create(
+                type_intervention='CORRECTIVE', appareil=appareil, technicien=technicien,
+                date_prevue=maintenant + timedelta(hours=9 + i), duree_prevue=90, description="Panne"
+            )
+        
+        manager = User.objects.create_user(username="chef", password="testpass123")
+        manager.profile.role = "MANAGER"
+        manager.profile.save()
+        http = Client()
+        http.login(username="chef", password="testpass123")
+        url = reverse('inventory:planning_interventions_api')
+        parametres = {'debut': self.lundi.isoformat(), 'fin': (self.lundi + timedelta(days=4)).isoformat()}
+        donnees = http.get(url, parametres).json()
+        self.assertEqual(len(donnees['techniciens']), 2)
+        jour, = donnees['techniciens'][0]['jours']
+        self.assertEqual((jour['date'], jour['minutes']), (self.lundi.isoformat(), 90))
+        self.assertEqual(jour['interventions'][0]['ville'], "Thiès")
+        self.assertEqual(jour['interventions'][0]['debut'], "08:00")
+        
+        # Second appel servi par le cache, puis invalidé par l'écriture d'une intervention
+        from inventory.planning_techniciens import planning
+        with CaptureQueriesContext(connection) as requetes:
+            planning(self.lundi, self.lundi + timedelta(days=4))
+        self.assertEqual(len(requetes), 0)
+        InterventionSAV.objects.filter(technicien=self.techniciens[0]).get().delete()
+        donnees = http.get(url, parametres).json()
+        self.assertEqual(donnees['techniciens'][0]['minutes'], 0)
+        self.assertEqual(http.get(url, {'debut': 'demain'}).status_code, 400)
+        
+        # Un technicien ne voit que son planning
+        http.login(username="tech1", password="testpass123")
+        donnees = http.get(url, parametres).json()
+        self.assertEqual([t['id'] for t in donnees['techniciens']], [self.techniciens[1].pk])
+
+
+class ReapprovisionnementTest(TestCase):
+    """Tests des points de commande et des commandes fournisseurs brouillons"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="magasin", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        self.fournisseur = Fournisseur.objects.create(
+            nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0",
+            delai_livraison_jours=14,
+        )
+        categorie = Categorie.objects.create(nom="Consommables")
+        
+        def produit(reference, stock):
+            return Produit.objects.create(
+                nom=reference, reference=reference, prix_achat=Decimal("10.00"), prix_vente=Decimal("20.00"),
+                categorie=categorie, fournisseur=self.fournisseur, quantite_stock=stock, seuil_alerte=3,
+            )
+        self.regulier = produit("REG", 5)
+        self.irregulier = produit("IRR", 500)
+        self.nouveau = produit("NEW", 0)
+        
+        # 20 semaines complètes d'historique : 10 par semaine, et 0 / 20 en alternance
+        self.aujourd_hui = timezone.localdate()
+        lundi = self.aujourd_hui - timedelta(days=self.aujourd_hui.weekday())
+        debut = lundi - timedelta(weeks=20)
+        Produit.objects.filter(pk__in=[self.regulier.pk, self.irregulier.pk]).update(
+            date_creation=timezone.make_aware(datetime.combine(debut, datetime.min.time()))
+        )
+        for semaine in range(20):
+            jour = timezone.make_aware(datetime.combine(debut + timedelta(weeks=semaine, days=2), datetime.min.time()))
+            for produit_sortie, quantite in ((self.regulier, 10), (self.irregulier, 20 * (semaine % 2))):
+                if quantite:
+                    mouvement = MouvementStock.objects.create(
+                        produit=produit_sortie, type_mouvement='SORTIE', quantite=quantite,
+                        quantite_avant=0, quantite_apres=0, motif="Vente", utilisateur=self.user,
+                    )
+                    MouvementStock.objects.filter(pk=mouvement.pk).update(date_mouvement=jour)
+    
+    def test_points_de_commande(self):
+        from inventory.reapprovisionnement import calculer
+        resultat = calculer(self.aujourd_hui, seuils=True)
+        self.assertEqual((resultat.produits, resultat.a_commander), (3, 1))
+        
+        regulier = SuggestionReappro.objects.get(produit=self.regulier)
+        self.assertEqual((regulier.demande_hebdo, regulier.ecart_type_hebdo, regulier.semaines), (Decimal("10.00"), 0, 20))
+        # Délai de 2 semaines, couverture de 30 jours : 10 x 2 = 20, ceil(10 x (2 + 30/7)) = 63
+        self.assertEqual((regulier.point_commande, regulier.stock_cible, regulier.quantite_suggeree), (20, 63, 58))
+        
+        irregulier = SuggestionReappro.objects.get(produit=self.irregulier)
+        self.assertEqual(irregulier.demande_hebdo, Decimal("10.00"))
+        self.assertEqual(irregulier.ecart_type_hebdo, Decimal("10.26"))  # 10 x racine(20/19)
+        self.assertGreater(irregulier.point_commande, 20)  # stock de sécurité
+        self.assertEqual(irregulier.quantite_suggeree, 0)
+        
+        # Seuils d'alerte remplacés seulement avec assez d'historique
+        self.regulier.refresh_from_db()
+        self.nouveau.refresh_from_db()
+        self.assertEqual((self.regulier.seuil_alerte, self.nouveau.seuil_alerte), (20, 3))
+    
+    def test_calcul_sans_numpy(self):
+        from unittest import mock
+        from inventory import reapprovisionnement
+        with mock.patch.object(reapprovisionnement, 'np', None), mock.patch.object(reapprovisionnement, 'TAILLE_LOT', 2):
+            reapprovisionnement.calculer(self.aujourd_hui)
+        self.assertEqual(
+            list(SuggestionReappro.objects.order_by('produit').values_list('ecart_type_hebdo', 'point_commande', 'quantite_suggeree')),
+            [(0, 20, 58), (Decimal("10.26"), 44, 0), (0, 0, 0)]
+        )
+    
+    def test_brouillons_et_page(self):
+        from inventory.reapprovisionnement import calculer
+        calculer(self.aujourd_hui)
+        http = Client()
+        http.login(username="magasin", password="testpass123")
+        url = reverse('inventory:reappro_suggestions')
+        response = http.get(url, {'fournisseur': self.fournisseur.pk})
+        self.assertContains(response, "REG")
+        self.assertEqual(response.context['fournisseurs'][0]['montant'], Decimal("580.00"))
+        
+        http.post(url, {'fournisseur': self.fournisseur.pk})
+        commande = CommandeFournisseur.objects.get()
+        self.assertEqual((commande.statut, commande.total), ('BROUILLON', Decimal("580.00")))
+        self.assertTrue(commande.numero_commande.startswith('CF-'))
+        self.assertEqual(list(commande.lignes.values_list('produit', 'quantite')), [(self.regulier.pk, 58)])
+        
+        # Quantité en commande comptée dans le stock prévisionnel : plus rien à commander
+        self.assertFalse(SuggestionReappro.objects.filter(quantite_suggeree__gt=0).exists())
+        self.assertEqual(calculer(self.aujourd_hui).a_commander, 0)
+
+
+class ReservationsStockTest(TestCase):
+    """Tests des réservations de stock des commandes confirmées"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username="commandes", password="testpass123")
+        self.user.profile.role = "MANAGER"
+        self.user.profile.save()
+        categorie = Categorie.objects.create(nom="Imagerie")
+        fournisseur = Fournisseur.objects.create(
+            nom="Fournisseur", email="f@f.fr", telephone="0100000000", adresse="Rue", ville="Dakar", code_postal="0"
+        )
+        self.produit = Produit.objects.create(
+            nom="Échographe", reference="RES-1", categorie=categorie, fournisseur=fournisseur,
+            prix_achat=Decimal("10.00"), prix_vente=Decimal("20.00"), quantite_stock=10,
+        )
+        self.client_commande = ClientModel.objects.create(
+            nom="Diallo", prenom="Awa", email="awa@clinique.sn", telephone="0100000001",
+            adresse="Avenue", ville="Dakar", code_postal="0"
+        )
+    
+    def commande(self, quantite, statut='EN_ATTENTE'):
+        commande = Commande.objects.create(client=self.client_commande, utilisateur=self.user, statut=statut)
+        LigneCommande.objects.create(commande=commande, produit=self.produit, quantite=quantite, prix_unitaire=Decimal("20.00"))
+        commande.calculer_total()
+        return commande
+    
+    def stocks(self):
+        self.produit.refresh_from_db()
+        return self.produit.quantite_stock, self.produit.quantite_reservee, self.produit.quantite_disponible
+    
+    def test_cycle_de_vie_de_la_commande(self):
+        commande = self.commande(4)
+        self.assertEqual(self.stocks(), (10, 0, 10))
+        
+        commande.statut = 'CONFIRMEE'
+        commande.save()
+        self.assertEqual(self.stocks(), (10, 4, 6))
+        self.assertEqual(ReservationStock.objects.get().quantite, 4)
+        
+        # Expédition : sortie de stock et réservation libérée, une seule fois
+        commande.statut = 'EXPEDIEE'
+        commande.save()
+        commande.statut = 'LIVREE'
+        commande.save()
+        self.assertEqual(self.stocks(), (6, 0, 6))
+        self.assertFalse(ReservationStock.objects.exists())
+        mouvement = MouvementStock.objects.get()
+        self.assertEqual((mouvement.type_mouvement, mouvement.quantite, mouvement.motif),
+                         ('SORTIE', 4, f'Expédition commande {commande.numero_commande}'))
+        
+        # Annulation et suppression d'une commande confirmée : réservation rendue
+        autre = self.commande(2, statut='CONFIRMEE')
+        self.assertEqual(self.stocks(), (6, 2, 4))
+        autre.statut = 'ANNULEE'
+        autre.save()
+        self.assertEqual(self.stocks(), (6, 0, 6))
+        self.commande(3, statut='CONFIRMEE').delete()
+        self.assertEqual(self.stocks(), (6, 0, 6))
+    
+    def test_reservation_superieure_au_disponible_refusee(self):
+        from inventory.stock import StockInsuffisant
+        self.commande(7, statut='CONFIRMEE')
+        commande = self.commande(4)
+        commande.statut = 'CONFIRMEE'
+        with self.assertRaises(StockInsuffisant) as erreur:
+            commande.save()
+        self.assertEqual((erreur.exception.disponible, erreur.exception.demande), (3, 4))
+        self.assertEqual(self.stocks(), (10, 7, 3))
+        
+        # Une fiche produit lue avant la réservation ne l'efface pas
+        fiche = Produit.objects.get(pk=self.produit.pk)
+        self.commande(1, statut='CONFIRMEE')
+        fiche.prix_vente = Decimal("25.00")
+        fiche.save()
+        self.assertEqual(self.stocks(), (10, 8, 2))
+    
+    def test_seul_le_produit_insuffisant_est_signale(self):
+        from inventory.stock import StockInsuffisant
+        rare = Produit.objects.create(
+            nom="Sonde", reference="RES-2", categorie=self.produit.categorie, fournisseur=self.produit.fournisseur,
+            prix_achat=Decimal("10.00"), prix_vente=Decimal("20.00"), quantite_stock=1,
+        )
+        commande = self.commande(8)
+        LigneCommande.objects.create(commande=commande, produit=rare, quantite=5, prix_unitaire=Decimal("20.00"))
+        commande.statut = 'CONFIRMEE'
+        with self.assertRaises(StockInsuffisant) as erreur:
+            commande.save()
+        self.assertEqual(erreur.exception.produit, rare)
+        self.assertEqual((erreur.exception.disponible, erreur.exception.demande), (1, 5))
+    
+    def test_vente_et_catalogue_ne_prennent_pas_le_stock_reserve(self):
+        self.commande(8, statut='CONFIRMEE')
+        http = Client()
+        http.login(username="commandes", password="testpass123")
+        response = http.post(reverse('inventory:vente_create'), {
+            'mode_paiement': 'ESPECES', 'remise': '0',
+            'ligne_0_produit': self.produit.pk, 'ligne_0_quantite': 3, 'ligne_0_prix_unitaire': '20.00',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Vente.objects.exists())
+        self.assertIn("Stock insuffisant pour Échographe. Stock disponible: 2, Demandé: 3",
+                      [str(m) for m in response.context['messages']])
+        
+        # Page du catalogue en cache périmée quand le disponible tombe à zéro
+        from django.core.cache import cache
+        cache.clear()
+        catalogue = reverse('inventory:ecommerce_catalogue')
+        self.assertContains(Client().get(catalogue), "Échographe")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.commande(2, statut='CONFIRMEE')
+        self.assertFalse(Produit.objects.filter(actif=True, quantite_disponible__gt=0).exists())
+        self.assertNotContains(Client().get(catalogue), "Échographe")
+    
+    def test_expedition_par_le_formulaire_de_modification(self):
+        commande = self.commande(3, statut='CONFIRMEE')
+        self.assertEqual(self.stocks(), (10, 3, 7))
+        http = Client()
+        http.login(username="commandes", password="testpass123")
+        response = http.post(reverse('inventory:commande_update', args=[commande.pk]), {
+            'numero_commande': commande.numero_commande, 'client': self.client_commande.pk, 'statut': 'EXPEDIEE',
+            'adresse_livraison': 'Dakar', 'ligne_0_produit': self.produit.pk, 'ligne_0_quantite': 3, 'ligne_0_prix_unitaire': '20.00',
+        })
+        self.assertRedirects(response, reverse('inventory:commande_detail', args=[commande.pk]))
+        # Les nouvelles lignes sortent du stock, une seule fois
+        self.assertEqual(self.stocks(), (7, 0, 7))
+        self.assertEqual(MouvementStock.objects.filter(produit=self.produit, type_mouvement='SORTIE').get().quantite, 3)
+        commande.refresh_from_db()
+        self.assertTrue(commande.stock_expedie)
+    
+    def test_commande_sans_lignes_non_marquee_expediee(self):
+        from inventory.reservations import synchroniser
+        commande = Commande.objects.create(client=self.client_commande, utilisateur=self.user, statut='EXPEDIEE')
+        synchroniser(commande)
+        commande.refresh_from_db()
+        self.assertFalse(commande.stock_expedie)
+
+
 if __name__ == '__main__':
     import unittest
     unittest.main()
@@ -21,6 +21,7 @@ urlpatterns = [
     # Gestion des clients
     path('clients/', views.clients_list, name='clients_list'),
     path('clients/<int:pk>/', views.client_detail, name='client_detail'),
+    path('clients/meilleurs/', views.clients_top, name='clients_top'),
     path('clients/nouveau/', views.client_create, name='client_create'),
     path('clients/<int:pk>/modifier/', views.client_update, name='client_update'),
     path('clients/<int:pk>/supprimer/', views.client_delete, name='client_delete'),
@@ -57,6 +58,7 @@ urlpatterns = [
     
     # Gestion du stock
     path('stock/', views.stock_list, name='stock_list'),
+    path('stock/reapprovisionnement/', views.reappro_suggestions, name='reappro_suggestions'),
     
     # E-commerce public
     path('ecommerce/', views.ecommerce_home, name='ecommerce_home'),
@@ -99,6 +101,7 @@ urlpatterns = [
     # Interventions SAV (Service Biomédical)
     path('interventions/', extended_views.intervention_list, name='intervention_list'),
     path('interventions/<int:pk>/', extended_views.intervention_detail, name='intervention_detail'),
+    path('interventions/planning/', extended_views.planning_interventions_api, name='planning_interventions_api'),
     path('interventions/nouvelle/', extended_views.intervention_create, name='intervention_create'),
     path('interventions/<int:pk>/modifier/', extended_views.intervention_edit, name='intervention_edit'),
     
@@ -120,4 +123,12 @@ urlpatterns = [
     # Export et statistiques
     path('prospection/export/excel/', views_prospection.prospection_export_excel, name='prospection_export_excel'),
     path('prospection/stats/api/', views_prospection.prospection_stats_api, name='prospection_stats_api'),
+    
+    # Exports CSV / XLSX des listes (produits, mouvements, clients, commandes, ventes, lignes_vente, devis, prospections)
+    path('exports/<str:type_export>/', views.export_donnees, name='export_donnees'),
+    
+    # PDF par lot (bons de livraison, proformas, factures de vente, devis) en ZIP ou fusionnés
+    path('documents/lot/', views.documents_lot, name='documents_lot'),
+
+    path('profilage/', views.profilage_requetes, name='profilage_requetes'),
 ]
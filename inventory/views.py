@@ -1,198 +1,93 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Sum, Count, F
+from django.db.models import Q, Sum, Count, F, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.db import transaction
-from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, Http404, StreamingHttpResponse, FileResponse
 from django.core.paginator import Paginator
 from datetime import datetime, timedelta
+from decimal import Decimal
 from .models import (
     Produit, Categorie, Fournisseur, Client, Commande, 
-    Vente, MouvementStock, LigneVente, LigneCommande
+    Vente, MouvementStock, LigneVente, LigneCommande, SuggestionReappro, MONTANT
 )
 from .forms import (
     ProduitForm, ClientForm, CommandeForm, VenteForm, 
     MouvementStockForm, FournisseurForm, CategorieForm
 )
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_RIGHT, TA_CENTER, TA_LEFT, TA_JUSTIFY
-from io import BytesIO
 
 # Imports pour la gestion des rôles
 from users.decorators import role_required, permission_required
+from users.permissions import droits
 from users.models import Profile
-
-# Page d'accueil client (catalogue public)
-def client_homepage(request):
-    # Produits actifs par catégorie
-    categories = Categorie.objects.all()
-    produits_nouveaux = Produit.objects.filter(
-        actif=True, 
-        quantite_stock__gt=0
-    ).order_by('-date_creation')[:8]
-    
-    # Recherche
-    query = request.GET.get('q', '')
-    categorie_id = request.GET.get('categorie', '')
-    
-    produits = Produit.objects.filter(actif=True, quantite_stock__gt=0)
-    
-    if query:
-        produits = produits.filter(
-            Q(nom__icontains=query) | 
-            Q(description__icontains=query) |
-            Q(reference__icontains=query)
-        )
-    
-    if categorie_id:
-        produits = produits.filter(categorie_id=categorie_id)
-    
-    # Pagination
-    paginator = Paginator(produits, 12)
-    page_number = request.GET.get('page')
-    produits_page = paginator.get_page(page_number)
-    
-    context = {
-        'categories': categories,
-        'produits_nouveaux': produits_nouveaux,
-        'produits': produits_page,
-        'query': query,
-        'categorie_id': int(categorie_id) if categorie_id else None,
-    }
-    
-    return render(request, 'inventory/client_homepage.html', context)
-
-
-# Gestion des produits
-from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required
-from django.contrib import messages
-from django.db.models import Q, Sum, Count, F
-from django.http import JsonResponse
-from django.core.paginator import Paginator
-from datetime import datetime, timedelta
-from .models import (
-    Produit, Categorie, Fournisseur, Client, Commande, 
-    Vente, MouvementStock, LigneVente, LigneCommande
-)
-from .forms import (
-    ProduitForm, ClientForm, CommandeForm, VenteForm, 
-    MouvementStockForm, FournisseurForm, CategorieForm
-)
+from .statistiques import obtenir_statistiques
+from .lignes import analyser_lignes, creer_lignes
+from .stock import Mouvement, StockInsuffisant, appliquer_mouvements, mouvement_ajustement
+from .cloture_stock import valorisation_au
+from .compteurs_ventes import enregistrer_ventes, par_popularite
+from .cumuls_clients import cumul as cumul_client, meilleurs_clients
+from .reapprovisionnement import a_commander, resume_par_fournisseur, creer_brouillons
+from .cache_catalogue import page_catalogue, fiche_produit, fragment, categories as categories_catalogue
+from .recherche import rechercher
+from .filtres import filtrer_produits, filtrer_clients, filtrer_commandes, filtrer_ventes
+from .exports import EXPORTS, peut_exporter, reponse_csv, reponse_xlsx, xlsx_disponible
+from .cache_pdf import pdf_en_cache
+from .moteur_pdf import rendre, contexte_commande
+from .lot_pdf import TYPES_LOT, LotTropVolumineux, peut_generer, charger_documents, flux_zip, pdf_fusionne, fusion_disponible, nom_lot
+from .profilage import actif as profilage_actif, historique, agregats_par_vue
+from .pagination import paginer, apaginer, pagination_json
+from .stats_listes import statistiques, dans
 
 
 # Vue d'accueil générale (Dashboard)
 @login_required
 def dashboard(request):
-    # Obtenir le rôle de l'utilisateur
-    try:
-        user_role = request.user.profile.role
-    except:
+    # Rôle depuis le cache des droits (users/permissions.py), sans requête sur le profil
+    user_role = droits(request.user).role
+    if user_role is None:
         # Si pas de profil, rediriger vers la création
         return redirect('admin:index')
     
-    # Statistiques de base communes
-    total_produits = Produit.objects.filter(actif=True).count()
-    total_clients = Client.objects.filter(actif=True).count()
-    total_fournisseurs = Fournisseur.objects.filter(actif=True).count()
-    
-    # Produits en stock bas
-    produits_stock_bas = Produit.objects.filter(
-        actif=True, 
-        quantite_stock__lte=F('seuil_alerte')
-    ).count()
-    
-    # Ventes du mois
-    debut_mois = datetime.now().replace(day=1)
-    ventes_mois = Vente.objects.filter(
-        date_vente__gte=debut_mois
-    ).aggregate(
-        total=Sum('total'),
-        count=Count('id')
-    )
-    
-    # Commandes en attente
-    commandes_attente = Commande.objects.filter(
-        statut__in=['EN_ATTENTE', 'CONFIRMEE']
-    ).count()
-    
-    # Derniers mouvements de stock
-    derniers_mouvements = MouvementStock.objects.select_related(
-        'produit', 'utilisateur'
-    ).order_by('-date_mouvement')[:10]
-    
-    # Produits les plus vendus (30 derniers jours)
-    fin_periode = datetime.now()
-    debut_periode = fin_periode - timedelta(days=30)
-    
-    produits_populaires = Produit.objects.filter(
-        lignevente__vente__date_vente__range=[debut_periode, fin_periode]
-    ).annotate(
-        total_vendu=Sum('lignevente__quantite')
-    ).order_by('-total_vendu')[:5]
+    # Statistiques pré-calculées (voir inventory/statistiques.py)
+    globales, personnelles = obtenir_statistiques(request.user, user_role)
     
     # Context de base
     context = {
-        'total_produits': total_produits,
-        'total_clients': total_clients,
-        'total_fournisseurs': total_fournisseurs,
-        'produits_stock_bas': produits_stock_bas,
-        'ventes_mois': ventes_mois,
-        'commandes_attente': commandes_attente,
-        'derniers_mouvements': derniers_mouvements,
-        'produits_populaires': produits_populaires,
+        'total_produits': globales['total_produits'],
+        'total_clients': globales['total_clients'],
+        'total_fournisseurs': globales['total_fournisseurs'],
+        'produits_stock_bas': globales['produits_stock_bas'],
+        'ventes_mois': globales['ventes_mois'],
+        'commandes_attente': globales['commandes_attente'],
+        'derniers_mouvements': globales['derniers_mouvements'],
+        'produits_populaires': globales['produits_populaires'],
+        'dernieres_ventes': globales['dernieres_ventes'],
+        'dernieres_commandes': globales['dernieres_commandes'],
         'user_role': user_role,
     }
-
-    # Dernières ventes (pour tous les rôles)
-    dernieres_ventes = Vente.objects.select_related('client').order_by('-date_vente')[:5]
-    context['dernieres_ventes'] = dernieres_ventes
-
-    # Dernières commandes (pour tous les rôles)
-    dernieres_commandes = Commande.objects.select_related('client', 'utilisateur').order_by('-date_commande')[:5]
-    context['dernieres_commandes'] = dernieres_commandes
-
     
     # Choisir le template selon le rôle
     if user_role == 'MANAGER':
         # Statistiques complètes pour le manager
         context.update({
-            'total_utilisateurs': Profile.objects.count(),
-            'revenus_mois': ventes_mois.get('total', 0) or 0,
+            'total_utilisateurs': globales['total_utilisateurs'],
+            'revenus_mois': globales['ventes_mois'].get('total', 0) or 0,
         })
         template = 'inventory/dashboard_manager.html'
         
     elif user_role == 'COMMERCIAL_SHOWROOM':
         # Statistiques pour commercial 1 (clients/ventes/commandes)
-        mes_ventes = Vente.objects.filter(
-            utilisateur=request.user,
-            date_vente__gte=debut_mois
-        ).aggregate(
-            total=Sum('total'),
-            count=Count('id')
-        )
-        
-        mes_commandes = Commande.objects.filter(
-            utilisateur=request.user,
-            date_commande__gte=debut_mois
-        ).aggregate(
-            total=Sum('total'),
-            count=Count('id')
-        )
-        
-        commandes_en_cours = Commande.objects.filter(
-            utilisateur=request.user,
-            statut__in=['EN_ATTENTE', 'CONFIRMEE']
-        ).count()
+        mes_ventes = personnelles['mes_ventes']
+        mes_commandes = personnelles['mes_commandes']
         
         context.update({
             'mes_ventes': mes_ventes,
             'mes_commandes': mes_commandes,
-            'commandes_en_cours': commandes_en_cours,
+            'commandes_en_cours': mes_commandes.get('en_cours', 0),
             'stats': {
                 'ventes_total': mes_ventes.get('total', 0) or 0,
                 'ventes_count': mes_ventes.get('count', 0) or 0,
@@ -204,24 +99,8 @@ def dashboard(request):
         
     elif user_role == 'COMMERCIAL_TERRAIN':
         # Statistiques pour commercial 2 (clients/devis/prospects + rapports)
-        try:
-            from .models import Devis, Prospect
-            mes_devis = Devis.objects.filter(commercial=request.user).aggregate(
-                total=Count('id'),
-                brouillon=Count('id', filter=Q(statut='BROUILLON')),
-                envoyes=Count('id', filter=Q(statut='ENVOYE')),
-                acceptes=Count('id', filter=Q(statut='ACCEPTE'))
-            )
-            
-            mes_prospects = Prospect.objects.filter(commercial=request.user).aggregate(
-                total=Count('id'),
-                nouveaux=Count('id', filter=Q(statut='NOUVEAU')),
-                qualifies=Count('id', filter=Q(statut='QUALIFIE')),
-                convertis=Count('id', filter=Q(statut='CONVERTI'))
-            )
-        except:
-            mes_devis = {'total': 0, 'brouillon': 0, 'envoyes': 0, 'acceptes': 0}
-            mes_prospects = {'total': 0, 'nouveaux': 0, 'qualifies': 0, 'convertis': 0}
+        mes_devis = personnelles['mes_devis']
+        mes_prospects = personnelles['mes_prospects']
         
         context.update({
             'mes_devis': mes_devis,
@@ -236,73 +115,22 @@ def dashboard(request):
         template = 'inventory/dashboard_commercial_terrain.html'
         
     elif user_role == 'TECHNICIEN':
-        # Statistiques de stock pour technicien
-        mouvements_recents = MouvementStock.objects.filter(
-            utilisateur=request.user
-        ).order_by('-date_mouvement')[:5]
-
-        # Mouvements du jour
-        today = datetime.now().date()
-        mouvements_jour = MouvementStock.objects.filter(date_mouvement__date=today).count()
-        entrees_jour = MouvementStock.objects.filter(date_mouvement__date=today, type_mouvement='ENTREE').aggregate(total=Sum('quantite'))['total'] or 0
-        sorties_jour = MouvementStock.objects.filter(date_mouvement__date=today, type_mouvement='SORTIE').aggregate(total=Sum('quantite'))['total'] or 0
-
-        # Valeur totale du stock
-        valeur_stock = Produit.objects.filter(actif=True).aggregate(valeur=Sum(F('prix_vente') * F('quantite_stock')))['valeur'] or 0
-        produits_actifs = Produit.objects.filter(actif=True).count()
-        total_categories = Categorie.objects.count()
-
-        # Fournisseurs principaux (par nombre de produits actifs)
-        fournisseurs_principaux = Fournisseur.objects.annotate(
-            produits_count=Count('produit', filter=Q(produit__actif=True))
-        ).order_by('-produits_count')[:5]
-
-        # Produits critiques (stock <= seuil)
-        produits_critiques = Produit.objects.filter(actif=True, quantite_stock__lte=F('seuil_alerte'))
-
-        # Nouvelles statistiques biomédicales pour Technicien
-        try:
-            from .models import AppareilVendu, InterventionSAV, TransfertStock
-            from datetime import date
-            
-            # Appareils vendus sous ma responsabilité
-            mes_appareils = AppareilVendu.objects.filter(technicien_responsable=request.user).aggregate(
-                total=Count('id'),
-                maintenance_due=Count('id', filter=Q(prochaine_maintenance_preventive__lte=date.today())),
-                en_service=Count('id', filter=Q(statut='EN_SERVICE'))
-            )
-            
-            # Interventions SAV
-            mes_interventions = InterventionSAV.objects.filter(technicien=request.user).aggregate(
-                total=Count('id'),
-                planifiees=Count('id', filter=Q(statut='PLANIFIEE')),
-                maintenance_preventive=Count('id', filter=Q(type_intervention='PREVENTIVE'))
-            )
-            
-            # Transferts de stock
-            mes_transferts = TransfertStock.objects.filter(
-                Q(demandeur=request.user) | Q(expediteur=request.user) | Q(recepteur=request.user)
-            ).aggregate(
-                total=Count('id'),
-                en_attente=Count('id', filter=Q(statut='EN_ATTENTE')),
-                expedies=Count('id', filter=Q(statut='EXPEDIE'))
-            )
-        except:
-            mes_appareils = {'maintenance_due': 0, 'en_service': 0}
-            mes_interventions = {'planifiees': 0, 'maintenance_preventive': 0}
-            mes_transferts = {'en_attente': 0, 'expedies': 0}
+        # Statistiques de stock et biomédicales pour technicien
+        mes_appareils = personnelles['mes_appareils']
+        mes_interventions = personnelles['mes_interventions']
+        mes_transferts = personnelles['mes_transferts']
 
         context.update({
-            'mes_mouvements': mouvements_recents,
-            'produits_critique': produits_critiques.count(),
-            'mouvements_jour': mouvements_jour,
-            'entrees_jour': entrees_jour,
-            'sorties_jour': sorties_jour,
-            'valeur_stock': valeur_stock,
-            'produits_actifs': produits_actifs,
-            'total_categories': total_categories,
-            'fournisseurs_principaux': fournisseurs_principaux,
-            'produits_critiques': produits_critiques,
+            'mes_mouvements': personnelles['mes_mouvements'],
+            'produits_critique': globales['produits_stock_bas'],
+            'mouvements_jour': globales['mouvements_jour'],
+            'entrees_jour': globales['entrees_jour'],
+            'sorties_jour': globales['sorties_jour'],
+            'valeur_stock': globales['valeur_stock'],
+            'produits_actifs': globales['total_produits'],
+            'total_categories': globales['total_categories'],
+            'fournisseurs_principaux': globales['fournisseurs_principaux'],
+            'produits_critiques': globales['produits_critiques'],
             'stats': {
                 'maintenance_due': mes_appareils['maintenance_due'] or 0,
                 'appareils_service': mes_appareils['en_service'] or 0,
@@ -322,19 +150,20 @@ def dashboard(request):
 
 
 # Page d'accueil client (catalogue public)
+@page_catalogue(('q', 'categorie', 'page'))
 def client_homepage(request):
     # Produits actifs par catégorie
-    categories = Categorie.objects.all()
-    produits_nouveaux = Produit.objects.filter(
+    categories = categories_catalogue()
+    produits_nouveaux = fragment('produits_nouveaux', lambda: list(Produit.objects.filter(
         actif=True, 
-        quantite_stock__gt=0
-    ).order_by('-date_creation')[:8]
+        quantite_disponible__gt=0
+    ).select_related('categorie', 'fournisseur').order_by('-date_creation')[:8]), 'produits')
     
     # Recherche
     query = request.GET.get('q', '')
     categorie_id = request.GET.get('categorie', '')
     
-    produits = Produit.objects.filter(actif=True, quantite_stock__gt=0)
+    produits = Produit.objects.filter(actif=True, quantite_disponible__gt=0).select_related('categorie', 'fournisseur')
     
     if query:
         produits = produits.filter(
@@ -372,28 +201,10 @@ def produits_list(request):
     fournisseur_id = request.GET.get('fournisseur', '')
     stock_bas = request.GET.get('stock_bas', '')
     
-    produits = Produit.objects.select_related('categorie', 'fournisseur')
-    
-    if query:
-        produits = produits.filter(
-            Q(nom__icontains=query) | 
-            Q(reference__icontains=query) |
-            Q(code_barre__icontains=query)
-        )
-    
-    if categorie_id:
-        produits = produits.filter(categorie_id=categorie_id)
-    
-    if fournisseur_id:
-        produits = produits.filter(fournisseur_id=fournisseur_id)
-    
-    if stock_bas:
-        produits = produits.filter(quantite_stock__lte=F('seuil_alerte'))
+    produits = filtrer_produits(request, Produit.objects.select_related('categorie', 'fournisseur'))
     
     # Pagination
-    paginator = Paginator(produits, 20)
-    page_number = request.GET.get('page')
-    produits_page = paginator.get_page(page_number)
+    produits_page = paginer(request, produits, 20, total=True)
     
     categories = Categorie.objects.all()
     fournisseurs = Fournisseur.objects.filter(actif=True)
@@ -432,18 +243,14 @@ def produit_create(request):
     if request.method == 'POST':
         form = ProduitForm(request.POST, request.FILES)
         if form.is_valid():
-            produit = form.save()
-            # Créer un mouvement d'entrée initial si nécessaire
-            if produit.quantite_stock > 0:
-                MouvementStock.objects.create(
-                    produit=produit,
-                    type_mouvement='ENTREE',
-                    quantite=produit.quantite_stock,
-                    quantite_avant=0,
-                    quantite_apres=produit.quantite_stock,
-                    motif='Stock initial',
-                    utilisateur=request.user
-                )
+            with transaction.atomic():
+                produit = form.save(commit=False)
+                stock_initial = produit.quantite_stock
+                # Le stock initial est enregistré par le registre (inventory/stock.py)
+                produit.quantite_stock = 0
+                produit.save()
+                if stock_initial > 0:
+                    appliquer_mouvements([Mouvement(produit, 'ENTREE', stock_initial, 'Stock initial')], request.user)
             messages.success(request, f'Le produit {produit.nom} a été créé avec succès.')
             return redirect('inventory:produit_detail', pk=produit.pk)
     else:
@@ -463,30 +270,25 @@ def produit_update(request, pk):
     if request.method == 'POST':
         form = ProduitForm(request.POST, request.FILES, instance=produit)
         if form.is_valid():
-            produit = form.save()
-            
-            # Si le stock a changé, créer un mouvement
-            nouveau_stock = produit.quantite_stock
-            if nouveau_stock != ancien_stock:
-                if nouveau_stock > ancien_stock:
-                    type_mouvement = 'ENTREE'
-                    quantite = nouveau_stock - ancien_stock
-                else:
-                    type_mouvement = 'SORTIE'
-                    quantite = ancien_stock - nouveau_stock
-                
-                MouvementStock.objects.create(
-                    produit=produit,
-                    type_mouvement=type_mouvement,
-                    quantite=quantite,
-                    quantite_avant=ancien_stock,
-                    quantite_apres=nouveau_stock,
-                    motif='Ajustement manuel',
-                    utilisateur=request.user
-                )
-            
-            messages.success(request, f'Le produit {produit.nom} a été modifié avec succès.')
-            return redirect('inventory:produit_detail', pk=produit.pk)
+            try:
+                with transaction.atomic():
+                    produit = form.save(commit=False)
+                    nouveau_stock = produit.quantite_stock
+                    
+                    # Le stock n'est pas réécrit avec la fiche : la différence saisie est
+                    # appliquée par le registre, sans écraser une vente concurrente
+                    produit.save(update_fields=[
+                        f.name for f in Produit._meta.concrete_fields
+                        if not f.primary_key and not f.generated and f.name not in ('quantite_stock', 'quantite_reservee')
+                    ])
+                    mouvement = mouvement_ajustement(produit, ancien_stock, nouveau_stock, 'Ajustement manuel')
+                    if mouvement:
+                        appliquer_mouvements([mouvement], request.user)
+            except StockInsuffisant as e:
+                form.add_error('quantite_stock', str(e))
+            else:
+                messages.success(request, f'Le produit {produit.nom} a été modifié avec succès.')
+                return redirect('inventory:produit_detail', pk=produit.pk)
     else:
         form = ProduitForm(instance=produit)
     
@@ -519,19 +321,9 @@ def produit_delete(request, pk):
 def clients_list(request):
     query = request.GET.get('q', '')
     ville = request.GET.get('ville', '')
+    tri = request.GET.get('tri', '')
     
-    clients = Client.objects.all()
-    
-    if query:
-        clients = clients.filter(
-            Q(nom__icontains=query) | 
-            Q(prenom__icontains=query) |
-            Q(email__icontains=query) |
-            Q(telephone__icontains=query)
-        )
-    
-    if ville:
-        clients = clients.filter(ville__icontains=ville)
+    clients = filtrer_clients(request, Client.objects.select_related('cumul'))
     
     # Pagination
     paginator = Paginator(clients, 20)
@@ -546,6 +338,8 @@ def clients_list(request):
         'villes': villes,
         'query': query,
         'ville': ville,
+        'tri': tri,
+        'ca_min': request.GET.get('ca_min', ''),
     }
     
     return render(request, 'inventory/clients_list.html', context)
@@ -553,7 +347,7 @@ def clients_list(request):
 
 @login_required
 def client_detail(request, pk):
-    client = get_object_or_404(Client, pk=pk)
+    client = get_object_or_404(Client.objects.select_related('cumul'), pk=pk)
     
     # Dernières commandes
     commandes = Commande.objects.filter(client=client).order_by('-date_commande')[:10]
@@ -561,28 +355,27 @@ def client_detail(request, pk):
     # Dernières ventes
     ventes = Vente.objects.filter(client=client).order_by('-date_vente')[:10]
     
-    # Statistiques
-    total_commandes = Commande.objects.filter(client=client).aggregate(
-        total=Sum('total'),
-        count=Count('id')
-    )
-    
-    total_ventes = Vente.objects.filter(client=client).aggregate(
-        total=Sum('total'),
-        count=Count('id')
-    )
-    
+    # Statistiques (cumuls tenus à jour à chaque écriture, voir inventory/cumuls_clients.py)
     context = {
         'client': client,
         'commandes': commandes,
         'ventes': ventes,
-        'total_commandes': total_commandes,
-        'total_ventes': total_ventes,
+        'cumul': cumul_client(client),
     }
     
     return render(request, 'inventory/client_detail.html', context)
 
 
+@login_required
+@role_required(['MANAGER', 'COMMERCIAL_SHOWROOM', 'COMMERCIAL_TERRAIN'])
+def clients_top(request):
+    """Classement des clients par chiffre d'affaires (lecture de l'index des cumuls)"""
+    context = {
+        'cumuls': meilleurs_clients(20),
+    }
+    return render(request, 'inventory/clients_top.html', context)
+
+
 @login_required
 def client_create(request):
     if request.method == 'POST':
@@ -677,14 +470,17 @@ def fournisseur_detail(request, pk):
     fournisseur = get_object_or_404(Fournisseur, pk=pk)
     
     # Produits de ce fournisseur
-    produits = Produit.objects.filter(fournisseur=fournisseur).order_by('nom')
-    
-    # Statistiques
-    stats = {
-        'total_produits': produits.count(),
-        'produits_actifs': produits.filter(actif=True).count(),
-        'valeur_stock': sum([p.quantite_stock * p.prix_achat for p in produits]),
-    }
+    produits = Produit.objects.filter(fournisseur=fournisseur).select_related('categorie').order_by('nom')
+    
+    # Statistiques en une seule requête d'agrégation
+    stats = produits.order_by().aggregate(
+        total_produits=Count('id'),
+        produits_actifs=Count('id', filter=Q(actif=True)),
+        valeur_stock=Coalesce(
+            Sum(ExpressionWrapper(F('quantite_stock') * F('prix_achat'), output_field=MONTANT)),
+            Decimal('0'), output_field=MONTANT
+        ),
+    )
     
     context = {
         'fournisseur': fournisseur,
@@ -755,34 +551,20 @@ def commandes_list(request):
     statut = request.GET.get('statut', '')
     query = request.GET.get('q', '')
     
-    commandes = Commande.objects.select_related('client', 'utilisateur')
-    
-    if statut:
-        commandes = commandes.filter(statut=statut)
-    
-    if query:
-        commandes = commandes.filter(
-            Q(numero_commande__icontains=query) |
-            Q(client__nom__icontains=query) |
-            Q(client__prenom__icontains=query)
-        )
-    
-    commandes = commandes.order_by('-date_commande')
+    commandes = filtrer_commandes(request, Commande.objects.select_related('client', 'utilisateur'))
     
-    # Statistiques pour les badges
-    stats = {
-        'en_attente': Commande.objects.filter(statut='EN_ATTENTE').count(),
-        'confirmees': Commande.objects.filter(statut='CONFIRMEE').count(),
-        'expediees': Commande.objects.filter(statut='EXPEDIEE').count(),
-        'total_mois': Commande.objects.filter(
-            date_commande__gte=datetime.now().replace(day=1)
-        ).aggregate(total=Sum('total'))['total'] or 0,
-    }
+    # Statistiques pour les badges, en une requête (voir inventory/stats_listes.py)
+    debut_mois = timezone.localtime().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    stats = statistiques(
+        Commande.objects.all(), request.user,
+        en_attente=Count('id', filter=Q(statut='EN_ATTENTE')),
+        confirmees=Count('id', filter=Q(statut='CONFIRMEE')),
+        expediees=Count('id', filter=Q(statut='EXPEDIEE')),
+        total_mois=Coalesce(Sum('total', filter=Q(date_commande__gte=debut_mois)), Decimal('0'), output_field=MONTANT),
+    )
     
     # Pagination
-    paginator = Paginator(commandes, 20)
-    page_number = request.GET.get('page')
-    commandes_page = paginator.get_page(page_number)
+    commandes_page = paginer(request, commandes, 20, total=True)
     
     context = {
         'commandes': commandes_page,
@@ -827,87 +609,12 @@ def commande_create(request):
                     commande.utilisateur = request.user
                     commande.save()
                     
-                    # Traitement des lignes de produit - LOGIQUE ROBUSTE
-                    lines_created = 0
-                    has_error = False
-                    
-                    # Parser toutes les clés POST pour trouver TOUTES les lignes de produit
-                    lines_data = {}
-                    for key in request.POST:
-                        if key.startswith('ligne_') and '_' in key:
-                            parts = key.split('_', 2)
-                            if len(parts) == 3:
-                                line_idx = parts[1]
-                                field_name = parts[2]
-                                
-                                if line_idx not in lines_data:
-                                    lines_data[line_idx] = {}
-                                lines_data[line_idx][field_name] = request.POST[key]
-                    
-                    print(f"=== DEBUG COMMANDE_CREATE ===")
-                    print(f"POST data: {request.POST}")
-                    print(f"Lignes trouvées: {sorted(lines_data.keys())}")
-                    
-                    # Traiter chaque ligne trouvée (triée par index)
-                    for line_idx in sorted(lines_data.keys(), key=lambda x: int(x) if x.isdigit() else 0):
-                        data = lines_data[line_idx]
-                        produit_id = data.get('produit')
-                        quantite = data.get('quantite')
-                        prix_unitaire = data.get('prix_unitaire')
-                        
-                        print(f"Traitement ligne {line_idx}: produit={produit_id}, quantite={quantite}, prix={prix_unitaire}")
-                        
-                        # Ignorer les lignes vides
-                        if not produit_id:
-                            print(f"Ligne {line_idx} ignorée (pas de produit)")
-                            continue
-                        
-                        # Vérifier que tous les champs requis sont présents
-                        if not quantite or not prix_unitaire:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Quantité et prix requis')
-                            has_error = True
-                            continue
-                        
-                        try:
-                            produit = Produit.objects.get(id=produit_id)
-                            quantite = int(quantite)
-                            prix_unitaire = float(prix_unitaire)
-                            
-                            # Validation
-                            if quantite <= 0:
-                                messages.error(request, f'{produit.nom}: La quantité doit être positive')
-                                has_error = True
-                                continue
-                            
-                            if prix_unitaire < 0:
-                                messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
-                                has_error = True
-                                continue
-                            
-                            # Vérifier le stock disponible (warning, pas bloquant)
-                            if quantite > produit.quantite_stock:
-                                messages.warning(request, f'{produit.nom}: Stock insuffisant ({produit.quantite_stock} disponibles)')
-                            
-                            # Créer la ligne de commande
-                            ligne = LigneCommande.objects.create(
-                                commande=commande,
-                                produit=produit,
-                                quantite=quantite,
-                                prix_unitaire=prix_unitaire
-                            )
-                            lines_created += 1
-                            print(f"✓ Ligne {line_idx} créée: {ligne}")
-                            
-                        except Produit.DoesNotExist:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Produit introuvable')
-                            has_error = True
-                            continue
-                        except (ValueError, TypeError) as e:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Erreur de conversion - {str(e)}')
-                            has_error = True
-                            continue
-                    
-                    print(f"✓ Total de lignes créées: {lines_created}")
+                    # Traitement des lignes de produit (voir inventory/lignes.py)
+                    lignes, has_error = analyser_lignes(
+                        request,
+                        avertissement_stock=lambda produit, quantite: f'{produit.nom}: Stock insuffisant ({produit.quantite_disponible} disponibles)'
+                    )
+                    lines_created = 0 if has_error else len(creer_lignes(LigneCommande, 'commande', commande, lignes))
                     
                     # Si erreur détectée, annuler la transaction
                     if has_error:
@@ -924,9 +631,11 @@ def commande_create(request):
                     messages.success(request, f'Commande {commande.numero_commande} créée avec succès ({lines_created} ligne(s)).')
                     return redirect('inventory:commande_detail', pk=commande.pk)
                     
-            except ValueError as e:
+            except StockInsuffisant as e:
+                # Commande confirmée au-delà du stock disponible (voir inventory/reservations.py)
+                messages.error(request, str(e))
+            except ValueError:
                 # Erreur de validation, le formulaire sera réaffiché avec les erreurs
-                print(f"Erreur de validation: {e}")
                 messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
         else:
             messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
@@ -947,92 +656,6 @@ def commande_create(request):
     return render(request, 'inventory/commande_form.html', context)
 
 
-# Company information for all documents - Style DIMAT MEDICAL
-COMPANY_INFO = {
-    'name': 'DIMAT MEDICAL',
-    'subtitle': 'CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE',
-    'address': '123 Rue Médicale, 75000 Paris, France',
-    'phone': '+33 1 23 45 67 89',
-    'fax': '+33 1 23 45 67 90',
-    'email': 'contact@dimatmedical.com',
-    'website': 'www.dimatmedical.com',
-    'siret': 'SIRET: 123 456 789 00012',
-    'vat': 'TVA: FR12123456789',
-    'logo_path': 'static/images/logo.png'  # Placeholder for logo
-}
-
-# Common styles for all documents
-def get_document_styles():
-    styles = getSampleStyleSheet()
-    return {
-        'title': ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            spaceAfter=20,
-            textColor=colors.HexColor('#1e3a8a')
-        ),
-        'subtitle': ParagraphStyle(
-            'CustomSubtitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            spaceAfter=15,
-            textColor=colors.HexColor('#1e3a8a')
-        ),
-        'normal': ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=10,
-            spaceAfter=8
-        ),
-        'footer': ParagraphStyle(
-            'Footer',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.grey,
-            alignment=TA_CENTER
-        )
-    }
-
-# Common header for all documents
-def build_header(story, title_text, styles):
-    # Logo placeholder (replace with actual logo path)
-    try:
-        logo = Image(COMPANY_INFO['logo_path'], width=1.5*inch, height=0.75*inch)
-        story.append(logo)
-    except:
-        story.append(Paragraph("Logo Placeholder", styles['normal']))
-    
-    story.append(Spacer(1, 10))
-    story.append(Paragraph(title_text, styles['title']))
-    story.append(Spacer(1, 10))
-    
-    # Company information
-    company_data = [
-        [COMPANY_INFO['name']],
-        [COMPANY_INFO['address']],
-        [f"Tél: {COMPANY_INFO['phone']} | Email: {COMPANY_INFO['email']}"],
-        [f"{COMPANY_INFO['siret']} | {COMPANY_INFO['vat']}"]
-    ]
-    company_table = Table(company_data, colWidths=[6*inch])
-    company_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    story.append(company_table)
-    story.append(Spacer(1, 20))
-
-# Common footer for all documents
-def build_footer(canvas, doc):
-    canvas.saveState()
-    footer_text = f"{COMPANY_INFO['name']} | {COMPANY_INFO['address']} | Tél: {COMPANY_INFO['phone']} | Email: {COMPANY_INFO['email']} | {COMPANY_INFO['siret']} | {COMPANY_INFO['vat']}"
-    footer = Paragraph(footer_text, get_document_styles()['footer'])
-    w, h = footer.wrap(doc.width, doc.bottomMargin)
-    footer.drawOn(canvas, doc.leftMargin, doc.bottomMargin - 10)
-    canvas.restoreState()
-
 @login_required
 def commande_print_bon(request, pk):
     """Générer le bon de commande en PDF professionnel avec WeasyPrint"""
@@ -1040,7 +663,6 @@ def commande_print_bon(request, pk):
     from weasyprint import HTML
     from django.http import HttpResponse
     from decimal import Decimal
-    from datetime import datetime
     
     commande = get_object_or_404(Commande, pk=pk)
     lignes_commande = LigneCommande.objects.filter(commande=commande).select_related('produit')
@@ -1066,7 +688,6 @@ def commande_print_bon(request, pk):
         'tva': tva,
         'total_ttc': total_ttc,
         'total_quantity': total_quantity,
-        'now': datetime.now(),
         **company_info
     }
     
@@ -1086,277 +707,9 @@ def commande_print_bon(request, pk):
 @login_required
 def commande_print_livraison(request, pk):
     """Générer le bon de livraison en PDF selon le modèle DIMAT MEDICAL"""
-    from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-    from io import BytesIO
-    
     commande = get_object_or_404(Commande, pk=pk)
-    lignes = LigneCommande.objects.filter(commande=commande).select_related('produit')
-    
-    # Créer le PDF en mémoire
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*cm, bottomMargin=2*cm)
-    story = []
-    
-    # Styles personnalisés
-    styles = getSampleStyleSheet()
-    
-    # En-tête entreprise style DIMAT MEDICAL
-    company_style = ParagraphStyle(
-        'CompanyStyle',
-        parent=styles['Normal'],
-        fontSize=16,
-        fontName='Helvetica-Bold',
-        alignment=TA_LEFT,
-        spaceAfter=5
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'SubtitleStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_LEFT,
-        spaceAfter=10
-    )
-    
-    title_style = ParagraphStyle(
-        'TitleStyle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        fontName='Helvetica-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-    
-    # En-tête avec logo et infos entreprise
-    header_data = [
-        [Paragraph("DIMAT MEDICAL", company_style), "", Paragraph("CODE CLIENT:", styles['Normal']), commande.client.id if commande.client else ""],
-        [Paragraph("CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE", subtitle_style), "", "", ""],
-        [Paragraph(f"Tél: {COMPANY_INFO['phone']} Fax: {COMPANY_INFO['fax']}", styles['Normal']), "", Paragraph("DIVERS CLIENT", styles['Normal']), ""],
-        [Paragraph(f"RC: 123456 - Email: {COMPANY_INFO['email']}", styles['Normal']), "", "", ""]
-    ]
-    
-    header_table = Table(header_data, colWidths=[3*inch, 1*inch, 1.5*inch, 1.5*inch])
-    header_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('BOX', (2, 0), (3, 2), 1, colors.black),
-        ('GRID', (2, 0), (3, 2), 0.5, colors.black),
-    ]))
-    
-    story.append(header_table)
-    story.append(Spacer(1, 20))
-    
-    # Titre du document
-    story.append(Paragraph("BON DE LIVRAISON", title_style))
-    story.append(Spacer(1, 15))
-    
-    # Informations de la livraison
-    info_data = [
-        ["NUMERO", "DATE", "REFERENCE", "CLIENT SUIVI PAR:", "AFFAIRE/OBJECTIF"],
-        [commande.numero_commande, 
-         commande.date_commande.strftime('%d/%m/%y'), 
-         commande.numero_commande,
-         commande.utilisateur.get_full_name() or commande.utilisateur.username,
-         commande.client.nom_complet if commande.client else "Client comptoir"]
-    ]
-    
-    info_table = Table(info_data, colWidths=[1.5*inch, 1.5*inch, 1.5*inch, 1.8*inch, 1.7*inch])
-    info_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 15))
-    
-    # Tableau des produits pour bon de livraison (simplifié)
-    if lignes:
-        # En-tête du tableau simplifié
-        data = [['Référence', 'Désignation', 'Qte', 'Observation']]
-        
-        # Lignes de produits
-        for ligne in lignes:
-            data.append([
-                ligne.produit.reference or 'N/A',
-                ligne.produit.nom[:50] + '...' if len(ligne.produit.nom) > 50 else ligne.produit.nom,
-                str(ligne.quantite),
-                ""  # Observation vide par défaut
-            ])
-        
-        # Créer le tableau principal
-        main_table = Table(data, colWidths=[1.5*inch, 3.5*inch, 1*inch, 2*inch])
-        main_table.setStyle(TableStyle([
-            # En-tête
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            
-            # Corps du tableau
-            ('FONTSIZE', (0, 1), (-1, -1), 10),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),  # Référence à gauche
-            ('ALIGN', (1, 1), (1, -1), 'LEFT'),  # Désignation à gauche
-            ('ALIGN', (2, 1), (-1, -1), 'CENTER'),  # Qte et observation centrées
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-        ]))
-        
-        story.append(main_table)
-        story.append(Spacer(1, 30))
-        
-        # Section cachet et visa client
-        visa_data = [
-            ["Cachet et Visa Client"],
-            [""],
-            [""],
-            [""],
-            [""]
-        ]
-        
-        visa_table = Table(visa_data, colWidths=[4*inch], rowHeights=[0.4*inch, 0.6*inch, 0.6*inch, 0.6*inch, 0.6*inch])
-        visa_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        story.append(visa_table)
-    
-    # Conditions générales en bas
-    story.append(Spacer(1, 30))
-    conditions_text = """Conditions de ventes - La marchandise est sous la responsabilité du client dès la signature et le cachet du bon de livraison. Toutes les réclamations formulées après cette décharge ne seront pas prises en compte. Conformément à l'article 314 de l'Acte Uniforme du Droit Commercial Général, le transfert de propriété de la marchandise ne s'effectue qu'au jour du paiement complet et de toute satisfaction et notre propriété."""
-    
-    story.append(Paragraph(conditions_text, ParagraphStyle(
-        'Conditions',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_JUSTIFY
-    )))
-    
-    # Construire le PDF
-    doc.build(story)
     
-    # Retourner la réponse
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="bon_livraison_{commande.numero_commande}.pdf"'
-    return response  # Générer le bon de livraison en PDF
-    commande = get_object_or_404(Commande, pk=pk)
-    lignes = LigneCommande.objects.filter(commande=commande).select_related('produit')
-    
-    if commande.statut not in ['EXPEDIEE', 'LIVREE']:
-        messages.error(request, 'Le bon de livraison ne peut être généré que pour les commandes expédiées ou livrées.')
-        return redirect('inventory:commande_detail', pk=pk)
-    
-    # Créer le PDF en mémoire
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.5*inch, bottomMargin=0.75*inch)
-    story = []
-    styles = get_document_styles()
-    
-    # Header
-    build_header(story, "BON DE LIVRAISON", styles)
-    
-    # Commande information
-    info_data = [
-        ['Numéro de commande:', commande.numero_commande],
-        ['Date de commande:', commande.date_commande.strftime('%d/%m/%Y')],
-        ['Date de livraison:', commande.date_livraison_prevue.strftime('%d/%m/%Y') if commande.date_livraison_prevue else 'Non définie'],
-        ['Client:', commande.client.nom_complet],
-        ['Adresse de livraison:', commande.adresse_livraison],
-        ['Statut:', commande.get_statut_display()],
-    ]
-    
-    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    story.append(info_table)
-    story.append(Spacer(1, 20))
-    
-    # Tableau des produits
-    if lignes:
-        story.append(Paragraph("PRODUITS LIVRÉS", styles['subtitle']))
-        story.append(Spacer(1, 10))
-        
-        data = [['Produit', 'Référence', 'Quantité livrée', 'État']]
-        for ligne in lignes:
-            data.append([
-                ligne.produit.nom,
-                ligne.produit.reference or 'N/A',
-                str(ligne.quantite),
-                'Livré'
-            ])
-        
-        table = Table(data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f3f4f6')),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        story.append(table)
-    
-    # Signature section
-    story.append(Spacer(1, 30))
-    story.append(Paragraph("VÉRIFICATION DE LA LIVRAISON", styles['subtitle']))
-    signature_data = [
-        ['Signature du livreur:', 'Signature du client:'],
-        ['', ''],
-        ['Date: _______________', 'Date: _______________']
-    ]
-    
-    signature_table = Table(signature_data, colWidths=[3*inch, 3*inch])
-    signature_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 1), (-1, 1), 40),
-        ('LINEBELOW', (0, 1), (-1, 1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    story.append(signature_table)
-    
-    # Notes
-    if commande.notes:
-        story.append(Spacer(1, 20))
-        story.append(Paragraph("NOTES:", styles['subtitle']))
-        story.append(Paragraph(commande.notes, styles['normal']))
-    
-    # Build PDF with footer
-    doc.build(story, onFirstPage=build_footer, onLaterPages=build_footer)
-    
-    # Return response
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    response = HttpResponse(rendre('bon_livraison', contexte_commande(commande)), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="bon_livraison_{commande.numero_commande}.pdf"'
     return response
 
@@ -1364,129 +717,12 @@ def commande_print_livraison(request, pk):
 def commande_print_facture(request, pk):
     """Générer la facture en PDF"""
     commande = get_object_or_404(Commande, pk=pk)
-    lignes = LigneCommande.objects.filter(commande=commande).select_related('produit')
-    total = commande.total
     
     if commande.statut != 'LIVREE':
         messages.error(request, 'La facture ne peut être générée que pour les commandes livrées.')
         return redirect('inventory:commande_detail', pk=pk)
     
-    # Créer le PDF en mémoire
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=0.5*inch, leftMargin=0.5*inch, topMargin=0.5*inch, bottomMargin=0.75*inch)
-    story = []
-    styles = get_document_styles()
-    
-    # Header
-    build_header(story, "FACTURE", styles)
-    
-    # Billing information
-    billing_data = [
-        ['FACTURÉ À:'],
-        [commande.client.nom_complet],
-        [commande.client.email],
-        [commande.client.telephone or 'Non renseigné'],
-        [commande.adresse_livraison]
-    ]
-    
-    billing_table = Table(billing_data, colWidths=[6*inch])
-    billing_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    story.append(billing_table)
-    story.append(Spacer(1, 20))
-    
-    # Invoice information
-    invoice_data = [
-        ['Numéro de facture:', f"FACT-{commande.numero_commande}"],
-        ['Date de facture:', commande.date_commande.strftime('%d/%m/%Y')],
-        ['Numéro de commande:', commande.numero_commande],
-        ['Date de livraison:', commande.date_livraison_prevue.strftime('%d/%m/%Y') if commande.date_livraison_prevue else 'Non définie'],
-    ]
-    
-    invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
-    invoice_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    story.append(invoice_table)
-    story.append(Spacer(1, 20))
-    
-    # Tableau des produits
-    if lignes:
-        story.append(Paragraph("DÉTAIL DE LA FACTURE", styles['subtitle']))
-        story.append(Spacer(1, 10))
-        
-        data = [['Description', 'Qté', 'Prix unitaire HT', 'Total HT']]
-        subtotal = 0
-        for ligne in lignes:
-            total_ligne = ligne.sous_total()
-            subtotal += total_ligne
-            data.append([
-                ligne.produit.nom,
-                str(ligne.quantite),
-                f"{ligne.prix_unitaire:.2f}F CFA",
-                f"{total_ligne:.2f}F CFA"
-            ])
-        
-        from decimal import Decimal
-        tva_rate = Decimal('0.20')
-        tva_amount = subtotal * tva_rate
-        total_ttc = subtotal + tva_amount
-        
-        data.append(['', '', 'Sous-total HT:', f"{subtotal:.2f}F CFA"])
-        data.append(['', '', f'TVA ({tva_rate*100:.0f}%):', f"{tva_amount:.2f}F CFA"])
-        data.append(['', '', 'TOTAL TTC:', f"{total_ttc:.2f}F CFA"])
-        
-        table = Table(data, colWidths=[3*inch, 0.8*inch, 1.6*inch, 1.6*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -4), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -4), colors.HexColor('#f3f4f6')),
-            ('BACKGROUND', (0, -3), (-1, -1), colors.HexColor('#e5e7eb')),
-            ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        story.append(table)
-    
-    # Conditions de paiement
-    story.append(Spacer(1, 20))
-    story.append(Paragraph("CONDITIONS DE PAIEMENT", styles['subtitle']))
-    conditions = [
-        "• Paiement à 30 jours fin de mois",
-        "• Escompte de 2% pour paiement à 8 jours",
-        "• Pénalités de retard : 3 fois le taux légal",
-        "• Indemnité forfaitaire de recouvrement : 40F CFA"
-    ]
-    for condition in conditions:
-        story.append(Paragraph(condition, styles['normal']))
-    
-    # Notes
-    if commande.notes:
-        story.append(Spacer(1, 20))
-        story.append(Paragraph("NOTES:", styles['subtitle']))
-        story.append(Paragraph(commande.notes, styles['normal']))
-    
-    # Build PDF with footer
-    doc.build(story, onFirstPage=build_footer, onLaterPages=build_footer)
-    
-    # Return response
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    response = HttpResponse(rendre('facture_commande', contexte_commande(commande)), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="facture_{commande.numero_commande}.pdf"'
     return response
     
@@ -1501,88 +737,15 @@ def commande_update(request, pk):
         if form.is_valid():
             try:
                 with transaction.atomic():
-                    commande = form.save()
-                    
-                    # Supprimer les anciennes lignes
+                    # Supprimer les anciennes lignes ; le post_save ne synchronise pas la commande
+                    # sans lignes : calculer_total réserve ou expédie les nouvelles lignes
                     commande.lignecommande_set.all().delete()
+                    form.instance.lignes_en_remplacement = True
+                    commande = form.save()
                     
-                    # Traitement des lignes de produit - LOGIQUE ROBUSTE
-                    lines_created = 0
-                    has_error = False
-                    
-                    # Parser toutes les clés POST pour trouver TOUTES les lignes de produit
-                    lines_data = {}
-                    for key in request.POST:
-                        if key.startswith('ligne_') and '_' in key:
-                            parts = key.split('_', 2)
-                            if len(parts) == 3:
-                                line_idx = parts[1]
-                                field_name = parts[2]
-                                
-                                if line_idx not in lines_data:
-                                    lines_data[line_idx] = {}
-                                lines_data[line_idx][field_name] = request.POST[key]
-                    
-                    print(f"=== DEBUG COMMANDE_UPDATE ===")
-                    print(f"POST data: {request.POST}")
-                    print(f"Lignes trouvées: {sorted(lines_data.keys())}")
-                    
-                    # Traiter chaque ligne trouvée (triée par index)
-                    for line_idx in sorted(lines_data.keys(), key=lambda x: int(x) if x.isdigit() else 0):
-                        data = lines_data[line_idx]
-                        produit_id = data.get('produit')
-                        quantite = data.get('quantite')
-                        prix_unitaire = data.get('prix_unitaire')
-                        
-                        print(f"Traitement ligne {line_idx}: produit={produit_id}, quantite={quantite}, prix={prix_unitaire}")
-                        
-                        # Ignorer les lignes vides
-                        if not produit_id:
-                            print(f"Ligne {line_idx} ignorée (pas de produit)")
-                            continue
-                        
-                        # Vérifier que tous les champs requis sont présents
-                        if not quantite or not prix_unitaire:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Quantité et prix requis')
-                            has_error = True
-                            continue
-                        
-                        try:
-                            produit = Produit.objects.get(id=produit_id)
-                            quantite = int(quantite)
-                            prix_unitaire = float(prix_unitaire)
-                            
-                            # Validation
-                            if quantite <= 0:
-                                messages.error(request, f'{produit.nom}: La quantité doit être positive')
-                                has_error = True
-                                continue
-                            
-                            if prix_unitaire < 0:
-                                messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
-                                has_error = True
-                                continue
-                            
-                            # Créer la ligne de commande
-                            ligne = LigneCommande.objects.create(
-                                commande=commande,
-                                produit=produit,
-                                quantite=quantite,
-                                prix_unitaire=prix_unitaire
-                            )
-                            lines_created += 1
-                            print(f"✓ Ligne {line_idx} créée: {ligne}")
-                            
-                        except Produit.DoesNotExist:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Produit introuvable')
-                            has_error = True
-                            continue
-                        except (ValueError, TypeError) as e:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Erreur de conversion - {str(e)}')
-                            has_error = True
-                            continue
-                    
-                    print(f"✓ Total de lignes créées: {lines_created}")
+                    # Traitement des lignes de produit (voir inventory/lignes.py)
+                    lignes, has_error = analyser_lignes(request)
+                    lines_created = 0 if has_error else len(creer_lignes(LigneCommande, 'commande', commande, lignes))
                     
                     # Si erreur détectée, annuler la transaction
                     if has_error:
@@ -1599,9 +762,11 @@ def commande_update(request, pk):
                     messages.success(request, f'Commande {commande.numero_commande} modifiée avec succès ({lines_created} ligne(s)).')
                     return redirect('inventory:commande_detail', pk=commande.pk)
                     
-            except ValueError as e:
+            except StockInsuffisant as e:
+                # Réservation ou expédition au-delà du stock disponible (voir inventory/reservations.py)
+                messages.error(request, str(e))
+            except ValueError:
                 # Erreur de validation, le formulaire sera réaffiché avec les erreurs
-                print(f"Erreur de validation: {e}")
                 messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
         else:
             messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
@@ -1638,182 +803,12 @@ def commande_delete(request, pk):
         'object_name': 'commande'
     })
 
-
 @login_required
 def commande_print_proforma(request, pk):
     """Générer un proforma en PDF selon le modèle DIMAT MEDICAL"""
-    from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-    from io import BytesIO
-    from decimal import Decimal
-    import datetime
-    
     commande = get_object_or_404(Commande, pk=pk)
-    lignes = LigneCommande.objects.filter(commande=commande).select_related('produit')
-    
-    # Créer le PDF en mémoire
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*cm, bottomMargin=2*cm)
-    story = []
-    
-    # Styles personnalisés
-    styles = getSampleStyleSheet()
-    
-    # En-tête entreprise style DIMAT MEDICAL
-    company_style = ParagraphStyle(
-        'CompanyStyle',
-        parent=styles['Normal'],
-        fontSize=16,
-        fontName='Helvetica-Bold',
-        alignment=TA_LEFT,
-        spaceAfter=5
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'SubtitleStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_LEFT,
-        spaceAfter=10
-    )
-    
-    # En-tête avec logo et infos entreprise
-    story.append(Paragraph("DIMAT MEDICAL", company_style))
-    story.append(Paragraph("CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE", subtitle_style))
-    story.append(Spacer(1, 30))
-    
-    # Numéro de proforma centré
-    proforma_style = ParagraphStyle(
-        'ProformaStyle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        fontName='Helvetica-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
     
-    story.append(Paragraph(f"Proforma n° {commande.numero_commande}", proforma_style))
-    story.append(Spacer(1, 20))
-    
-    # Informations client et date
-    client_info = f"Client: {commande.client.nom_complet if commande.client else 'Client comptoir'}"
-    date_info = f"DATE: {commande.date_commande.strftime('%d/%m/%Y')}"
-    
-    info_data = [[client_info, date_info]]
-    info_table = Table(info_data, colWidths=[4*inch, 2*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 30))
-    
-    # Tableau des produits style proforma
-    if lignes:
-        # En-tête du tableau
-        data = [['Description', 'Quantité', 'Prix unitaire', 'Prix Total']]
-        
-        total_general = Decimal('0.00')
-        
-        # Lignes de produits
-        for ligne in lignes:
-            total_ligne = ligne.prix_unitaire * ligne.quantite
-            total_general += total_ligne
-            
-            data.append([
-                ligne.produit.nom,
-                str(ligne.quantite),
-                f"{ligne.prix_unitaire:.0f} 000",  # Style des prix dans l'image
-                f"{total_ligne:.0f} 000"
-            ])
-        
-        # Ligne de total
-        data.append(['', 'TOTAL', '', f"{total_general:.0f} 000"])
-        
-        # Créer le tableau
-        main_table = Table(data, colWidths=[3*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-        main_table.setStyle(TableStyle([
-            # En-tête
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -2), 'LEFT'),  # Description à gauche
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            
-            # Corps du tableau
-            ('FONTSIZE', (0, 1), (-1, -2), 10),
-            ('GRID', (0, 0), (-1, -2), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            
-            # Ligne de total
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f0f0f0')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('GRID', (0, -1), (-1, -1), 1, colors.black),
-        ]))
-        
-        story.append(main_table)
-        story.append(Spacer(1, 30))
-    
-    # Informations de garantie et SAV (selon le modèle)
-    garantie_data = [
-        ["Garantie 12 Mois"],
-        ["SAV Assuré"],
-        ["Validité de l'offre: 2 mois"]
-    ]
-    
-    garantie_table = Table(garantie_data, colWidths=[3*inch])
-    garantie_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#e0e0e0')),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-    ]))
-    
-    story.append(garantie_table)
-    story.append(Spacer(1, 30))
-    
-    # Pied de page avec coordonnées
-    footer_text = f"Route nationale en face EDK technologie Dakar - Tél : +221 33 833 03 17 - Email : info@dimatmedical.com"
-    footer_text2 = f"Numéro compte CBAO : sn 01307 03816162A001 34/PC, SN DKR 2018-B-1833 - NINEA : 006890892 200"
-    
-    story.append(Paragraph(footer_text, ParagraphStyle(
-        'Footer1',
-        parent=styles['Normal'],
-        fontSize=9,
-        alignment=TA_CENTER,
-        spaceAfter=5
-    )))
-    
-    story.append(Paragraph(footer_text2, ParagraphStyle(
-        'Footer2',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#666666')
-    )))
-    
-    # Construire le PDF
-    doc.build(story)
-    
-    # Retourner la réponse
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    response = HttpResponse(rendre('proforma', contexte_commande(commande)), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="proforma_{commande.numero_commande}.pdf"'
     return response
 
@@ -1827,47 +822,25 @@ def ventes_list(request):
     date_debut = request.GET.get('date_debut', '')
     date_fin = request.GET.get('date_fin', '')
     
-    ventes = Vente.objects.select_related('client', 'utilisateur')
+    ventes = filtrer_ventes(request, Vente.objects.select_related('client', 'utilisateur'))
     
-    if mode_paiement:
-        ventes = ventes.filter(mode_paiement=mode_paiement)
-    
-    if query:
-        ventes = ventes.filter(
-            Q(numero_vente__icontains=query) |
-            Q(client__nom__icontains=query) |
-            Q(client__prenom__icontains=query)
-        )
-    
-    if date_debut:
-        ventes = ventes.filter(date_vente__gte=date_debut)
-    
-    if date_fin:
-        ventes = ventes.filter(date_vente__lte=date_fin)
-    
-    ventes = ventes.order_by('-date_vente')
-    
-    # Statistiques
-    total_ventes = ventes.aggregate(
-        total=Sum('total'),
-        count=Count('id')
+    # Statistiques des ventes filtrées et ventes du jour (toutes) en une requête
+    stats = statistiques(
+        Vente.objects.all(), request.user,
+        chiffre_affaires=Sum('total', filter=dans(ventes)),
+        nombre=Count('id', filter=dans(ventes)),
+        aujourdhui=Sum('total', filter=Q(date_vente__date=timezone.localdate())),
     )
+    total_ventes = {'total': stats['chiffre_affaires'], 'count': stats['nombre']}
+    ventes_aujourdhui = stats['aujourdhui'] or 0
     
     # Calcul de la vente moyenne
     vente_moyenne = 0
     if total_ventes['count'] and total_ventes['total']:
         vente_moyenne = total_ventes['total'] / total_ventes['count']
     
-    # Ventes aujourd'hui
-    aujourd_hui = datetime.now().date()
-    ventes_aujourdhui = Vente.objects.filter(
-        date_vente__date=aujourd_hui
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
     # Pagination
-    paginator = Paginator(ventes, 20)
-    page_number = request.GET.get('page')
-    ventes_page = paginator.get_page(page_number)
+    ventes_page = paginer(request, ventes, 20, total=True)
     
     context = {
         'ventes': ventes_page,
@@ -1903,135 +876,59 @@ def vente_detail(request, pk):
 
 
 @login_required
-@transaction.atomic
 def vente_create(request):
     """Création de vente avec gestion des lignes de produit en une seule étape"""
     if request.method == 'POST':
-        # Debug: afficher les données POST reçues
-        print("=== DEBUG VENTE_CREATE ===")
-        print("POST data:", dict(request.POST))
-        
         form = VenteForm(request.POST)
         
         if form.is_valid():
-            vente = form.save(commit=False)
-            vente.utilisateur = request.user
-            vente.save()
-            
-            # Traitement des lignes de produit - NOUVELLE LOGIQUE ROBUSTE
-            lines_created = 0
-            
-            # Parser toutes les clés POST pour trouver TOUTES les lignes de produit
-            lines_data = {}
-            for key in request.POST:
-                if key.startswith('ligne_') and '_' in key:
-                    parts = key.split('_', 2)  # ligne_0_produit → ['ligne', '0', 'produit']
-                    if len(parts) == 3:
-                        line_idx = parts[1]
-                        field_name = parts[2]
-                        
-                        if line_idx not in lines_data:
-                            lines_data[line_idx] = {}
-                        lines_data[line_idx][field_name] = request.POST[key]
-            
-            print(f"=== DEBUG VENTE_CREATE ===")
-            print(f"Lignes trouvées: {sorted(lines_data.keys())}")
-            
-            # Traiter chaque ligne trouvée (triée par index)
-            for line_idx in sorted(lines_data.keys(), key=lambda x: int(x) if x.isdigit() else 0):
-                data = lines_data[line_idx]
-                produit_id = data.get('produit')
-                quantite = data.get('quantite')
-                prix_unitaire = data.get('prix_unitaire')
-                
-                print(f"Traitement ligne {line_idx}: produit={produit_id}, quantite={quantite}, prix={prix_unitaire}")
-                
-                # Ignorer les lignes vides (pas de produit sélectionné)
-                if not produit_id:
-                    print(f"Ligne {line_idx} ignorée (pas de produit)")
-                    continue
-                
-                # Vérifier que tous les champs requis sont présents
-                if not (quantite and prix_unitaire):
-                    messages.error(request, f'Ligne {int(line_idx) + 1}: Quantité et prix requis')
-                    raise ValueError(f'Données incomplètes pour la ligne {line_idx}')
-                
-                try:
-                    # Verrouiller le produit pour éviter les race conditions
-                    produit = Produit.objects.select_for_update().get(id=produit_id)
-                    quantite = int(quantite)
-                    prix_unitaire = float(prix_unitaire)
-                    
-                    # Validation
-                    if quantite <= 0:
-                        messages.error(request, f'{produit.nom}: La quantité doit être positive')
-                        raise ValueError('Quantité invalide')
+            try:
+                with transaction.atomic():
+                    vente = form.save(commit=False)
+                    vente.utilisateur = request.user
+                    vente.save()
                     
-                    if prix_unitaire < 0:
-                        messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
-                        raise ValueError('Prix invalide')
+                    # Traitement des lignes de produit (voir inventory/lignes.py)
+                    # Sans verrou : la sortie de stock conditionnelle du registre garantit le stock
+                    lignes, has_error = analyser_lignes(request, stock_bloquant=True)
                     
-                    # Vérifier le stock disponible
-                    if quantite > produit.quantite_stock:
-                        messages.error(
-                            request, 
-                            f'Stock insuffisant pour {produit.nom}. '
-                            f'Stock disponible: {produit.quantite_stock}, Demandé: {quantite}'
-                        )
-                        raise ValueError('Stock insuffisant')
+                    # Si erreur détectée, annuler la transaction
+                    if has_error:
+                        raise ValueError('Erreurs détectées dans les lignes')
                     
-                    # Créer la ligne de vente
-                    ligne = LigneVente.objects.create(
-                        vente=vente,
-                        produit=produit,
-                        quantite=quantite,
-                        prix_unitaire=prix_unitaire
-                    )
-                    lines_created += 1
-                    print(f"✓ Ligne {line_idx} créée: {ligne}")
+                    # Vérifier qu'au moins une ligne a été créée
+                    if not lignes:
+                        messages.error(request, 'Une vente doit contenir au moins un produit')
+                        raise ValueError('Aucune ligne de produit')
                     
-                    # Mettre à jour le stock
-                    quantite_avant = produit.quantite_stock
-                    produit.quantite_stock -= quantite
-                    produit.save()
+                    lines_created = len(creer_lignes(LigneVente, 'vente', vente, lignes))
+                    # bulk_create n'envoie pas de signal : compteurs de popularité (voir inventory/compteurs_ventes.py)
+                    enregistrer_ventes(lignes, vente.date_vente)
                     
-                    # Enregistrer le mouvement de stock
-                    MouvementStock.objects.create(
-                        produit=produit,
-                        type_mouvement='SORTIE',
-                        quantite=quantite,
-                        quantite_avant=quantite_avant,
-                        quantite_apres=produit.quantite_stock,
-                        motif=f'Vente {vente.numero_vente}',
-                        utilisateur=request.user
+                    # Mettre à jour le stock et enregistrer les mouvements (voir inventory/stock.py)
+                    # Le stock réservé par les commandes confirmées n'est pas vendable (voir inventory/reservations.py)
+                    appliquer_mouvements(
+                        [Mouvement(ligne.produit, 'SORTIE', ligne.quantite, f'Vente {vente.numero_vente}') for ligne in lignes],
+                        request.user, hors_reservations=True
                     )
                     
-                except Produit.DoesNotExist:
-                    messages.error(request, f'Ligne {int(line_idx) + 1}: Produit introuvable')
-                    raise
-                except (ValueError, TypeError) as e:
-                    messages.error(request, f'Ligne {int(line_idx) + 1}: {str(e)}')
-                    raise
-            
-            print(f"✓ Total de lignes créées: {lines_created}")
-            
-            # Vérifier qu'au moins une ligne a été créée
-            if lines_created == 0:
-                messages.error(request, 'Une vente doit contenir au moins un produit')
-                raise ValueError('Aucune ligne de produit')
-            
-            # Calculer le total avec remise
-            vente.calculer_total()
-            
-            action = request.POST.get('action', 'finalize')
-            if action == 'finalize':
-                messages.success(request, f'Vente {vente.numero_vente} créée avec succès! ({lines_created} lignes)')
-                return redirect('inventory:vente_detail', pk=vente.id)
-            else:
-                messages.success(request, f'Vente {vente.numero_vente} enregistrée en brouillon. ({lines_created} lignes)')
+                    # Calculer le total avec remise
+                    vente.calculer_total()
+                
+                action = request.POST.get('action', 'finalize')
+                if action == 'finalize':
+                    messages.success(request, f'Vente {vente.numero_vente} créée avec succès! ({lines_created} lignes)')
+                else:
+                    messages.success(request, f'Vente {vente.numero_vente} enregistrée en brouillon. ({lines_created} lignes)')
                 return redirect('inventory:vente_detail', pk=vente.id)
+                
+            except StockInsuffisant as e:
+                # Stock vendu entre-temps par une vente concurrente
+                messages.error(request, str(e))
+            except ValueError:
+                # Erreur de validation, le formulaire sera réaffiché avec les erreurs
+                messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
         else:
-            print("Form errors:", form.errors)
             messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
     else:
         form = VenteForm()
@@ -2039,7 +936,7 @@ def vente_create(request):
     context = {
         'form': form,
         'title': 'Nouvelle Vente',
-        'produits': Produit.objects.filter(actif=True, quantite_stock__gt=0),
+        'produits': Produit.objects.filter(actif=True, quantite_disponible__gt=0),
         'clients': Client.objects.filter(actif=True)
     }
     
@@ -2069,270 +966,10 @@ def vente_update(request, pk):
 @login_required
 def vente_print(request, pk):
     """Générer le reçu de vente en PDF avec tous les éléments d'une facture"""
-    from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-    from io import BytesIO
-    from decimal import Decimal
-    import datetime
-    
     vente = get_object_or_404(Vente, pk=pk)
-    lignes = LigneVente.objects.filter(vente=vente).select_related('produit')
     
-    # Créer le PDF en mémoire
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*cm, bottomMargin=2*cm)
-    story = []
-    
-    # Styles personnalisés
-    styles = getSampleStyleSheet()
-    
-    # Style pour le titre principal
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=20,
-        textColor=colors.HexColor('#059669'),
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    # Style pour l'en-tête de l'entreprise
-    company_style = ParagraphStyle(
-        'CompanyStyle',
-        parent=styles['Normal'],
-        fontSize=14,
-        textColor=colors.HexColor('#059669'),
-        fontName='Helvetica-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=5
-    )
-    
-    # Style pour les informations de contact
-    contact_style = ParagraphStyle(
-        'ContactStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-    
-    # En-tête de l'entreprise
-    story.append(Paragraph("GGStock", company_style))
-    story.append(Paragraph("Système de Gestion d'Inventaire Médical", contact_style))
-    story.append(Paragraph("Email: contact@ggstock.com | Tél: +33 1 23 45 67 89", contact_style))
-    story.append(Spacer(1, 20))
-    
-    # Titre de la facture
-    story.append(Paragraph("FACTURE DE VENTE", title_style))
-    story.append(Spacer(1, 15))
-    
-    # Section informations client et vente
-    info_client_vente = []
-    
-    # Colonne gauche - Informations client
-    if vente.client:
-        client_info = f"""
-        <b>FACTURER À:</b><br/>
-        {vente.client.nom_complet}<br/>
-        {vente.client.adresse if vente.client.adresse else 'Adresse non renseignée'}<br/>
-        {vente.client.code_postal or ''} {vente.client.ville or ''}<br/>
-        Email: {vente.client.email}<br/>
-        Tél: {vente.client.telephone or 'Non renseigné'}
-        """
-        if hasattr(vente.client, 'entreprise') and vente.client.entreprise:
-            client_info = f"""
-            <b>FACTURER À:</b><br/>
-            {vente.client.entreprise}<br/>
-            {vente.client.nom_complet}<br/>
-            {vente.client.adresse if vente.client.adresse else 'Adresse non renseignée'}<br/>
-            {vente.client.code_postal or ''} {vente.client.ville or ''}<br/>
-            Email: {vente.client.email}<br/>
-            Tél: {vente.client.telephone or 'Non renseigné'}
-            """
-    else:
-        client_info = """
-        <b>FACTURER À:</b><br/>
-        Client au comptoir<br/>
-        Vente directe
-        """
-    
-    # Colonne droite - Informations de la vente
-    vente_info = f"""
-    <b>NUMÉRO:</b> {vente.numero_vente}<br/>
-    <b>DATE:</b> {vente.date_vente.strftime('%d/%m/%Y')}<br/>
-    <b>HEURE:</b> {vente.date_vente.strftime('%H:%M')}<br/>
-    <b>VENDEUR:</b> {vente.utilisateur.get_full_name() or vente.utilisateur.username}<br/>
-    <b>MODE DE PAIEMENT:</b> {vente.get_mode_paiement_display()}
-    """
-    
-    # Tableau pour disposer les informations côte à côte
-    info_data = [[Paragraph(client_info, styles['Normal']), Paragraph(vente_info, styles['Normal'])]]
-    info_table = Table(info_data, colWidths=[4*inch, 3*inch])
-    info_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 30))
-    
-    # Tableau des produits détaillé
-    if lignes:
-        story.append(Paragraph("DÉTAIL DE LA VENTE", ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#374151'),
-            spaceAfter=15
-        )))
-        
-        # En-tête du tableau avec plus de colonnes
-        data = [['Article', 'Réf.', 'Qté', 'Prix unit. HT', 'TVA', 'Prix unit. TTC', 'Total HT', 'Total TTC']]
-        
-        total_ht = Decimal('0.00')
-        total_tva = Decimal('0.00')
-        total_ttc = Decimal('0.00')
-        
-        # Lignes de produits avec calculs détaillés
-        for ligne in lignes:
-            # Calculs TVA (assumons 20% par défaut)
-            taux_tva = Decimal('0.20')  # 20%
-            prix_ht = ligne.prix_unitaire / (1 + taux_tva)
-            montant_tva = ligne.prix_unitaire - prix_ht
-            total_ligne_ht = prix_ht * ligne.quantite
-            total_ligne_ttc = ligne.prix_unitaire * ligne.quantite
-            
-            total_ht += total_ligne_ht
-            total_tva += montant_tva * ligne.quantite
-            total_ttc += total_ligne_ttc
-            
-            data.append([
-                ligne.produit.nom[:25] + '...' if len(ligne.produit.nom) > 25 else ligne.produit.nom,
-                ligne.produit.reference or 'N/A',
-                str(ligne.quantite),
-                f"{prix_ht:.2f}F CFA",
-                f"{taux_tva*100:.0f}%",
-                f"{ligne.prix_unitaire:.2f}F CFA",
-                f"{total_ligne_ht:.2f}F CFA",
-                f"{total_ligne_ttc:.2f}F CFA"
-            ])
-        
-        # Lignes de totaux
-        data.append(['', '', '', '', '', '', '', ''])  # Ligne vide
-        data.append(['', '', '', '', '', 'TOTAL HT:', f"{total_ht:.2f}F CFA", ''])
-        data.append(['', '', '', '', '', 'TOTAL TVA:', f"{total_tva:.2f}F CFA", ''])
-        data.append(['', '', '', '', '', 'TOTAL TTC:', '', f"{total_ttc:.2f}F CFA"])
-        
-        # Création du tableau avec largeurs adaptées
-        table = Table(data, colWidths=[2.2*inch, 0.7*inch, 0.5*inch, 0.8*inch, 0.5*inch, 0.8*inch, 0.8*inch, 0.8*inch])
-        
-        # Style du tableau
-        table.setStyle(TableStyle([
-            # En-tête
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-            
-            # Corps du tableau
-            ('FONTSIZE', (0, 1), (-1, -5), 8),
-            ('ALIGN', (1, 1), (-1, -5), 'CENTER'),  # Centrer sauf première colonne
-            ('ALIGN', (0, 1), (0, -5), 'LEFT'),    # Première colonne à gauche
-            ('GRID', (0, 0), (-1, -5), 0.5, colors.HexColor('#d1d5db')),
-            
-            # Ligne vide avant totaux
-            ('LINEBELOW', (0, -5), (-1, -5), 1, colors.HexColor('#059669')),
-            
-            # Section totaux
-            ('FONTNAME', (0, -4), (-1, -1), 'Helvetica-Bold'),
-            ('ALIGN', (0, -4), (-1, -1), 'RIGHT'),
-            ('FONTSIZE', (0, -4), (-1, -1), 10),
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f3f4f6')),
-            ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#059669')),
-        ]))
-        
-        story.append(table)
-        story.append(Spacer(1, 30))
-    
-    # Informations de paiement
-    story.append(Paragraph("INFORMATIONS DE PAIEMENT", ParagraphStyle(
-        'PaymentTitle',
-        parent=styles['Heading3'],
-        fontSize=12,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=10
-    )))
-    
-    payment_info = f"""
-    <b>Mode de paiement:</b> {vente.get_mode_paiement_display()}<br/>
-    <b>Date de paiement:</b> {vente.date_vente.strftime('%d/%m/%Y')}<br/>
-    <b>Statut:</b> Payé
-    """
-    
-    if vente.notes:
-        payment_info += f"<br/><b>Notes:</b> {vente.notes}"
-    
-    story.append(Paragraph(payment_info, styles['Normal']))
-    story.append(Spacer(1, 30))
-    
-    # Conditions générales
-    story.append(Paragraph("CONDITIONS GÉNÉRALES", ParagraphStyle(
-        'TermsTitle',
-        parent=styles['Heading3'],
-        fontSize=12,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=10
-    )))
-    
-    conditions = """
-    • Les produits médicaux sont vendus conformément aux réglementations en vigueur.<br/>
-    • Garantie selon les conditions du fabricant.<br/>
-    • Retour possible sous 14 jours pour les produits non ouverts.<br/>
-    • Facturation TTC, TVA non applicable selon l'article 293 B du CGI.<br/>
-    • Paiement comptant à la livraison.
-    """
-    
-    story.append(Paragraph(conditions, ParagraphStyle(
-        'Conditions',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#6b7280')
-    )))
-    
-    # Pied de page avec remerciements
-    story.append(Spacer(1, 40))
-    story.append(Paragraph("Merci de votre confiance !", ParagraphStyle(
-        'Thanks',
-        parent=styles['Heading3'],
-        fontSize=14,
-        textColor=colors.HexColor('#059669'),
-        alignment=TA_CENTER
-    )))
-    
-    story.append(Paragraph(f"Document généré le {datetime.datetime.now().strftime('%d/%m/%Y à %H:%M')}", 
-                          ParagraphStyle(
-                              'Generated',
-                              parent=styles['Normal'],
-                              fontSize=8,
-                              textColor=colors.HexColor('#9ca3af'),
-                              alignment=TA_CENTER
-                          )))
-    
-    # Construire le PDF
-    doc.build(story)
-    
-    # Retourner la réponse
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    # PDF servi depuis le cache disque tant que la vente n'a pas changé
+    response = HttpResponse(pdf_en_cache(vente, 'facture_vente'), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="facture_vente_{vente.numero_vente}.pdf"'
     
     return response
@@ -2341,178 +978,10 @@ def vente_print(request, pk):
 @login_required
 def vente_print_proforma(request, pk):
     """Générer un proforma de vente en PDF selon le modèle DIMAT MEDICAL"""
-    from django.http import HttpResponse
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, cm
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-    from io import BytesIO
-    from decimal import Decimal
-    import datetime
-    
     vente = get_object_or_404(Vente, pk=pk)
-    lignes = LigneVente.objects.filter(vente=vente).select_related('produit')
     
-    # Créer le PDF en mémoire
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*cm, bottomMargin=2*cm)
-    story = []
-    
-    # Styles personnalisés
-    styles = getSampleStyleSheet()
-    
-    # En-tête entreprise style DIMAT MEDICAL
-    company_style = ParagraphStyle(
-        'CompanyStyle',
-        parent=styles['Normal'],
-        fontSize=16,
-        fontName='Helvetica-Bold',
-        alignment=TA_LEFT,
-        spaceAfter=5
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'SubtitleStyle',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_LEFT,
-        spaceAfter=10
-    )
-    
-    # En-tête avec logo et infos entreprise
-    story.append(Paragraph("DIMAT MEDICAL", company_style))
-    story.append(Paragraph("CHIRURGIE GENERALE - RADIOLOGIE - IMAGERIE MÉDICALE", subtitle_style))
-    story.append(Spacer(1, 30))
-    
-    # Numéro de proforma centré
-    proforma_style = ParagraphStyle(
-        'ProformaStyle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        fontName='Helvetica-Bold',
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-    
-    story.append(Paragraph(f"Proforma n° {vente.numero_vente}", proforma_style))
-    story.append(Spacer(1, 20))
-    
-    # Informations client et date
-    client_info = f"Client: {vente.client.nom_complet if vente.client else 'Client comptoir'}"
-    date_info = f"DATE: {vente.date_vente.strftime('%d/%m/%Y')}"
-    
-    info_data = [[client_info, date_info]]
-    info_table = Table(info_data, colWidths=[4*inch, 2*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-    ]))
-    
-    story.append(info_table)
-    story.append(Spacer(1, 30))
-    
-    # Tableau des produits style proforma
-    if lignes:
-        # En-tête du tableau
-        data = [['Description', 'Quantité', 'Prix unitaire', 'Prix Total']]
-        
-        total_general = Decimal('0.00')
-        
-        # Lignes de produits
-        for ligne in lignes:
-            total_ligne = ligne.prix_unitaire * ligne.quantite
-            total_general += total_ligne
-            
-            data.append([
-                ligne.produit.nom,
-                str(ligne.quantite),
-                f"{ligne.prix_unitaire:.0f} 000",  # Style des prix dans l'image
-                f"{total_ligne:.0f} 000"
-            ])
-        
-        # Ligne de total
-        data.append(['', 'TOTAL', '', f"{total_general:.0f} 000"])
-        
-        # Créer le tableau
-        main_table = Table(data, colWidths=[3*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-        main_table.setStyle(TableStyle([
-            # En-tête
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f0f0f0')),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -2), 'LEFT'),  # Description à gauche
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-            ('TOPPADDING', (0, 0), (-1, 0), 10),
-            
-            # Corps du tableau
-            ('FONTSIZE', (0, 1), (-1, -2), 10),
-            ('GRID', (0, 0), (-1, -2), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            
-            # Ligne de total
-            ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f0f0f0')),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('GRID', (0, -1), (-1, -1), 1, colors.black),
-        ]))
-        
-        story.append(main_table)
-        story.append(Spacer(1, 30))
-    
-    # Informations de garantie et SAV (selon le modèle)
-    garantie_data = [
-        ["Garantie 12 Mois"],
-        ["SAV Assuré"],
-        ["Validité de l'offre: 2 mois"]
-    ]
-    
-    garantie_table = Table(garantie_data, colWidths=[3*inch])
-    garantie_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#e0e0e0')),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-    ]))
-    
-    story.append(garantie_table)
-    story.append(Spacer(1, 30))
-    
-    # Pied de page avec coordonnées
-    footer_text = f"Route nationale en face EDK technologie Dakar - Tél : +221 33 833 03 17 - Email : info@dimatmedical.com"
-    footer_text2 = f"Numéro compte CBAO : sn 01307 03816162A001 34/PC, SN DKR 2018-B-1833 - NINEA : 006890892 200"
-    
-    story.append(Paragraph(footer_text, ParagraphStyle(
-        'Footer1',
-        parent=styles['Normal'],
-        fontSize=9,
-        alignment=TA_CENTER,
-        spaceAfter=5
-    )))
-    
-    story.append(Paragraph(footer_text2, ParagraphStyle(
-        'Footer2',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_CENTER,
-        textColor=colors.HexColor('#666666')
-    )))
-    
-    # Construire le PDF
-    doc.build(story)
-    
-    # Retourner la réponse
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    # PDF servi depuis le cache disque tant que la vente n'a pas changé
+    response = HttpResponse(pdf_en_cache(vente, 'proforma_vente'), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="proforma_vente_{vente.numero_vente}.pdf"'
     return response
 
@@ -2528,10 +997,8 @@ def stock_list(request):
     produits = Produit.objects.select_related('categorie', 'fournisseur').filter(actif=True)
     
     if query:
-        produits = produits.filter(
-            Q(nom__icontains=query) |
-            Q(reference__icontains=query)
-        )
+        # Recherche plein texte, résultats triés par pertinence
+        produits = rechercher(produits, query).order_by('rang_recherche')
     
     if categorie_id:
         produits = produits.filter(categorie_id=categorie_id)
@@ -2540,18 +1007,28 @@ def stock_list(request):
         produits = produits.filter(quantite_stock__lte=F('seuil_alerte'))
     
     # Pagination
-    paginator = Paginator(produits, 20)
-    page_number = request.GET.get('page')
-    produits_page = paginator.get_page(page_number)
+    produits_page = paginer(request, produits, 20, total=True)
     
     categories = Categorie.objects.all()
     
-    # Statistiques
-    stats = {
-        'total_produits': produits.count(),
-        'produits_stock_bas': produits.filter(quantite_stock__lte=F('seuil_alerte')).count(),
-        'valeur_stock': sum([p.quantite_stock * p.prix_achat for p in produits]),
-    }
+    # Statistiques en une seule requête d'agrégation
+    stats = produits.order_by().aggregate(
+        total_produits=Count('id'),
+        produits_stock_bas=Count('id', filter=Q(quantite_stock__lte=F('seuil_alerte'))),
+        valeur_stock=Coalesce(
+            Sum(ExpressionWrapper(F('quantite_stock') * F('prix_achat'), output_field=MONTANT)),
+            Decimal('0'), output_field=MONTANT
+        ),
+    )
+    
+    # Valorisation historique : dernière clôture + mouvements depuis (voir inventory/cloture_stock.py)
+    valorisation = None
+    date_valorisation = request.GET.get('date_valorisation', '')
+    if date_valorisation:
+        try:
+            valorisation = valorisation_au(datetime.strptime(date_valorisation, '%Y-%m-%d').date())
+        except ValueError:
+            messages.error(request, 'Date de valorisation invalide.')
     
     context = {
         'produits': produits_page,
@@ -2560,11 +1037,49 @@ def stock_list(request):
         'categorie_id': int(categorie_id) if categorie_id else None,
         'stock_bas': stock_bas,
         'stats': stats,
+        'date_valorisation': date_valorisation,
+        'valorisation': valorisation,
     }
     
     return render(request, 'inventory/stock_list.html', context)
 
 
+@login_required
+@role_required(['MANAGER', 'TECHNICIEN'])
+def reappro_suggestions(request):
+    """
+    Produits à commander par fournisseur, calculés par `manage.py compute_replenishment` ;
+    POST : une commande fournisseur brouillon par fournisseur (ou pour le fournisseur choisi)
+    """
+    if request.method == 'POST':
+        fournisseur_id = request.POST.get('fournisseur', '')
+        commandes = creer_brouillons(request.user, [int(fournisseur_id)] if fournisseur_id.isdigit() else None)
+        if commandes:
+            messages.success(
+                request,
+                f"{len(commandes)} commande(s) fournisseur brouillon créée(s) : "
+                + ', '.join(commande.numero_commande for commande in commandes)
+            )
+        else:
+            messages.info(request, "Aucun produit à commander.")
+        return redirect('inventory:reappro_suggestions')
+    
+    fournisseur_id = request.GET.get('fournisseur', '')
+    suggestions = None
+    if fournisseur_id.isdigit():
+        suggestions = a_commander([int(fournisseur_id)]).select_related('produit').order_by(
+            '-quantite_suggeree', 'produit_id'
+        )[:200]
+    
+    context = {
+        'fournisseurs': resume_par_fournisseur(),
+        'fournisseur_id': int(fournisseur_id) if fournisseur_id.isdigit() else None,
+        'suggestions': suggestions,
+        'date_calcul': SuggestionReappro.objects.values_list('date_calcul', flat=True).first(),
+    }
+    return render(request, 'inventory/reappro_suggestions.html', context)
+
+
 @login_required
 @role_required(['MANAGER', 'TECHNICIEN'])
 def mouvement_create(request):
@@ -2572,20 +1087,18 @@ def mouvement_create(request):
     if request.method == 'POST':
         form = MouvementStockForm(request.POST)
         if form.is_valid():
-            mouvement = form.save(commit=False)
-            mouvement.utilisateur = request.user
-            # Calcul des quantités avant/après
-            produit = mouvement.produit
-            mouvement.quantite_avant = produit.quantite_stock
-            if mouvement.type_mouvement == 'ENTREE':
-                produit.quantite_stock += mouvement.quantite
+            donnees = form.cleaned_data
+            try:
+                # Quantités avant/après calculées par le registre (voir inventory/stock.py)
+                appliquer_mouvements([Mouvement(
+                    donnees['produit'], donnees['type_mouvement'], donnees['quantite'],
+                    donnees['motif'], donnees['numero_lot']
+                )], request.user)
+            except StockInsuffisant as e:
+                form.add_error('quantite', str(e))
             else:
-                produit.quantite_stock -= mouvement.quantite
-            produit.save()
-            mouvement.quantite_apres = produit.quantite_stock
-            mouvement.save()
-            messages.success(request, "Mouvement de stock enregistré avec succès.")
-            return redirect('inventory:stock_list')
+                messages.success(request, "Mouvement de stock enregistré avec succès.")
+                return redirect('inventory:stock_list')
     else:
         form = MouvementStockForm()
     return render(request, 'inventory/mouvement_form.html', {'form': form, 'title': 'Nouveau Mouvement de Stock'})
@@ -2594,36 +1107,35 @@ def mouvement_create(request):
 # ================== API POUR RECHERCHES AJAX ==================
 
 @login_required
-def api_produit_search(request):
+async def api_produit_search(request):
+    # Vue asynchrone : sous ASGI, les autocomplétions simultanées n'occupent pas un thread chacune
     query = request.GET.get('q', '')
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    produits = Produit.objects.filter(
-        Q(nom__icontains=query) | Q(reference__icontains=query),
-        actif=True
-    )[:10]
+    # rechercher() peut lire la base (détection du backend) : exécuté dans un thread
+    recherche = await sync_to_async(rechercher)(Produit.objects.filter(actif=True), query)
+    produits = await apaginer(request, recherche.order_by('rang_recherche'), 10)
     
     results = [{
         'id': p.id,
         'text': f"{p.nom} - {p.reference}",
         'prix': str(p.prix_vente),
-        'stock': p.quantite_stock
+        'stock': p.quantite_stock,
+        'disponible': p.quantite_disponible
     } for p in produits]
     
-    return JsonResponse({'results': results})
+    return JsonResponse({'results': results, **pagination_json(produits)})
 
 
 @login_required
-def api_client_search(request):
+async def api_client_search(request):
     query = request.GET.get('q', '')
     if len(query) < 2:
         return JsonResponse({'results': []})
     
-    clients = Client.objects.filter(
-        Q(nom__icontains=query) | Q(prenom__icontains=query) | Q(email__icontains=query),
-        actif=True
-    )[:10]
+    recherche = await sync_to_async(rechercher)(Client.objects.filter(actif=True), query)
+    clients = await apaginer(request, recherche.order_by('rang_recherche'), 10)
     
     results = [{
         'id': c.id,
@@ -2632,21 +1144,22 @@ def api_client_search(request):
         'telephone': c.telephone
     } for c in clients]
     
-    return JsonResponse({'results': results})
+    return JsonResponse({'results': results, **pagination_json(clients)})
 
 
 # ============ VUES PUBLIQUES E-COMMERCE ============
 
+@page_catalogue()
 def ecommerce_home(request):
     """Landing page e-commerce avec produits populaires"""
-    # Produits les plus populaires/récents
-    produits_populaires = Produit.objects.filter(
+    # Produits les plus vendus sur 30 jours, puis les plus récents
+    produits_populaires = fragment('produits_populaires', lambda: list(par_popularite(Produit.objects.filter(
         actif=True, 
-        quantite_stock__gt=0
-    ).order_by('-id')[:8]
+        quantite_disponible__gt=0
+    ))[:8]), 'produits')
     
     # Catégories principales
-    categories = Categorie.objects.all()[:6]
+    categories = categories_catalogue()[:6]
     
     context = {
         'produits_populaires': produits_populaires,
@@ -2655,30 +1168,33 @@ def ecommerce_home(request):
     return render(request, 'inventory/ecommerce/home.html', context)
 
 
+@page_catalogue(('categorie', 'search', 'sort', 'page'))
 def ecommerce_catalogue(request):
     """Catalogue de produits e-commerce avec filtres"""
-    produits = Produit.objects.filter(actif=True, quantite_stock__gt=0)
+    produits = Produit.objects.filter(actif=True, quantite_disponible__gt=0).select_related('categorie')
     
     # Filtrage par catégorie
     categorie_id = request.GET.get('categorie')
     if categorie_id:
         produits = produits.filter(categorie_id=categorie_id)
     
-    # Recherche par nom/description
+    # Recherche plein texte (nom, référence, description)
     search = request.GET.get('search')
     if search:
-        produits = produits.filter(
-            Q(nom__icontains=search) | Q(description__icontains=search)
-        )
+        produits = rechercher(produits, search)
     
-    # Tri
-    sort_by = request.GET.get('sort', 'nom')
-    if sort_by == 'prix_asc':
+    # Tri (par pertinence par défaut lors d'une recherche)
+    sort_by = request.GET.get('sort', 'pertinence' if search else 'nom')
+    if sort_by == 'pertinence' and search:
+        produits = produits.order_by('rang_recherche')
+    elif sort_by == 'prix_asc':
         produits = produits.order_by('prix_vente')
     elif sort_by == 'prix_desc':
         produits = produits.order_by('-prix_vente')
     elif sort_by == 'recent':
         produits = produits.order_by('-id')
+    elif sort_by == 'populaires':
+        produits = par_popularite(produits)
     else:
         produits = produits.order_by('nom')
     
@@ -2688,7 +1204,7 @@ def ecommerce_catalogue(request):
     page_obj = paginator.get_page(page_number)
     
     # Toutes les catégories pour le filtre
-    categories = Categorie.objects.all()
+    categories = categories_catalogue()
     
     context = {
         'page_obj': page_obj,
@@ -2700,16 +1216,17 @@ def ecommerce_catalogue(request):
     return render(request, 'inventory/ecommerce/catalogue.html', context)
 
 
+@page_catalogue(dependances=fiche_produit)
 def ecommerce_produit_detail(request, pk):
     """Page détail produit e-commerce"""
     produit = get_object_or_404(Produit, pk=pk, actif=True)
     
-    # Produits similaires (même catégorie)
-    produits_similaires = Produit.objects.filter(
+    # Produits similaires (même catégorie), les plus vendus d'abord
+    produits_similaires = par_popularite(Produit.objects.filter(
         categorie=produit.categorie,
         actif=True,
-        quantite_stock__gt=0
-    ).exclude(pk=pk)[:4]
+        quantite_disponible__gt=0
+    ).exclude(pk=pk))[:4]
     
     context = {
         'produit': produit,
@@ -2775,93 +1292,17 @@ def commande_create_advanced(request):
                     commande.utilisateur = request.user
                     commande.save()
                     
-                    # Traitement des lignes de produit - LOGIQUE ROBUSTE
-                    lines_created = 0
-                    has_error = False
-                    
-                    # Parser toutes les clés POST pour trouver TOUTES les lignes de produit
-                    lines_data = {}
-                    for key in request.POST:
-                        if key.startswith('ligne_') and '_' in key:
-                            parts = key.split('_', 2)  # ligne_0_produit → ['ligne', '0', 'produit']
-                            if len(parts) == 3:
-                                line_idx = parts[1]
-                                field_name = parts[2]
-                                
-                                if line_idx not in lines_data:
-                                    lines_data[line_idx] = {}
-                                lines_data[line_idx][field_name] = request.POST[key]
-                    
-                    print(f"=== DEBUG COMMANDE_CREATE ===")
-                    print(f"POST data: {request.POST}")
-                    print(f"Lignes trouvées: {sorted(lines_data.keys())}")
-                    
-                    # Traiter chaque ligne trouvée (triée par index)
-                    for line_idx in sorted(lines_data.keys(), key=lambda x: int(x) if x.isdigit() else 0):
-                        data = lines_data[line_idx]
-                        produit_id = data.get('produit')
-                        quantite = data.get('quantite')
-                        prix_unitaire = data.get('prix_unitaire')
-                        
-                        print(f"Traitement ligne {line_idx}: produit={produit_id}, quantite={quantite}, prix={prix_unitaire}")
-                        
-                        # Ignorer les lignes vides (pas de produit sélectionné)
-                        if not produit_id:
-                            print(f"Ligne {line_idx} ignorée (pas de produit)")
-                            continue
-                        
-                        # Vérifier que tous les champs requis sont présents
-                        if not quantite or not prix_unitaire:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Quantité et prix requis')
-                            has_error = True
-                            continue
-                        
-                        try:
-                            produit = Produit.objects.get(id=produit_id)
-                            quantite = int(quantite)
-                            prix_unitaire = float(prix_unitaire)
-                            
-                            # Validation
-                            if quantite <= 0:
-                                messages.error(request, f'{produit.nom}: La quantité doit être positive')
-                                has_error = True
-                                continue
-                            
-                            if prix_unitaire < 0:
-                                messages.error(request, f'{produit.nom}: Le prix ne peut pas être négatif')
-                                has_error = True
-                                continue
-                            
-                            # ✅ VÉRIFICATION DE STOCK (avec warning, pas d'erreur)
-                            if quantite > produit.quantite_stock:
-                                messages.warning(
-                                    request,
-                                    f'⚠️ Stock insuffisant pour {produit.nom}: '
-                                    f'Stock disponible={produit.quantite_stock}, Commandé={quantite}. '
-                                    f'La commande sera créée, mais vérifiez le stock avant livraison.'
-                                )
-                                # On continue quand même (c'est une commande fournisseur)
-                            
-                            # Créer la ligne de commande
-                            ligne = LigneCommande.objects.create(
-                                commande=commande,
-                                produit=produit,
-                                quantite=quantite,
-                                prix_unitaire=prix_unitaire
-                            )
-                            lines_created += 1
-                            print(f"✓ Ligne {line_idx} créée: {ligne}")
-                            
-                        except Produit.DoesNotExist:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Produit introuvable')
-                            has_error = True
-                            continue
-                        except (ValueError, TypeError) as e:
-                            messages.error(request, f'Ligne {int(line_idx) + 1}: Erreur de conversion - {str(e)}')
-                            has_error = True
-                            continue
-                    
-                    print(f"✓ Total de lignes créées: {lines_created}")
+                    # Traitement des lignes de produit (voir inventory/lignes.py)
+                    # Stock insuffisant : simple avertissement (c'est une commande fournisseur)
+                    lignes, has_error = analyser_lignes(
+                        request,
+                        avertissement_stock=lambda produit, quantite: (
+                            f'⚠️ Stock insuffisant pour {produit.nom}: '
+                            f'Stock disponible={produit.quantite_disponible}, Commandé={quantite}. '
+                            f'La commande sera créée, mais vérifiez le stock avant livraison.'
+                        )
+                    )
+                    lines_created = 0 if has_error else len(creer_lignes(LigneCommande, 'commande', commande, lignes))
                     
                     # Si erreur détectée, annuler la transaction
                     if has_error:
@@ -2877,8 +1318,15 @@ def commande_create_advanced(request):
                     
                     action = request.POST.get('action', 'confirm')
                     if action == 'confirm':
-                        commande.statut = 'CONFIRMEE'
-                        commande.save()
+                        try:
+                            # La confirmation réserve le stock (voir inventory/reservations.py)
+                            with transaction.atomic():
+                                commande.statut = 'CONFIRMEE'
+                                commande.save()
+                        except StockInsuffisant as e:
+                            commande.statut = 'EN_ATTENTE'
+                            messages.warning(request, f'Commande {commande.numero_commande} enregistrée en attente, non confirmée : {e}')
+                            return redirect('inventory:commande_detail', pk=commande.id)
                         messages.success(request, f'Commande {commande.numero_commande} créée et confirmée avec succès ({lines_created} ligne(s))!')
                         return redirect('inventory:commande_detail', pk=commande.id)
                     else:
@@ -2886,9 +1334,8 @@ def commande_create_advanced(request):
                         messages.success(request, f'Commande {commande.numero_commande} enregistrée en brouillon ({lines_created} ligne(s)).')
                         return redirect('inventory:commande_detail', pk=commande.id)
                         
-            except ValueError as e:
+            except ValueError:
                 # Erreur de validation, le formulaire sera réaffiché avec les erreurs
-                print(f"Erreur de validation: {e}")
                 messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
         else:
             messages.error(request, 'Veuillez corriger les erreurs dans le formulaire.')
@@ -2912,129 +1359,20 @@ def vente_generate_pdf(request, vente_id):
     vente = get_object_or_404(Vente, id=vente_id)
     
     # Vérification des permissions
-    if not request.user.profile.role in ['MANAGER', 'COMMERCIAL_SHOWROOM']:
+    if not droits(request.user).a_role(['MANAGER', 'COMMERCIAL_SHOWROOM']):
         messages.error(request, "Vous n'avez pas les permissions pour générer ce document.")
-        return redirect('inventory:vente_detail', vente_id=vente_id)
+        return redirect('inventory:vente_detail', pk=vente_id)
     
     try:
-        # Création du PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="facture_{vente.numero_vente}.pdf"'
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Style personnalisé pour le titre
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#007bff')
-        )
-        
-        # En-tête
-        story.append(Paragraph("GGSTOCK ENTERPRISE", title_style))
-        story.append(Paragraph("FACTURE", styles['Heading2']))
-        story.append(Spacer(1, 12))
-        
-        # Informations de base
-        info_data = [
-            ['Numéro:', vente.numero_vente],
-            ['Date:', vente.date_vente.strftime('%d/%m/%Y %H:%M')],
-            ['Vendeur:', vente.utilisateur.get_full_name() or vente.utilisateur.username],
-            ['Client:', vente.client.nom_complet if vente.client else 'VENTE COMPTOIR'],
-            ['Mode de paiement:', vente.get_mode_paiement_display()],
-        ]
-        
-        info_table = Table(info_data, colWidths=[2*inch, 3*inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(info_table)
-        story.append(Spacer(1, 20))
-        
-        # Tableau des produits
-        lignes = vente.lignevente_set.all()
-        if lignes:
-            # En-têtes du tableau
-            data = [['Produit', 'Référence', 'Qté', 'Prix unitaire', 'Total']]
-            
-            # Lignes de produits
-            for ligne in lignes:
-                data.append([
-                    ligne.produit.nom,
-                    ligne.produit.reference,
-                    str(ligne.quantite),
-                    f"{ligne.prix_unitaire:.2f} F CFA",
-                    f"{ligne.sous_total():.2f} F CFA"
-                ])
-            
-            # Total
-            subtotal = sum(ligne.sous_total() for ligne in lignes)
-            remise_amount = subtotal * vente.remise / 100
-            total = subtotal - remise_amount
-            
-            data.append(['', '', '', 'Sous-total:', f"{subtotal:.2f} F CFA"])
-            if vente.remise > 0:
-                data.append(['', '', '', f'Remise ({vente.remise}%):', f"-{remise_amount:.2f} F CFA"])
-            data.append(['', '', '', 'TOTAL TTC:', f"{total:.2f} F CFA"])
-            
-            table = Table(data, colWidths=[2.5*inch, 1.5*inch, 0.8*inch, 1.2*inch, 1.2*inch])
-            table.setStyle(TableStyle([
-                # En-tête
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                # Corps
-                ('FONTNAME', (0, 1), (-1, -4), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -4), 9),
-                ('GRID', (0, 0), (-1, -4), 1, colors.black),
-                # Totaux
-                ('FONTNAME', (0, -3), (-1, -1), 'Helvetica-Bold'),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-            ]))
-            
-            story.append(table)
-        else:
-            story.append(Paragraph("Aucun produit dans cette vente", styles['Normal']))
-        
-        story.append(Spacer(1, 30))
-        
-        # Notes
-        if vente.notes:
-            story.append(Paragraph("Notes:", styles['Heading3']))
-            story.append(Paragraph(vente.notes, styles['Normal']))
-        
-        # Pied de page
-        story.append(Spacer(1, 50))
-        story.append(Paragraph("Merci pour votre confiance !", styles['Normal']))
-        story.append(Paragraph("GGSTOCK Enterprise - contact@ggstock.com", styles['Normal']))
-        
-        # Construction du PDF
-        doc.build(story)
-        
-        pdf = buffer.getvalue()
-        buffer.close()
-        response.write(pdf)
-        
-        return response
-        
+        # PDF servi depuis le cache disque tant que la vente n'a pas changé
+        pdf = pdf_en_cache(vente, 'facture_vente_simple')
     except Exception as e:
         messages.error(request, f'Erreur lors de la génération du PDF: {str(e)}')
-        return redirect('inventory:vente_detail', vente_id=vente_id)
+        return redirect('inventory:vente_detail', pk=vente_id)
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="facture_{vente.numero_vente}.pdf"'
+    return response
 
 
 @login_required
@@ -3044,140 +1382,114 @@ def commande_generate_pdf(request, commande_id):
     commande = get_object_or_404(Commande, id=commande_id)
     
     # Vérification des permissions
-    if not request.user.profile.role in ['MANAGER', 'COMMERCIAL_SHOWROOM', 'COMMERCIAL_TERRAIN']:
+    if not droits(request.user).a_role(['MANAGER', 'COMMERCIAL_SHOWROOM', 'COMMERCIAL_TERRAIN']):
         messages.error(request, "Vous n'avez pas les permissions pour générer ce document.")
-        return redirect('inventory:commande_detail', commande_id=commande_id)
+        return redirect('inventory:commande_detail', pk=commande_id)
     
     try:
-        # Création du PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="bon_commande_{commande.numero_commande}.pdf"'
-        
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Style personnalisé pour le titre
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.HexColor('#007bff')
-        )
-        
-        # En-tête
-        story.append(Paragraph("GGSTOCK ENTERPRISE", title_style))
-        story.append(Paragraph("BON DE COMMANDE", styles['Heading2']))
-        story.append(Spacer(1, 12))
-        
-        # Informations de base
-        info_data = [
-            ['Numéro:', commande.numero_commande],
-            ['Date:', commande.date_commande.strftime('%d/%m/%Y %H:%M')],
-            ['Commercial:', commande.utilisateur.get_full_name() or commande.utilisateur.username],
-            ['Client:', commande.client.nom_complet],
-            ['Statut:', commande.get_statut_display()],
-        ]
-        
-        if commande.date_livraison_prevue:
-            info_data.append(['Livraison prévue:', commande.date_livraison_prevue.strftime('%d/%m/%Y')])
-        
-        info_table = Table(info_data, colWidths=[2*inch, 3*inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        story.append(info_table)
-        story.append(Spacer(1, 20))
-        
-        # Adresse de livraison
-        if commande.adresse_livraison:
-            story.append(Paragraph("Adresse de livraison:", styles['Heading3']))
-            story.append(Paragraph(commande.adresse_livraison.replace('\n', '<br/>'), styles['Normal']))
-            story.append(Spacer(1, 12))
-        
-        # Tableau des produits
-        lignes = commande.lignecommande_set.all()
-        if lignes:
-            # En-têtes du tableau
-            data = [['Produit', 'Référence', 'Qté', 'Prix unitaire', 'Total']]
-            
-            # Lignes de produits
-            for ligne in lignes:
-                data.append([
-                    ligne.produit.nom,
-                    ligne.produit.reference,
-                    str(ligne.quantite),
-                    f"{ligne.prix_unitaire:.2f} F CFA",
-                    f"{ligne.sous_total():.2f} F CFA"
-                ])
-            
-            # Total
-            total = sum(ligne.sous_total() for ligne in lignes)
-            data.append(['', '', '', 'TOTAL TTC:', f"{total:.2f} F CFA"])
-            
-            table = Table(data, colWidths=[2.5*inch, 1.5*inch, 0.8*inch, 1.2*inch, 1.2*inch])
-            table.setStyle(TableStyle([
-                # En-tête
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#007bff')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                # Corps
-                ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -2), 9),
-                ('GRID', (0, 0), (-1, -2), 1, colors.black),
-                # Total
-                ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-                ('BACKGROUND', (0, -1), (-1, -1), colors.lightgrey),
-                ('ALIGN', (2, 1), (-1, -1), 'RIGHT'),
-            ]))
-            
-            story.append(table)
-        else:
-            story.append(Paragraph("Aucun produit dans cette commande", styles['Normal']))
-        
-        story.append(Spacer(1, 30))
-        
-        # Notes
-        if commande.notes:
-            story.append(Paragraph("Notes et instructions:", styles['Heading3']))
-            story.append(Paragraph(commande.notes, styles['Normal']))
-        
-        # Conditions
-        story.append(Spacer(1, 30))
-        story.append(Paragraph("Conditions:", styles['Heading3']))
-        conditions = """
-        • Les délais de livraison sont donnés à titre indicatif<br/>
-        • Les prix sont valables au moment de la commande<br/>
-        • Toute modification doit être confirmée par écrit<br/>
-        • Signature requise à la livraison
-        """
-        story.append(Paragraph(conditions, styles['Normal']))
-        
-        # Pied de page
-        story.append(Spacer(1, 50))
-        story.append(Paragraph("GGSTOCK Enterprise - Votre partenaire de confiance", styles['Normal']))
-        story.append(Paragraph("contact@ggstock.com | +33 1 23 45 67 89", styles['Normal']))
-        
-        # Construction du PDF
-        doc.build(story)
-        
-        pdf = buffer.getvalue()
-        buffer.close()
-        response.write(pdf)
-        
-        return response
-        
+        pdf = rendre('bon_commande_simple', contexte_commande(commande))
     except Exception as e:
         messages.error(request, f'Erreur lors de la génération du PDF: {str(e)}')
-        return redirect('inventory:commande_detail', commande_id=commande_id)
+        return redirect('inventory:commande_detail', pk=commande_id)
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="bon_commande_{commande.numero_commande}.pdf"'
+    return response
+
+
+# ================== EXPORTS ==================
+
+@login_required
+def export_donnees(request, type_export):
+    """Export CSV (ou XLSX avec ?format=xlsx) d'une liste, avec les mêmes filtres que la page"""
+    definition = EXPORTS.get(type_export)
+    if definition is None:
+        raise Http404("Export inconnu")
+
+    if not peut_exporter(request.user, definition):
+        messages.error(request, "Vous n'avez pas les permissions nécessaires pour accéder à cette page.")
+        return HttpResponseForbidden("Accès refusé : permissions insuffisantes")
+
+    if request.GET.get('format') == 'xlsx':
+        if not xlsx_disponible():
+            messages.error(request, "L'export Excel nécessite le module openpyxl. Utilisez l'export CSV.")
+            return redirect('inventory:dashboard')
+        return reponse_xlsx(definition, request)
+
+    return reponse_csv(definition, request)
+
+
+# ================== DOCUMENTS PAR LOT ==================
+
+@login_required
+def documents_lot(request):
+    """
+    PDF par lot des documents filtrés (?type=bon_livraison&type=facture_vente,
+    date_debut, date_fin, statut, client), en ZIP ou fusionnés avec ?format=pdf
+    """
+    noms = request.GET.getlist('type') or [nom for nom, type_lot in TYPES_LOT.items() if peut_generer(request.user, type_lot)]
+    if any(nom not in TYPES_LOT for nom in noms):
+        raise Http404("Type de document inconnu")
+
+    types = [TYPES_LOT[nom] for nom in noms]
+    if not types or not all(peut_generer(request.user, type_lot) for type_lot in types):
+        messages.error(request, "Vous n'avez pas les permissions nécessaires pour accéder à cette page.")
+        return HttpResponseForbidden("Accès refusé : permissions insuffisantes")
+
+    # Paramètres validés avant d'atteindre l'ORM (une date ou un client mal formé levait une erreur 500)
+    dates = {}
+    for champ in ('date_debut', 'date_fin'):
+        valeur = request.GET.get(champ) or None
+        try:
+            dates[champ] = parse_date(valeur) if valeur else None
+        except ValueError:
+            dates[champ] = None
+        if valeur and dates[champ] is None:
+            messages.error(request, f"Date invalide ({valeur}) : utilisez le format AAAA-MM-JJ.")
+            return redirect('inventory:dashboard')
+    client = request.GET.get('client') or None
+    if client is not None and not client.isdigit():
+        messages.error(request, "Client invalide.")
+        return redirect('inventory:dashboard')
+
+    try:
+        taches = charger_documents(
+            types,
+            date_debut=dates['date_debut'],
+            date_fin=dates['date_fin'],
+            statut=request.GET.get('statut') or None,
+            client=int(client) if client else None,
+            user=request.user,
+        )
+    except LotTropVolumineux as e:
+        messages.error(request, f"Le lot dépasse {e.limite} documents : réduisez la période ou filtrez par statut ou client.")
+        return redirect('inventory:dashboard')
+
+    if request.GET.get('format') == 'pdf':
+        if not fusion_disponible():
+            messages.error(request, "La fusion en un seul PDF nécessite le module pypdf. Utilisez l'archive ZIP.")
+            return redirect('inventory:dashboard')
+        return FileResponse(pdf_fusionne(taches), as_attachment=True, filename=nom_lot('pdf'), content_type='application/pdf')
+
+    response = StreamingHttpResponse(flux_zip(taches), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{nom_lot("zip")}"'
+    return response
+
+
+# ================== PROFILAGE ==================
+
+@login_required
+@role_required(['MANAGER'])
+def profilage_requetes(request):
+    """Dernières mesures du middleware de profilage (requêtes SQL, durées, N+1) et agrégats par vue"""
+    if not profilage_actif():
+        raise Http404("Profilage désactivé")
+
+    mesures = historique()
+    vue = request.GET.get('vue')
+    if vue:
+        mesures = [mesure for mesure in mesures if mesure.vue == vue]
+    return JsonResponse({
+        'vues': agregats_par_vue(mesures),
+        'mesures': [mesure.en_dict() for mesure in reversed(mesures)],
+    }, json_dumps_params={'ensure_ascii': False})
@@ -9,16 +9,16 @@ from django.template.loader import render_to_string
 from django.conf import settings
 from weasyprint import HTML
 from decimal import Decimal
-from datetime import datetime
 import os
 
-from .models import Commande, LigneCommande
+from .models import Commande
+from .cache_pdf import document_pdf, pdf_en_cache, lignes_document
 
 
-def commande_print_bon_weasyprint(request, pk):
+@document_pdf('bon_commande', Commande)
+def rendre_bon_commande(commande):
     """Générer le bon de commande en PDF professionnel avec WeasyPrint"""
-    commande = get_object_or_404(Commande, pk=pk)
-    lignes_commande = LigneCommande.objects.filter(commande=commande).select_related('produit')
+    lignes_commande = lignes_document(commande)
     
     # Calculer TVA et Total TTC
     tva = commande.total * Decimal('0.18')
@@ -37,7 +37,6 @@ def commande_print_bon_weasyprint(request, pk):
         'tva': tva,
         'total_ttc': total_ttc,
         'total_quantite': total_quantity,
-        'now': datetime.now(),
         'logo_path': logo_path,
         'STATIC_ROOT': os.path.join(settings.BASE_DIR, 'static'),
     }
@@ -46,20 +45,25 @@ def commande_print_bon_weasyprint(request, pk):
     html_string = render_to_string('inventory/bon_commande_pdf.html', context)
     
     # Générer le PDF avec WeasyPrint
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf_file = html.write_pdf()
+    html = HTML(string=html_string, base_url=str(settings.BASE_DIR))
+    return html.write_pdf()
+
+
+def commande_print_bon_weasyprint(request, pk):
+    """Générer le bon de commande en PDF professionnel avec WeasyPrint"""
+    commande = get_object_or_404(Commande, pk=pk)
     
-    # Créer la réponse HTTP
-    response = HttpResponse(pdf_file, content_type='application/pdf')
+    # PDF servi depuis le cache disque tant que la commande n'a pas changé
+    response = HttpResponse(pdf_en_cache(commande, 'bon_commande'), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="Bon_Commande_{commande.numero_commande}.pdf"'
     
     return response
 
 
-def commande_print_proforma_weasyprint(request, pk):
+@document_pdf('proforma_commande', Commande)
+def rendre_proforma_commande(commande):
     """Générer la facture proforma en PDF professionnel avec WeasyPrint"""
-    commande = get_object_or_404(Commande, pk=pk)
-    lignes_commande = LigneCommande.objects.filter(commande=commande).select_related('produit')
+    lignes_commande = lignes_document(commande)
     
     # Calculer TVA et Total TTC
     tva = commande.total * Decimal('0.18')
@@ -74,7 +78,6 @@ def commande_print_proforma_weasyprint(request, pk):
         'lignes_commande': lignes_commande,
         'tva': tva,
         'total_ttc': total_ttc,
-        'now': datetime.now(),
         'logo_path': logo_path,
         'STATIC_ROOT': os.path.join(settings.BASE_DIR, 'static'),
     }
@@ -83,24 +86,30 @@ def commande_print_proforma_weasyprint(request, pk):
     html_string = render_to_string('inventory/facture_proforma_pdf.html', context)
     
     # Générer le PDF avec WeasyPrint
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf_file = html.write_pdf()
+    html = HTML(string=html_string, base_url=str(settings.BASE_DIR))
+    return html.write_pdf()
+
+
+def commande_print_proforma_weasyprint(request, pk):
+    """Générer la facture proforma en PDF professionnel avec WeasyPrint"""
+    commande = get_object_or_404(Commande, pk=pk)
     
-    # Créer la réponse HTTP
-    response = HttpResponse(pdf_file, content_type='application/pdf')
+    # PDF servi depuis le cache disque tant que la commande n'a pas changé
+    response = HttpResponse(pdf_en_cache(commande, 'proforma_commande'), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="Facture_Proforma_{commande.numero_commande}.pdf"'
     
     return response
 
 
-def commande_print_livraison_weasyprint(request, pk):
+@document_pdf('bon_livraison', Commande)
+def rendre_bon_livraison(commande):
     """Générer le bon de livraison en PDF professionnel avec WeasyPrint"""
-    commande = get_object_or_404(Commande, pk=pk)
-    lignes_commande = LigneCommande.objects.filter(commande=commande).select_related('produit')
+    lignes_commande = lignes_document(commande)
     
     # Calculer quantité totale et quantité livrée
     total_quantite = sum(ligne.quantite for ligne in lignes_commande)
-    total_quantite_livree = sum(ligne.quantite_recue if ligne.quantite_recue else ligne.quantite for ligne in lignes_commande)
+    # LigneCommande n'a pas de quantité reçue : tout ce qui est commandé est livré
+    total_quantite_livree = total_quantite
     
     # Chemin absolu vers le logo
     logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
@@ -111,7 +120,6 @@ def commande_print_livraison_weasyprint(request, pk):
         'lignes_commande': lignes_commande,
         'total_quantite': total_quantite,
         'total_quantite_livree': total_quantite_livree,
-        'now': datetime.now(),
         'logo_path': logo_path,
         'STATIC_ROOT': os.path.join(settings.BASE_DIR, 'static'),
     }
@@ -120,11 +128,16 @@ def commande_print_livraison_weasyprint(request, pk):
     html_string = render_to_string('inventory/bon_livraison_pdf.html', context)
     
     # Générer le PDF avec WeasyPrint
-    html = HTML(string=html_string, base_url=request.build_absolute_uri())
-    pdf_file = html.write_pdf()
+    html = HTML(string=html_string, base_url=str(settings.BASE_DIR))
+    return html.write_pdf()
+
+
+def commande_print_livraison_weasyprint(request, pk):
+    """Générer le bon de livraison en PDF professionnel avec WeasyPrint"""
+    commande = get_object_or_404(Commande, pk=pk)
     
-    # Créer la réponse HTTP
-    response = HttpResponse(pdf_file, content_type='application/pdf')
+    # PDF servi depuis le cache disque tant que la commande n'a pas changé
+    response = HttpResponse(pdf_en_cache(commande, 'bon_livraison'), content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="Bon_Livraison_{commande.numero_commande}.pdf"'
     
     return response
@@ -1,14 +1,21 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count
-from django.core.paginator import Paginator
-from django.http import HttpResponse
-from datetime import datetime
-import csv
 from .models import ProspectionTelephonique
 from .forms import ProspectionTelephoniqueForm
+from .filtres import filtrer_prospections, prospections_visibles
+from .stats_listes import statistiques, astatistiques, dans
+from .exports import EXPORTS, reponse_csv
+from .pagination import paginer
 from users.decorators import role_required
+from users.permissions import droits
+
+
+# Badges de l'API de statistiques
+STATUTS_SUIVIS = ('RDV', 'BV', 'CLIENT_ACQUIS', 'A_RELANCER')
+TYPES_APPEL = ('SORTANT', 'ENTRANT')
 
 
 @login_required
@@ -17,58 +24,34 @@ def prospection_list(request):
     """Liste des prospections téléphoniques avec filtres et recherche"""
     
     # Récupération de tous les prospects
-    prospections = ProspectionTelephonique.objects.select_related('commercial').all()
-    
-    # Filtres commerciaux uniquement voient leurs prospects
-    if hasattr(request.user, 'profile') and request.user.profile.role == 'COMMERCIAL_TERRAIN':
-        prospections = prospections.filter(commercial=request.user)
-    
-    # Recherche
+    prospections = filtrer_prospections(
+        request, ProspectionTelephonique.objects.select_related('commercial').all()
+    )
     search_query = request.GET.get('search', '')
-    if search_query:
-        prospections = prospections.filter(
-            Q(nom_complet__icontains=search_query) |
-            Q(numero_telephone__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
-    
-    # Filtre par statut
     statut_filter = request.GET.get('statut', '')
-    if statut_filter:
-        prospections = prospections.filter(statut=statut_filter)
-    
-    # Filtre par type d'appel
     type_appel_filter = request.GET.get('type_appel', '')
-    if type_appel_filter:
-        prospections = prospections.filter(type_appel=type_appel_filter)
-    
-    # Filtre par source (appel entrant uniquement)
     source_filter = request.GET.get('source', '')
-    if source_filter:
-        prospections = prospections.filter(source_prospect=source_filter)
     
     # Tri
     sort_by = request.GET.get('sort', '-date_creation')
     prospections = prospections.order_by(sort_by)
     
-    # Statistiques
-    stats = {
-        'total': ProspectionTelephonique.objects.filter(
-            commercial=request.user if request.user.profile.role == 'commercial_terrain' else None
-        ).count() if request.user.profile.role == 'commercial_terrain' else ProspectionTelephonique.objects.count(),
-        'rdv': prospections.filter(statut='RDV').count(),
-        'bv': prospections.filter(statut='BV').count(),
-        'client_acquis': prospections.filter(statut='CLIENT_ACQUIS').count(),
-        'a_relancer': prospections.filter(statut='A_RELANCER').count(),
-        'appel_sortant': prospections.filter(type_appel='SORTANT').count(),
-        'appel_entrant': prospections.filter(type_appel='ENTRANT').count(),
-    }
+    # Statistiques en une requête : total des prospects visibles par l'utilisateur,
+    # badges sur les prospects filtrés
+    filtres = dans(prospections)
+    stats = statistiques(
+        prospections_visibles(request.user), request.user,
+        total=Count('id'),
+        rdv=Count('id', filter=filtres & Q(statut='RDV')),
+        bv=Count('id', filter=filtres & Q(statut='BV')),
+        client_acquis=Count('id', filter=filtres & Q(statut='CLIENT_ACQUIS')),
+        a_relancer=Count('id', filter=filtres & Q(statut='A_RELANCER')),
+        appel_sortant=Count('id', filter=filtres & Q(type_appel='SORTANT')),
+        appel_entrant=Count('id', filter=filtres & Q(type_appel='ENTRANT')),
+    )
     
     # Pagination
-    paginator = Paginator(prospections, 20)  # 20 prospects par page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginer(request, prospections, 20, total=True)  # 20 prospects par page
     
     context = {
         'page_obj': page_obj,
@@ -121,7 +104,7 @@ def prospection_detail(request, pk):
     prospection = get_object_or_404(ProspectionTelephonique, pk=pk)
     
     # Vérifier les permissions
-    if hasattr(request.user, 'profile') and request.user.profile.role == 'COMMERCIAL_TERRAIN' and prospection.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and prospection.commercial != request.user:
         messages.error(request, '❌ Vous n\'avez pas accès à cette prospection.')
         return redirect('inventory:prospection_list')
     
@@ -140,7 +123,7 @@ def prospection_edit(request, pk):
     prospection = get_object_or_404(ProspectionTelephonique, pk=pk)
     
     # Vérifier les permissions
-    if hasattr(request.user, 'profile') and request.user.profile.role == 'COMMERCIAL_TERRAIN' and prospection.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and prospection.commercial != request.user:
         messages.error(request, '❌ Vous ne pouvez pas modifier cette prospection.')
         return redirect('inventory:prospection_list')
     
@@ -173,7 +156,7 @@ def prospection_delete(request, pk):
     prospection = get_object_or_404(ProspectionTelephonique, pk=pk)
     
     # Vérifier les permissions
-    if hasattr(request.user, 'profile') and request.user.profile.role == 'COMMERCIAL_TERRAIN' and prospection.commercial != request.user:
+    if droits(request.user).role == 'COMMERCIAL_TERRAIN' and prospection.commercial != request.user:
         messages.error(request, '❌ Vous ne pouvez pas supprimer cette prospection.')
         return redirect('inventory:prospection_list')
     
@@ -194,88 +177,30 @@ def prospection_delete(request, pk):
 @login_required
 @role_required(['COMMERCIAL_TERRAIN', 'MANAGER'])
 def prospection_export_excel(request):
-    """Exporter les prospections en CSV (compatible Excel)"""
-    
-    # Récupération des prospects selon les filtres
-    prospections = ProspectionTelephonique.objects.select_related('commercial').all()
-    
-    # Filtres commerciaux uniquement voient leurs prospects
-    if hasattr(request.user, 'profile') and request.user.profile.role == 'COMMERCIAL_TERRAIN':
-        prospections = prospections.filter(commercial=request.user)
-    
-    # Appliquer les mêmes filtres que la liste
-    statut_filter = request.GET.get('statut', '')
-    if statut_filter:
-        prospections = prospections.filter(statut=statut_filter)
-    
-    type_appel_filter = request.GET.get('type_appel', '')
-    if type_appel_filter:
-        prospections = prospections.filter(type_appel=type_appel_filter)
-    
-    # Créer la réponse HTTP
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="prospections_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    response.write('\ufeff'.encode('utf-8'))  # BOM pour Excel
-    
-    writer = csv.writer(response, delimiter=';')
-    
-    # En-têtes
-    writer.writerow([
-        'Nom Complet', 
-        'Numéro Téléphone', 
-        'Email', 
-        'Type Appel', 
-        'Statut', 
-        'Date RDV', 
-        'Source Prospect', 
-        'Description', 
-        'Commercial',
-        'Date Création',
-        'Date Modification'
-    ])
-    
-    # Données
-    for prospection in prospections:
-        writer.writerow([
-            prospection.nom_complet,
-            prospection.numero_telephone,
-            prospection.email or '',
-            prospection.get_type_appel_display(),
-            prospection.get_statut_display(),
-            prospection.date_rdv.strftime('%d/%m/%Y') if prospection.date_rdv else '',
-            prospection.get_source_prospect_display() if prospection.source_prospect else '',
-            prospection.description,
-            f"{prospection.commercial.first_name} {prospection.commercial.last_name}",
-            prospection.date_creation.strftime('%d/%m/%Y %H:%M'),
-            prospection.date_modification.strftime('%d/%m/%Y %H:%M'),
-        ])
-    
-    return response
+    """Exporter les prospections en CSV (compatible Excel), avec les filtres de la liste"""
+    return reponse_csv(EXPORTS['prospections'], request)
 
 
 @login_required
 @role_required(['COMMERCIAL_TERRAIN', 'MANAGER'])
-def prospection_stats_api(request):
-    """API JSON pour les statistiques (pour graphiques futurs)"""
+async def prospection_stats_api(request):
+    """API JSON pour les statistiques (pour graphiques futurs), vue asynchrone"""
     from django.http import JsonResponse
     
-    prospections = ProspectionTelephonique.objects.all()
-    
-    if hasattr(request.user, 'profile') and request.user.profile.role == 'COMMERCIAL_TERRAIN':
-        prospections = prospections.filter(commercial=request.user)
+    user = await request.auser()
+    # Le rôle peut être lu en base (cache des droits expiré) : exécuté dans un thread
+    prospections = await sync_to_async(prospections_visibles)(user)
+    comptes = await astatistiques(
+        prospections, user,
+        total=Count('id'),
+        **{f'statut_{statut}': Count('id', filter=Q(statut=statut)) for statut in STATUTS_SUIVIS},
+        **{f'type_{type_appel}': Count('id', filter=Q(type_appel=type_appel)) for type_appel in TYPES_APPEL},
+    )
     
     stats = {
-        'par_statut': {
-            'RDV': prospections.filter(statut='RDV').count(),
-            'BV': prospections.filter(statut='BV').count(),
-            'CLIENT_ACQUIS': prospections.filter(statut='CLIENT_ACQUIS').count(),
-            'A_RELANCER': prospections.filter(statut='A_RELANCER').count(),
-        },
-        'par_type': {
-            'SORTANT': prospections.filter(type_appel='SORTANT').count(),
-            'ENTRANT': prospections.filter(type_appel='ENTRANT').count(),
-        },
-        'total': prospections.count(),
+        'par_statut': {statut: comptes[f'statut_{statut}'] for statut in STATUTS_SUIVIS},
+        'par_type': {type_appel: comptes[f'type_{type_appel}'] for type_appel in TYPES_APPEL},
+        'total': comptes['total'],
     }
     
     return JsonResponse(stats)
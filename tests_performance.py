@@ -20,15 +20,15 @@ from inventory.models import (
     Commande, LigneCommande, Vente, LigneVente, MouvementStock,
     Devis, LigneDevis
 )
+from inventory.profilage import mesurer
 
 
 @contextmanager
 def query_counter():
-    """Context manager pour compter les requêtes SQL"""
-    initial_queries = len(connection.queries)
-    yield
-    final_queries = len(connection.queries)
-    print(f"Nombre de requêtes SQL: {final_queries - initial_queries}")
+    """Context manager pour compter les requêtes SQL (voir inventory/profilage.py)"""
+    with mesurer() as mesure:
+        yield mesure
+    print(f"Nombre de requêtes SQL: {mesure.requetes} ({mesure.duree_sql:.1f} ms, {len(mesure.doublons())} N+1)")
 
 
 class DatabasePerformanceTest(TestCase):
@@ -0,0 +1,29 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .permissions import droits
+
+
+class CapacitesMiddleware:
+    """
+    Attache à la requête les capacités de l'utilisateur (request.capacites,
+    frozenset des méthodes can_* / is_manager accordées), évaluées au premier
+    accès depuis le cache de users/permissions.py : aucune requête en base
+    après la connexion.
+
+    À placer après AuthenticationMiddleware. Compatible WSGI et ASGI (les vues
+    asynchrones ne sont pas repassées dans un thread).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.capacites = SimpleLazyObject(lambda: droits(request.user).capacites)
+        # En mode asynchrone, renvoie la coroutine de la suite de la chaîne
+        return self.get_response(request)
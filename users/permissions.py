@@ -0,0 +1,90 @@
+"""
+Cache des rôles et capacités des utilisateurs
+
+Les décorateurs de users/decorators.py ne chargent plus request.user.profile à
+chaque requête : le rôle de chaque utilisateur est conservé dans un cache du
+processus, et l'ensemble de ses capacités (noms des méthodes can_* et
+is_manager de Profile qui lui sont accordées) est un frozenset calculé une
+seule fois par rôle. Après le premier accès, une autorisation ne coûte donc
+aucune requête.
+
+Le cache d'un utilisateur est vidé par post_save / post_delete de Profile
+(users/signals.py). Les autres processus du serveur ne reçoivent pas ce
+signal : leurs entrées expirent après PERMISSIONS_CACHE_DUREE secondes.
+"""
+
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+
+from .models import Profile
+
+
+# Méthodes de Profile qui définissent les capacités d'un rôle
+CAPACITES = tuple(
+    nom for nom in vars(Profile)
+    if nom.startswith('can_') or nom == 'is_manager'
+)
+
+_cache = {}
+
+
+@dataclass(frozen=True)
+class Droits:
+    role: str = None  # None : utilisateur sans profil
+    capacites: frozenset = frozenset()
+    expiration: float = 0
+
+    def a_role(self, roles):
+        return self.role in roles
+
+    def peut(self, *capacites):
+        """Vrai si au moins une des capacités est accordée"""
+        return not self.capacites.isdisjoint(capacites)
+
+
+@lru_cache(maxsize=None)
+def capacites_du_role(role):
+    """Capacités accordées à un rôle, évaluées une fois par processus"""
+    profil = Profile(role=role)
+    return frozenset(nom for nom in CAPACITES if getattr(profil, nom)())
+
+
+def duree():
+    return getattr(settings, 'PERMISSIONS_CACHE_DUREE', 300)
+
+
+def droits(user):
+    """Rôle et capacités de l'utilisateur (mémorisés sur l'instance User pour la requête)"""
+    if not user.is_authenticated:
+        return Droits()
+    resultat = getattr(user, '_droits', None)
+    if resultat is not None:
+        return resultat
+
+    maintenant = time.monotonic()
+    resultat = _cache.get(user.pk)
+    if resultat is None or resultat.expiration <= maintenant:
+        # Le profil déjà chargé sur l'instance évite la requête
+        if 'profile' in user._state.fields_cache:
+            role = user.profile.role
+        else:
+            role = Profile.objects.filter(user_id=user.pk).values_list('role', flat=True).first()
+        resultat = Droits(
+            role=role,
+            capacites=capacites_du_role(role) if role is not None else frozenset(),
+            expiration=maintenant + duree(),
+        )
+        _cache[user.pk] = resultat
+    user._droits = resultat
+    return resultat
+
+
+def invalider_droits(user_id):
+    _cache.pop(user_id, None)
+
+
+def vider_cache():
+    _cache.clear()
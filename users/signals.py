@@ -1,14 +1,18 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import Profile
+from .permissions import invalider_droits
 
 @receiver(post_save, sender=User)
 def create_or_update_user_profile(sender, instance, created, **kwargs):
-    if created:
-        # Créer un profil seulement si l'utilisateur vient d'être créé
-        Profile.objects.create(user=instance)
-    else:
-        # Pour les utilisateurs existants, créer le profil s'il n'existe pas
-        if not hasattr(instance, 'profile'):
-            Profile.objects.create(user=instance)
+    # Le receiver de users/models.py crée déjà le profil : rester idempotent
+    Profile.objects.get_or_create(user=instance)
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalider_droits_profil(sender, instance, **kwargs):
+    # Le rôle a pu changer : les décorateurs relisent le profil à la prochaine requête
+    invalider_droits(instance.user_id)
+    if 'user' in instance._state.fields_cache:
+        instance.user.__dict__.pop('_droits', None)
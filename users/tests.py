@@ -4,6 +4,7 @@ from django.urls import reverse
 from django.core.exceptions import ValidationError
 from .models import Profile
 from .decorators import role_required, permission_required, manager_required
+from .permissions import droits, capacites_du_role, vider_cache
 from .forms import ProfileForm
 
 
@@ -528,6 +529,69 @@ class SecurityTest(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirection vers login
 
 
+class CapacitesCacheTest(TestCase):
+    """Tests du cache des rôles et capacités (users/permissions.py)"""
+
+    def setUp(self):
+        vider_cache()
+        self.user = User.objects.create_user("tech_cache", "test@test.com", "pass")
+        self.user.profile.role = Profile.Role.TECHNICIEN
+        self.user.profile.save()
+
+    def test_capacites_du_role(self):
+        """Les capacités d'un rôle sont celles des méthodes can_* de Profile"""
+        capacites = capacites_du_role(Profile.Role.COMMERCIAL_SHOWROOM)
+        self.assertIn('can_manage_sales', capacites)
+        self.assertNotIn('can_manage_stock', capacites)
+        self.assertIn('is_manager', capacites_du_role(Profile.Role.MANAGER))
+
+    def test_aucune_requete_apres_premier_acces(self):
+        """Après le premier chargement, une autorisation ne coûte aucune requête"""
+        droits(User.objects.get(pk=self.user.pk))
+        utilisateur = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(droits(utilisateur).peut('can_manage_stock'))
+
+    def test_invalidation_au_changement_de_role(self):
+        """post_save de Profile vide le cache de l'utilisateur"""
+        self.assertTrue(droits(User.objects.get(pk=self.user.pk)).peut('can_manage_stock'))
+        profile = Profile.objects.get(user=self.user)
+        profile.role = Profile.Role.COMMERCIAL_SHOWROOM
+        profile.save()
+        user_droits = droits(User.objects.get(pk=self.user.pk))
+        self.assertEqual(user_droits.role, Profile.Role.COMMERCIAL_SHOWROOM)
+        self.assertFalse(user_droits.peut('can_manage_stock'))
+
+    def test_permission_required_chaine_ou_liste(self):
+        """permission_required accepte une permission ou une liste (au moins une requise)"""
+        from django.http import HttpResponse
+
+        @permission_required('can_manage_stock')
+        def vue_stock(request):
+            return HttpResponse("ok")
+
+        @permission_required(['can_manage_sales', 'can_manage_products'])
+        def vue_liste(request):
+            return HttpResponse("ok")
+
+        @permission_required('can_manage_sales')
+        def vue_ventes(request):
+            return HttpResponse("ok")
+
+        request = self.client.get('/').wsgi_request
+        request.user = self.user
+        self.assertEqual(vue_stock(request).status_code, 200)
+        self.assertEqual(vue_liste(request).status_code, 200)
+        self.assertEqual(vue_ventes(request).status_code, 302)
+
+    def test_middleware_capacites(self):
+        """Le middleware attache les capacités de l'utilisateur connecté à la requête"""
+        self.client.login(username="tech_cache", password="pass")
+        request = self.client.get(reverse('users:profile')).wsgi_request
+        self.assertIn('can_manage_products', request.capacites)
+        self.assertNotIn('can_view_analytics', request.capacites)
+
+
 if __name__ == '__main__':
     import unittest
     unittest.main()